@@ -0,0 +1,293 @@
+"""
+Read files and folders from tar and zip archives without extracting them.
+
+`ArchiveFileSystem` provides the names, sizes and modification times stored in the index of
+an archive using the same methods as `antglob.LocalFileSystem`, so
+`antglob.AntPatternSet.findEntries()` can scan an archive as if it was a folder. The paths
+of the entries are located "in" the archive, for example ``/tmp/drop.tar.gz/docs/some.txt``.
+
+To read the content of files, `iterFiles()` yields them in the order they are stored in the
+archive together with a file-like object to read their content from. That way, even
+compressed tar archives, which cannot be accessed at random without decompressing everything
+before the requested file again, are read in a single sequential pass. To read the content
+while reading the index, which saves decompressing the archive a second time, pass a function
+to `ArchiveFileSystem`.
+
+Supported archive formats are tar, optionally compressed using gzip or bzip2, and zip.
+Entries other than files and folders, for example symbolic links, are ignored.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import errno
+import logging
+import os
+import stat
+import tarfile
+import time
+import zipfile
+
+_log = logging.getLogger("scunch.archive")
+
+# Permissions of files and folders for archives that do not store any.
+_DefaultFileMode = stat.S_IFREG | 0644
+_DefaultFolderMode = stat.S_IFDIR | 0755
+
+# Value of ``ZipInfo.create_system`` for archives created on Unix.
+_ZipUnixSystem = 3
+
+
+class ArchiveError(EnvironmentError):
+    """
+    Error raised when an archive cannot be read.
+    """
+    pass
+
+
+def isArchive(path):
+    """
+    ``True`` if ``path`` refers to a tar or zip archive.
+    """
+    assert path is not None
+    result = False
+    if os.path.isfile(path):
+        try:
+            result = zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+        except EnvironmentError, error:
+            _log.debug(u'cannot examine "%s": %s', path, error)
+    return result
+
+
+class ArchiveEntryInfo(object):
+    """
+    Information about a file or folder in an archive, providing the same fields as needed
+    from ``os.stat()``.
+    """
+    def __init__(self, mode, size, timeModified):
+        self.st_mode = mode
+        self.st_size = size
+        self.st_mtime = timeModified
+
+
+def _decodedName(name, fallbackEncoding):
+    if isinstance(name, unicode):
+        result = name
+    else:
+        try:
+            result = name.decode('utf-8')
+        except UnicodeError:
+            result = name.decode(fallbackEncoding)
+    return result
+
+
+def _relativePathOrNone(name):
+    """
+    Relative path of the archive entry ``name`` using the separator of the local file system,
+    or ``None`` if ``name`` refers to the archive itself.
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if os.pardir in parts:
+        raise ArchiveError(u'archive entry must be located inside the archive: %r' % name)
+    if parts:
+        result = os.sep.join(parts)
+    else:
+        result = None
+    return result
+
+
+def _zipEntries(archive):
+    """
+    Iterator over tuples ``(relativePath, entryInfo, zipInfo)`` for the files and folders in
+    the zip ``archive`` in the order they are stored.
+    """
+    for zipInfo in sorted(archive.infolist(), key=lambda zipInfo: zipInfo.header_offset):
+        name = _decodedName(zipInfo.filename, 'cp437')
+        relativePath = _relativePathOrNone(name)
+        if relativePath is not None:
+            isFolder = name.endswith('/')
+            unixMode = 0
+            if zipInfo.create_system == _ZipUnixSystem:
+                unixMode = zipInfo.external_attr >> 16
+            if isFolder:
+                mode = stat.S_IFDIR | (stat.S_IMODE(unixMode) or stat.S_IMODE(_DefaultFolderMode))
+            elif (stat.S_IFMT(unixMode) == 0) or stat.S_ISREG(unixMode):
+                mode = stat.S_IFREG | (stat.S_IMODE(unixMode) or stat.S_IMODE(_DefaultFileMode))
+            else:
+                mode = None
+            if mode is not None:
+                timeModified = time.mktime(zipInfo.date_time + (0, 0, -1))
+                yield relativePath, ArchiveEntryInfo(mode, zipInfo.file_size, timeModified), zipInfo
+            else:
+                _log.warning(u'ignore archive entry that is neither a file nor a folder: "%s"', relativePath)
+
+
+def _tarEntries(archive):
+    """
+    Iterator over tuples ``(relativePath, entryInfo, tarInfo)`` for the files and folders in
+    the tar ``archive`` opened as stream in the order they are stored.
+    """
+    for tarInfo in archive:
+        # Forget the entries read so far so the memory needed does not grow with the number
+        # of entries in the archive.
+        archive.members = []
+        relativePath = _relativePathOrNone(_decodedName(tarInfo.name, 'latin-1'))
+        if relativePath is not None:
+            if tarInfo.isdir():
+                mode = stat.S_IFDIR | tarInfo.mode
+            elif tarInfo.isfile():
+                mode = stat.S_IFREG | tarInfo.mode
+            else:
+                mode = None
+            if mode is not None:
+                yield relativePath, ArchiveEntryInfo(mode, tarInfo.size, tarInfo.mtime), tarInfo
+            else:
+                _log.warning(u'ignore archive entry that is neither a file nor a folder: "%s"', relativePath)
+
+
+def _openedTarArchive(archivePath):
+    try:
+        result = tarfile.open(archivePath, 'r|*')
+    except tarfile.TarError, error:
+        raise ArchiveError(u'cannot read archive "%s": %s' % (archivePath, error))
+    return result
+
+
+def iterFiles(archivePath, relativePathsToRead=None):
+    """
+    Iterator over tuples ``(relativePath, entryInfo, fileToRead)`` for the files in the archive
+    at ``archivePath`` in the order they are stored in the archive, where ``entryInfo`` is an
+    `ArchiveEntryInfo` and ``fileToRead`` is a file-like object to read the content from.
+    ``fileToRead`` can only be read until the next file is yielded.
+
+    If ``relativePathsToRead`` is specified, only yield the files whose relative path is in
+    it. Files stored several times in the archive are yielded each time, so the last one wins.
+    """
+    assert archivePath is not None
+    if zipfile.is_zipfile(archivePath):
+        with zipfile.ZipFile(archivePath) as archive:
+            for relativePath, entryInfo, zipInfo in _zipEntries(archive):
+                if stat.S_ISREG(entryInfo.st_mode) and ((relativePathsToRead is None) or (relativePath in relativePathsToRead)):
+                    fileToRead = archive.open(zipInfo)
+                    try:
+                        yield relativePath, entryInfo, fileToRead
+                    finally:
+                        fileToRead.close()
+    else:
+        archive = _openedTarArchive(archivePath)
+        try:
+            for relativePath, entryInfo, tarInfo in _tarEntries(archive):
+                if stat.S_ISREG(entryInfo.st_mode) and ((relativePathsToRead is None) or (relativePath in relativePathsToRead)):
+                    yield relativePath, entryInfo, archive.extractfile(tarInfo)
+        except tarfile.TarError, error:
+            raise ArchiveError(u'cannot read archive "%s": %s' % (archivePath, error))
+        finally:
+            archive.close()
+
+
+class ArchiveFileSystem(object):
+    """
+    Access to the files and folders in the archive at ``archivePath`` as needed by
+    `antglob.AntPatternSet.ifind()`. The index of the archive is read once when creating the
+    `ArchiveFileSystem`. Folders that are not stored in the archive but contain stored files
+    get the modification time of the archive.
+
+    To read the content of the files during the same pass, specify a function
+    ``readFile(relativePath, entryInfo, fileToRead)``, which is called for each file in the
+    order they are stored in the archive with the same arguments as yielded by `iterFiles()`.
+    ``fileToRead`` can only be read until ``readFile`` returns.
+    """
+    def __init__(self, archivePath, readFile=None):
+        assert archivePath is not None
+        self.archivePath = os.path.normpath(os.path.abspath(archivePath))
+        self._relativePathToEntryInfoMap = {}
+        self._folderPathToNamesMap = {}
+        archiveTimeModified = os.path.getmtime(self.archivePath)
+        self._addFolder(u'', archiveTimeModified)
+        if zipfile.is_zipfile(self.archivePath):
+            try:
+                with zipfile.ZipFile(self.archivePath) as archive:
+                    for relativePath, entryInfo, zipInfo in _zipEntries(archive):
+                        self._addEntry(relativePath, entryInfo, archiveTimeModified)
+                        if (readFile is not None) and stat.S_ISREG(entryInfo.st_mode):
+                            fileToRead = archive.open(zipInfo)
+                            try:
+                                readFile(relativePath, entryInfo, fileToRead)
+                            finally:
+                                fileToRead.close()
+            except zipfile.BadZipfile, error:
+                raise ArchiveError(u'cannot read archive "%s": %s' % (archivePath, error))
+        else:
+            archive = _openedTarArchive(self.archivePath)
+            try:
+                for relativePath, entryInfo, tarInfo in _tarEntries(archive):
+                    self._addEntry(relativePath, entryInfo, archiveTimeModified)
+                    if (readFile is not None) and stat.S_ISREG(entryInfo.st_mode):
+                        readFile(relativePath, entryInfo, archive.extractfile(tarInfo))
+            except tarfile.TarError, error:
+                raise ArchiveError(u'cannot read archive "%s": %s' % (archivePath, error))
+            finally:
+                archive.close()
+        _log.info(u'read index of "%s" with %d entries', archivePath, len(self._relativePathToEntryInfoMap) - 1)
+
+    def _addFolder(self, relativeFolderPath, timeModified):
+        if relativeFolderPath not in self._folderPathToNamesMap:
+            self._folderPathToNamesMap[relativeFolderPath] = set()
+            self._relativePathToEntryInfoMap[relativeFolderPath] = ArchiveEntryInfo(_DefaultFolderMode, 0, timeModified)
+            if relativeFolderPath:
+                parentFolderPath, name = os.path.split(relativeFolderPath)
+                self._addFolder(parentFolderPath, timeModified)
+                self._folderPathToNamesMap[parentFolderPath].add(name)
+
+    def _addEntry(self, relativePath, entryInfo, archiveTimeModified):
+        parentFolderPath, name = os.path.split(relativePath)
+        self._addFolder(parentFolderPath, archiveTimeModified)
+        if stat.S_ISDIR(entryInfo.st_mode):
+            self._addFolder(relativePath, entryInfo.st_mtime)
+            self._relativePathToEntryInfoMap[relativePath] = entryInfo
+        elif relativePath in self._folderPathToNamesMap:
+            raise ArchiveError(u'archive entry must be either a file or a folder: "%s"' % relativePath)
+        else:
+            self._relativePathToEntryInfoMap[relativePath] = entryInfo
+            self._folderPathToNamesMap[parentFolderPath].add(name)
+
+    def relativePath(self, path):
+        """
+        Path of ``path`` relative to the archive.
+        """
+        assert path is not None
+        normalizedPath = os.path.normpath(os.path.abspath(path))
+        if normalizedPath == self.archivePath:
+            result = u''
+        elif normalizedPath.startswith(self.archivePath + os.sep):
+            result = normalizedPath[len(self.archivePath) + 1:]
+        else:
+            raise OSError(errno.ENOENT, u'path must be located in archive "%s": "%s"' % (self.archivePath, path))
+        return result
+
+    def listdir(self, folderPath):
+        names = self._folderPathToNamesMap.get(self.relativePath(folderPath))
+        if names is None:
+            raise OSError(errno.ENOTDIR, u'folder must exist in archive "%s": "%s"' % (self.archivePath, folderPath))
+        return sorted(names)
+
+    def isdir(self, path):
+        return self.relativePath(path) in self._folderPathToNamesMap
+
+    def stat(self, path):
+        result = self._relativePathToEntryInfoMap.get(self.relativePath(path))
+        if result is None:
+            raise OSError(errno.ENOENT, u'entry must exist in archive "%s": "%s"' % (self.archivePath, path))
+        return result
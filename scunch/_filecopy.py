@@ -0,0 +1,442 @@
+"""
+Copy files letting the kernel move the data where possible.
+
+`copyFile()` works like `shutil.copy2()` but tries the following methods to copy the content,
+falling back to the next one if a method is not available for the files involved:
+
+1. ``clone``: share the data blocks of the source file using the ``FICLONE`` ioctl, which
+   only takes a moment regardless of the file size but requires both files to be located on
+   the same file system supporting reflinks, for example btrfs or XFS.
+2. ``copy_file_range``: let the kernel copy the data without passing it through user space,
+   which also allows network file systems to copy the data on the server.
+3. ``sendfile``: similar to ``copy_file_range`` but available with older kernels.
+4. ``read``: read and write the data using a large buffer.
+
+Except for ``clone``, the target file is preallocated first to avoid fragmentation.
+
+To keep copying large amounts of data from pushing everything else out of the page cache,
+`adviseSequential()` and `dropFromCache()` tell the kernel how a file is going to be used
+with ``posix_fadvise()``. `copyFile()` applies them if ``dropCache`` is set.
+
+To change only the parts of a large file that actually differ, `updateFile()` compares it
+with the source in blocks of `DeltaBlockSize` bytes and rewrites only the blocks that differ
+in place, which saves most of the writes if only a few blocks changed.
+
+To write files that survive a crash, copy them to a temporary file first, sync it using
+`syncFile()`, move it into place using `replaceFile()` and finally sync the folder containing
+it using `syncFolder()`.
+
+The module only uses the standard library and accesses the system calls using `ctypes`, so
+everything but ``read`` is only available on Linux.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_log = logging.getLogger("scunch.filecopy")
+
+Clone = 'clone'
+CopyFileRange = 'copy_file_range'
+SendFile = 'sendfile'
+Read = 'read'
+
+#: Methods to copy the content of files in the order they are tried.
+Methods = (Clone, CopyFileRange, SendFile, Read)
+
+# ``_IOW(0x94, 9, int)`` as defined in <linux/fs.h>.
+_FICLONE = 0x40049409
+
+# Errors indicating that a method is not available for the files involved, in which case the
+# next method should be tried.
+_UnsupportedErrors = set([
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EPERM,
+    errno.EXDEV,
+])
+
+# Advice for ``posix_fadvise()`` as defined in <fcntl.h>.
+_FadviseSequential = 2
+_FadviseDontNeed = 4
+
+# Maximum number of bytes to copy with a single system call.
+_ChunkSize = 64 * 1024 * 1024
+
+#: Default number of bytes to read and write at once when the data pass through user space.
+DefaultBufferSize = 1024 * 1024
+
+#: Number of bytes `updateFileContent()` compares and rewrites at once.
+DeltaBlockSize = 64 * 1024
+
+
+def _loadedLibc():
+    result = None
+    libcPath = ctypes.util.find_library('c')
+    if libcPath is not None:
+        try:
+            result = ctypes.CDLL(libcPath, use_errno=True)
+        except OSError, error:  # pragma: no cover
+            _log.debug(u'cannot load C library "%s": %s', libcPath, error)
+    return result
+
+
+def _libcFunction(name, restype, argtypes):
+    """
+    Function ``name`` from the C library or ``None`` if it is not available.
+    """
+    result = None
+    if _libc is not None:
+        result = getattr(_libc, name, None)
+        if result is not None:
+            result.restype = restype
+            result.argtypes = argtypes
+    return result
+
+_libc = _loadedLibc()
+_copyFileRange = _libcFunction('copy_file_range', ctypes.c_ssize_t, [
+    ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint
+])
+_sendFile = _libcFunction('sendfile', ctypes.c_ssize_t, [ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t])
+_fallocate = _libcFunction('fallocate', ctypes.c_int, [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong])
+_posixFadvise = _libcFunction('posix_fadvise', ctypes.c_int, [ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong, ctypes.c_int])
+
+
+def _isUnsupported(error):
+    return error in _UnsupportedErrors
+
+
+def _fadvise(fileDescriptor, advice):
+    if _posixFadvise is not None:
+        # Unlike most system calls, ``posix_fadvise()`` returns the error instead of setting
+        # ``errno``.
+        error = _posixFadvise(fileDescriptor, 0, 0, advice)
+        if error != 0:
+            _log.debug(u'cannot advise on file usage: %s', os.strerror(error))
+
+
+def adviseSequential(fileDescriptor):
+    """
+    Tell the kernel that the file ``fileDescriptor`` is read from start to end so it can read
+    ahead more aggressively.
+    """
+    _fadvise(fileDescriptor, _FadviseSequential)
+
+
+def dropFromCache(fileDescriptor, isWritten=False):
+    """
+    Tell the kernel that the data of the file ``fileDescriptor`` are not needed anymore so it
+    can remove them from the page cache. Because the kernel cannot drop pages that are not
+    written to disk yet, a file that was written to (as indicated by ``isWritten``) is synced
+    first.
+    """
+    if _posixFadvise is not None:
+        if isWritten:
+            os.fdatasync(fileDescriptor)
+        _fadvise(fileDescriptor, _FadviseDontNeed)
+
+
+def _clone(sourceFileDescriptor, targetFileDescriptor):
+    """
+    ``True`` if the target could be cloned from the source.
+    """
+    result = False
+    if fcntl is not None:
+        try:
+            fcntl.ioctl(targetFileDescriptor, _FICLONE, sourceFileDescriptor)
+            result = True
+        except IOError, error:
+            if not _isUnsupported(error.errno):
+                raise
+    return result
+
+
+def _copyUsingSystemCall(copy, sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle):
+    """
+    Number of bytes copied from the current position of ``sourceFileDescriptor`` to
+    ``targetFileDescriptor`` by repeatedly calling the system call wrapper ``copy(sourceFd,
+    targetFd, count)`` with at most ``chunkSize`` bytes. If the first call fails because it
+    is not supported, the result is ``0``, in which case the next method should be tried.
+    Once something was copied, errors are raised as ``OSError``.
+    """
+    assert copy is not None
+    result = 0
+    while result < byteCount:
+        byteCountToCopy = min(chunkSize, byteCount - result)
+        if throttle is not None:
+            throttle(byteCountToCopy)
+        copiedByteCount = copy(sourceFileDescriptor, targetFileDescriptor, byteCountToCopy)
+        if copiedByteCount < 0:
+            error = ctypes.get_errno()
+            if (result == 0) and _isUnsupported(error):
+                break
+            raise OSError(error, os.strerror(error))
+        elif copiedByteCount == 0:
+            # The source file got shorter in the meantime.
+            break
+        result += copiedByteCount
+    return result
+
+
+def _copyUsingCopyFileRange(sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle):
+    result = 0
+    if _copyFileRange is not None:
+        result = _copyUsingSystemCall(
+            lambda source, target, count: _copyFileRange(source, None, target, None, count, 0),
+            sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle)
+    return result
+
+
+def _copyUsingSendFile(sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle):
+    result = 0
+    if _sendFile is not None:
+        result = _copyUsingSystemCall(
+            lambda source, target, count: _sendFile(target, source, None, count),
+            sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle)
+    return result
+
+
+def _copyUsingRead(sourceFileDescriptor, targetFileDescriptor, bufferSize, throttle):
+    while True:
+        data = os.read(sourceFileDescriptor, bufferSize)
+        if not data:
+            break
+        if throttle is not None:
+            throttle(len(data))
+        while data:
+            writtenByteCount = os.write(targetFileDescriptor, data)
+            data = data[writtenByteCount:]
+
+
+def _preallocate(targetFileDescriptor, byteCount):
+    """
+    Reserve ``byteCount`` bytes for the target file if the file system supports it.
+    """
+    if (_fallocate is not None) and (byteCount > 0):
+        # Use mode 0 so the file size grows, which ``copy_file_range`` and ``sendfile`` then
+        # overwrite. Unlike ``posix_fallocate()``, ``fallocate()`` never writes zeros to
+        # emulate the reservation.
+        if _fallocate(targetFileDescriptor, 0, 0, byteCount) != 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, os.strerror(error))
+            _log.debug(u'cannot preallocate: %s', os.strerror(error))
+
+
+def copyFileContent(sourceFilePath, targetFilePath, methods=Methods, bufferSize=DefaultBufferSize, dropCache=False, throttle=None):
+    """
+    Copy the content of ``sourceFilePath`` to ``targetFilePath`` trying the methods in
+    ``methods`` in the order of `Methods`. If none of them is available, use `Read` with
+    buffers of ``bufferSize`` bytes. If ``dropCache`` is set, remove both files from the page
+    cache once done. The result is the method that actually copied the content.
+
+    If ``throttle`` is not ``None``, the content is copied in blocks of ``bufferSize`` bytes
+    even if the kernel copies it, and ``throttle`` is called with the size of each block
+    before copying it, for example to wait using `_tools.RateLimiter.consume()`. Cloning is
+    not throttled because it does not copy any data.
+    """
+    assert sourceFilePath is not None
+    assert targetFilePath is not None
+    assert methods is not None
+    assert bufferSize > 0
+    result = None
+    sourceFileDescriptor = os.open(sourceFilePath, os.O_RDONLY)
+    try:
+        byteCount = os.fstat(sourceFileDescriptor).st_size
+        adviseSequential(sourceFileDescriptor)
+        targetFileDescriptor = os.open(targetFilePath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+        try:
+            if (Clone in methods) and _clone(sourceFileDescriptor, targetFileDescriptor):
+                result = Clone
+            else:
+                _preallocate(targetFileDescriptor, byteCount)
+                if throttle is not None:
+                    chunkSize = bufferSize
+                else:
+                    chunkSize = _ChunkSize
+                copiedByteCount = 0
+                if CopyFileRange in methods:
+                    copiedByteCount = _copyUsingCopyFileRange(sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle)
+                    if copiedByteCount:
+                        result = CopyFileRange
+                if (result is None) and (SendFile in methods):
+                    copiedByteCount = _copyUsingSendFile(sourceFileDescriptor, targetFileDescriptor, byteCount, chunkSize, throttle)
+                    if copiedByteCount:
+                        result = SendFile
+                if result is None:
+                    result = Read
+                # Copy anything left, for example if the source file grew in the meantime or was
+                # empty to begin with.
+                _copyUsingRead(sourceFileDescriptor, targetFileDescriptor, bufferSize, throttle)
+                # Remove any preallocated space the source file does not need anymore.
+                os.ftruncate(targetFileDescriptor, os.lseek(targetFileDescriptor, 0, os.SEEK_CUR))
+            if dropCache:
+                dropFromCache(targetFileDescriptor, isWritten=True)
+        finally:
+            os.close(targetFileDescriptor)
+        if dropCache:
+            dropFromCache(sourceFileDescriptor)
+    finally:
+        os.close(sourceFileDescriptor)
+    return result
+
+
+def copyFile(sourceFilePath, targetFilePath, methods=Methods, bufferSize=DefaultBufferSize, dropCache=False, throttle=None):
+    """
+    Same as `shutil.copy2()` for two file paths but using `copyFileContent()` with ``methods``,
+    ``bufferSize``, ``dropCache`` and ``throttle`` to copy the content. The result is the
+    method that actually copied the content.
+    """
+    result = copyFileContent(sourceFilePath, targetFilePath, methods, bufferSize, dropCache, throttle)
+    shutil.copystat(sourceFilePath, targetFilePath)
+    return result
+
+
+def _writeAt(fileDescriptor, offset, data):
+    os.lseek(fileDescriptor, offset, os.SEEK_SET)
+    while data:
+        writtenByteCount = os.write(fileDescriptor, data)
+        data = data[writtenByteCount:]
+
+
+def updateFileContent(sourceFilePath, targetFilePath, bufferSize=DefaultBufferSize, dropCache=False, readThrottle=None, writeThrottle=None):
+    """
+    Change the content of the existing file ``targetFilePath`` to the one of ``sourceFilePath``
+    by reading both files in buffers of ``bufferSize`` bytes and rewriting only the blocks of
+    `DeltaBlockSize` bytes that differ in place. The target file is truncated or extended as
+    needed. If ``dropCache`` is set, remove both files from the page cache once done. The
+    result is the number of bytes written.
+
+    If ``readThrottle`` is not ``None``, it is called with the number of bytes read from both
+    files before comparing them, and if ``writeThrottle`` is not ``None``, it is called with
+    the size of each block before writing it.
+
+    Unlike `copyFileContent()`, an interrupted update leaves the target file with a mix of old
+    and new blocks.
+    """
+    assert sourceFilePath is not None
+    assert targetFilePath is not None
+    assert bufferSize > 0
+    # Read whole blocks so they line up with the blocks compared.
+    bufferSize = max(DeltaBlockSize, bufferSize - bufferSize % DeltaBlockSize)
+    result = 0
+    sourceFileDescriptor = os.open(sourceFilePath, os.O_RDONLY)
+    try:
+        adviseSequential(sourceFileDescriptor)
+        targetFileDescriptor = os.open(targetFilePath, os.O_RDWR)
+        try:
+            adviseSequential(targetFileDescriptor)
+            offset = 0
+            while True:
+                sourceData = os.read(sourceFileDescriptor, bufferSize)
+                if not sourceData:
+                    break
+                os.lseek(targetFileDescriptor, offset, os.SEEK_SET)
+                targetData = os.read(targetFileDescriptor, len(sourceData))
+                if readThrottle is not None:
+                    readThrottle(len(sourceData) + len(targetData))
+                if sourceData != targetData:
+                    for blockOffset in xrange(0, len(sourceData), DeltaBlockSize):
+                        blockEndOffset = blockOffset + DeltaBlockSize
+                        sourceBlock = sourceData[blockOffset:blockEndOffset]
+                        if sourceBlock != targetData[blockOffset:blockEndOffset]:
+                            if writeThrottle is not None:
+                                writeThrottle(len(sourceBlock))
+                            _writeAt(targetFileDescriptor, offset + blockOffset, sourceBlock)
+                            result += len(sourceBlock)
+                offset += len(sourceData)
+            if os.fstat(targetFileDescriptor).st_size != offset:
+                os.ftruncate(targetFileDescriptor, offset)
+            if dropCache:
+                dropFromCache(targetFileDescriptor, isWritten=(result > 0))
+        finally:
+            os.close(targetFileDescriptor)
+        if dropCache:
+            dropFromCache(sourceFileDescriptor)
+    finally:
+        os.close(sourceFileDescriptor)
+    return result
+
+
+def updateFile(sourceFilePath, targetFilePath, bufferSize=DefaultBufferSize, dropCache=False, readThrottle=None, writeThrottle=None):
+    """
+    Same as `copyFile()` for an existing ``targetFilePath`` but using `updateFileContent()` to
+    rewrite only the blocks that differ. The result is the number of bytes written.
+    """
+    result = updateFileContent(sourceFilePath, targetFilePath, bufferSize, dropCache, readThrottle, writeThrottle)
+    shutil.copystat(sourceFilePath, targetFilePath)
+    return result
+
+
+def syncFile(filePath):
+    """
+    Write the data of the file at ``filePath`` to the disk.
+    """
+    assert filePath is not None
+    fileDescriptor = os.open(filePath, os.O_RDONLY)
+    try:
+        os.fsync(fileDescriptor)
+    finally:
+        os.close(fileDescriptor)
+
+
+def syncFolder(folderPath):
+    """
+    Write the entries of the folder at ``folderPath`` to the disk so that files added to it,
+    for example using `replaceFile()`, survive a crash. On systems that cannot open folders,
+    for example Windows, this does nothing.
+    """
+    assert folderPath is not None
+    try:
+        folderDescriptor = os.open(folderPath, os.O_RDONLY)
+    except OSError, error:
+        if error.errno not in (errno.EACCES, errno.EISDIR):
+            raise
+        _log.debug(u'cannot open folder to sync: %s', error)
+    else:
+        try:
+            os.fsync(folderDescriptor)
+        except OSError, error:
+            if not _isUnsupported(error.errno):
+                raise
+        finally:
+            os.close(folderDescriptor)
+
+
+def replaceFile(sourceFilePath, targetFilePath):
+    """
+    Rename ``sourceFilePath`` to ``targetFilePath``, replacing any existing file. On POSIX
+    systems, this is atomic, so ``targetFilePath`` always either has its old or its new
+    content. Windows cannot rename to an existing file, so the target is removed first.
+    """
+    assert sourceFilePath is not None
+    assert targetFilePath is not None
+    if (os.name == 'nt') and os.path.exists(targetFilePath):  # pragma: no cover
+        os.remove(targetFilePath)
+    os.rename(sourceFilePath, targetFilePath)
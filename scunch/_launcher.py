@@ -0,0 +1,131 @@
+"""
+Launcher to run shell commands from a small helper process.
+
+Running a shell command with `subprocess` forks the current process. The
+more memory the current process uses, the longer this takes because the
+page tables have to be copied and pages shared with the child process
+result in copy on write overhead. While punching large folders, scunch
+holds a lot of file system entries in memory, so launching thousands of
+commands can dominate the run time.
+
+To avoid this, `CommandLauncher` starts a helper process early while memory
+usage still is small. The helper then runs commands on request and reports
+their exit code, so the time to launch a command does not depend on the
+memory used by scunch.
+
+The helper runs this module as script and only uses the standard library.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import cPickle as pickle
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+_log = logging.getLogger("scunch")
+
+
+class LauncherError(EnvironmentError):
+    """
+    Error raised when the helper process of a `CommandLauncher` cannot run commands anymore.
+    """
+    pass
+
+
+class CommandLauncher(object):
+    """
+    Helper process to run shell commands without forking the current process. Use `close()`
+    to terminate the helper process once no more commands have to be run.
+    """
+    def __init__(self):
+        scriptPath = os.path.abspath(__file__)
+        _log.debug(u'start command launcher: %s', scriptPath)
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            [sys.executable, scriptPath],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True
+        )
+
+    def call(self, commandAndOptions, stdoutPath, stderrPath, cwd=None):
+        """
+        Similar to `subprocess.call()` but run ``commandAndOptions`` from the helper process
+        and redirect its output to the files at ``stdoutPath`` and ``stderrPath``. Errors
+        starting the command are raised like with `subprocess.call()`, for example an
+        `OSError` if the command cannot be found.
+        """
+        assert commandAndOptions
+        assert stdoutPath is not None
+        assert stderrPath is not None
+        with self._lock:
+            if self._process is None:
+                raise LauncherError(u'command launcher must be running to perform command')
+            try:
+                pickle.dump((commandAndOptions, cwd, stdoutPath, stderrPath), self._process.stdin, pickle.HIGHEST_PROTOCOL)
+                self._process.stdin.flush()
+                exitCode, error = pickle.load(self._process.stdout)
+            except (EOFError, EnvironmentError), error:
+                self._process = None
+                raise LauncherError(u'command launcher terminated unexpectedly: %s' % error)
+        if error is not None:
+            raise error
+        return exitCode
+
+    def close(self):
+        """
+        Terminate the helper process. Calling this multiple times is harmless.
+        """
+        with self._lock:
+            if self._process is not None:
+                _log.debug(u'stop command launcher')
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._process = None
+
+
+def _serve(requestFile, responseFile):
+    """
+    Run the commands requested in ``requestFile`` and write the results to ``responseFile``
+    until ``requestFile`` reaches its end.
+    """
+    hasRequestsLeft = True
+    while hasRequestsLeft:
+        try:
+            commandAndOptions, cwd, stdoutPath, stderrPath = pickle.load(requestFile)
+        except EOFError:
+            hasRequestsLeft = False
+        if hasRequestsLeft:
+            exitCode = None
+            error = None
+            try:
+                with open(os.devnull, 'rb') as stdinFile:
+                    with open(stdoutPath, 'wb') as stdoutFile:
+                        with open(stderrPath, 'wb') as stderrFile:
+                            exitCode = subprocess.call(commandAndOptions, stdin=stdinFile, stdout=stdoutFile, stderr=stderrFile, cwd=cwd)
+            except Exception, error:
+                pass
+            try:
+                response = pickle.dumps((exitCode, error), pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                # Fall back to a generic error for errors that cannot be pickled.
+                response = pickle.dumps((None, EnvironmentError(u'%s' % error)), pickle.HIGHEST_PROTOCOL)
+            responseFile.write(response)
+            responseFile.flush()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    _serve(sys.stdin, sys.stdout)
@@ -15,14 +15,22 @@ Various utility functions for scunch.
 #
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
 import errno
+import hashlib
 import logging
 import os
+import Queue
 import shutil
 import string
 import sys
+import threading
+import time
 from unittest import TestCase
 
+from scunch import _filecopy
+
 _log = logging.getLogger("scunch")
 
 
@@ -55,6 +63,62 @@ def makeEmptyFolder(folderPathToCreate):
     makeFolder(folderPathToCreate)
 
 
+_COMPARE_BUFFER_SIZE = 64 * 1024
+
+
+def hasSameContent(someFilePath, otherFilePath, bufferSize=_COMPARE_BUFFER_SIZE, dropCache=False, throttle=None):
+    """
+    ``True`` if the files ``someFilePath`` and ``otherFilePath`` have the same size and content.
+    Unlike `filecmp.cmp` this never considers file dates and does not cache results, which
+    would grow without bounds when comparing large amounts of files. The files are read in
+    blocks of ``bufferSize`` bytes and removed from the page cache afterwards if ``dropCache``
+    is set. If ``throttle`` is not ``None``, it is called with the number of bytes read after
+    each block, for example to wait using `RateLimiter.consume()`.
+    """
+    assert someFilePath is not None
+    assert otherFilePath is not None
+    assert bufferSize > 0
+    result = (os.path.getsize(someFilePath) == os.path.getsize(otherFilePath))
+    if result:
+        with open(someFilePath, 'rb') as someFile:
+            with open(otherFilePath, 'rb') as otherFile:
+                for fileToCompare in (someFile, otherFile):
+                    _filecopy.adviseSequential(fileToCompare.fileno())
+                hasDataLeftToCompare = True
+                while result and hasDataLeftToCompare:
+                    someData = someFile.read(bufferSize)
+                    otherData = otherFile.read(bufferSize)
+                    if throttle is not None:
+                        throttle(len(someData) + len(otherData))
+                    result = (someData == otherData)
+                    hasDataLeftToCompare = (len(someData) > 0)
+                if dropCache:
+                    for fileToCompare in (someFile, otherFile):
+                        _filecopy.dropFromCache(fileToCompare.fileno())
+    return result
+
+
+def sha1HexDigest(filePath, bufferSize=_COMPARE_BUFFER_SIZE, dropCache=False, throttle=None):
+    """
+    SHA1 hash of the content of the file at ``filePath`` as hexadecimal text. For
+    ``bufferSize``, ``dropCache`` and ``throttle``, see `hasSameContent()`.
+    """
+    assert filePath is not None
+    assert bufferSize > 0
+    result = hashlib.sha1()
+    with open(filePath, 'rb') as fileToHash:
+        _filecopy.adviseSequential(fileToHash.fileno())
+        data = fileToHash.read(bufferSize)
+        while data:
+            if throttle is not None:
+                throttle(len(data))
+            result.update(data)
+            data = fileToHash.read(bufferSize)
+        if dropCache:
+            _filecopy.dropFromCache(fileToHash.fileno())
+    return result.hexdigest()
+
+
 def humanReadableList(items):
     """
     All values in ``items`` in a human readable form. This is meant to be used in error messages, where
@@ -83,6 +147,41 @@ def humanReadableList(items):
     return result
 
 
+_SuffixToByteFactorMap = {
+    '': 1,
+    'k': 1024,
+    'm': 1024 * 1024,
+    'g': 1024 * 1024 * 1024,
+}
+
+
+def parsedByteCount(text):
+    """
+    Number of bytes described by ``text``, which is a number optionally followed by a suffix
+    "k", "m" or "g" for kilo, mega or giga bytes using a factor of 1024. If ``text`` is
+    broken, raise a `ValueError`.
+
+    >>> parsedByteCount('2k')
+    2048L
+    """
+    assert text is not None
+    strippedText = text.strip().lower()
+    if strippedText.endswith('b'):
+        strippedText = strippedText[:-1]
+    suffix = strippedText[-1:]
+    if suffix in _SuffixToByteFactorMap:
+        strippedText = strippedText[:-1]
+    else:
+        suffix = ''
+    try:
+        result = long(strippedText.strip()) * _SuffixToByteFactorMap[suffix]
+    except ValueError:
+        raise ValueError(u'byte count must be a number optionally followed by k, m or g but is: %r' % text)
+    if result < 0:
+        raise ValueError(u'byte count must be at least 0 but is: %r' % text)
+    return result
+
+
 def oneOrOtherText(count, oneText, otherText):
     """
     Text depending ``count`` to properly use singular and plural.
@@ -99,6 +198,118 @@ def oneOrOtherText(count, oneText, otherText):
     return result
 
 
+# Seconds to wait for a queue. With a timeout, Python 2 still can interrupt the wait, for example
+# when the user presses Control-C.
+_QUEUE_WAIT_DURATION = 24 * 60 * 60
+_QUEUE_POLL_DURATION = 0.1
+_NO_MORE_ITEMS = object()
+
+
+def parallelResults(function, items, workerCount):
+    """
+    Iterator over tuples ``(item, result, error)`` for each of ``items`` after calling
+    ``function(item)`` from ``workerCount`` threads, in the order the calls finish. If the call
+    raised an `Exception`, ``result`` is ``None`` and ``error`` is the exception, otherwise
+    ``error`` is ``None``. Errors do not stop other calls, so the caller can report all of them
+    at once.
+
+    At most ``2 * workerCount`` items wait for a thread at any time, so ``items`` can be a long
+    iterator without all of them being held in memory.
+
+    >>> sorted(result for _, result, _ in parallelResults(abs, [-1, 2, -3], 2))
+    [1, 2, 3]
+    """
+    assert function is not None
+    assert items is not None
+    assert workerCount >= 1
+    itemQueue = Queue.Queue(2 * workerCount)
+    resultQueue = Queue.Queue()
+    stopEvent = threading.Event()
+
+    def work():
+        while not stopEvent.isSet():
+            try:
+                item = itemQueue.get(True, _QUEUE_POLL_DURATION)
+            except Queue.Empty:
+                # Check again if the caller gave up.
+                continue
+            if item is _NO_MORE_ITEMS:
+                break
+            try:
+                result = (item, function(item), None)
+            except Exception, error:
+                result = (item, None, error)
+            resultQueue.put(result)
+
+    workers = []
+    for _ in range(workerCount):
+        worker = threading.Thread(target=work, name='scunch worker')
+        # Do not prevent the process from exiting if the caller gives up on the results.
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+    hasFinished = False
+    try:
+        pendingCount = 0
+        for item in items:
+            itemQueue.put(item, True, _QUEUE_WAIT_DURATION)
+            pendingCount += 1
+            # Pass on results already available without waiting for further ones.
+            while not resultQueue.empty():
+                pendingCount -= 1
+                yield resultQueue.get()
+        while pendingCount > 0:
+            pendingCount -= 1
+            yield resultQueue.get(True, _QUEUE_WAIT_DURATION)
+        for _ in workers:
+            itemQueue.put(_NO_MORE_ITEMS, True, _QUEUE_WAIT_DURATION)
+        for worker in workers:
+            worker.join()
+        hasFinished = True
+    finally:
+        if not hasFinished:
+            # Make threads stop without processing any remaining items.
+            stopEvent.set()
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting some amount, for example bytes read, to ``rate`` units per second
+    on average. Bursts of up to one second worth of units pass without waiting. All threads
+    calling `consume()` share the same limit.
+    """
+    def __init__(self, rate):
+        assert rate > 0
+        self.rate = float(rate)
+        self._availableAmount = self.rate
+        self._lastTime = time.time()
+        self._lock = threading.Lock()
+        self.consumedAmount = 0
+        self.waitDuration = 0.0
+
+    def consume(self, amount):
+        """
+        Take ``amount`` units from the bucket, waiting until the bucket has refilled enough to
+        stay within `rate`. The amount may exceed the size of the bucket, in which case the
+        wait takes accordingly longer.
+        """
+        assert amount >= 0
+        with self._lock:
+            now = time.time()
+            self._availableAmount = min(self.rate, self._availableAmount + (now - self._lastTime) * self.rate)
+            self._lastTime = now
+            # Take the units right away so other threads wait for them too.
+            self._availableAmount -= amount
+            self.consumedAmount += amount
+            if self._availableAmount < 0:
+                waitDuration = -self._availableAmount / self.rate
+            else:
+                waitDuration = 0.0
+            self.waitDuration += waitDuration
+        if waitDuration > 0:
+            time.sleep(waitDuration)
+
+
 def _maximumCommandLength():
     '''
     Maximum length of console commands.
@@ -320,9 +531,17 @@ class LoggableTestCase(TestCase):
         configConsoleLogging()
 
 
-def bundledPathsToRun(baseCommandAndOptions, paths, maxCommandLenth=_MAX_COMMAND_LENGTH):
+def bundledPathsToRun(baseCommandAndOptions, paths, maxCommandLenth=_MAX_COMMAND_LENGTH, trailingOptions=()):
+    '''
+    Sequence of lists containing ``paths`` split up in a way that the
+    resulting command ``baseCommandAndOptions + bundle + trailingOptions``
+    does not exceed ``maxCommandLength``. Use ``trailingOptions`` for
+    options that have to be passed after the paths, for example the target
+    folder of ``svn move``.
+    '''
     assert baseCommandAndOptions
     assert paths is not None
+    assert trailingOptions is not None
 
     def escapedLength(text):
         '''
@@ -341,7 +560,7 @@ def bundledPathsToRun(baseCommandAndOptions, paths, maxCommandLenth=_MAX_COMMAND
 
     result = []
     resultLength = 0
-    baseCommandAndOptionsLength = sum(escapedLength(option) for option in baseCommandAndOptions)
+    baseCommandAndOptionsLength = sum(escapedLength(option) for option in list(baseCommandAndOptions) + list(trailingOptions))
     maxPathsLength = maxCommandLenth - baseCommandAndOptionsLength
     if maxPathsLength < 1 + _MIN_BASE_COMMAND_AND_OPTIONS_LENGTH:
         raise EnvironmentError(u'command must have at most %d escapable characters instead of %d: %s' % (
@@ -0,0 +1,221 @@
+"""
+Watch a folder for changes using Linux inotify.
+
+`FolderWatcher` registers an inotify watch for each folder in a folder tree
+and collects the paths of changed files and folders until no more changes
+happened for a certain time. That way, a long running process can punch
+only the paths that actually changed instead of scanning the whole tree
+again.
+
+The module only uses the standard library and accesses inotify using
+`ctypes`. On systems without inotify, creating a `FolderWatcher` raises a
+`WatchError`.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+_log = logging.getLogger("scunch.watch")
+
+# Event masks as defined in <sys/inotify.h>.
+_InModify = 0x00000002
+_InAttrib = 0x00000004
+_InCloseWrite = 0x00000008
+_InMovedFrom = 0x00000040
+_InMovedTo = 0x00000080
+_InCreate = 0x00000100
+_InDelete = 0x00000200
+_InDeleteSelf = 0x00000400
+_InMoveSelf = 0x00000800
+_InQueueOverflow = 0x00004000
+_InIgnored = 0x00008000
+_InOnlyDir = 0x01000000
+_InIsDir = 0x40000000
+
+_WatchMask = _InModify | _InAttrib | _InCloseWrite | _InMovedFrom | _InMovedTo | _InCreate | _InDelete | _InDeleteSelf | _InMoveSelf | _InOnlyDir
+
+# Layout of ``struct inotify_event`` without the trailing name.
+_EventHeaderFormat = 'iIII'
+_EventHeaderSize = struct.calcsize(_EventHeaderFormat)
+
+_ReadSize = 64 * 1024
+
+
+class WatchError(EnvironmentError):
+    """
+    Error raised when a folder cannot be watched.
+    """
+    pass
+
+
+def _fileSystemEncoding():
+    return sys.getfilesystemencoding() or 'utf-8'
+
+
+def _libc():
+    libcPath = ctypes.util.find_library('c')
+    if libcPath is None:
+        raise WatchError(u'C library must be available to watch folders')
+    result = ctypes.CDLL(libcPath, use_errno=True)
+    if not hasattr(result, 'inotify_init'):
+        raise WatchError(u'inotify must be available to watch folders')
+    return result
+
+
+def parsedEvents(data):
+    """
+    List of tuples ``(watchDescriptor, mask, name)`` for the inotify events in ``data``.
+    """
+    assert data is not None
+    result = []
+    offset = 0
+    dataSize = len(data)
+    while offset + _EventHeaderSize <= dataSize:
+        watchDescriptor, mask, _, nameSize = struct.unpack_from(_EventHeaderFormat, data, offset)
+        offset += _EventHeaderSize
+        name = data[offset:offset + nameSize].rstrip('\0')
+        offset += nameSize
+        result.append((watchDescriptor, mask, name))
+    return result
+
+
+class FolderWatcher(object):
+    """
+    Watcher for changes in ``folderPath`` and all its sub folders. Use `changedPaths()` to
+    wait for changes and `close()` once done.
+    """
+    def __init__(self, folderPath):
+        assert folderPath is not None
+        self.folderPath = folderPath
+        self._libc = _libc()
+        self._fileDescriptor = self._libc.inotify_init()
+        if self._fileDescriptor < 0:
+            error = ctypes.get_errno()
+            raise WatchError(error, u'cannot watch "%s": %s' % (folderPath, os.strerror(error)))
+        self._watchDescriptorToRelativeFolderPathMap = {}
+        self._changedPaths = set()
+        self._hasOverflown = False
+        self._addWatches(u'')
+        _log.info(u'watch %d folders in "%s"', len(self._watchDescriptorToRelativeFolderPathMap), folderPath)
+
+    def _addWatch(self, relativeFolderPath):
+        folderPath = os.path.join(self.folderPath, relativeFolderPath)
+        if isinstance(folderPath, unicode):
+            encodedFolderPath = folderPath.encode(_fileSystemEncoding())
+        else:
+            encodedFolderPath = folderPath
+        watchDescriptor = self._libc.inotify_add_watch(self._fileDescriptor, encodedFolderPath, _WatchMask)
+        if watchDescriptor < 0:
+            error = ctypes.get_errno()
+            if error not in (errno.ENOENT, errno.ENOTDIR):
+                raise WatchError(error, u'cannot watch "%s": %s' % (folderPath, os.strerror(error)))
+            # The folder has been removed in the meantime.
+        else:
+            self._watchDescriptorToRelativeFolderPathMap[watchDescriptor] = relativeFolderPath
+
+    def _addWatches(self, relativeFolderPath):
+        """
+        Watch ``relativeFolderPath`` and all its sub folders.
+        """
+        self._addWatch(relativeFolderPath)
+        for folderPath, folderNames, _ in os.walk(os.path.join(self.folderPath, relativeFolderPath)):
+            for folderName in folderNames:
+                self._addWatch(os.path.relpath(os.path.join(folderPath, folderName), self.folderPath))
+
+    def _processEvents(self, data):
+        for watchDescriptor, mask, name in parsedEvents(data):
+            if mask & _InQueueOverflow:
+                _log.warning(u'too many changes to watch them individually')
+                self._hasOverflown = True
+                continue
+            relativeFolderPath = self._watchDescriptorToRelativeFolderPathMap.get(watchDescriptor)
+            if relativeFolderPath is None:
+                continue
+            if mask & _InIgnored:
+                del self._watchDescriptorToRelativeFolderPathMap[watchDescriptor]
+                continue
+            if not name:
+                # Changes of a watched folder itself are also reported for its parent folder.
+                continue
+            if (mask & _InIsDir) and not (mask & (_InCreate | _InDelete | _InMovedFrom | _InMovedTo)):
+                # Only the attributes of a folder changed, which does not matter.
+                continue
+            if isinstance(relativeFolderPath, unicode):
+                name = name.decode(_fileSystemEncoding())
+            changedPath = os.path.join(relativeFolderPath, name)
+            if (mask & _InIsDir) and (mask & (_InCreate | _InMovedTo)):
+                # Files might have been added to the new folder before it was watched, so
+                # it has to be examined completely anyway.
+                self._addWatches(changedPath)
+            _log.debug(u'changed: "%s", mask=0x%x', changedPath, mask)
+            self._changedPaths.add(changedPath)
+
+    def _readEvents(self, timeout):
+        """
+        Wait at most ``timeout`` seconds for events and process them. The result is ``True`` if
+        any events were read.
+        """
+        try:
+            readableFileDescriptors, _, _ = select.select([self._fileDescriptor], [], [], timeout)
+        except select.error, error:
+            if error.args[0] != errno.EINTR:
+                raise
+            readableFileDescriptors = []
+        result = bool(readableFileDescriptors)
+        if result:
+            self._processEvents(os.read(self._fileDescriptor, _ReadSize))
+        return result
+
+    def changedPaths(self, quietDuration):
+        """
+        Wait for changes until nothing changed for ``quietDuration`` seconds. The result is a
+        set with the paths relative to `folderPath` of the files and folders that changed, or
+        ``None`` if too many things changed to keep track of them, in which case the whole
+        folder should be examined.
+        """
+        assert quietDuration >= 0
+        # Wait for the first change.
+        while not self._changedPaths and not self._hasOverflown:
+            self._readEvents(None)
+        # Collect further changes until it remains quiet.
+        quietTime = time.time() + quietDuration
+        while True:
+            remainingDuration = quietTime - time.time()
+            if remainingDuration <= 0:
+                break
+            if self._readEvents(remainingDuration):
+                quietTime = time.time() + quietDuration
+        if self._hasOverflown:
+            result = None
+        else:
+            result = self._changedPaths
+        self._changedPaths = set()
+        self._hasOverflown = False
+        return result
+
+    def close(self):
+        if self._fileDescriptor is not None:
+            os.close(self._fileDescriptor)
+            self._fileDescriptor = None
@@ -73,6 +73,10 @@ A `FileSystemEntry` has the following properties:
 * ``size``, the size of the file in bytes.
 * ``timeModified``, the timestamp when the file or folder was last
   modified. See ``os.stat``, field ``st_mtime`` on how to process it.
+
+To scan a large folder repeatedly, pass a `SnapshotFileSystem` to
+`AntPatternSet.ifindEntries()`. It remembers the contents of each folder in
+a snapshot file so unchanged folders do not have to be listed again.
 """
 # Copyright (C) 2011 - 2013 Thomas Aglassinger
 #
@@ -92,10 +96,12 @@ from __future__ import absolute_import
 
 import errno
 import fnmatch
+import json
 import logging
 import os
 import re
 import stat
+import time
 
 _log = logging.getLogger('antglob')
 _logPattern = logging.getLogger('antglob.pattern')
@@ -203,14 +209,16 @@ class FileSystemEntry(object):
     File = 'file'
     Folder = 'folder'
 
-    def __init__(self, baseFolderPath='', parts=[]):
+    def __init__(self, baseFolderPath='', parts=[], fileSystem=None):
         assert parts is not None
         assert baseFolderPath is not None
 
         self._baseFolderPath = baseFolderPath
         self.setParts(parts)
+        if fileSystem is None:
+            fileSystem = _LocalFileSystem
         try:
-            entryInfo = os.stat(self.path)
+            entryInfo = fileSystem.stat(self.path)
         except OSError, error:  # pragma: no cover
             if error.errno == errno.ENOENT:
                 raise AntPatternError(u'file system entry must remain during processing but was removed in the background: %r' % self.path)
@@ -286,6 +294,159 @@ class FileSystemEntry(object):
         return self.__str__()
 
 
+class LocalFileSystem(object):
+    """
+    Access to the local file system as needed by `AntPatternSet.ifind()`. To scan other trees,
+    for example the contents of a repository, pass an object providing the same methods to
+    `AntPatternSet.ifind()`.
+    """
+    def listdir(self, folderPath):
+        """
+        Names of the files and folders in ``folderPath``.
+        """
+        return os.listdir(folderPath)
+
+    def isdir(self, path):
+        """
+        ``True`` if ``path`` refers to a folder.
+        """
+        return os.path.isdir(path)
+
+    def stat(self, path):
+        """
+        Information about ``path`` similar to ``os.stat()`` providing at least ``st_mode``,
+        ``st_size`` and ``st_mtime``. This is only needed to find a `FileSystemEntry`.
+        """
+        return os.stat(path)
+
+
+_LocalFileSystem = LocalFileSystem()
+
+
+class _SnapshotEntryInfo(object):
+    """
+    Information about a file or folder stored in a `SnapshotFileSystem`, providing the same
+    fields as needed from ``os.stat()``.
+    """
+    def __init__(self, mode, size, timeModified):
+        self.st_mode = mode
+        self.st_size = size
+        self.st_mtime = timeModified
+
+
+class SnapshotFileSystem(LocalFileSystem):
+    """
+    Access to the local file system that remembers the contents of each folder listed in a
+    snapshot file at ``snapshotPath``. When scanning ``baseFolderPath`` again, folders whose
+    modification and status change time are the same as in the snapshot are taken from the
+    snapshot without listing them or examining their entries. To update the snapshot after
+    scanning, call `save()`.
+
+    The snapshot holds the complete contents of each folder regardless of any patterns, so it
+    remains valid if the patterns change. Folders not examined during a scan, for example
+    because they are excluded, are removed from the snapshot on `save()`.
+
+    Note that the size and modification time of files in unchanged folders might be outdated
+    because modifying a file does not change the modification time of its folder. So only
+    use a snapshot if the content of the files is examined anyway, for instance by comparing
+    it.
+    """
+    _Version = 1
+
+    #: Seconds during which a folder that has just been modified could be modified again
+    #: without its modification time changing.
+    _RacyDuration = 2
+
+    def __init__(self, snapshotPath, baseFolderPath):
+        assert snapshotPath is not None
+        assert baseFolderPath is not None
+        self.snapshotPath = snapshotPath
+        self.baseFolderPath = os.path.abspath(baseFolderPath)
+        self.listedFolderCount = 0
+        self.reusedFolderCount = 0
+        self._scanTime = time.time()
+        self._previousFolderPathToContentMap = {}
+        self._folderPathToContentMap = {}
+        self._pathToEntryInfoMap = {}
+        if os.path.exists(self.snapshotPath):
+            try:
+                with open(self.snapshotPath, 'rb') as snapshotFile:
+                    snapshot = json.load(snapshotFile)
+                if (snapshot.get('version') == SnapshotFileSystem._Version) and (snapshot.get('baseFolderPath') == self.baseFolderPath):
+                    self._previousFolderPathToContentMap = snapshot['folders']
+                else:
+                    _log.info(u'ignore snapshot of different folder "%s"', self.snapshotPath)
+            except (KeyError, ValueError), error:
+                _log.warning(u'ignore broken snapshot "%s": %s', self.snapshotPath, error)
+
+    def listdir(self, folderPath):
+        assert folderPath is not None
+        absoluteFolderPath = os.path.normpath(os.path.abspath(folderPath))
+        folderInfo = os.stat(absoluteFolderPath)
+        previousContent = self._previousFolderPathToContentMap.get(absoluteFolderPath)
+        if (previousContent is not None) and (previousContent[0] == folderInfo.st_mtime) and (previousContent[1] == folderInfo.st_ctime):
+            self.reusedFolderCount += 1
+            entryInfos = previousContent[2]
+        else:
+            self.listedFolderCount += 1
+            entryInfos = []
+            for name in os.listdir(absoluteFolderPath):
+                try:
+                    entryInfo = os.stat(os.path.join(absoluteFolderPath, name))
+                except OSError, error:  # pragma: no cover
+                    if error.errno == errno.ENOENT:
+                        # Ignore entries removed in the background.
+                        continue
+                    raise
+                entryInfos.append([name, entryInfo.st_mode, entryInfo.st_size, entryInfo.st_mtime])
+            if folderInfo.st_mtime >= self._scanTime - SnapshotFileSystem._RacyDuration:
+                # The folder could still change without its time changing, so do not trust it
+                # during the next scan.
+                timeModified = None
+            else:
+                timeModified = folderInfo.st_mtime
+            previousContent = [timeModified, folderInfo.st_ctime, entryInfos]
+        self._folderPathToContentMap[absoluteFolderPath] = previousContent
+        result = []
+        for name, mode, size, timeModified in entryInfos:
+            self._pathToEntryInfoMap[os.path.join(absoluteFolderPath, name)] = _SnapshotEntryInfo(mode, size, timeModified)
+            result.append(name)
+        return result
+
+    def _entryInfo(self, path):
+        return self._pathToEntryInfoMap.get(os.path.normpath(os.path.abspath(path)))
+
+    def isdir(self, path):
+        entryInfo = self._entryInfo(path)
+        if entryInfo is not None:
+            result = stat.S_ISDIR(entryInfo.st_mode)
+        else:
+            result = os.path.isdir(path)
+        return result
+
+    def stat(self, path):
+        result = self._entryInfo(path)
+        if result is None:
+            result = os.stat(path)
+        return result
+
+    def save(self):
+        """
+        Write the contents of all folders listed since the snapshot was read to the snapshot
+        file.
+        """
+        snapshot = {
+            'version': SnapshotFileSystem._Version,
+            'baseFolderPath': self.baseFolderPath,
+            'folders': self._folderPathToContentMap,
+        }
+        # Write to a temporary file first so an interrupted save keeps the previous snapshot.
+        temporarySnapshotPath = self.snapshotPath + '.tmp'
+        with open(temporarySnapshotPath, 'wb') as snapshotFile:
+            json.dump(snapshot, snapshotFile, separators=(',', ':'))
+        os.rename(temporarySnapshotPath, self.snapshotPath)
+
+
 class AntPatternItem(object):
     """
     Ant-like pattern item able to match a single part of a path.
@@ -303,13 +464,21 @@ class AntPatternItem(object):
             self.kind = AntPatternItem.Many
         else:
             self.kind = AntPatternItem.One
+        # Prepare everything `fnmatch.fnmatch()` would do for each call of `matches()`.
+        self._normalizedPattern = os.path.normcase(text)
+        if self.kind == AntPatternItem.Many:
+            self._regex = re.compile(fnmatch.translate(self._normalizedPattern))
+        else:
+            self._regex = None
 
     def matches(self, text):
         if self.kind == AntPatternItem.All:
             result = True
+        elif self.kind == AntPatternItem.Many:
+            result = (self._regex.match(os.path.normcase(text)) is not None)
         else:
-            assert self.kind in (AntPatternItem.Many, AntPatternItem.One)
-            result = fnmatch.fnmatch(text, self.pattern)
+            assert self.kind == AntPatternItem.One
+            result = (os.path.normcase(text) == self._normalizedPattern)
         return result
 
     def __cmp__(self, other):
@@ -494,6 +663,62 @@ def _textItemsMatchPatternItems(textItems, patternItems):
     return result
 
 
+def _patternItemIndicesAfterAllMagic(patternItems, patternItemIndices):
+    """
+    ``patternItemIndices`` extended by the indices following any "**", which can match no text
+    item at all.
+    """
+    result = set(patternItemIndices)
+    for patternItemIndex in sorted(patternItemIndices):
+        while (patternItemIndex < len(patternItems)) and (patternItems[patternItemIndex].kind == AntPatternItem.All):
+            patternItemIndex += 1
+            result.add(patternItemIndex)
+    return result
+
+
+def _nextPatternItemIndices(patternItems, patternItemIndices, textItem):
+    """
+    Indices of all pattern items that could match the text item following ``textItem``
+    provided that ``patternItemIndices`` are the indices of all pattern items that could
+    match ``textItem``. Unlike `_textItemsMatchPatternItems()`, this allows to match a path
+    one item after the other and to continue from the indices of any folder containing it.
+    """
+    assert patternItems is not None
+    assert patternItemIndices is not None
+    assert textItem is not None
+    patternItemCount = len(patternItems)
+    result = set()
+    for patternItemIndex in patternItemIndices:
+        if patternItemIndex < patternItemCount:
+            patternItem = patternItems[patternItemIndex]
+            if patternItem.kind == AntPatternItem.All:
+                result.add(patternItemIndex)
+            elif patternItem.matches(textItem):
+                result.add(patternItemIndex + 1)
+    return frozenset(_patternItemIndicesAfterAllMagic(patternItems, result))
+
+
+def _patternItemsCanMatchBelowTextItems(textItems, patternItems):
+    """
+    ``True`` if ``patternItems`` could match any path that starts with all ``textItems`` and has at
+    least one more item.
+    """
+    assert textItems is not None
+    assert patternItems is not None
+    patternItemCount = len(patternItems)
+    # Indices of all pattern items that could match the next text item.
+    patternItemIndices = _patternItemIndicesAfterAllMagic(patternItems, [0])
+    textItemIndex = 0
+    while patternItemIndices and (textItemIndex < len(textItems)):
+        patternItemIndices = _nextPatternItemIndices(patternItems, patternItemIndices, textItems[textItemIndex])
+        textItemIndex += 1
+    result = False
+    for patternItemIndex in patternItemIndices:
+        if patternItemIndex < patternItemCount:
+            result = True
+    return result
+
+
 def _splitTextParts(text, fixAllMagicAtEnd=False):
     """
     List of string containing ``text`` split using a system independent path separator.
@@ -514,9 +739,12 @@ def _splitTextParts(text, fixAllMagicAtEnd=False):
         raise NotImplementedError(u'cannot split unknown path separator: %r' % pathSeperator)
     if fixAllMagicAtEnd and remainingText.endswith(pathSeperator):
         remainingText += _AntAllMagic
-    while remainingText and (remainingText != pathSeperator):
-        remainingText, part = os.path.split(remainingText)
-        result.insert(0, part)
+    # Split the whole text at once instead of repeatedly calling ``os.path.split()``, which
+    # would take quadratic time for deeply nested paths.
+    result = [part for part in remainingText.split(pathSeperator) if part]
+    if result and remainingText.endswith(pathSeperator):
+        # Preserve the empty part indicating a folder.
+        result.append('')
     return result
 
 
@@ -527,6 +755,13 @@ class AntPattern(object):
     def __init__(self, patternText):
         assert patternText is not None
         self.patternItems = [AntPatternItem(itemText) for itemText in _splitTextParts(patternText, True)]
+        # For each pattern item index, the indices of all pattern items that could match the
+        # same text item because any "**" in between can also match no text item at all.
+        self._patternItemIndexToReachableIndicesMap = [
+            frozenset(_patternItemIndicesAfterAllMagic(self.patternItems, [patternItemIndex]))
+            for patternItemIndex in range(len(self.patternItems) + 1)
+        ]
+        self._initialPatternItemIndices = self._patternItemIndexToReachableIndicesMap[0]
 
     def matches(self, text):
         assert text is not None
@@ -535,7 +770,72 @@ class AntPattern(object):
 
     def matchesParts(self, textItems):
         assert textItems is not None
-        return _textItemsMatchPatternItems(textItems, self.patternItems)
+        if textItems:
+            patternItemIndices = self._initialPatternItemIndices
+            textItemIndex = 0
+            while patternItemIndices and (textItemIndex < len(textItems)):
+                patternItemIndices = self.nextPatternItemIndices(patternItemIndices, textItems[textItemIndex])
+                textItemIndex += 1
+            result = self.isMatchingPatternItemIndices(patternItemIndices)
+        else:
+            result = _textItemsMatchPatternItems(textItems, self.patternItems)
+        return result
+
+    def initialPatternItemIndices(self):
+        """
+        Indices of the pattern items that could match the first part of a path. Together with
+        `nextPatternItemIndices()` and `isMatchingPatternItemIndices()`, this allows to match
+        paths one part after the other and to share the result for common leading parts.
+        """
+        return self._initialPatternItemIndices
+
+    def nextPatternItemIndices(self, patternItemIndices, textItem):
+        """
+        Indices of the pattern items that could match the part following ``textItem`` provided
+        that ``patternItemIndices`` could match ``textItem``.
+        """
+        assert patternItemIndices is not None
+        assert textItem is not None
+        result = set()
+        patternItemCount = len(self.patternItems)
+        for patternItemIndex in patternItemIndices:
+            if patternItemIndex < patternItemCount:
+                patternItem = self.patternItems[patternItemIndex]
+                if patternItem.kind == AntPatternItem.All:
+                    result.update(self._patternItemIndexToReachableIndicesMap[patternItemIndex])
+                elif patternItem.matches(textItem):
+                    result.update(self._patternItemIndexToReachableIndicesMap[patternItemIndex + 1])
+        return frozenset(result)
+
+    def isMatchingPatternItemIndices(self, patternItemIndices):
+        """
+        ``True`` if the pattern matches a path after obtaining ``patternItemIndices`` for its
+        last part.
+        """
+        return len(self.patternItems) in patternItemIndices
+
+    def canMatchBelowParts(self, folderItems):
+        """
+        ``True`` if the pattern could match anything located in the folder described by
+        ``folderItems`` or any of its sub folders. If this is ``False``, there is no need to
+        scan the folder.
+        """
+        assert folderItems is not None
+        return _patternItemsCanMatchBelowTextItems(folderItems, self.patternItems)
+
+    def staticFolderParts(self):
+        """
+        List of the leading parts of the pattern that do not contain any magic and describe a
+        folder. Everything the pattern can match is located in this folder. For example, the
+        static folder parts of "sdk/lib/*.so" are ``['sdk', 'lib']``. If the pattern starts with
+        magic, the result is an empty list.
+        """
+        result = []
+        for patternItem in self.patternItems[:-1]:
+            if patternItem.kind != AntPatternItem.One:
+                break
+            result.append(patternItem.pattern)
+        return result
 
     def __unicode__(self):
         result = u'<AntPattern: %s>' % (self.patternItems)
@@ -635,6 +935,82 @@ class AntPatternSet(object):
                 patternIndex += 1
         return result
 
+    def _matchesLastPart(self, folderPatternItemIndices, lastPart):
+        """
+        Same as `matchesParts()` for a path ending in ``lastPart`` provided that
+        ``folderPatternItemIndices`` holds the indices obtained for the folder containing it
+        for each of `includePatterns` followed by `excludePatterns`.
+        """
+        assert folderPatternItemIndices is not None
+        assert lastPart is not None
+        includePatternCount = len(self.includePatterns)
+        result = not includePatternCount
+        patternIndex = 0
+        while not result and (patternIndex < includePatternCount):
+            pattern = self.includePatterns[patternIndex]
+            result = pattern.isMatchingPatternItemIndices(pattern.nextPatternItemIndices(folderPatternItemIndices[patternIndex], lastPart))
+            patternIndex += 1
+        patternIndex = 0
+        while result and (patternIndex < len(self.excludePatterns)):
+            pattern = self.excludePatterns[patternIndex]
+            result = not pattern.isMatchingPatternItemIndices(pattern.nextPatternItemIndices(folderPatternItemIndices[includePatternCount + patternIndex], lastPart))
+            patternIndex += 1
+        return result
+
+    def _pathsAndMatches(self, paths):
+        """
+        Iterator over tuples ``(path, isMatching)`` for each path in ``paths`` with
+        ``isMatching`` being the result of `matches()`. For each pattern, the indices of the
+        pattern items that could match the next part are remembered for all folders containing
+        the previous path and reused for the folders the current path has in common with it.
+        That way, sorted paths only have to be matched starting with their first folder that
+        differs from the previous path, which typically only is the name of the file.
+        """
+        assert paths is not None
+        patterns = self.includePatterns + self.excludePatterns
+        previousFolderParts = []
+        # Indices for each pattern after matching no parts, the first part of
+        # ``previousFolderParts``, the first two parts and so on.
+        patternItemIndicesStack = [tuple(pattern.initialPatternItemIndices() for pattern in patterns)]
+        for path in paths:
+            parts = _splitTextParts(path)
+            if parts:
+                folderParts = parts[:-1]
+                commonPartCount = 0
+                maxCommonPartCount = min(len(folderParts), len(previousFolderParts))
+                while (commonPartCount < maxCommonPartCount) and (folderParts[commonPartCount] == previousFolderParts[commonPartCount]):
+                    commonPartCount += 1
+                del patternItemIndicesStack[commonPartCount + 1:]
+                for part in folderParts[commonPartCount:]:
+                    patternItemIndicesStack.append(tuple(
+                        pattern.nextPatternItemIndices(patternItemIndices, part)
+                        for pattern, patternItemIndices in zip(patterns, patternItemIndicesStack[-1])
+                    ))
+                previousFolderParts = folderParts
+                isMatching = self._matchesLastPart(patternItemIndicesStack[-1], parts[-1])
+            else:
+                isMatching = self.matchesParts(parts)
+            yield path, isMatching
+
+    def matchesMany(self, paths):
+        """
+        List of ``bool`` containing the result of `matches()` for each path in ``paths``. This
+        is much faster than calling `matches()` for each path, in particular if ``paths`` are
+        sorted so that paths in the same folder follow each other.
+        """
+        assert paths is not None
+        return [isMatching for _, isMatching in self._pathsAndMatches(paths)]
+
+    def filter(self, paths):
+        """
+        Iterator over the items in ``paths`` for which `matches()` is ``True``. Like with
+        `matchesMany()`, this is much faster than calling `matches()` for each path.
+        """
+        assert paths is not None
+        for path, isMatching in self._pathsAndMatches(paths):
+            if isMatching:
+                yield path
+
     def matchesParts(self, partsToMatch):
         assert partsToMatch is not None
         if self.includePatterns:
@@ -645,18 +1021,131 @@ class AntPatternSet(object):
             result = False
         return result
 
-    def _findFilesAndEmptyFolders(self, baseFolderPath, relativeFolderParts, relativeFolderPath, addFolders):
+    def canMatchBelowParts(self, folderItems):
+        """
+        ``True`` if any of the include patterns could match anything located in the folder
+        described by ``folderItems`` or any of its sub folders.
+        """
+        assert folderItems is not None
+        if self.includePatterns:
+            result = False
+            patternIndex = 0
+            while not result and (patternIndex < len(self.includePatterns)):
+                if self.includePatterns[patternIndex].canMatchBelowParts(folderItems):
+                    result = True
+                else:
+                    patternIndex += 1
+        else:
+            result = True
+        return result
+
+    def examinesFolderParts(self, folderParts):
+        """
+        ``True`` if `find()` examines the contents of the folder described by ``folderParts``,
+        which means that neither the folder nor any folder containing it is excluded and some
+        include pattern could match something located in it.
+        """
+        assert folderParts is not None
+        result = True
+        partCount = 1
+        while result and (partCount <= len(folderParts)):
+            partsToExamine = folderParts[:partCount]
+            if self.excludePatterns and self._matchesAnyPatternIn(partsToExamine, self.excludePatterns):
+                result = False
+            elif not self.canMatchBelowParts(partsToExamine):
+                result = False
+            else:
+                partCount += 1
+        return result
+
+    def matchesFileParts(self, fileParts):
+        """
+        ``True`` if `find()` would find a file described by ``fileParts``. Unlike with
+        `matchesParts()`, the result is ``False`` for files located in folders `find()` does
+        not examine.
+        """
+        assert fileParts
+        return self.examinesFolderParts(fileParts[:-1]) and self.matchesParts(fileParts)
+
+    def _examinesFolderPartsUsingCache(self, folderParts, folderPartsToExaminesMap):
+        """
+        Same as `examinesFolderParts()` but remember the result for ``folderParts`` and all
+        folders containing it in ``folderPartsToExaminesMap`` and reuse results already
+        remembered there.
+        """
+        assert folderParts is not None
+        assert folderPartsToExaminesMap is not None
+        folderKey = tuple(folderParts)
+        result = folderPartsToExaminesMap.get(folderKey)
+        if result is None:
+            if not folderParts:
+                result = True
+            elif not self._examinesFolderPartsUsingCache(folderParts[:-1], folderPartsToExaminesMap):
+                result = False
+            elif self.excludePatterns and self._matchesAnyPatternIn(folderParts, self.excludePatterns):
+                result = False
+            else:
+                result = self.canMatchBelowParts(folderParts)
+            folderPartsToExaminesMap[folderKey] = result
+        return result
+
+    def matchingFileParts(self, filePartsToMatch):
+        """
+        List of the items in ``filePartsToMatch`` for which `matchesFileParts()` is ``True``
+        in their original order. Unlike calling `matchesFileParts()` for each item, every
+        folder is checked only once even if it contains many of the files, which makes this
+        more efficient for long lists of files such as a list of changed files.
+        """
+        assert filePartsToMatch is not None
+        result = []
+        folderPartsToExaminesMap = {}
+        for fileParts in filePartsToMatch:
+            assert fileParts
+            if self._examinesFolderPartsUsingCache(fileParts[:-1], folderPartsToExaminesMap) and self.matchesParts(fileParts):
+                result.append(fileParts)
+        return result
+
+    def staticFolderPaths(self):
+        """
+        Sorted list of relative paths of folders that hold everything the include patterns can
+        match, or ``None`` if anything in any folder can match. Folders located in other folders
+        of the list are omitted. For example, with include patterns "sdk/include/**,
+        sdk/lib/*.so" the result is ``['sdk/include', 'sdk/lib']``.
+
+        This is useful to limit the folders to obtain from a large repository to those that
+        actually matter.
+        """
+        result = None
+        if self.includePatterns:
+            folderPaths = set()
+            for includePattern in self.includePatterns:
+                folderParts = includePattern.staticFolderParts()
+                if folderParts:
+                    folderPaths.add(os.sep.join(folderParts))
+                else:
+                    # The pattern can match anything anywhere.
+                    folderPaths = None
+                    break
+            if folderPaths is not None:
+                result = []
+                for folderPath in sorted(folderPaths):
+                    if not result or not folderPath.startswith(result[-1] + os.sep):
+                        result.append(folderPath)
+        return result
+
+    def _findFilesAndEmptyFolders(self, baseFolderPath, relativeFolderParts, relativeFolderPath, addFolders, fileSystem):
         """
         Find files and empty folders matching the pattern.
         """
         assert baseFolderPath is not None
         assert relativeFolderParts is not None
         assert relativeFolderPath is not None
+        assert fileSystem is not None
         if os.path.isabs(relativeFolderPath):
             raise AntError(u'path must be a relative path: %r' % relativeFolderPath)
         folderToScanPath = os.path.join(baseFolderPath, relativeFolderPath)
         foundMatchingFilesOrSubFolders = False
-        for nameToExamine in os.listdir(folderToScanPath):
+        for nameToExamine in fileSystem.listdir(folderToScanPath):
             pathToExamine = os.path.join(relativeFolderPath, nameToExamine)
             if os.path.isabs(pathToExamine):
                 raise AntError(u'path to examine must be a relative path: %r' % pathToExamine)
@@ -668,13 +1157,17 @@ class AntPatternSet(object):
                 isExcluded = False
             if not isExcluded:
                 fullPathToExamine = os.path.join(baseFolderPath, pathToExamine)
-                if os.path.isdir(fullPathToExamine):
-                    # TODO: Scan into folder only if include patterns suggest there is a chance to
-                    # actually find anything there.
-                    for pathToExamine in self._findFilesAndEmptyFolders(baseFolderPath, pathToExamineParts, pathToExamine, addFolders):
-                        if not foundMatchingFilesOrSubFolders:
-                            foundMatchingFilesOrSubFolders = True
-                        yield pathToExamine
+                if fileSystem.isdir(fullPathToExamine):
+                    if self.canMatchBelowParts(pathToExamineParts):
+                        for pathToExamine in self._findFilesAndEmptyFolders(baseFolderPath, pathToExamineParts, pathToExamine, addFolders, fileSystem):
+                            if not foundMatchingFilesOrSubFolders:
+                                foundMatchingFilesOrSubFolders = True
+                            yield pathToExamine
+                    elif addFolders and self.matchesParts(pathToExamineParts):
+                        # Nothing in the folder can match, so skip scanning it but still yield
+                        # the folder itself.
+                        foundMatchingFilesOrSubFolders = True
+                        yield _asFolderPath(pathToExamine)
                 elif self.includePatterns:
                     if self._matchesAnyPatternIn(pathToExamineParts, self.includePatterns):
                         yield pathToExamine
@@ -685,10 +1178,15 @@ class AntPatternSet(object):
             # If no files or sub folders could be found but the folder itself matches, yield it.
             yield _asFolderPath(relativeFolderPath)
 
-    def _findInFolder(self, baseFolderPath, addFolders):
+    def _findInFolder(self, baseFolderPath, addFolders, fileSystem=_LocalFileSystem, relativeFolderPath=""):
         assert baseFolderPath is not None
+        assert relativeFolderPath is not None
+        if relativeFolderPath:
+            relativeFolderParts = _splitTextParts(relativeFolderPath)
+        else:
+            relativeFolderParts = []
         folderPathsYield = set()
-        for pathToExamine in self._findFilesAndEmptyFolders(baseFolderPath, [], "", addFolders):
+        for pathToExamine in self._findFilesAndEmptyFolders(baseFolderPath, relativeFolderParts, relativeFolderPath, addFolders, fileSystem):
             if addFolders:
                 # Yield all containing folders of `pathToExamine` that have not been yield yet.
                 if isFolderPath(pathToExamine):
@@ -710,43 +1208,55 @@ class AntPatternSet(object):
             result = pathToExamine
             yield result
 
-    def ifind(self, folderToScanPath=os.getcwdu(), addFolders=False):
+    def ifind(self, folderToScanPath=os.getcwdu(), addFolders=False, fileSystem=None, relativeFolderPath=""):
         """
         Like `find()` but iterates over ``folderToScanPath`` instead of returning a list of paths.
+        To scan something else than the local file system, specify an object with the same
+        methods as `LocalFileSystem` in ``fileSystem``.
+
+        To scan only the folder ``relativeFolderPath`` located in ``folderToScanPath``, specify
+        it. The patterns still apply to paths relative to ``folderToScanPath``, and with
+        ``addFolders`` the folders containing ``relativeFolderPath`` are included too.
         """
         assert folderToScanPath is not None
+        assert relativeFolderPath is not None
         _log.debug(u'  ifind in %r', folderToScanPath)
-        for relativePath in self._findInFolder(folderToScanPath, addFolders):
+        if fileSystem is None:
+            fileSystem = _LocalFileSystem
+        for relativePath in self._findInFolder(folderToScanPath, addFolders, fileSystem, relativeFolderPath):
             assert not os.path.isabs(relativePath), 'relativePath=%r' % relativePath
             yield relativePath
 
-    def find(self, folderToScanPath=os.getcwdu(), addFolders=False):
+    def find(self, folderToScanPath=os.getcwdu(), addFolders=False, fileSystem=None):
         """
         List of paths of files relative to ``folderPath`` matching the pattern set.
         """
         assert folderToScanPath is not None
         result = []
-        for path in self.ifind(folderToScanPath, addFolders):
+        for path in self.ifind(folderToScanPath, addFolders, fileSystem):
             result.append(path)
         return result
 
-    def ifindEntries(self, folderToScanPath=os.getcwdu()):
+    def ifindEntries(self, folderToScanPath=os.getcwdu(), fileSystem=None, relativeFolderPath=""):
         """
         Like `findEntries()` but iterates over ``folderToScanPath`` instead of returning a list of paths.
+        To scan only a folder located in ``folderToScanPath``, specify ``relativeFolderPath``
+        as described with `ifind()`.
         """
         _log.debug(u'  ifindEntries in %r', folderToScanPath)
-        for path in self.ifind(folderToScanPath, True):
+        for path in self.ifind(folderToScanPath, True, fileSystem, relativeFolderPath):
             parts = _splitTextParts(path)
-            yield FileSystemEntry(folderToScanPath, parts)
+            yield FileSystemEntry(folderToScanPath, parts, fileSystem)
 
-    def findEntries(self, folderToScanPath=os.getcwdu()):
+    def findEntries(self, folderToScanPath=os.getcwdu(), fileSystem=None):
         """
         List containing a `FileSystemEntry` for each file matching the pattern set or any folder
-        containing at least one such file.
+        containing at least one such file. To scan using a snapshot of a previous scan, specify
+        a `SnapshotFileSystem` in ``fileSystem``.
         """
         result = []
         _log.debug(u'  findEntries in %r', folderToScanPath)
-        for entry in self.ifindEntries(folderToScanPath):
+        for entry in self.ifindEntries(folderToScanPath, fileSystem):
             result.append(entry)
         return result
 
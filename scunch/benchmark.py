@@ -0,0 +1,416 @@
+"""
+Benchmarks for scunch.
+
+To run all benchmarks, use::
+
+  $ python -m scunch.benchmark
+
+To run only certain benchmarks, specify their names, for example::
+
+  $ python -m scunch.benchmark backends
+
+To match patterns against a list of 5 million paths, use::
+
+  $ python -m scunch.benchmark --files 5000000 patterns
+
+Apart from ``copy`` and ``patterns``, the benchmarks need the Subversion command line
+tools ``svn`` and ``svnadmin``. Benchmarks comparing the Subversion Python bindings with the
+command line client only measure the command line client if the bindings are
+not installed.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import ctypes
+import ctypes.util
+import logging
+import mmap
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from urlparse import urljoin
+
+from scunch import antglob
+from scunch import scunch
+from scunch import _filecopy
+from scunch import _tools
+
+_log = logging.getLogger("scunch.benchmark")
+
+
+class Stopwatch(object):
+    """
+    Measure the time passed since the stopwatch has been created or `reset()`.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._startTime = time.time()
+
+    def duration(self):
+        """
+        Seconds passed since the start.
+        """
+        return time.time() - self._startTime
+
+
+def writeSourceFolder(folderPath, fileCount, filesPerFolder=50, variant=0):
+    """
+    Write ``fileCount`` small text files to ``folderPath`` distributed in folders containing
+    ``filesPerFolder`` files each. Different values for ``variant`` result in files with
+    different content and some files being located in a different folder.
+    """
+    assert fileCount >= 0
+    assert filesPerFolder > 0
+    _tools.makeEmptyFolder(folderPath)
+    for fileNumber in range(fileCount):
+        folderNumber = fileNumber // filesPerFolder
+        if variant and (fileNumber % 10 == 0):
+            # Move every tenth file to a different folder.
+            folderNumber += 1
+        subFolderPath = os.path.join(folderPath, u'folder%d' % folderNumber)
+        _tools.makeFolder(subFolderPath)
+        filePath = os.path.join(subFolderPath, u'file%d.txt' % fileNumber)
+        with open(filePath, 'wb') as targetFile:
+            targetFile.write('file %d\n' % fileNumber)
+            if variant and (fileNumber % 3 == 0):
+                targetFile.write('variant %d\n' % variant)
+
+
+def _cachedByteCount(filePaths):
+    """
+    Number of bytes of the files at ``filePaths`` currently held in the page cache according to
+    ``mincore()``, or ``None`` if this cannot be determined.
+    """
+    libcPath = ctypes.util.find_library('c')
+    if libcPath is None:
+        return None
+    libc = ctypes.CDLL(libcPath, use_errno=True)
+    if not hasattr(libc, 'mincore'):
+        return None
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_longlong]
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_char_p]
+    pageSize = mmap.PAGESIZE
+    result = 0
+    for filePath in filePaths:
+        fileSize = os.path.getsize(filePath)
+        if fileSize == 0:
+            continue
+        fileDescriptor = os.open(filePath, os.O_RDONLY)
+        try:
+            address = libc.mmap(None, fileSize, mmap.PROT_READ, mmap.MAP_SHARED, fileDescriptor, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                return None
+            try:
+                pageCount = (fileSize + pageSize - 1) // pageSize
+                pageStates = ctypes.create_string_buffer(pageCount)
+                if libc.mincore(address, fileSize, pageStates) != 0:
+                    return None
+                result += sum(1 for pageState in pageStates.raw if ord(pageState) & 1) * pageSize
+            finally:
+                libc.munmap(address, fileSize)
+        finally:
+            os.close(fileDescriptor)
+    return result
+
+
+def createScmWork(testFolderPath, project, scmWorkClass=scunch.ScmWork):
+    """
+    Create a new local Subversion repository for ``project`` and check out its trunk to an
+    ``scmWorkClass``.
+    """
+    storagePath = os.path.join(testFolderPath, "svnRepository", project)
+    _tools.makeEmptyFolder(storagePath)
+    scmStorage = scunch.ScmStorage(urljoin("file://localhost/", storagePath))
+    scmStorage.create(storagePath)
+    scmStorage.mkdir(["trunk"], "Added project folders.")
+    workFolderPath = os.path.join(testFolderPath, "svnWork", project)
+    result = scmWorkClass(scmStorage, "trunk", workFolderPath, scunch.ScmWork.CheckOutActionReset)
+    return result
+
+
+def benchmarkBackends(testFolderPath, fileCount):
+    """
+    Compare the time to punch and commit ``fileCount`` files using the ``svn`` command line client
+    and the Subversion Python bindings.
+    """
+    firstSourceFolderPath = os.path.join(testFolderPath, "first")
+    secondSourceFolderPath = os.path.join(testFolderPath, "second")
+    writeSourceFolder(firstSourceFolderPath, fileCount)
+    writeSourceFolder(secondSourceFolderPath, fileCount, variant=1)
+    backends = ['cli']
+    if scunch._HasSvnBindings:
+        backends.append('bindings')
+    else:
+        _log.warning(u'Subversion Python bindings are not installed, measuring only command line client')
+    for backend in backends:
+        scmWork = createScmWork(testFolderPath, backend, scunch.scmWorkClass(backend))
+        stopwatch = Stopwatch()
+        for sourceFolderPath in (firstSourceFolderPath, secondSourceFolderPath):
+            changes = scunch.scunch(sourceFolderPath, scmWork)
+            if changes:
+                scmWork.commitChanges(changes, "Punched benchmark files.")
+        _log.info(u'backend %s: punched and committed %d files twice in %.2f seconds', backend, fileCount, stopwatch.duration())
+
+
+def sourcePaths(fileCount, filesPerFolder=50):
+    """
+    Sorted list of ``fileCount`` relative paths of files distributed in folders containing
+    ``filesPerFolder`` files each and nested in folders for projects and modules.
+    """
+    assert fileCount >= 0
+    assert filesPerFolder > 0
+    result = []
+    for fileNumber in range(fileCount):
+        folderNumber = fileNumber // filesPerFolder
+        if fileNumber % 2:
+            suffix = u'py'
+        else:
+            suffix = u'txt'
+        result.append(u'project%d/source/module%d/file%d.%s' % (folderNumber // 100, folderNumber, fileNumber, suffix))
+    result.sort()
+    return result
+
+
+def benchmarkPatterns(testFolderPath, fileCount):
+    """
+    Compare the number of paths per second `antglob.AntPatternSet` can match when matching
+    one path after the other and when matching all paths at once.
+    """
+    paths = sourcePaths(fileCount)
+    for includePatternText in (None, u'**/*.py'):
+        patternSet = antglob.AntPatternSet()
+        if includePatternText:
+            patternSet.include(includePatternText)
+        stopwatch = Stopwatch()
+        matchingPathCount = len([path for path in paths if patternSet.matches(path)])
+        singleDuration = stopwatch.duration()
+        stopwatch.reset()
+        matchingManyPathCount = patternSet.matchesMany(paths).count(True)
+        manyDuration = stopwatch.duration()
+        assert matchingPathCount == matchingManyPathCount
+        _log.info(
+            u'patterns %s: matched %d of %d paths with matches() at %.0f paths/s and with matchesMany() at %.0f paths/s',
+            includePatternText or u'(default)', matchingPathCount, fileCount,
+            fileCount / max(singleDuration, 0.001), fileCount / max(manyDuration, 0.001))
+
+
+def benchmarkCopy(testFolderPath, fileCount, fileSize=64 * 1024 * 1024):
+    """
+    Compare the MB per second `shutil.copy2()` and `_filecopy.copyFile()` can copy between
+    files of ``fileSize`` bytes each. The total size of the files is ``fileCount`` times
+    64 KB but at least one file.
+    """
+    assert fileSize > 0
+    largeFileCount = max(1, (fileCount * 64 * 1024) // fileSize)
+    _tools.makeEmptyFolder(testFolderPath)
+    sourceFilePaths = []
+    block = os.urandom(1024 * 1024)
+    for fileNumber in range(largeFileCount):
+        sourceFilePath = os.path.join(testFolderPath, u'source%d.bin' % fileNumber)
+        with open(sourceFilePath, 'wb') as sourceFile:
+            for _ in range(fileSize // len(block)):
+                sourceFile.write(block)
+        sourceFilePaths.append(sourceFilePath)
+    targetFilePath = os.path.join(testFolderPath, u'target.bin')
+    megaByteCount = largeFileCount * fileSize / (1024.0 * 1024.0)
+    # Copy everything once so all implementations find the source files in the cache.
+    for implementationName, copy in (
+        (u'warm up', shutil.copy2),
+        (u'shutil.copy2', shutil.copy2),
+        (u'_filecopy.copyFile', _filecopy.copyFile),
+        (u'_filecopy.copyFile(read)', lambda source, target: _filecopy.copyFile(source, target, (_filecopy.Read,))),
+    ):
+        stopwatch = Stopwatch()
+        for sourceFilePath in sourceFilePaths:
+            copy(sourceFilePath, targetFilePath)
+            os.remove(targetFilePath)
+        duration = stopwatch.duration()
+        if implementationName != u'warm up':
+            _log.info(u'copy %s: copied %d files with %.0f MB at %.0f MB/s', implementationName, largeFileCount, megaByteCount, megaByteCount / max(duration, 0.001))
+    # Show which method copyFile() actually uses for this folder.
+    _log.info(u'copy method used: %s', _filecopy.copyFile(sourceFilePaths[0], targetFilePath))
+
+
+def benchmarkDelta(testFolderPath, fileCount, fileSize=256 * 1024 * 1024, changeCount=10):
+    """
+    Compare the MB per second `_filecopy.copyFile()` and `_filecopy.updateFile()` can
+    transfer a file of ``fileSize`` bytes to a target file that differs in ``changeCount``
+    places, and how many bytes `_filecopy.updateFile()` actually writes.
+    """
+    assert fileSize > 0
+    assert changeCount >= 0
+    _tools.makeEmptyFolder(testFolderPath)
+    sourceFilePath = os.path.join(testFolderPath, u'source.bin')
+    targetFilePath = os.path.join(testFolderPath, u'target.bin')
+    block = os.urandom(1024 * 1024)
+    with open(sourceFilePath, 'wb') as sourceFile:
+        for _ in range(fileSize // len(block)):
+            sourceFile.write(block)
+    megaByteCount = fileSize / (1024.0 * 1024.0)
+    for implementationName, transfer in (
+        (u'_filecopy.copyFile', _filecopy.copyFile),
+        (u'_filecopy.updateFile', _filecopy.updateFile),
+    ):
+        shutil.copy2(sourceFilePath, targetFilePath)
+        with open(targetFilePath, 'r+b') as targetFile:
+            for changeNumber in range(changeCount):
+                targetFile.seek(changeNumber * (fileSize // max(1, changeCount)))
+                targetFile.write('changed')
+        stopwatch = Stopwatch()
+        writtenByteCount = transfer(sourceFilePath, targetFilePath)
+        duration = stopwatch.duration()
+        if implementationName == u'_filecopy.copyFile':
+            writtenText = u'%.0f MB' % megaByteCount
+        else:
+            writtenText = u'%.1f MB' % (writtenByteCount / (1024.0 * 1024.0))
+        _log.info(
+            u'delta %s: transferred %.0f MB with %d changes at %.0f MB/s writing %s',
+            implementationName, megaByteCount, changeCount, megaByteCount / max(duration, 0.001), writtenText)
+
+
+def _convertTextByLine(textOptions, sourceFilePath, targetFilePath):
+    with open(sourceFilePath, 'rb') as sourceFile:
+        with open(targetFilePath, 'wb') as targetFile:
+            for line in sourceFile:
+                targetFile.write(textOptions.convertedLine(line))
+
+
+def _convertTextByChunk(textOptions, sourceFilePath, targetFilePath):
+    with open(sourceFilePath, 'rb') as sourceFile:
+        with open(targetFilePath, 'wb') as targetFile:
+            for _, convertedChunk in textOptions.convertedChunks(sourceFile):
+                targetFile.write(convertedChunk)
+
+
+def benchmarkText(testFolderPath, fileCount):
+    """
+    Compare the MB per second `scunch.TextOptions` can convert when converting one line after
+    the other and when converting chunks of many lines at once. The text has a size of
+    ``fileCount`` times 64 KB.
+    """
+    _tools.makeEmptyFolder(testFolderPath)
+    sourceFilePath = os.path.join(testFolderPath, u'source.txt')
+    targetFilePath = os.path.join(testFolderPath, u'target.txt')
+    lines = ['def function%d(value):  \r\n\treturn value * %d\r\n\r\n' % (lineNumber, lineNumber) for lineNumber in range(1000)]
+    text = ''.join(lines)
+    textCount = max(1, (fileCount * 64 * 1024) // len(text))
+    with open(sourceFilePath, 'wb') as sourceFile:
+        for _ in range(textCount):
+            sourceFile.write(text)
+    megaByteCount = textCount * len(text) / (1024.0 * 1024.0)
+    textOptions = scunch.TextOptions(None, scunch.TextOptions.Unix, 4, True)
+    for implementationName, convert in (
+        (u'convertedLine()', _convertTextByLine),
+        (u'convertedChunks()', _convertTextByChunk),
+    ):
+        stopwatch = Stopwatch()
+        convert(textOptions, sourceFilePath, targetFilePath)
+        duration = stopwatch.duration()
+        _log.info(u'text %s: converted %.0f MB at %.1f MB/s', implementationName, megaByteCount, megaByteCount / max(duration, 0.001))
+
+
+def benchmarkCache(testFolderPath, fileCount, fileSize=1024 * 1024):
+    """
+    Compare the throughput and the amount of data left in the page cache when transferring
+    ``fileCount`` files of ``fileSize`` bytes each to a work copy with and without
+    `scunch.TransferOptions.dropCache`. Every other file is converted as text file.
+    """
+    assert fileSize > 0
+    _tools.makeEmptyFolder(testFolderPath)
+    sourceFolderPath = os.path.join(testFolderPath, u'source')
+    workFolderPath = os.path.join(testFolderPath, u'work')
+    _tools.makeFolder(sourceFolderPath)
+    line = 'some text  \r\n'
+    textData = line * (fileSize // len(line))
+    binaryData = os.urandom(fileSize)
+    sourceFilePaths = []
+    for fileNumber in range(fileCount):
+        isText = (fileNumber % 2 == 0)
+        sourceFilePath = os.path.join(sourceFolderPath, u'file%d.%s' % (fileNumber, 'txt' if isText else 'bin'))
+        with open(sourceFilePath, 'wb') as sourceFile:
+            sourceFile.write(textData if isText else binaryData)
+        sourceFilePaths.append((sourceFilePath, isText))
+    megaByteCount = fileCount * fileSize / (1024.0 * 1024.0)
+    textOptions = scunch.TextOptions(None, scunch.TextOptions.Unix, stripTrailing=True)
+    for dropCache in (False, True):
+        _tools.makeEmptyFolder(workFolderPath)
+        # Start with none of the source files in the cache.
+        for sourceFilePath, _ in sourceFilePaths:
+            with open(sourceFilePath, 'rb') as sourceFile:
+                _filecopy.dropFromCache(sourceFile.fileno())
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', workFolderPath))
+        puncher.transferOptions = scunch.TransferOptions(dropCache=dropCache)
+        workFilePaths = []
+        stopwatch = Stopwatch()
+        for sourceFilePath, isText in sourceFilePaths:
+            workFilePath = os.path.join(workFolderPath, os.path.basename(sourceFilePath))
+            puncher._transferFileToWork(sourceFilePath, workFilePath, isText, textOptions)
+            workFilePaths.append(workFilePath)
+        duration = stopwatch.duration()
+        cachedByteCount = _cachedByteCount([sourceFilePath for sourceFilePath, _ in sourceFilePaths] + workFilePaths)
+        if cachedByteCount is None:
+            cachedText = u'unknown'
+        else:
+            cachedText = u'%.0f MB' % (cachedByteCount / (1024.0 * 1024.0))
+        _log.info(
+            u'cache dropCache=%s: transferred %d files with %.0f MB at %.0f MB/s leaving %s in the page cache',
+            dropCache, fileCount, megaByteCount, megaByteCount / max(duration, 0.001), cachedText)
+
+
+_NameToBenchmarkMap = {
+    'backends': benchmarkBackends,
+    'cache': benchmarkCache,
+    'copy': benchmarkCopy,
+    'delta': benchmarkDelta,
+    'patterns': benchmarkPatterns,
+    'text': benchmarkText,
+}
+
+
+def main(arguments=None):
+    if arguments is None:
+        arguments = sys.argv
+    parser = optparse.OptionParser(usage="%prog [options] [BENCHMARK...]", description="Run benchmarks for scunch.")
+    parser.add_option("-f", "--files", default=1000, dest="fileCount", metavar="NUMBER", type=int, help=u'number of files to process (default: %default)')
+    options, benchmarkNames = parser.parse_args(arguments[1:])
+    if not benchmarkNames:
+        benchmarkNames = sorted(_NameToBenchmarkMap.keys())
+    for benchmarkName in benchmarkNames:
+        if benchmarkName not in _NameToBenchmarkMap:
+            parser.error(u'benchmark %r must be changed to one of: %s' % (benchmarkName, _tools.humanReadableList(sorted(_NameToBenchmarkMap.keys()))))
+    scunch._setUpLogging(logging.INFO)
+    scunch._setUpEncoding()
+    logging.getLogger("scunch").setLevel(logging.WARNING)
+    _log.setLevel(logging.INFO)
+    testFolderPath = tempfile.mkdtemp(prefix="scunch_benchmark_")
+    try:
+        for benchmarkName in benchmarkNames:
+            _log.info(u'run benchmark: %s', benchmarkName)
+            _NameToBenchmarkMap[benchmarkName](os.path.join(testFolderPath, benchmarkName), options.fileCount)
+    finally:
+        _tools.removeFolder(testFolderPath)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
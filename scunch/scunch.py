@@ -189,6 +189,22 @@ where ``http://example.com/ohsome/trunk`` represents the project's depot
 qualifier. Note that a ``before=checkout`` usually takes longer than a
 ``--before=reset`` because a checkout needs to obtain all files again
 where else a ``--before=checkout`` needs to obtain every file in the depot.
+If the work copy folder already contains a work copy of the same
+repository, it is reset and switched to the depot qualifier instead, so
+only the differences have to be obtained. This is particularly useful to
+punch into different branches or tags using the same work copy folder.
+Work copies of other repositories or broken work copies are removed and
+checked out again.
+
+If only certain folders of a large depot are relevant, combine
+``--before=checkout`` with ``--include``, for example::
+
+  $ scunch --before checkout --depot http://example.com/ohsome/trunk --include "sdk/include/**, sdk/lib/*.so" ...
+
+This checks out only the folders that can hold files matching the include
+patterns, in this case ``sdk/include`` and ``sdk/lib``. If any include
+pattern starts with a wildcard such as ``**/*.h``, the whole depot has to be
+checked out.
 
 In case you are happy with the current pending changes and want to preserve
 them even after punching the external changes, use::
@@ -357,6 +373,323 @@ with different settings than the work copy, or you cannot figure them out
 at all, try to copy the files to a Volume with know settings and run
 ``scunch`` on this copy.
 
+Punching without work copy
+--------------------------
+
+Checking out a large repository folder just to punch a few changes into it
+can take a long time. To punch directly into the repository without a work
+copy, use ``--remote`` and specify the repository folder with ``--depot``::
+
+  $ scunch --remote --depot=http://example.com/svn/ohsome/trunk /tmp/ohsome
+
+This lists the files in the repository, compares them with the external
+folder and commits all changes in a single revision using ``svnmucc``,
+which is part of the Subversion command line tools. Consequently
+``--after=commit`` is implied and other actions for ``--before`` and
+``--after`` cannot be used.
+
+Because Subversion does not list the checksum of files, ``scunch`` stores
+the SHA1 hash of punched files in the property ``scunch:sha1``. Files
+without this property, for example from a previous punch into a work copy,
+are exported and compared with the external file if their size did not
+change. If the content turns out to be the same, the property is added so
+the next punch does not have to export the file again.
+
+Committing large changes
+------------------------
+
+Committing many or large files in a single revision can take very long and
+might exceed timeouts of the server. To split the commit into multiple
+revisions, use for example::
+
+  $ scunch --after commit --commit-chunk-files 5000 --commit-chunk-bytes 200m ...
+
+Each revision contains at most 5000 files and folders with a total size of
+at most 200 MB, unless a single file is larger. The commit messages are
+numbered, for example "Punched recent changes. (2/7)". Folders are
+committed before their contents and both sides of a moved file are
+committed together.
+
+If one of the commits fails, the remaining chunks are stored next to the
+work copy. The next run using ``--after=commit`` commits them before
+anything else.
+
+Continuing an interrupted punch
+-------------------------------
+
+While punching, ``scunch`` logs the steps it performs in a journal next to
+the work copy. If punching gets interrupted, for example because the
+machine crashed or a Subversion operation failed, run ``scunch`` again with
+the same options and ``--resume``::
+
+  $ scunch --resume --after commit ...
+
+This continues with the first step not performed yet without scanning the
+external folder and work copy again. Actions specified with ``--before``
+are skipped because they would complain about or discard the changes
+performed so far. If there is nothing to resume, ``--resume`` punches
+everything as usual.
+
+Planning changes without punching them
+--------------------------------------
+
+To find out what ``scunch`` would change without touching the work copy,
+use ``--plan-only=FILE``::
+
+  $ scunch --plan-only=ohsome.plan /tmp/ohsome ~/projects/ohsome
+
+This scans both folders and writes the steps to punch the changes to
+``FILE`` without running any Subversion command. Each line of the plan holds
+a step as JSON, and the first line also tells how many bytes will be
+transferred. Files that exist in both folders are compared while planning,
+so only those that actually differ are transferred. The work copy folder
+does not even have to be a work copy, an
+export of it works just as well. This allows to compute the plan on a
+machine that can scan files quickly.
+
+To later punch the planned changes into the work copy, use
+``--apply-plan=FILE`` with the same text options::
+
+  $ scunch --apply-plan=ohsome.plan --after=commit /tmp/ohsome ~/projects/ohsome
+
+The files to transfer are read from the folder specified on the command
+line, so it does not have to be located at the same path as when planning.
+
+Scanning only changed folders
+-----------------------------
+
+Scanning a folder with many files can take a while, especially on a network
+file system. To scan only folders that changed since the previous run, use
+``--scan-snapshot``::
+
+  $ scunch --scan-snapshot /tmp/ohsome ~/projects/ohsome
+
+This remembers the contents of each folder in a snapshot file next to the
+work copy. Next time, folders whose modification time did not change are
+taken from the snapshot instead of listing them again. The content of files
+is still compared as usual, so modified files are detected even if their
+folder did not change. Changing ``--include`` or ``--exclude`` is fine, the
+snapshot remains valid.
+
+Punching only listed changes
+----------------------------
+
+If another tool already knows which files changed, ``scunch`` does not need
+to scan the whole folder to find them. Instead, pass a file listing the
+changed paths relative to the folder to punch using ``--changes``::
+
+  $ find /tmp/ohsome -newer /tmp/ohsome.stamp -printf "%P\\n" >/tmp/ohsome.changes
+  $ scunch --changes /tmp/ohsome.changes --after=commit /tmp/ohsome ~/projects/ohsome
+
+Only the listed files and folders and the folders containing them are
+examined in the folder to punch and in the work copy. Listed folders are
+examined completely. Files not listed are assumed to be unchanged, so make
+sure to also list removed files.
+
+Besides plain paths, the list can contain the output of
+``rsync --itemize-changes``, which also reports removed files when using
+``--delete``. Use ``--changes -`` to read the list from standard input::
+
+  $ rsync -a --delete --itemize-changes server:ohsome/ /tmp/ohsome/ \\
+    | scunch --changes - --after=commit /tmp/ohsome ~/projects/ohsome
+
+The patterns specified with ``--include``, ``--exclude`` and
+``--work-only`` apply to the listed paths the same way as to a full scan.
+Because listed paths are punched using the same path in the work copy,
+``--changes`` cannot be combined with ``--names``.
+
+Punching changes as they happen
+-------------------------------
+
+Instead of running ``scunch`` regularly, you can keep it running and let it
+punch changes as soon as they happen using ``--watch``::
+
+  $ scunch --watch --after=commit /tmp/ohsome ~/projects/ohsome
+
+After punching everything once, ``scunch`` waits for files in the folder
+to punch to change. Once nothing changed for a few seconds, it punches only
+the changed files and folders and performs the actions specified with
+``--after``. To wait for a different number of seconds, use
+``--watch-delay``. To stop watching, press Control-C.
+
+Watching uses the Linux inotify API, so it is not available on other
+platforms. Because changed files are punched using the same path in the
+work copy, ``--watch`` cannot be combined with ``--names``. If too many
+files change at once to keep track of them, ``scunch`` punches everything
+as usual. Changes in the work copy made while watching are not detected.
+
+Skipping unchanged folders
+--------------------------
+
+When ``scunch`` runs regularly, for example as a cron job, most runs
+typically find no changes. To skip such runs quickly, use
+``--skip-unchanged``::
+
+  $ scunch --skip-unchanged --after=commit /tmp/ohsome ~/projects/ohsome
+
+After each successful run, this stores a fingerprint of the names, sizes
+and modification times of all files in the folder to punch next to the work
+copy. If the fingerprint is the same the next time, ``scunch`` neither scans
+the work copy nor runs any Subversion command or actions specified with
+``--before`` and ``--after``. Otherwise the punch reuses the entries found
+while computing the fingerprint, so the folder is scanned only once.
+Changing any option that affects the punch such as ``--include``,
+``--text`` or ``--after`` also changes the fingerprint.
+
+Note that changes in the work copy or the repository made without
+``scunch`` are not detected. In case such changes should be reverted by
+the next run, remove ``--skip-unchanged``.
+
+Transferring many files at once
+-------------------------------
+
+By default, ``scunch`` copies one file after the other to the work copy. If
+the folder to punch or the work copy are located on network storage, most
+of the time is spent waiting for the storage to respond to each file. In
+such cases, copying several files at the same time can be a lot faster::
+
+  $ scunch --transfer-workers 8 /mnt/server/ohsome ~/projects/ohsome
+
+Folders are still created one after the other, and Subversion commands such
+as ``svn add`` only run after all files they refer to have been copied. If
+some files cannot be copied, ``scunch`` still copies all other files and
+reports the broken ones at the end. Once the cause has been resolved, use
+``--resume`` to copy only the remaining files.
+
+Keeping the page cache for others
+---------------------------------
+
+The operating system keeps the data of recently read and written files in
+memory in case they are needed again. When punching huge folders, this
+pushes the data of everything else running on the same machine out of the
+page cache, which then slows down for a while. To remove each file from the
+page cache once it has been transferred, use ``--drop-cache``::
+
+  $ scunch --drop-cache /mnt/vendor/drop ~/projects/drop
+
+Because only data already written to the disk can be removed from the page
+cache, this syncs each file written to the work copy and is therefore a
+little slower.
+
+To change the number of bytes read and written at once when converting text
+files or comparing files, use ``--buffer-size``, for example
+``--buffer-size=4m``. The default of 1 MB works well in most cases.
+
+Limiting the load on shared storage
+-----------------------------------
+
+Punching a huge folder from a file server as fast as possible can slow down
+everyone else using the same server. To limit the load ``scunch`` puts on
+the storage, specify the maximum number of bytes per second to read and
+write and the maximum number of files and folders per second to examine
+while scanning::
+
+  $ scunch --max-read-rate=20m --max-write-rate=20m --max-stat-rate=500 /mnt/vendor/drop ~/projects/drop
+
+The limits apply to ``scunch`` as a whole, so with ``--transfer-workers``
+all threads together stay within them. Short bursts of up to one second
+worth of data pass without waiting. Once done, ``scunch`` logs how much it
+read, wrote and examined and how long it had to wait because of the limits.
+
+Surviving crashes
+-----------------
+
+``scunch`` copies each file to a temporary file named ``.scunch_*.tmp`` in
+the same folder of the work copy and only then renames it to its actual
+name. If ``scunch`` is interrupted, the work copy therefore never contains
+partially copied files, though it might contain such a temporary file. The
+next run removes these leftovers when it scans the work copy, so they
+neither end up in the repository nor make ``--before=check`` complain.
+
+To also survive a power failure, the files have to be written to the disk,
+which ``--fsync`` controls:
+
+* ``none`` (the default): leave it to the operating system to write the
+  files eventually.
+* ``file``: write each file and the folder containing it to the disk right
+  away. This is safe but slow when transferring many small files.
+* ``batch``: write the files and their folders to the disk after every 100
+  files and once all files have been transferred. To change the number of
+  files, use ``--fsync-batch``. After a power failure, at most the files of
+  the last batch might be broken.
+
+For example::
+
+  $ scunch --fsync=batch --fsync-batch=500 /tmp/ohsome ~/projects/ohsome
+
+Updating large files in place
+-----------------------------
+
+Large files such as database dumps or disk images often change in only a
+few places between two punches. Copying them completely each time then
+writes a lot of data that already is in the work copy. To update such files
+in place instead, specify the minimum size of files to update with
+``--delta-threshold``::
+
+  $ scunch --delta-threshold=100m /tmp/ohsome ~/projects/ohsome
+
+``scunch`` then reads both the external file and the existing file in the
+work copy, compares them in blocks of 64 KB and only rewrites the blocks
+that differ, truncating or extending the file as needed. This still reads
+both files completely but writes only what changed. Once done, ``scunch``
+logs how many bytes it wrote and how many it saved. Text files are always
+copied because they have to be converted anyway.
+
+Updating a file in place cannot use a temporary file, so if ``scunch`` is
+interrupted while updating a file, the file might contain a mix of old and
+new blocks. Run ``scunch`` again with ``--resume`` (see "Continuing an
+interrupted punch"), which updates the file again. With ``--fsync``,
+updated files are written to the disk the same way as copied files.
+
+Punching archives
+-----------------
+
+Instead of a folder, ``scunch`` can punch the contents of a tar archive,
+optionally compressed using gzip or bzip2, or a zip archive without
+extracting it first::
+
+  $ scunch /tmp/ohsome-1.2.tar.gz ~/projects/ohsome
+
+The files and folders to punch are taken from the index of the archive,
+and the content of changed files is streamed directly into the work copy,
+converting text files on the way. To do so, ``scunch`` reads the archive
+in a single pass in the order the files are stored in it, so even
+compressed archives are decompressed only once and never accessed at
+random. While reading, each file is compared with the work copy and only
+written to a temporary file if it changed. The temporary files are stored
+in a hidden staging folder next to the work copy, for example
+``~/projects/.ohsome.scunch_staging``, so the file system of the work copy
+needs enough free space to hold them until they are moved to their place.
+
+Binary files whose size and modification time in the archive are the same
+as the ones of the file in the work copy are considered unchanged without
+comparing them. ``--skip-unchanged`` uses the size and modification time of
+the archive itself.
+
+Archives cannot be punched using ``--changes``, ``--remote``,
+``--scan-snapshot`` or ``--watch``. Symbolic links and other entries that
+are neither files nor folders are ignored.
+
+Choosing how to access Subversion
+---------------------------------
+
+If the Subversion Python bindings are installed, ``scunch`` uses them to
+modify the work copy. This is faster than running the ``svn`` command line
+client for each operation, especially when punching many files. To
+explicitly choose how to access Subversion, use ``--backend=KIND``::
+
+  $ scunch --backend=cli /tmp/ohsome ~/projects/ohsome
+
+Possible values for ``--backend`` are:
+
+* ``auto`` (the default): use the Python bindings if they are installed and
+  otherwise the ``svn`` command line client.
+* ``bindings``: use the Python bindings.
+* ``cli``: use the ``svn`` command line client.
+
+On most Linux distributions, the Python bindings are available as package
+called ``python-subversion`` or similar.
+
 .. scenarios:
 
 Scenarios
@@ -426,6 +759,23 @@ the commit all by itself::
   $ scunch --commit ~/projects/nifti_2010-11-27
   $ scunch --commit ~/projects/nifti
 
+With many snapshots, it is faster to punch all of them in a single run
+using ``--history``. This punches and commits each ``SNAPSHOT`` in turn,
+followed by the work copy as last argument. Patterns are expanded by
+``scunch`` itself and sorted by name, so timestamps should be written
+year first as Tim did. Any ``{snapshot}`` in the commit message is replaced
+by the name of the snapshot::
+
+  $ scunch --history --after=commit --message "Imported {snapshot}." "$HOME/projects/nifti_*" /tmp/nifti
+
+Instead of scanning the work copy again for each snapshot, ``scunch``
+remembers what it punched into it. Files with the same size and
+modification time as in the previous snapshot are not read at all, and the
+next snapshot is scanned while the current one is committed. Consequently,
+the work copy must not be changed by anything else during the run. If a
+snapshot fails to punch, continue by punching it again using ``--resume
+--after=commit`` and then run ``--history`` with the remaining snapshots.
+
 Now all the changes are nicely traceable in the repository. However, the
 timestamps use the time of the commit instead of the date when the source
 code was current. In order to fix that, Tim looks at the history log to
@@ -622,6 +972,71 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 Version history
 ===============
 
+**Version 0.7.0, unreleased**
+
+* Changed ``--after=commit`` to commit only the paths changed by the punch
+  instead of examining the whole work copy. Transferred files with unchanged
+  content are not rewritten anymore.
+* Improved performance of moving many files by moving all files with the
+  same target folder using a single ``svn move``.
+* Improved performance of running many shell commands while punching large
+  folders. Commands are now launched from a small helper process instead of
+  forking the whole ``scunch`` process.
+* Added option ``--backend`` to access Subversion using the Python bindings
+  instead of the ``svn`` command line client. By default, the bindings are
+  used if they are installed.
+* Added option ``--remote`` to punch directly into a repository folder
+  without a work copy using ``svnmucc``.
+* Changed ``--before=checkout`` combined with ``--include`` to check out
+  only the folders that can hold files matching the include patterns.
+  Scanning for files now skips folders where no include pattern can match.
+* Changed ``--before=checkout`` to reuse an existing work copy of the same
+  repository by resetting it and switching it to the depot qualifier
+  instead of checking out all files again.
+* Improved performance of ``--after=commit`` for an empty work copy by
+  committing all files using a single ``svn import``.
+* Added options ``--commit-chunk-files`` and ``--commit-chunk-bytes`` to
+  commit large changes in multiple revisions. If a commit fails, the next
+  run continues with the remaining chunks.
+* Added option ``--resume`` to continue an interrupted punch without
+  scanning and copying everything again.
+* Added options ``--plan-only`` and ``--apply-plan`` to compute the changes
+  to punch separately from actually punching them.
+* Added option ``--skip-unchanged`` to quickly skip runs where nothing
+  changed in the folder to punch since the last run.
+* Added option ``--scan-snapshot`` to scan only folders that changed since
+  the last run.
+* Added option ``--watch`` to keep running and punch changes as soon as
+  they happen.
+* Added option ``--changes`` to punch only the paths listed in a file, for
+  example the output of ``rsync --itemize-changes``.
+* Added ``antglob.AntPatternSet.matchesMany()`` and ``filter()`` to
+  efficiently match long lists of paths.
+* Fixed that patterns like "**/source/*.txt" matched "hugo.txt" without the
+  folder "source".
+* Added option ``--transfer-workers`` to copy several files to the work copy
+  at the same time.
+* Changed copying of binary files to let the kernel copy the data or even
+  clone it on file systems supporting reflinks such as btrfs or XFS.
+* Changed conversion of text files to process large chunks of lines at once
+  and to simply copy files that already conform to the text options.
+* Added option ``--drop-cache`` to remove transferred files from the page
+  cache and ``--buffer-size`` to specify how many bytes to read and write at
+  once (see "Keeping the page cache for others").
+* Added options ``--max-read-rate``, ``--max-write-rate`` and
+  ``--max-stat-rate`` to limit the load on shared storage (see "Limiting the
+  load on shared storage").
+* Changed transfer of files to the work copy to copy them to a temporary
+  file first so an interrupted punch does not leave partially copied files.
+* Added option ``--fsync`` to write transferred files to the disk (see
+  "Surviving crashes").
+* Added option ``--delta-threshold`` to rewrite only the changed blocks of
+  large files (see "Updating large files in place").
+* Added punching of tar and zip archives without extracting them (see
+  "Punching archives").
+* Added option ``--history`` to punch and commit a series of snapshots in a
+  single run (see "Upgrading from old school version management").
+
 **Version 0.6.0, 2013-05-28**
 
 * Fixed too long command line calls with multiple paths by splitting them up
@@ -756,25 +1171,47 @@ import atexit
 import codecs
 import copy
 import difflib
+import errno
+import glob
+import hashlib
+import itertools
+import json
 import locale
 import logging
 import optparse
 import os.path
 import platform
+import posixpath
+import re
 import shutil
+import stat
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import types
 import unicodedata
+import urllib
 import urlparse
 import xml.sax
 from xml.sax.handler import ContentHandler
 
 from scunch import antglob
+from scunch import _archive
+from scunch import _filecopy
+from scunch import _launcher
+from scunch import _watch
 from scunch import _tools
 
+try:
+    import svn.client
+    import svn.core
+    import svn.wc
+    _HasSvnBindings = True
+except ImportError:
+    _HasSvnBindings = False
+
 __version_info__ = (0, 6, 0)
 __version__ = '.'.join(unicode(item) for item in __version_info__)
 
@@ -782,6 +1219,7 @@ _log = logging.getLogger("scunch")
 
 _consoleEncoding = None
 _consoleNormalization = None
+_commandLauncher = None
 
 
 class _Actions(object):
@@ -811,9 +1249,30 @@ _NameToTransformationMap = {
 
 _ValidAfterActions = set([_Actions.Commit, _Actions.None_, _Actions.Purge])
 _ValidBeforeActions = set([_Actions.Check, _Actions.Checkout, _Actions.None_, _Actions.Reset, _Actions.Update])
+_ValidBackends = set(['auto', 'bindings', 'cli'])
 _ValidConsoleNormalizations = set(['auto', 'nfc', 'nfkc', 'nfd', 'nfkd'])
 _ValidNameTransformations = set(_NameToTransformationMap.keys())
 
+# Actions of steps that only change files in the work copy without running any SCM commands.
+_TransferActions = set(['mkdir', 'transfer'])
+
+# Prefix and suffix of the temporary files written to the work copy before renaming them to their
+# actual name.
+_TemporaryWorkFilePrefix = '.scunch_'
+_TemporaryWorkFileSuffix = '.tmp'
+
+
+def _isTemporaryWorkFileName(name):
+    """
+    ``True`` if ``name`` is the name of a temporary file written to the work copy.
+    """
+    assert name is not None
+    return name.startswith(_TemporaryWorkFilePrefix) and name.endswith(_TemporaryWorkFileSuffix)
+
+# Line written by ``rsync --itemize-changes``, for example ">f.st...... some/file.txt" or
+# "*deleting   some/other.txt".
+_RsyncItemizeRegex = re.compile(r'^(?P<itemize>[<>ch.][fdLDS][.+ ?a-zA-Z]{7,9}|\*deleting) +(?P<path>.+)$')
+
 
 def _setUpLogging(level=logging.INFO):
     """
@@ -899,9 +1358,10 @@ def run(commandAndOptions, returnStdout=False, cwd=None):
                 stdoutFile = codecs.open(stdoutPath, "w+b", encoding)
             else:
                 # No need to set encoding "w+b" here because nothing can be read or written.
-                stdoutFile = open(os.devnull, "wb")
+                stdoutPath = os.devnull
+                stdoutFile = open(stdoutPath, "wb")
             try:
-                exitCode = subprocess.call(normalizedCommandAndOptions, stdout=stdoutFile, stderr=stderrLines, cwd=cwd)
+                exitCode = _call(normalizedCommandAndOptions, stdoutFile, stdoutPath, stderrLines, stderrPath, cwd)
                 if exitCode != 0:
                     stderrLines.seek(0)
                     errorMessage = stderrLines.readline().rstrip("\n\r")
@@ -923,25 +1383,75 @@ def run(commandAndOptions, returnStdout=False, cwd=None):
                         line = unicodedata.normalize(_consoleNormalization, line)
                         result.append(line)
                 stdoutFile.close()
+                if returnStdout:
+                    _removeTemporaryFile(stdoutPath)
     finally:
+        _removeTemporaryFile(stderrPath)
+    return result
+
+
+def _call(commandAndOptions, stdoutFile, stdoutPath, stderrFile, stderrPath, cwd):
+    """
+    Exit code of ``commandAndOptions`` run using the `_launcher.CommandLauncher` set up with
+    `_setUpCommandLauncher()` or `subprocess.call()` if there is no launcher.
+    """
+    global _commandLauncher
+
+    result = None
+    if _commandLauncher is not None:
         try:
-            os.remove(stderrPath)
-        except EnvironmentError:
-            # HACK: If the temporary file cannot be reomoved immediately,
-            # attempt to remove it again upon program exit.
-            atexit.register(os.remove, stderrPath)
+            result = _commandLauncher.call(commandAndOptions, stdoutPath, stderrPath, cwd)
+        except _launcher.LauncherError, error:
+            _log.warning(u'%s; continuing without command launcher', error)
+            _commandLauncher = None
+    if result is None:
+        result = subprocess.call(commandAndOptions, stdout=stdoutFile, stderr=stderrFile, cwd=cwd)
     return result
 
 
-def runWithPaths(baseCommandAndOptions, paths, returnStdout=False, cwd=None):
+def _setUpCommandLauncher():
+    """
+    Start a helper process to run shell commands without forking the current process, which
+    gets slow once the puncher uses a lot of memory. Call this early while the memory usage is
+    still small. If the helper process cannot be started, commands are run directly.
+    """
+    global _commandLauncher
+
+    if (_commandLauncher is None) and (os.name == 'posix'):
+        try:
+            _commandLauncher = _launcher.CommandLauncher()
+        except EnvironmentError, error:
+            _log.debug(u'cannot start command launcher, running commands directly: %s', error)
+
+
+def _tearDownCommandLauncher():
+    global _commandLauncher
+
+    if _commandLauncher is not None:
+        _commandLauncher.close()
+        _commandLauncher = None
+
+
+def _removeTemporaryFile(temporaryFilePath):
+    assert temporaryFilePath is not None
+    try:
+        os.remove(temporaryFilePath)
+    except EnvironmentError:
+        # HACK: If the temporary file cannot be reomoved immediately,
+        # attempt to remove it again upon program exit.
+        atexit.register(os.remove, temporaryFilePath)
+
+
+def runWithPaths(baseCommandAndOptions, paths, returnStdout=False, cwd=None, trailingOptions=()):
     '''
     Run ``baseCommandAndOptions`` and pass ``paths`` to it as additional
-    options. If the resulting command runs into danger of becoming "too long"
-    for the console to be processed, split up ``paths`` into shorter
-    sequences and run multiple commands.
+    options followed by ``trailingOptions``. If the resulting command runs
+    into danger of becoming "too long" for the console to be processed, split
+    up ``paths`` into shorter sequences and run multiple commands.
     '''
     assert baseCommandAndOptions is not None
     assert paths is not None
+    assert trailingOptions is not None
     assert not isinstance(paths, basestring), 'paths must wrapped in [...] to turn string into sequence: %r' % paths
     pathCount = len(paths)
     assert pathCount > 0
@@ -952,8 +1462,8 @@ def runWithPaths(baseCommandAndOptions, paths, returnStdout=False, cwd=None):
     MESSAGE_FORMAT = u'  %5.2f: %s'
     previousLogTime = time.time()
     previousLoggedPathIndex = 0
-    for pathIndex, bundledPaths in enumerate(_tools.bundledPathsToRun(baseCommandAndOptions, paths), start=1):
-        commandResult = run(baseCommandAndOptions + bundledPaths, returnStdout=returnStdout, cwd=cwd)
+    for pathIndex, bundledPaths in enumerate(_tools.bundledPathsToRun(baseCommandAndOptions, paths, trailingOptions=trailingOptions), start=1):
+        commandResult = run(baseCommandAndOptions + bundledPaths + list(trailingOptions), returnStdout=returnStdout, cwd=cwd)
         percentOfPathsProcessed = 100.0 * pathIndex / pathCount
         if returnStdout:
             result.extend(commandResult)
@@ -969,6 +1479,59 @@ def runWithPaths(baseCommandAndOptions, paths, returnStdout=False, cwd=None):
         return result
 
 
+def runWithTargets(baseCommandAndOptions, paths, returnStdout=False, cwd=None, targetsOption="--targets"):
+    '''
+    Run ``baseCommandAndOptions`` and pass ``paths`` to it using a temporary
+    file specified with the Subversion option ``--targets``. Unlike
+    `runWithPaths()`, the command is never split up, so for example a commit
+    always results in a single revision no matter how many paths it contains.
+    For commands reading their arguments from a file specified with a different
+    option, for example ``svnmucc --extra-args``, set ``targetsOption``.
+    '''
+    assert _consoleEncoding is not None
+    assert _consoleNormalization is not None
+    assert baseCommandAndOptions is not None
+    assert paths is not None
+    assert not isinstance(paths, basestring), 'paths must wrapped in [...] to turn string into sequence: %r' % paths
+    assert len(paths) > 0
+
+    targetsFd, targetsPath = tempfile.mkstemp(prefix="scunch_targets_")
+    try:
+        with os.fdopen(targetsFd, "wb") as targetsFile:
+            for path in paths:
+                if isinstance(path, types.UnicodeType):
+                    path = unicodedata.normalize(_consoleNormalization, path).encode(_consoleEncoding)
+                targetsFile.write(path)
+                targetsFile.write("\n")
+        result = run(baseCommandAndOptions + [targetsOption, targetsPath], returnStdout=returnStdout, cwd=cwd)
+    finally:
+        _removeTemporaryFile(targetsPath)
+    return result
+
+
+def _sparseCheckoutSteps(sparseFolderPaths):
+    """
+    List of tuples ``(depth, relativeFolderPaths)`` describing the ``svn update --set-depth``
+    calls to perform after checking out an empty work copy in order to obtain the contents of
+    the folders in ``sparseFolderPaths``. The folders leading to them are obtained without their
+    contents, one folder level after another.
+    """
+    assert sparseFolderPaths is not None
+    levelToParentFolderPathsMap = {}
+    for folderPath in sparseFolderPaths:
+        parentFolderPath = os.path.dirname(folderPath)
+        while parentFolderPath:
+            level = len(antglob._splitTextParts(parentFolderPath))
+            levelToParentFolderPathsMap.setdefault(level, set()).add(parentFolderPath)
+            parentFolderPath = os.path.dirname(parentFolderPath)
+    result = []
+    for level in sorted(levelToParentFolderPathsMap.keys()):
+        result.append(('empty', sorted(levelToParentFolderPathsMap[level])))
+    if sparseFolderPaths:
+        result.append(('infinity', sorted(sparseFolderPaths)))
+    return result
+
+
 class ScmError(Exception):
     """
     Error related to performing an SCM operation.
@@ -1016,6 +1579,30 @@ class ScmNameTransformationError(ScmError):
     existingToTransformedPathMap = property(_getExistingToTransformedPathMap, doc='Mapping to existing current work entry path to transformed path.')
 
 
+class ScmTransferError(ScmError):
+    """
+    Error raised when some files could not be transferred to the work copy while others
+    could.
+    """
+    def __init__(self, pathToErrorMap):
+        assert pathToErrorMap
+        self._pathToErrorMap = pathToErrorMap
+
+    def __unicode__(self):
+        return u'cannot transfer %s to work copy' % _tools.oneOrOtherText(len(self._pathToErrorMap), 'file', 'files')
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _getPathToErrorMap(self):
+        return self._pathToErrorMap
+
+    pathToErrorMap = property(_getPathToErrorMap, doc='Mapping of relative work copy path to error preventing its transfer.')
+
+
 class ScmStatus(object):
     Added = 'added'
     Conflicted = 'conflicted'
@@ -1135,6 +1722,128 @@ class _SvnStatusContentHandler(ContentHandler):
             self.currentEntry = None
 
 
+class _SvnListContentHandler(ContentHandler):
+    """
+    Handler for the output of ``svn list --xml``.
+    """
+    _ElementsToIgnore = set(('author', 'commit', 'date', 'lists', 'lock', 'token', 'owner', 'comment', 'created', 'expires'))
+    _ElementsWithText = set(('name', 'size'))
+
+    def __init__(self):
+        self.listQualifier = None
+        # List of tuples ``(kind, name, size)``.
+        self.entries = []
+        self._currentKind = None
+        self._currentName = None
+        self._currentSize = None
+        self._currentText = None
+
+    def startElement(self, name, attributes):
+        if name == "list":
+            self.listQualifier = attributes.get("path")
+        elif name == "entry":
+            self._currentKind = attributes.get("kind")
+            self._currentName = None
+            self._currentSize = None
+        elif name in _SvnListContentHandler._ElementsWithText:
+            self._currentText = u''
+        elif name not in _SvnListContentHandler._ElementsToIgnore:
+            _log.warning(u"ignored <%s>", name)
+
+    def characters(self, content):
+        if self._currentText is not None:
+            self._currentText += content
+
+    def endElement(self, name):
+        if name == "name":
+            self._currentName = self._currentText
+        elif name == "size":
+            self._currentSize = long(self._currentText)
+        elif name == "entry":
+            if self._currentName is None:
+                raise ScmError(u"<entry> must contain <name>")
+            self.entries.append((self._currentKind, self._currentName, self._currentSize))
+        if name in _SvnListContentHandler._ElementsWithText:
+            self._currentText = None
+
+
+class _SvnPropertiesContentHandler(ContentHandler):
+    """
+    Handler for the output of ``svn propget --xml`` collecting the value of a single property.
+    """
+    def __init__(self):
+        self.targetToValueMap = {}
+        self._currentTarget = None
+        self._currentText = None
+
+    def startElement(self, name, attributes):
+        if name == "target":
+            self._currentTarget = attributes.get("path")
+        elif name == "property":
+            self._currentText = u''
+        elif name != "properties":
+            _log.warning(u"ignored <%s>", name)
+
+    def characters(self, content):
+        if self._currentText is not None:
+            self._currentText += content
+
+    def endElement(self, name):
+        if name == "property":
+            self.targetToValueMap[self._currentTarget] = self._currentText
+            self._currentText = None
+
+
+class _SvnInfoContentHandler(ContentHandler):
+    """
+    Handler for the output of ``svn info --xml`` collecting information about the first entry.
+    """
+    _ElementsWithText = set(('depth', 'root', 'url', 'uuid'))
+
+    def __init__(self):
+        self.url = None
+        self.repositoryRoot = None
+        self.repositoryUuid = None
+        self.depth = None
+        self._entryCount = 0
+        self._currentText = None
+
+    def startElement(self, name, attributes):
+        if name == "entry":
+            self._entryCount += 1
+        elif (name in _SvnInfoContentHandler._ElementsWithText) and (self._entryCount == 1):
+            self._currentText = u''
+
+    def characters(self, content):
+        if self._currentText is not None:
+            self._currentText += content
+
+    def endElement(self, name):
+        if self._currentText is not None:
+            if name == "depth":
+                self.depth = self._currentText
+            elif name == "root":
+                self.repositoryRoot = self._currentText
+            elif name == "url":
+                self.url = self._currentText
+            elif name == "uuid":
+                self.repositoryUuid = self._currentText
+            self._currentText = None
+
+
+def _parseSvnXml(svnCommand, contentHandler, cwd=None):
+    """
+    Run ``svnCommand``, which must produce XML output, and parse the result using ``contentHandler``.
+    """
+    assert svnCommand
+    assert contentHandler is not None
+    svnXml = u''
+    for svnLine in run(svnCommand, returnStdout=True, cwd=cwd):
+        svnXml += svnLine + os.linesep
+    svnXml = svnXml.encode('utf-8')
+    xml.sax.parseString(svnXml, contentHandler)
+
+
 class ScmStorage(object):
     """
     Abstract storage (repository) for a software configuration management system (SCMS).
@@ -1235,6 +1944,9 @@ class TextOptions(object):
 
     _ValidNewLines = set((Dos, Native, Unix))
 
+    # Number of bytes to read and convert at once.
+    _ChunkSize = 1024 * 1024
+
     def __init__(self, antPatternText=None, newLine=Native, tabSize=PreserveTabs, stripTrailing=False):
         assert newLine in TextOptions._ValidNewLines
         assert tabSize is not None
@@ -1243,6 +1955,10 @@ class TextOptions(object):
         self._trailingCharactersToStrip = '\n\r'
         if stripTrailing:
                 self._trailingCharactersToStrip += "\t "
+        # Line ends preceded by characters to strip. Because regular expressions starting with
+        # a literal can be searched much faster, the pattern matches the reversed text.
+        self._lineEndsToStrip = [character + '\n' for character in self._trailingCharactersToStrip if character != '\n']
+        self._reversedTrailingCharactersRegex = re.compile('\n[%s]+' % re.escape(self._trailingCharactersToStrip.replace('\n', '')))
         self.newLine = newLine
         assert self.newLine
         self.tabSize = tabSize
@@ -1279,87 +1995,867 @@ class TextOptions(object):
         result += self.newLine
         return result
 
+    def _convertedLines(self, lines):
+        """
+        Same as joining the `convertedLine()` of each line in ``lines``, which must end with a
+        linefeed, but converting all lines at once.
+        """
+        assert lines.endswith('\n')
+        result = lines
+        if self.tabSize and ('\t' in result):
+            # `str.expandtabs()` starts a new column after each linefeed and carriage return
+            # just like it would for each line on its own. Expanding tabs before stripping
+            # trailing white space yields the same result because trailing tabs become
+            # spaces, which are stripped the same.
+            result = result.expandtabs(self.tabSize)
+        # Remove carriage returns in bulk first so the regular expression below only has to
+        # replace anything in lines that actually end in white space.
+        result = result.replace('\r\n', '\n')
+        if any(lineEnd in result for lineEnd in self._lineEndsToStrip):
+            result = self._reversedTrailingCharactersRegex.sub('\n', result[::-1])[::-1]
+        if self.newLine != '\n':
+            result = result.replace('\n', self.newLine)
+        return result
+
+    def convertedChunks(self, sourceFile, chunkSize=None):
+        """
+        Iterator over tuples ``(chunk, convertedChunk)`` for the content of the file-like
+        ``sourceFile`` split into chunks, where ``convertedChunk`` is ``chunk`` with the
+        conversion of `convertedLine()` applied to each of its lines. Joining all
+        ``convertedChunk`` yields the converted file. If a file already conforms to this
+        `TextOptions`, ``chunk`` and ``convertedChunk`` are always the same.
+
+        The data are read in blocks of ``chunkSize`` bytes, or a reasonable default if
+        ``chunkSize`` is ``None``.
+        """
+        assert sourceFile is not None
+        assert (chunkSize is None) or (chunkSize > 0)
+        if chunkSize is None:
+            chunkSize = TextOptions._ChunkSize
+        incompleteLine = ''
+        while True:
+            data = sourceFile.read(chunkSize)
+            if not data:
+                break
+            lastLineEndIndex = data.rfind('\n')
+            if lastLineEndIndex >= 0:
+                chunk = incompleteLine + data[:lastLineEndIndex + 1]
+                incompleteLine = data[lastLineEndIndex + 1:]
+                yield chunk, self._convertedLines(chunk)
+            else:
+                incompleteLine += data
+        if incompleteLine:
+            # Like `convertedLine()`, add a newline to the last line.
+            yield incompleteLine, self._convertedLines(incompleteLine + '\n')
+
     def __unicode__(self):
         return u"<TextOptions: newLine=%r, charactersToStrip=%r, tabSize=%d, texts=%s>" % (self.newLine, self._trailingCharactersToStrip, self.tabSize, self.textPatternSet)
 
     def __str__(self):
         return unicode(self).encode('utf-8')
 
-    def __repr__(self):
-        return self.__str__()
-
 
-class ScmPuncher(object):
-    """
-    Puncher to update a work copy according from a folder performing the following changes on the
-    work copy:
+def _rateLimiterOrNone(rate):
+    if rate is not None:
+        result = _tools.RateLimiter(rate)
+    else:
+        result = None
+    return result
 
-    * Add files that do not exist in the work copy but the folder.
-    * Remove files that exist in the work copy but not the folder.
-    * Copy other files that exist in both from the folder to the work copy.
 
-    This class is not thread safe and can only perform one `punch()` at a time.
+class TransferOptions(object):
     """
-    # TODO: Move to class ``MoveModes``.
-    MoveName = "name"
-    MoveNone = "none"
-    _ValidMoveModes = set((MoveName, MoveNone))
+    Options describing how to read and write the content of files transferred to the work
+    copy.
+
+    ``bufferSize`` is the number of bytes to read and write at once when the data have to pass
+    through scunch, for example to convert text files or compare files.
+
+    If ``dropCache`` is set, each file is removed from the page cache once it has been
+    processed. Punching huge folders then does not push the data of other processes out of
+    the cache, at the expense of syncing each file written to the disk.
+
+    ``maxReadRate`` and ``maxWriteRate`` limit the number of bytes per second read from and
+    written to files, and ``maxStatRate`` limits the number of files and folders per second
+    examined when scanning the folder to punch. ``None`` means no limit. Each limit is a
+    `_tools.RateLimiter` shared by all threads using the same `TransferOptions`, which also
+    keeps track of how much was transferred and how long it had to wait.
+
+    If ``deltaThreshold`` is not ``None``, binary files of at least this many bytes that
+    already exist in the work copy are updated in place using `_filecopy.updateFile()`, which
+    only rewrites the blocks that differ.
+
+    All other files are transferred to a temporary file first and then renamed, so a crash
+    never leaves a partially written file in the work copy. ``fsyncMode`` describes when to
+    write the transferred files to the disk so they also survive a power failure:
+
+    * `FsyncNone`: leave it to the operating system.
+    * `FsyncFile`: sync each file before renaming it and the folder containing it afterwards.
+    * `FsyncBatch`: sync files and their folders once ``fsyncBatchFileCount`` files have
+      been transferred, and at the end.
+    """
+    DefaultBufferSize = _filecopy.DefaultBufferSize
+    DefaultFsyncBatchFileCount = 100
+
+    # Possible values for ``fsyncMode``.
+    FsyncBatch = 'batch'
+    FsyncFile = 'file'
+    FsyncNone = 'none'
+
+    _ValidFsyncModes = set((FsyncBatch, FsyncFile, FsyncNone))
+
+    def __init__(self, bufferSize=DefaultBufferSize, dropCache=False, maxReadRate=None, maxWriteRate=None, maxStatRate=None, fsyncMode=FsyncNone, fsyncBatchFileCount=DefaultFsyncBatchFileCount, deltaThreshold=None):
+        assert bufferSize > 0
+        assert (maxReadRate is None) or (maxReadRate > 0)
+        assert (maxWriteRate is None) or (maxWriteRate > 0)
+        assert (maxStatRate is None) or (maxStatRate > 0)
+        assert fsyncMode in TransferOptions._ValidFsyncModes
+        assert fsyncBatchFileCount >= 1
+        assert (deltaThreshold is None) or (deltaThreshold >= 0)
+        self.bufferSize = int(bufferSize)
+        self.dropCache = dropCache
+        self.readRateLimiter = _rateLimiterOrNone(maxReadRate)
+        self.writeRateLimiter = _rateLimiterOrNone(maxWriteRate)
+        self.statRateLimiter = _rateLimiterOrNone(maxStatRate)
+        self.fsyncMode = fsyncMode
+        self.fsyncBatchFileCount = fsyncBatchFileCount
+        self.deltaThreshold = deltaThreshold
+
+    def _getIsDataThrottled(self):
+        return (self.readRateLimiter is not None) or (self.writeRateLimiter is not None)
+
+    isDataThrottled = property(_getIsDataThrottled,
+        doc='``True`` if reading or writing data is limited.'
+    )
 
-    def __init__(self, scmWork):
-        assert scmWork is not None
-        self.scmWork = scmWork
-        self._clear()
+    def throttleRead(self, byteCount):
+        """
+        Wait until ``byteCount`` more bytes can be read without exceeding the read rate.
+        """
+        if self.readRateLimiter is not None:
+            self.readRateLimiter.consume(byteCount)
 
-    def _clear(self):
-        self.externalEntries = None
-        self.workEntries = None
-        self._externalFolderPath = None
-        self._entriesToAdd = None
-        self._entriesToCopy = None
-        self._entriesToTransfer = None
-        self._entriesToMove = None
-        self._entriesToRemove = None
-        self._filesToPunchPatternSet = None
-        self._workFilesToPreservePatternSet = None
-        self._textOptions = None
-        self._moveMode = ScmPuncher.MoveName
-        self._nameTransformation = IdentityNameTransformation
-        self._lastRemovedFolderEntry = None
+    def throttleWrite(self, byteCount):
+        """
+        Wait until ``byteCount`` more bytes can be written without exceeding the write rate.
+        """
+        if self.writeRateLimiter is not None:
+            self.writeRateLimiter.consume(byteCount)
 
-    def _getMoveMode(self):
-        return self._moveMode
+    def throttleCopy(self, byteCount):
+        """
+        Wait until ``byteCount`` more bytes can be both read and written.
+        """
+        self.throttleRead(byteCount)
+        self.throttleWrite(byteCount)
 
-    def _setMoveMode(self, newValue):
-        assert newValue in ScmPuncher._ValidMoveModes
-        self._moveMode = newValue
+    def isDeltaFile(self, filePath):
+        """
+        ``True`` if the existing file at ``filePath`` should be updated in place.
+        """
+        return (self.deltaThreshold is not None) and (os.path.getsize(filePath) >= self.deltaThreshold)
 
-    moveMode = property(_getMoveMode, _setMoveMode,
-        'Mode describing when files and folders should be moved instead of removed and added.'
-    )
+    def throttleStat(self):
+        """
+        Wait until one more file or folder can be examined without exceeding the stat rate.
+        """
+        if self.statRateLimiter is not None:
+            self.statRateLimiter.consume(1)
 
-    def _getTextOptions(self):
-        return self._textOptions
+    def __unicode__(self):
+        return u"<TransferOptions: bufferSize=%d, dropCache=%s, fsyncMode=%s>" % (self.bufferSize, self.dropCache, self.fsyncMode)
 
-    def _setTextOptions(self, newTextOptions):
-        self._textOptions = newTextOptions
+    def __str__(self):
+        return unicode(self).encode('utf-8')
 
-    textOptions = property(_getTextOptions, _setTextOptions,
-        '`TextOptions` describing how to process text files.'
-    )
+    def __repr__(self):
+        return self.__str__()
 
-    def _getNameTransformation(self):
-        return self._nameTransformation
 
-    def _setNameTransformation(self, newValue):
-        self._nameTransformation = newValue
+class ScmChanges(object):
+    """
+    Changes `ScmPuncher.punch()` applied to a work copy. All paths are relative to the work
+    copy.
+    """
+    def __init__(self):
+        self.addedPaths = []
+        self.modifiedPaths = []
+        # List of tuples ``(sourcePath, targetPath)``.
+        self.movedPaths = []
+        self.removedPaths = []
+        # ``True`` if the changes already have been committed, for example using ``svn import``.
+        self.isCommitted = False
+
+    def _removedFolderPaths(self):
+        """
+        Sorted list of removed folders that are not located in another removed folder.
+        """
+        result = []
+        for removedPath in sorted(self.removedPaths):
+            if antglob.isFolderPath(removedPath) and not (result and removedPath.startswith(result[-1])):
+                result.append(removedPath)
+        return result
 
-    nameTransformation = property(_getNameTransformation, _setNameTransformation,
-        'Transformation to change names of files and folders when transferring them from the external folder to the work copy.'
-    )
+    def _isInRemovedFolder(self, relativePath, removedFolderPaths):
+        return any(relativePath.startswith(removedFolderPath) for removedFolderPath in removedFolderPaths)
 
-    def _setLastRemovedFolder(self, lastRemovedEntry):
-        assert lastRemovedEntry is not None
-        if lastRemovedEntry.kind == antglob.FileSystemEntry.Folder:
+    def _recursivePathsToCommitTogether(self):
+        """
+        Lists of paths that have to be committed together recursively: each removed folder
+        along with both paths of files moved out of it.
+        """
+        removedFolderPaths = self._removedFolderPaths()
+        result = [[removedFolderPath] for removedFolderPath in removedFolderPaths]
+        for sourcePath, targetPath in self.movedPaths:
+            for paths in result:
+                if sourcePath.startswith(paths[0]):
+                    paths.extend([sourcePath, targetPath])
+                    break
+        return result
+
+    def relativePathsToCommit(self):
+        """
+        Sorted list of all paths that have to be committed in order to store the changes. This
+        includes both the source and target of moved files. Removed folders and the files moved
+        out of them are not included because Subversion can only remove a folder containing
+        files in a recursive commit, see `relativePathsToCommitRecursively()`.
+        """
+        removedFolderPaths = self._removedFolderPaths()
+        result = set(self.addedPaths)
+        result.update(self.modifiedPaths)
+        for sourcePath, targetPath in self.movedPaths:
+            if not self._isInRemovedFolder(sourcePath, removedFolderPaths):
+                result.update([sourcePath, targetPath])
+        result.update([removedPath for removedPath in self.removedPaths if not self._isInRemovedFolder(removedPath, removedFolderPaths)])
+        result = sorted(result)
+        return result
+
+    def relativePathsToCommitRecursively(self):
+        """
+        Sorted list of the removed folders and the files moved out of them, which have to be
+        committed recursively together with `relativePathsToCommit()`.
+        """
+        return sorted(itertools.chain(*self._recursivePathsToCommitTogether()))
+
+    def commitChunks(self, workFolderPath, maxPathCount=None, maxByteCount=None):
+        """
+        List of chunks, each of them being a list of relative paths, that can be committed one
+        after another in order to store the changes. Each chunk contains at most
+        ``maxPathCount`` paths and the files in it have a total size of at most ``maxByteCount``
+        as found in ``workFolderPath``, unless a single file or move already exceeds these
+        limits. A value of ``None`` means no limit.
+
+        Folders are committed before or together with their contents, the source and target
+        of a move are always committed together, and removed files are committed last. Removed
+        folders are not included, see `recursiveCommitChunks()`.
+        """
+        assert workFolderPath is not None
+        assert (maxPathCount is None) or (maxPathCount > 0)
+        assert (maxByteCount is None) or (maxByteCount > 0)
+
+        def byteCountOf(relativePath):
+            path = os.path.join(workFolderPath, relativePath)
+            if os.path.isfile(path):
+                result = os.path.getsize(path)
+            else:
+                result = 0
+            return result
+
+        # Collect lists of paths that have to be committed together. Sorting them by the largest
+        # path ensures that folders are committed before their contents.
+        removedFolderPaths = self._removedFolderPaths()
+        pathsToCommitTogether = [[path] for path in self.addedPaths]
+        pathsToCommitTogether.extend([[path] for path in self.modifiedPaths])
+        pathsToCommitTogether.extend([[sourcePath, targetPath] for sourcePath, targetPath in self.movedPaths if not self._isInRemovedFolder(sourcePath, removedFolderPaths)])
+        pathsToCommitTogether.sort(key=max)
+        for removedPath in sorted(self.removedPaths):
+            if not self._isInRemovedFolder(removedPath, removedFolderPaths):
+                pathsToCommitTogether.append([removedPath])
+        return self._chunks(pathsToCommitTogether, byteCountOf, maxPathCount, maxByteCount)
+
+    def recursiveCommitChunks(self, maxPathCount=None):
+        """
+        List of chunks as described by `commitChunks()` for the paths in
+        `relativePathsToCommitRecursively()`, which have to be committed recursively after all
+        the other chunks. Removals need no file content, so the size of a chunk is not limited.
+        """
+        assert (maxPathCount is None) or (maxPathCount > 0)
+        return self._chunks(self._recursivePathsToCommitTogether(), lambda _: 0, maxPathCount, None)
+
+    def _chunks(self, pathsToCommitTogether, byteCountOf, maxPathCount, maxByteCount):
+        result = []
+        chunk = []
+        chunkByteCount = 0
+        for paths in pathsToCommitTogether:
+            byteCount = sum([byteCountOf(path) for path in paths])
+            hasTooManyPaths = (maxPathCount is not None) and (len(chunk) + len(paths) > maxPathCount)
+            hasTooManyBytes = (maxByteCount is not None) and (chunkByteCount + byteCount > maxByteCount)
+            if chunk and (hasTooManyPaths or hasTooManyBytes):
+                result.append(chunk)
+                chunk = []
+                chunkByteCount = 0
+            chunk.extend(paths)
+            chunkByteCount += byteCount
+        if chunk:
+            result.append(chunk)
+        return result
+
+    def __len__(self):
+        return len(self.addedPaths) + len(self.modifiedPaths) + len(self.movedPaths) + len(self.removedPaths)
+
+    def __unicode__(self):
+        return u"<ScmChanges: added=%d, modified=%d, moved=%d, removed=%d>" % (len(self.addedPaths), len(self.modifiedPaths), len(self.movedPaths), len(self.removedPaths))
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def stateFilePath(workFolderPath, suffix):
+    """
+    Path of a hidden file next to the work copy at ``workFolderPath`` where scunch can
+    remember its state between runs. Different kinds of state use a different ``suffix``.
+    """
+    assert workFolderPath is not None
+    assert suffix
+    absoluteWorkFolderPath = os.path.abspath(workFolderPath).rstrip(os.sep)
+    return os.path.join(os.path.dirname(absoluteWorkFolderPath), u'.%s.scunch_%s' % (os.path.basename(absoluteWorkFolderPath), suffix))
+
+
+_FingerprintModulo = 2 ** 160
+
+
+def findSourceEntries(sourceFolderPath, includePatternText=None, excludePatternText=None, transferOptions=None):
+    """
+    Sorted list of the `antglob.FileSystemEntry`s in the folder ``sourceFolderPath`` matching
+    ``includePatternText`` and ``excludePatternText``, examined at the rate limited by
+    ``transferOptions``. The result can be passed to both `treeFingerprint()` and `scunch()`
+    so the folder has to be scanned only once.
+    """
+    assert sourceFolderPath is not None
+    patternSet = antglob.AntPatternSet()
+    if includePatternText:
+        patternSet.include(includePatternText)
+    if excludePatternText:
+        patternSet.exclude(excludePatternText)
+    fileSystem = None
+    if (transferOptions is not None) and (transferOptions.statRateLimiter is not None):
+        fileSystem = _ThrottledFileSystem(antglob.LocalFileSystem(), transferOptions)
+    return _sortedFileSystemEntries(patternSet.findEntries(sourceFolderPath, fileSystem))
+
+
+def treeFingerprint(folderPath, includePatternText=None, excludePatternText=None, settingsText=u'', entries=None):
+    """
+    Hex digest identifying the names, sizes and modification times of the files and folders
+    in ``folderPath`` matching ``includePatternText`` and ``excludePatternText``. Additionally
+    the digest depends on ``settingsText``, which should describe all other options that
+    affect the result of a punch. If the entries have already been found using the same
+    patterns, for example by `findSourceEntries()`, pass them in ``entries`` instead of
+    scanning ``folderPath`` again.
+
+    The digest is the sum of the SHA1 hashes of all entries modulo 2^160, which does not
+    depend on the order of the entries.
+
+    If ``folderPath`` is an archive, the digest depends on the size and modification time of
+    the archive itself because reading the index of a compressed archive takes about as long
+    as reading all of it.
+    """
+    assert folderPath is not None
+    assert settingsText is not None
+    fingerprint = long(hashlib.sha1(settingsText.encode('utf-8')).hexdigest(), 16)
+    if os.path.isfile(folderPath):
+        archiveInfo = os.stat(folderPath)
+        entryTexts = [u'%s\0%s\0%d\0%r' % (includePatternText or u'', excludePatternText or u'', archiveInfo.st_size, archiveInfo.st_mtime)]
+    else:
+        if entries is None:
+            entries = findSourceEntries(folderPath, includePatternText, excludePatternText)
+        entryTexts = _entryFingerprintTexts(entries)
+    for entryText in entryTexts:
+        entryFingerprint = long(hashlib.sha1(entryText.encode('utf-8')).hexdigest(), 16)
+        fingerprint = (fingerprint + entryFingerprint) % _FingerprintModulo
+    return u'%040x' % fingerprint
+
+
+def _entryFingerprintTexts(entries):
+    for entry in entries:
+        if entry.kind == antglob.FileSystemEntry.File:
+            yield u'%s\0%d\0%r' % (entry.relativePath, entry.size, entry.timeModified)
+        else:
+            # Ignore the modification time of folders because it changes when excluded entries
+            # are added or removed.
+            yield entry.relativePath
+
+
+class SourceFingerprint(object):
+    """
+    `treeFingerprint()` of the folder punched into the work copy during the last successful
+    run, stored in a file next to the work copy.
+    """
+    def __init__(self, workFolderPath):
+        assert workFolderPath is not None
+        self.fingerprintPath = stateFilePath(workFolderPath, 'fingerprint')
+
+    def matches(self, fingerprint):
+        """
+        ``True`` if ``fingerprint`` is the same as the one stored after the last successful run.
+        """
+        assert fingerprint
+        result = False
+        if os.path.exists(self.fingerprintPath):
+            with open(self.fingerprintPath, 'rb') as fingerprintFile:
+                result = (fingerprintFile.read().strip() == fingerprint)
+        return result
+
+    def store(self, fingerprint):
+        assert fingerprint
+        with open(self.fingerprintPath, 'wb') as fingerprintFile:
+            fingerprintFile.write(fingerprint + '\n')
+
+    def discard(self):
+        if os.path.exists(self.fingerprintPath):
+            os.remove(self.fingerprintPath)
+
+
+class ChunkedCommit(object):
+    """
+    Commit of `ScmChanges` to an `ScmWork` using multiple revisions with a limited number of
+    paths or bytes each. The chunks still to commit are stored in a progress file next to the
+    work copy, so if a commit fails, `resume()` can continue with the next chunk later.
+    """
+    def __init__(self, scmWork):
+        assert scmWork is not None
+        self.scmWork = scmWork
+        self.progressPath = stateFilePath(self.scmWork.localTargetPath, 'commit')
+
+    def hasPendingChunks(self):
+        """
+        ``True`` if a previous commit did not finish and still has chunks to commit.
+        """
+        return os.path.exists(self.progressPath)
+
+    def commit(self, changes, message, maxPathCount=None, maxByteCount=None):
+        """
+        Commit ``changes`` in chunks as described by `ScmChanges.commitChunks()` using
+        ``message`` followed by the chunk number as commit message.
+        """
+        assert changes is not None
+        assert message is not None
+        chunks = changes.commitChunks(self.scmWork.localTargetPath, maxPathCount, maxByteCount)
+        recursiveChunks = changes.recursiveCommitChunks(maxPathCount)
+        chunkCount = len(chunks) + len(recursiveChunks)
+        if chunkCount:
+            _log.info(u'commit changes in %s', _tools.oneOrOtherText(chunkCount, 'chunk', 'chunks'))
+            self._writeProgress(message, chunkCount, chunks, recursiveChunks)
+            self.resume()
+
+    def resume(self):
+        """
+        Commit the chunks left by a previous `commit()`.
+        """
+        with open(self.progressPath, 'rb') as progressFile:
+            progress = json.load(progressFile)
+        message = progress['message']
+        chunkCount = progress['chunkCount']
+        chunks = progress['chunks']
+        recursiveChunks = progress.get('recursiveChunks', [])
+        while chunks or recursiveChunks:
+            chunkNumber = chunkCount - len(chunks) - len(recursiveChunks) + 1
+            _log.info(u'commit chunk %d of %d', chunkNumber, chunkCount)
+            chunkMessage = u'%s (%d/%d)' % (message, chunkNumber, chunkCount)
+            if chunks:
+                self.scmWork.commit(chunks[0], chunkMessage, recursive=False)
+                chunks = chunks[1:]
+            else:
+                self.scmWork.commit(recursiveChunks[0], chunkMessage, recursive=True)
+                recursiveChunks = recursiveChunks[1:]
+            if chunks or recursiveChunks:
+                self._writeProgress(message, chunkCount, chunks, recursiveChunks)
+        self.discard()
+
+    def discard(self):
+        """
+        Forget about any chunks left by a previous `commit()`.
+        """
+        if os.path.exists(self.progressPath):
+            os.remove(self.progressPath)
+
+    def _writeProgress(self, message, chunkCount, chunks, recursiveChunks):
+        progress = {
+            'message': message,
+            'chunkCount': chunkCount,
+            'chunks': chunks,
+            'recursiveChunks': recursiveChunks,
+        }
+        with open(self.progressPath, 'wb') as progressFile:
+            json.dump(progress, progressFile)
+
+
+class PunchJournal(object):
+    """
+    Write ahead journal for the steps `ScmPuncher` performs to punch changes into a work copy.
+    The journal is a text file where each line holds a JSON object. The first line describes
+    the external folder and the number of steps, followed by one line for each step as computed
+    by `ScmPuncher._plannedSteps()`. Once a step has been performed, a line with its number is
+    appended. That way an interrupted punch can continue with the first step not performed
+    yet using `ScmPuncher.resume()`.
+
+    A journal without any performed steps also serves as plan written by `ScmPuncher.plan()`
+    and performed later by `ScmPuncher.applyPlan()`.
+    """
+    def __init__(self, journalPath):
+        assert journalPath is not None
+        self.journalPath = journalPath
+        self._journalFile = None
+
+    def exists(self):
+        return os.path.exists(self.journalPath)
+
+    def start(self, externalFolderPath, steps):
+        """
+        Start a new journal for ``steps`` to punch ``externalFolderPath``, replacing any
+        existing journal.
+        """
+        assert externalFolderPath is not None
+        assert steps is not None
+        self.close()
+        self._journalFile = open(self.journalPath, 'wb')
+        byteCount = sum(step.get('byteCount', 0) for step in steps)
+        self._writeLine({'externalFolderPath': externalFolderPath, 'stepCount': len(steps), 'byteCount': byteCount})
+        for step in steps:
+            self._writeLine(step)
+        self._journalFile.flush()
+        os.fsync(self._journalFile.fileno())
+
+    def addDoneStep(self, stepNumber, hasChanged):
+        """
+        Remember that step ``stepNumber`` has been performed.
+        """
+        assert self._journalFile is not None
+        self._writeLine({'done': stepNumber, 'changed': hasChanged})
+        self._journalFile.flush()
+
+    def read(self):
+        """
+        Tuple ``(externalFolderPath, steps, stepNumberToChangedMap)`` with the contents of the
+        journal, where ``stepNumberToChangedMap`` maps the number of each performed step to
+        whether it changed the work copy. Afterwards, further steps performed can be added to
+        the journal using `addDoneStep()`.
+        """
+        self.close()
+        with open(self.journalPath, 'rb') as journalFile:
+            lines = journalFile.readlines()
+        try:
+            header = json.loads(lines[0])
+            externalFolderPath = header['externalFolderPath']
+            stepCount = header['stepCount']
+            steps = [json.loads(line) for line in lines[1:stepCount + 1]]
+            if len(steps) != stepCount:
+                raise ValueError(u'journal must contain %d steps but contains only %d' % (stepCount, len(steps)))
+            stepNumberToChangedMap = {}
+            for line in lines[stepCount + 1:]:
+                try:
+                    doneStep = json.loads(line)
+                except ValueError:
+                    # Ignore a partially written last line.
+                    break
+                stepNumberToChangedMap[doneStep['done']] = doneStep['changed']
+        except (IndexError, KeyError, ValueError), error:
+            raise ScmError(u'journal "%s" must be intact to resume: %s' % (self.journalPath, error))
+        self._journalFile = open(self.journalPath, 'ab')
+        return (externalFolderPath, steps, stepNumberToChangedMap)
+
+    def close(self):
+        if self._journalFile is not None:
+            self._journalFile.close()
+            self._journalFile = None
+
+    def remove(self):
+        """
+        Remove the journal once all steps have been performed.
+        """
+        self.close()
+        if os.path.exists(self.journalPath):
+            os.remove(self.journalPath)
+
+    def _writeLine(self, data):
+        self._journalFile.write(json.dumps(data, separators=(',', ':')))
+        self._journalFile.write('\n')
+
+
+def _syncFilesAndFolders(filePaths):
+    """
+    Sync the files at ``filePaths`` and then the folders containing them, each folder only
+    once.
+    """
+    assert filePaths is not None
+    for filePath in filePaths:
+        _filecopy.syncFile(filePath)
+    for folderPath in sorted(set(os.path.dirname(filePath) for filePath in filePaths)):
+        _filecopy.syncFolder(folderPath)
+
+
+class _FileSyncer(object):
+    """
+    Collector for transferred files that syncs them and the folders containing them once
+    ``batchFileCount`` files have been added or when calling `flush()`. Several threads can
+    add files at the same time.
+    """
+    def __init__(self, batchFileCount):
+        assert batchFileCount >= 1
+        self._batchFileCount = batchFileCount
+        self._filePathsToSync = []
+        self._lock = threading.Lock()
+
+    def add(self, filePath):
+        assert filePath is not None
+        with self._lock:
+            self._filePathsToSync.append(filePath)
+            if len(self._filePathsToSync) >= self._batchFileCount:
+                filePathsToSync = self._filePathsToSync
+                self._filePathsToSync = []
+            else:
+                filePathsToSync = []
+        if filePathsToSync:
+            _log.debug(u'  sync %s', _tools.oneOrOtherText(len(filePathsToSync), u'file', u'files'))
+            _syncFilesAndFolders(filePathsToSync)
+
+    def flush(self):
+        """
+        Sync all files added so far.
+        """
+        with self._lock:
+            filePathsToSync = self._filePathsToSync
+            self._filePathsToSync = []
+        _syncFilesAndFolders(filePathsToSync)
+
+
+class _ThrottledFileSystem(object):
+    """
+    File system as needed by `antglob.AntPatternSet.ifind()` that delegates to
+    ``fileSystem`` but waits for `TransferOptions.throttleStat()` before each access.
+    """
+    def __init__(self, fileSystem, transferOptions):
+        assert fileSystem is not None
+        assert transferOptions is not None
+        self._fileSystem = fileSystem
+        self._transferOptions = transferOptions
+
+    def listdir(self, folderPath):
+        self._transferOptions.throttleStat()
+        return self._fileSystem.listdir(folderPath)
+
+    def isdir(self, path):
+        self._transferOptions.throttleStat()
+        return self._fileSystem.isdir(path)
+
+    def stat(self, path):
+        self._transferOptions.throttleStat()
+        return self._fileSystem.stat(path)
+
+
+class _ArchiveMemberFileSystem(object):
+    """
+    File system providing ``stat()`` for a single file read from an archive, which is enough
+    to create a `antglob.FileSystemEntry` for it while the index of the archive is still
+    being read.
+    """
+    def __init__(self, entryInfo):
+        assert entryInfo is not None
+        self._entryInfo = entryInfo
+
+    def stat(self, path):
+        return self._entryInfo
+
+
+def _contentDigest(filePath, isText, textOptions, transferOptions):
+    """
+    SHA1 hash of the content of the file at ``filePath`` as hexadecimal text after applying
+    ``textOptions`` in case ``isText`` is ``True``, which is the digest the file has once
+    transferred to the work copy.
+    """
+    assert filePath is not None
+    assert not isText or textOptions
+    assert transferOptions is not None
+    if isText:
+        digest = hashlib.sha1()
+        with open(filePath, "rb") as fileToHash:
+            _filecopy.adviseSequential(fileToHash.fileno())
+            for chunk, convertedChunk in textOptions.convertedChunks(fileToHash, transferOptions.bufferSize):
+                transferOptions.throttleRead(len(chunk))
+                digest.update(convertedChunk)
+            if transferOptions.dropCache:
+                _filecopy.dropFromCache(fileToHash.fileno())
+        result = digest.hexdigest()
+    else:
+        result = _tools.sha1HexDigest(filePath, transferOptions.bufferSize, transferOptions.dropCache, transferOptions.throttleRead)
+    return result
+
+
+def _historyFileInfo(filePath, isText, textOptions, transferOptions, previousFileInfo=None):
+    """
+    Tuple ``(size, timeModified, isText, digest)`` describing the file at ``filePath`` with
+    ``digest`` as computed by `_contentDigest()`. If ``previousFileInfo`` has the same size,
+    modification time and ``isText``, its digest is reused without reading the file.
+    """
+    assert filePath is not None
+    fileStat = os.stat(filePath)
+    if (previousFileInfo is not None) and (previousFileInfo[:3] == (fileStat.st_size, fileStat.st_mtime, isText)):
+        result = previousFileInfo
+    else:
+        result = (fileStat.st_size, fileStat.st_mtime, isText, _contentDigest(filePath, isText, textOptions, transferOptions))
+    return result
+
+
+class ScmPuncher(object):
+    """
+    Puncher to update a work copy according from a folder performing the following changes on the
+    work copy:
+
+    * Add files that do not exist in the work copy but the folder.
+    * Remove files that exist in the work copy but not the folder.
+    * Copy other files that exist in both from the folder to the work copy.
+
+    This class is not thread safe and can only perform one `punch()` at a time.
+    """
+    # TODO: Move to class ``MoveModes``.
+    MoveName = "name"
+    MoveNone = "none"
+    _ValidMoveModes = set((MoveName, MoveNone))
+
+    def __init__(self, scmWork):
+        assert scmWork is not None
+        self.scmWork = scmWork
+        self._clear()
+
+    def _clear(self):
+        self.externalEntries = None
+        self.workEntries = None
+        self._externalFolderPath = None
+        self._entriesToAdd = None
+        self._entriesToCopy = None
+        self._entriesToTransfer = None
+        self._entriesToMove = None
+        self._entriesToRemove = None
+        self._filesToPunchPatternSet = None
+        self._workFilesToPreservePatternSet = None
+        self._textOptions = None
+        self._moveMode = ScmPuncher.MoveName
+        self._nameTransformation = IdentityNameTransformation
+        self._lastRemovedFolderEntry = None
+        self._importMessage = None
+        self._journalPath = None
+        self._snapshotPath = None
+        self._foundExternalEntries = None
+        self._transferWorkerCount = 1
+        self._transferOptions = TransferOptions()
+        self._fileSyncer = None
+        self._pathToPreparedTransferMap = None
+        self._isPlanning = False
+        self._externalPathToArchiveDigestMap = None
+        self._deltaLock = threading.Lock()
+        self._deltaFileCount = 0
+        self._deltaByteCount = 0
+        self._deltaWrittenByteCount = 0
+
+    def _getMoveMode(self):
+        return self._moveMode
+
+    def _setMoveMode(self, newValue):
+        assert newValue in ScmPuncher._ValidMoveModes
+        self._moveMode = newValue
+
+    moveMode = property(_getMoveMode, _setMoveMode,
+        'Mode describing when files and folders should be moved instead of removed and added.'
+    )
+
+    def _getTextOptions(self):
+        return self._textOptions
+
+    def _setTextOptions(self, newTextOptions):
+        self._textOptions = newTextOptions
+
+    textOptions = property(_getTextOptions, _setTextOptions,
+        '`TextOptions` describing how to process text files.'
+    )
+
+    def _getNameTransformation(self):
+        return self._nameTransformation
+
+    def _setNameTransformation(self, newValue):
+        self._nameTransformation = newValue
+
+    nameTransformation = property(_getNameTransformation, _setNameTransformation,
+        'Transformation to change names of files and folders when transferring them from the external folder to the work copy.'
+    )
+
+    def _getImportMessage(self):
+        return self._importMessage
+
+    def _setImportMessage(self, newValue):
+        self._importMessage = newValue
+
+    importMessage = property(_getImportMessage, _setImportMessage,
+        'Commit message to use when punching into an empty work copy using a single ``svn import``, or ``None`` to never import.'
+    )
+
+    def _getJournalPath(self):
+        return self._journalPath
+
+    def _setJournalPath(self, newValue):
+        self._journalPath = newValue
+
+    journalPath = property(_getJournalPath, _setJournalPath,
+        'Path of the `PunchJournal` to log the steps performed, or ``None`` to use no journal.'
+    )
+
+    def _getSnapshotPath(self):
+        return self._snapshotPath
+
+    def _setSnapshotPath(self, newValue):
+        self._snapshotPath = newValue
+
+    snapshotPath = property(_getSnapshotPath, _setSnapshotPath,
+        'Path of the `antglob.SnapshotFileSystem` to scan the external folder with, or ``None`` to list all folders.'
+    )
+
+    def _getFoundExternalEntries(self):
+        return self._foundExternalEntries
+
+    def _setFoundExternalEntries(self, newValue):
+        self._foundExternalEntries = newValue
+
+    foundExternalEntries = property(_getFoundExternalEntries, _setFoundExternalEntries,
+        'Entries of the external folder found in advance using the same patterns, for example by `findSourceEntries()`, or ``None`` to scan the folder.'
+    )
+
+    def _getTransferWorkerCount(self):
+        return self._transferWorkerCount
+
+    def _setTransferWorkerCount(self, newValue):
+        assert newValue >= 1
+        self._transferWorkerCount = newValue
+
+    transferWorkerCount = property(_getTransferWorkerCount, _setTransferWorkerCount,
+        'Number of threads transferring files to the work copy at the same time.'
+    )
+
+    def _getTransferOptions(self):
+        return self._transferOptions
+
+    def _setTransferOptions(self, newValue):
+        if newValue is None:
+            newValue = TransferOptions()
+        self._transferOptions = newValue
+
+    transferOptions = property(_getTransferOptions, _setTransferOptions,
+        '`TransferOptions` describing how to read and write files, or ``None`` to use the defaults.'
+    )
+
+    def _setLastRemovedFolder(self, lastRemovedEntry):
+        assert lastRemovedEntry is not None
+        if lastRemovedEntry.kind == antglob.FileSystemEntry.Folder:
             self._lastRemovedFolderEntry = lastRemovedEntry
         else:
             self._lastRemovedFolderEntry = None
@@ -1428,27 +2924,379 @@ class ScmPuncher(object):
     def _copyBinaryFile(self, sourceFilePath, targetFilePath):
         assert sourceFilePath is not None
         assert targetFilePath is not None
-        shutil.copy2(sourceFilePath, targetFilePath)
+        transferOptions = self.transferOptions
+        if transferOptions.isDataThrottled:
+            throttle = transferOptions.throttleCopy
+        else:
+            throttle = None
+        method = _filecopy.copyFile(sourceFilePath, targetFilePath, bufferSize=transferOptions.bufferSize, dropCache=transferOptions.dropCache, throttle=throttle)
+        _log.debug(u'  copied "%s" using %s', targetFilePath, method)
 
     def _copyTextFile(self, sourceFilePath, targetFilePath, textOptions):
+        """
+        Copy ``sourceFilePath`` to ``targetFilePath`` applying ``textOptions``. The converted
+        content is written while reading it, so the source is read only once even if it
+        already conforms to ``textOptions``.
+        """
         assert sourceFilePath is not None
         assert targetFilePath is not None
         assert textOptions is not None
+        transferOptions = self.transferOptions
         with open(sourceFilePath, "rb") as sourceFile:
+            _filecopy.adviseSequential(sourceFile.fileno())
             with open(targetFilePath, "wb") as targetFile:
-                for line in sourceFile:
-                    lineToWrite = textOptions.convertedLine(line)
-                    targetFile.write(lineToWrite)
+                for chunk, convertedChunk in textOptions.convertedChunks(sourceFile, transferOptions.bufferSize):
+                    transferOptions.throttleRead(len(chunk))
+                    transferOptions.throttleWrite(len(convertedChunk))
+                    targetFile.write(convertedChunk)
+                if transferOptions.dropCache:
+                    targetFile.flush()
+                    _filecopy.dropFromCache(targetFile.fileno(), isWritten=True)
+            if transferOptions.dropCache:
+                _filecopy.dropFromCache(sourceFile.fileno())
         shutil.copystat(sourceFilePath, targetFilePath)
 
-    def _transferEntryFromExternalToWork(self, entryToTransfer, textOptions):
-        assert entryToTransfer is not None
-        externalPathOfEntryToTransferFrom = self._externalPathFor(entryToTransfer)
-        workPathOfItemToTransferTo = self._workPathFor(entryToTransfer)
-        if textOptions and textOptions.isText(entryToTransfer):
-            self._copyTextFile(externalPathOfEntryToTransferFrom, workPathOfItemToTransferTo, textOptions)
-        else:
-            self._copyBinaryFile(externalPathOfEntryToTransferFrom, workPathOfItemToTransferTo)
+    def _hasSameTextContent(self, sourceFilePath, targetFilePath, textOptions):
+        """
+        ``True`` if ``targetFilePath`` already contains the content of ``sourceFilePath`` with
+        ``textOptions`` applied.
+        """
+        assert sourceFilePath is not None
+        assert targetFilePath is not None
+        assert textOptions is not None
+        result = True
+        with open(sourceFilePath, "rb") as sourceFile:
+            with open(targetFilePath, "rb") as targetFile:
+                for fileToCompare in (sourceFile, targetFile):
+                    _filecopy.adviseSequential(fileToCompare.fileno())
+                for chunk, convertedChunk in textOptions.convertedChunks(sourceFile, self.transferOptions.bufferSize):
+                    self.transferOptions.throttleRead(len(chunk) + len(convertedChunk))
+                    if targetFile.read(len(convertedChunk)) != convertedChunk:
+                        result = False
+                        break
+                if result and targetFile.read(1):
+                    result = False
+                if self.transferOptions.dropCache:
+                    for fileToCompare in (sourceFile, targetFile):
+                        _filecopy.dropFromCache(fileToCompare.fileno())
+        return result
+
+    def _hasSameBinaryContent(self, someFilePath, otherFilePath):
+        transferOptions = self.transferOptions
+        return _tools.hasSameContent(someFilePath, otherFilePath, transferOptions.bufferSize, transferOptions.dropCache, transferOptions.throttleRead)
+
+    def _sha1HexDigest(self, filePath):
+        transferOptions = self.transferOptions
+        return _tools.sha1HexDigest(filePath, transferOptions.bufferSize, transferOptions.dropCache, transferOptions.throttleRead)
+
+    def _transferFileToWork(self, externalFilePath, workFilePath, isText, textOptions):
+        """
+        Copy the file at ``externalFilePath`` to ``workFilePath`` unless the work copy already
+        holds a file with the same content. The result is ``True`` if the work copy changed.
+        """
+        assert externalFilePath is not None
+        assert workFilePath is not None
+        assert not isText or textOptions
+        isWorkFile = os.path.isfile(workFilePath)
+        if isWorkFile and not isText and self.transferOptions.isDeltaFile(externalFilePath):
+            result = self._updateWorkFile(externalFilePath, workFilePath)
+        else:
+            result = self._replaceOrKeepWorkFile(externalFilePath, workFilePath, isWorkFile, isText, textOptions)
+        return result
+
+    def _replaceOrKeepWorkFile(self, externalFilePath, workFilePath, isWorkFile, isText, textOptions):
+        if isWorkFile:
+            if isText:
+                hasSameContent = self._hasSameTextContent(externalFilePath, workFilePath, textOptions)
+            else:
+                hasSameContent = self._hasSameBinaryContent(externalFilePath, workFilePath)
+        else:
+            hasSameContent = False
+        if hasSameContent:
+            _log.debug(u'  skip unchanged "%s"', workFilePath)
+        else:
+            self._replaceWorkFile(externalFilePath, workFilePath, isText, textOptions)
+        return not hasSameContent
+
+    def _updateWorkFile(self, externalFilePath, workFilePath):
+        """
+        Rewrite only the blocks of ``workFilePath`` that differ from ``externalFilePath`` and
+        sync it as described by `TransferOptions.fsyncMode`. The result is ``True`` if the
+        work copy changed.
+        """
+        assert externalFilePath is not None
+        assert workFilePath is not None
+        transferOptions = self.transferOptions
+        byteCount = os.path.getsize(externalFilePath)
+        hasChangedSize = (os.path.getsize(workFilePath) != byteCount)
+        writtenByteCount = _filecopy.updateFileContent(
+            externalFilePath, workFilePath, transferOptions.bufferSize, transferOptions.dropCache,
+            transferOptions.throttleRead, transferOptions.throttleWrite)
+        result = hasChangedSize or (writtenByteCount > 0)
+        if result:
+            shutil.copystat(externalFilePath, workFilePath)
+            _log.debug(u'  updated %d of %d bytes in "%s"', writtenByteCount, byteCount, workFilePath)
+            if transferOptions.fsyncMode == TransferOptions.FsyncFile:
+                _filecopy.syncFile(workFilePath)
+            elif transferOptions.fsyncMode == TransferOptions.FsyncBatch:
+                self._fileSyncer.add(workFilePath)
+        else:
+            _log.debug(u'  skip unchanged "%s"', workFilePath)
+        with self._deltaLock:
+            self._deltaFileCount += 1
+            self._deltaByteCount += byteCount
+            self._deltaWrittenByteCount += writtenByteCount
+        return result
+
+    def _replaceWorkFile(self, externalFilePath, workFilePath, isText, textOptions):
+        """
+        Copy ``externalFilePath`` to a temporary file in the folder of ``workFilePath`` and
+        rename it to ``workFilePath`` once complete, so an interrupted transfer never leaves a
+        partially written file in the work copy. Sync the file as described by
+        `TransferOptions.fsyncMode`.
+        """
+        assert externalFilePath is not None
+        assert workFilePath is not None
+        temporaryFd, temporaryPath = tempfile.mkstemp(prefix=_TemporaryWorkFilePrefix, suffix=_TemporaryWorkFileSuffix, dir=os.path.dirname(workFilePath))
+        os.close(temporaryFd)
+        hasCopied = False
+        try:
+            if isText:
+                self._copyTextFile(externalFilePath, temporaryPath, textOptions)
+            else:
+                self._copyBinaryFile(externalFilePath, temporaryPath)
+            hasCopied = True
+        finally:
+            if not hasCopied:
+                _removeTemporaryFile(temporaryPath)
+        self._moveTemporaryToWork(temporaryPath, workFilePath)
+
+    def _moveTemporaryToWork(self, temporaryPath, workFilePath):
+        """
+        Rename the completely written ``temporaryPath`` to ``workFilePath`` and sync both as
+        described by `TransferOptions.fsyncMode`. If renaming fails, remove ``temporaryPath``.
+        """
+        assert temporaryPath is not None
+        assert workFilePath is not None
+        fsyncMode = self.transferOptions.fsyncMode
+        hasReplaced = False
+        try:
+            if fsyncMode == TransferOptions.FsyncFile:
+                _filecopy.syncFile(temporaryPath)
+            _filecopy.replaceFile(temporaryPath, workFilePath)
+            hasReplaced = True
+        finally:
+            if not hasReplaced:
+                _removeTemporaryFile(temporaryPath)
+        if fsyncMode == TransferOptions.FsyncFile:
+            _filecopy.syncFolder(os.path.dirname(workFilePath))
+        elif fsyncMode == TransferOptions.FsyncBatch:
+            self._fileSyncer.add(workFilePath)
+
+    def _archiveFileChunks(self, sourceFile, isText, textOptions):
+        """
+        Iterator over the content of the file-like ``sourceFile`` read from an archive in
+        chunks of about `TransferOptions.bufferSize` bytes, converted using ``textOptions`` if
+        ``isText`` is set.
+        """
+        assert sourceFile is not None
+        assert not isText or textOptions
+        transferOptions = self.transferOptions
+        if isText:
+            for chunk, convertedChunk in textOptions.convertedChunks(sourceFile, transferOptions.bufferSize):
+                transferOptions.throttleRead(len(chunk))
+                yield convertedChunk
+        else:
+            while True:
+                chunk = sourceFile.read(transferOptions.bufferSize)
+                if not chunk:
+                    break
+                transferOptions.throttleRead(len(chunk))
+                yield chunk
+
+    def _writeTemporaryWorkFile(self, temporaryFolderPath, chunks, entryInfo, sameFile=None, sameByteCount=0):
+        """
+        Path of a temporary file in ``temporaryFolderPath`` holding the first
+        ``sameByteCount`` bytes of the file-like ``sameFile`` followed by ``chunks``, with the
+        permissions and modification time of the `_archive.ArchiveEntryInfo` ``entryInfo``.
+        """
+        assert temporaryFolderPath is not None
+        assert chunks is not None
+        assert entryInfo is not None
+        assert (sameFile is not None) or (sameByteCount == 0)
+        transferOptions = self.transferOptions
+        _tools.makeFolder(temporaryFolderPath)
+        temporaryFd, result = tempfile.mkstemp(prefix=_TemporaryWorkFilePrefix, suffix=_TemporaryWorkFileSuffix, dir=temporaryFolderPath)
+        hasWritten = False
+        try:
+            with os.fdopen(temporaryFd, 'wb') as temporaryFile:
+                if sameByteCount > 0:
+                    sameFile.seek(0)
+                    remainingByteCount = sameByteCount
+                    while remainingByteCount > 0:
+                        data = sameFile.read(min(transferOptions.bufferSize, remainingByteCount))
+                        if not data:
+                            raise ScmError(u'file in work copy must remain unchanged during transfer: "%s"' % sameFile.name)
+                        transferOptions.throttleCopy(len(data))
+                        temporaryFile.write(data)
+                        remainingByteCount -= len(data)
+                for chunk in chunks:
+                    transferOptions.throttleWrite(len(chunk))
+                    temporaryFile.write(chunk)
+                if transferOptions.dropCache:
+                    temporaryFile.flush()
+                    _filecopy.dropFromCache(temporaryFile.fileno(), isWritten=True)
+            os.chmod(result, stat.S_IMODE(entryInfo.st_mode))
+            os.utime(result, (entryInfo.st_mtime, entryInfo.st_mtime))
+            hasWritten = True
+        finally:
+            if not hasWritten:
+                _removeTemporaryFile(result)
+        return result
+
+    def _prepareArchiveFileForWork(self, sourceFile, entryInfo, workFilePath, isText, textOptions, comparedFilePath=None):
+        """
+        Path of a temporary file in `_archiveStagingFolderPath()` holding the content of the
+        file-like ``sourceFile`` read from an archive for ``workFilePath``, or ``None`` if ``comparedFilePath``
+        already has the same content. If ``comparedFilePath`` is ``None``, compare with
+        ``workFilePath``.
+
+        Binary files whose size and modification time according to the
+        `_archive.ArchiveEntryInfo` ``entryInfo`` are the same as the one of the compared file
+        are considered unchanged without reading them. Otherwise the content is compared while
+        reading it, and only once it differs, it is written to the temporary file.
+        """
+        assert sourceFile is not None
+        assert entryInfo is not None
+        assert workFilePath is not None
+        assert not isText or textOptions
+        if comparedFilePath is None:
+            comparedFilePath = workFilePath
+        chunks = self._archiveFileChunks(sourceFile, isText, textOptions)
+        result = None
+        if os.path.isfile(comparedFilePath):
+            comparedInfo = os.stat(comparedFilePath)
+            isSizeDifferent = (comparedInfo.st_size != entryInfo.st_size)
+            if not isText and not isSizeDifferent and (int(comparedInfo.st_mtime) == int(entryInfo.st_mtime)):
+                _log.debug(u'  skip "%s" with same size and time', workFilePath)
+            elif not isText and isSizeDifferent:
+                result = self._writeTemporaryWorkFile(self._archiveStagingFolderPath(), chunks, entryInfo)
+            else:
+                with open(comparedFilePath, 'rb') as comparedFile:
+                    sameByteCount = 0
+                    differentChunk = None
+                    for chunk in chunks:
+                        comparedData = comparedFile.read(len(chunk))
+                        self.transferOptions.throttleRead(len(comparedData))
+                        if comparedData != chunk:
+                            differentChunk = chunk
+                            break
+                        sameByteCount += len(chunk)
+                    if (differentChunk is not None) or comparedFile.read(1):
+                        if differentChunk is not None:
+                            chunks = itertools.chain([differentChunk], chunks)
+                        result = self._writeTemporaryWorkFile(self._archiveStagingFolderPath(), chunks, entryInfo, comparedFile, sameByteCount)
+                    if self.transferOptions.dropCache:
+                        _filecopy.dropFromCache(comparedFile.fileno())
+        else:
+            result = self._writeTemporaryWorkFile(self._archiveStagingFolderPath(), chunks, entryInfo)
+        return result
+
+    def _stageEntryForImport(self, entryToStage, stagingFolderPath, textOptions):
+        """
+        Create ``entryToStage`` in ``stagingFolderPath`` with the content it should have in the
+        repository. Binary files are hard linked to the external file if possible instead of
+        copying them.
+        """
+        assert entryToStage is not None
+        assert stagingFolderPath is not None
+        stagedPath = entryToStage.absolutePath(stagingFolderPath)
+        if entryToStage.kind == antglob.FileSystemEntry.Folder:
+            _tools.makeFolder(stagedPath)
+        else:
+            externalPath = self._externalPathFor(entryToStage)
+            _tools.makeFolder(os.path.dirname(stagedPath))
+            if textOptions and textOptions.isText(entryToStage):
+                self._copyTextFile(externalPath, stagedPath, textOptions)
+            else:
+                hasLinked = False
+                if hasattr(os, 'link'):
+                    try:
+                        os.link(externalPath, stagedPath)
+                        hasLinked = True
+                    except OSError, error:
+                        _log.debug(u'  cannot link "%s", copying instead: %s', entryToStage._relativePath, error)
+                if not hasLinked:
+                    self._copyBinaryFile(externalPath, stagedPath)
+
+    def _stageArchiveFilesForImport(self, entriesToStage, stagingFolderPath):
+        """
+        Move the files in ``entriesToStage``, which `_readArchiveFile()` already wrote to
+        temporary files while scanning the external archive, to ``stagingFolderPath``.
+        """
+        assert entriesToStage is not None
+        assert stagingFolderPath is not None
+        assert self._pathToPreparedTransferMap is not None
+        for entryToStage in entriesToStage:
+            if entryToStage.kind == antglob.FileSystemEntry.File:
+                originalExternalEntry = self._renamedToOriginalExternalEntriesMap[entryToStage]
+                temporaryPath, _ = self._pathToPreparedTransferMap.pop(originalExternalEntry._relativePath)
+                stagedPath = entryToStage.absolutePath(stagingFolderPath)
+                _tools.makeFolder(os.path.dirname(stagedPath))
+                # The staging folder might be located on another file system than the work copy.
+                shutil.move(temporaryPath, stagedPath)
+
+    def _isExternalArchive(self):
+        """
+        ``True`` if the external files are read from an archive instead of a folder.
+        """
+        assert self._externalFolderPath is not None
+        return os.path.isfile(self._externalFolderPath)
+
+    def _isWorkEmpty(self):
+        """
+        ``True`` if the work copy does not contain anything but the special folders of the SCM.
+        """
+        result = True
+        for name in os.listdir(self.scmWork.localTargetPath):
+            if not self.scmWork.isSpecialPath(name):
+                result = False
+                break
+        return result
+
+    def _canImport(self):
+        """
+        ``True`` if all changes are additions to an empty work copy, which allows to commit them
+        using a single ``svn import`` instead of copying and adding each entry.
+        """
+        return (self.importMessage is not None) and bool(self._entriesToAdd) \
+            and not self._entriesToTransfer and not self._entriesToMove and not self._entriesToRemove \
+            and not self.workEntries and self._isWorkEmpty()
+
+    def _importAddedEntries(self, textOptions):
+        """
+        Commit the added entries using a single ``svn import`` of a staging folder that holds
+        exactly the added entries.
+        """
+        assert self._entriesToAdd
+        assert self.importMessage is not None
+        result = ScmChanges()
+        _log.info(u'import %s into empty work copy', _tools.oneOrOtherText(len(self._entriesToAdd), 'entry', 'entries'))
+        stagingFolderPath = tempfile.mkdtemp(prefix="scunch_import_")
+        try:
+            isExternalArchive = self._isExternalArchive()
+            for entryToAdd in sorted(self._entriesToAdd):
+                _log.debug(u'  stage "%s"', entryToAdd._relativePath)
+                if not isExternalArchive or (entryToAdd.kind == antglob.FileSystemEntry.Folder):
+                    self._stageEntryForImport(entryToAdd, stagingFolderPath, textOptions)
+                result.addedPaths.append(entryToAdd._relativePath)
+            if isExternalArchive:
+                self._stageArchiveFilesForImport(self._entriesToAdd, stagingFolderPath)
+            self.scmWork.importFolder(stagingFolderPath, self.importMessage)
+        finally:
+            _tools.removeFolder(stagingFolderPath)
+        result.isCommitted = True
+        return result
 
     def _setExternalAndWorkEntries(self, externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText):
         assert externalFolderPath is not None
@@ -1463,8 +3311,7 @@ class ScmPuncher(object):
             filesToPunchPatternSet.exclude(excludePatternText)
 
         # Collect external items.
-        self.externalEntries = filesToPunchPatternSet.findEntries(externalFolderPath)
-        self.externalEntries = _sortedFileSystemEntries(self.externalEntries)
+        self.externalEntries = _sortedFileSystemEntries(self._findExternalEntries(externalFolderPath, filesToPunchPatternSet))
         externalEntryCount = len(self.externalEntries)
         _log.info(u'found %s in "%s"', _tools.oneOrOtherText(externalEntryCount, 'external entry', 'external entries'), self._externalFolderPath)
 
@@ -1480,8 +3327,7 @@ class ScmPuncher(object):
         # Collect items in work copy.
         if workOnlyPatternText:
             filesToPunchPatternSet.exclude(workOnlyPatternText)
-        self.workEntries = self.scmWork.findEntries(relativeWorkFolderPath, filesToPunchPatternSet)
-        self.workEntries = _sortedFileSystemEntries(self.workEntries)
+        self.workEntries = _sortedFileSystemEntries(self._findWorkEntries(relativeWorkFolderPath, filesToPunchPatternSet))
         workEntryCount = len(self.workEntries)
         _log.info(u'found %s in "%s"', _tools.oneOrOtherText(workEntryCount, 'work entry', 'work entries'), self.scmWork.absolutePath("work path", relativeWorkFolderPath))
 
@@ -1496,6 +3342,211 @@ class ScmPuncher(object):
         if workEntriesNotComplyingWithNameTransformationMap:
             raise ScmNameTransformationError(workEntriesNotComplyingWithNameTransformationMap)
 
+    def _findExternalEntries(self, externalFolderPath, patternSet):
+        """
+        Entries in ``externalFolderPath`` matching ``patternSet``, or `foundExternalEntries`
+        if they have been found in advance. The files of an archive are processed by
+        `_readArchiveFile()` while reading its index.
+        """
+        assert externalFolderPath is not None
+        assert patternSet is not None
+        isExternalArchive = self._isExternalArchive()
+        if (self.foundExternalEntries is not None) and not isExternalArchive:
+            _log.info(u'reuse entries already found in "%s"', externalFolderPath)
+            result = self.foundExternalEntries
+        else:
+            snapshotFileSystem = None
+            if isExternalArchive:
+                if self._isPlanning:
+                    self._externalPathToArchiveDigestMap = {}
+                else:
+                    self._createArchiveStagingFolder()
+
+                def readArchiveFile(externalPath, entryInfo, sourceFile):
+                    self._readArchiveFile(externalPath, entryInfo, sourceFile, patternSet)
+
+                externalFileSystem = _archive.ArchiveFileSystem(externalFolderPath, readArchiveFile)
+            elif self.snapshotPath is not None:
+                snapshotFileSystem = antglob.SnapshotFileSystem(self.snapshotPath, externalFolderPath)
+                externalFileSystem = snapshotFileSystem
+            else:
+                externalFileSystem = None
+            result = patternSet.findEntries(externalFolderPath, self._throttledFileSystem(externalFileSystem))
+            if snapshotFileSystem is not None:
+                snapshotFileSystem.save()
+                _log.info(u'listed %d folders and reused %d unchanged folders from snapshot', snapshotFileSystem.listedFolderCount, snapshotFileSystem.reusedFolderCount)
+        return result
+
+    def _readArchiveFile(self, externalPath, entryInfo, sourceFile, patternSet):
+        """
+        Process the file ``externalPath`` of the external archive while reading its index, so
+        the archive only has to be decompressed once. Files not matching ``patternSet`` are
+        skipped.
+
+        When planning, remember the SHA1 hash of the content for `_changedSteps()`. Otherwise
+        remember a temporary file holding the content for `_finishPreparedTransfer()`. If the
+        work copy already holds the file, compare it as described by
+        `_prepareArchiveFileForWork()`. Otherwise write the temporary file to
+        `_archiveStagingFolderPath()` without comparing it.
+        """
+        assert externalPath is not None
+        assert entryInfo is not None
+        assert sourceFile is not None
+        assert patternSet is not None
+        externalParts = externalPath.split(os.sep)
+        if patternSet.matchesFileParts(externalParts):
+            textOptions = self.textOptions
+            externalEntry = antglob.FileSystemEntry(self._externalFolderPath, externalParts, _ArchiveMemberFileSystem(entryInfo))
+            renamedExternalEntry = self._createTransformedFileSystemEntry(externalEntry)
+            isText = bool(textOptions and textOptions.isText(renamedExternalEntry))
+            chunks = self._archiveFileChunks(sourceFile, isText, textOptions)
+            if self._isPlanning:
+                digest = hashlib.sha1()
+                for chunk in chunks:
+                    digest.update(chunk)
+                self._externalPathToArchiveDigestMap[externalPath] = (entryInfo, digest.hexdigest())
+            else:
+                # A file stored several times in the archive replaces the one prepared before.
+                previousTemporaryPath, _ = self._pathToPreparedTransferMap.pop(externalPath, (None, False))
+                if previousTemporaryPath is not None:
+                    _removeTemporaryFile(previousTemporaryPath)
+                workFilePath = self.scmWork.absolutePath("file to transfer to", renamedExternalEntry._relativePath)
+                if os.path.isfile(workFilePath):
+                    self._pathToPreparedTransferMap[externalPath] = (
+                        self._prepareArchiveFileForWork(sourceFile, entryInfo, workFilePath, isText, textOptions), True)
+                else:
+                    self._pathToPreparedTransferMap[externalPath] = (
+                        self._writeTemporaryWorkFile(self._archiveStagingFolderPath(), chunks, entryInfo), False)
+
+    def _findWorkEntries(self, relativeWorkFolderPath, patternSet):
+        """
+        Entries in the work copy folder ``relativeWorkFolderPath`` matching ``patternSet``.
+        """
+        return self._withoutTemporaryWorkFiles(self.scmWork.findEntries(relativeWorkFolderPath, patternSet))
+
+    def _withoutTemporaryWorkFiles(self, workEntries):
+        """
+        ``workEntries`` without the temporary files an interrupted transfer left in the work
+        copy, which are removed instead of being scheduled for removal from the repository.
+        """
+        assert workEntries is not None
+        result = []
+        for workEntry in workEntries:
+            if (workEntry.kind == antglob.FileSystemEntry.File) and _isTemporaryWorkFileName(workEntry.name):
+                _log.info(u'remove temporary file left over by interrupted transfer: "%s"', workEntry.path)
+                _removeTemporaryFile(workEntry.path)
+            else:
+                result.append(workEntry)
+        return result
+
+    def _throttledFileSystem(self, fileSystem=None):
+        """
+        ``fileSystem`` or the local file system accessed at most at the rate of
+        `TransferOptions.statRateLimiter`, or ``fileSystem`` itself if the rate is unlimited.
+        """
+        if self.transferOptions.statRateLimiter is not None:
+            if fileSystem is None:
+                fileSystem = antglob.LocalFileSystem()
+            result = _ThrottledFileSystem(fileSystem, self.transferOptions)
+        else:
+            result = fileSystem
+        return result
+
+    def _entriesForChangedPaths(self, baseFolderPath, changedPaths, patternSet, fileSystem=None):
+        """
+        Set of entries in ``baseFolderPath`` for the files in ``changedPaths`` matching
+        ``patternSet``, everything matching in the folders in ``changedPaths``, and all folders
+        containing any of them. To examine the entries using something else than the local
+        file system, specify an object like `antglob.LocalFileSystem` in ``fileSystem``.
+        """
+        assert baseFolderPath is not None
+        assert changedPaths is not None
+        assert patternSet is not None
+        if fileSystem is None:
+            fileSystem = antglob.LocalFileSystem()
+        result = set()
+        changedFileParts = []
+        for changedPath in changedPaths:
+            changedParts = changedPath.split(os.sep)
+            absoluteChangedPath = os.path.join(baseFolderPath, changedPath)
+            try:
+                changedMode = fileSystem.stat(absoluteChangedPath).st_mode
+            except OSError, error:
+                if error.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                # The path has been removed.
+                changedMode = 0
+            if stat.S_ISDIR(changedMode):
+                # Like `antglob.AntPatternSet.ifindEntries()`, skip excluded folders.
+                if not changedPath or patternSet.examinesFolderParts(changedParts):
+                    result.update(patternSet.ifindEntries(baseFolderPath, fileSystem, relativeFolderPath=changedPath))
+            elif stat.S_ISREG(changedMode):
+                changedFileParts.append(changedParts)
+        containingFolderParts = set()
+        for fileParts in patternSet.matchingFileParts(changedFileParts):
+            result.add(antglob.FileSystemEntry(baseFolderPath, fileParts, fileSystem))
+            for partCount in range(1, len(fileParts)):
+                containingFolderParts.add(tuple(fileParts[:partCount]))
+        for folderParts in containingFolderParts:
+            result.add(antglob.FileSystemEntry(baseFolderPath, list(folderParts) + [u''], fileSystem))
+        return result
+
+    def _addFoldersFoundInOther(self, entries, baseFolderPath, otherEntries):
+        """
+        Add the folders in ``otherEntries`` that also exist in ``baseFolderPath`` to ``entries``.
+        """
+        for otherEntry in otherEntries:
+            if (otherEntry.kind == antglob.FileSystemEntry.Folder) and os.path.isdir(otherEntry.absolutePath(baseFolderPath)):
+                entries.add(antglob.FileSystemEntry(baseFolderPath, otherEntry.parts))
+
+    def _setChangedExternalAndWorkEntries(self, externalFolderPath, changedPaths, includePatternText, excludePatternText, workOnlyPatternText):
+        """
+        Similar to `_setExternalAndWorkEntries()` but only consider ``changedPaths``.
+        """
+        assert externalFolderPath is not None
+        assert changedPaths is not None
+
+        self._externalFolderPath = externalFolderPath
+        if self._isExternalArchive():
+            raise ScmError(u'changed paths must be punched from a folder instead of an archive: "%s"' % externalFolderPath)
+        filesToPunchPatternSet = antglob.AntPatternSet()
+        if includePatternText:
+            filesToPunchPatternSet.include(includePatternText)
+        if excludePatternText:
+            filesToPunchPatternSet.exclude(excludePatternText)
+
+        # Check that the changed paths are located in the external folder.
+        normalizedChangedPaths = set()
+        for changedPath in changedPaths:
+            normalizedChangedPath = os.path.normpath(changedPath)
+            if os.path.isabs(normalizedChangedPath) or (normalizedChangedPath.split(os.sep)[0] == os.pardir):
+                raise ScmError(u'changed path must be relative to the folder to punch: "%s"' % changedPath)
+            if normalizedChangedPath != os.curdir:
+                normalizedChangedPaths.add(normalizedChangedPath)
+            else:
+                # Everything might have changed.
+                normalizedChangedPaths.add(u'')
+
+        externalEntries = self._entriesForChangedPaths(externalFolderPath, normalizedChangedPaths, filesToPunchPatternSet, self._throttledFileSystem())
+        if workOnlyPatternText:
+            workFilesToPreservePatternSet = antglob.AntPatternSet(False)
+            workFilesToPreservePatternSet.include(workOnlyPatternText)
+            for item in externalEntries:
+                if workFilesToPreservePatternSet.matchesParts(item.parts):
+                    raise ScmError('entry in folder to punch must exist only in work copy: "%s"' % item._relativePath)
+            filesToPunchPatternSet.exclude(workOnlyPatternText)
+        workFolderPath = self.scmWork.absolutePath("work path", "")
+        workEntries = set(self._withoutTemporaryWorkFiles(self._entriesForChangedPaths(workFolderPath, normalizedChangedPaths, filesToPunchPatternSet)))
+
+        # Folders existing on both sides must be found on both sides, otherwise they would be
+        # added or removed.
+        self._addFoldersFoundInOther(externalEntries, externalFolderPath, list(workEntries))
+        self._addFoldersFoundInOther(workEntries, workFolderPath, list(externalEntries))
+        self.externalEntries = _sortedFileSystemEntries(externalEntries)
+        _log.info(u'found %s for %s in "%s"', _tools.oneOrOtherText(len(self.externalEntries), 'external entry', 'external entries'), _tools.oneOrOtherText(len(normalizedChangedPaths), 'changed path', 'changed paths'), externalFolderPath)
+        self.workEntries = _sortedFileSystemEntries(workEntries)
+        _log.info(u'found %s in "%s"', _tools.oneOrOtherText(len(self.workEntries), 'work entry', 'work entries'), workFolderPath)
+
     def _createTransformedFileSystemEntry(self, entry):
         assert entry is not None
         if self.nameTransformation:
@@ -1601,82 +3652,792 @@ class ScmPuncher(object):
                     # TODO: #3: Move folders in case the new folder contains all the entries from the old folder (and possibly some more).
                     pass
 
-    def _applyChangedEntries(self, textOptions):
-        def _logfilesAndFoldersMessage(operation, entries):
-            assert operation
-            assert entries is not None
-            fileCount = 0
-            folderCount = 0
-            for entry in entries:
-                if entry.kind == antglob.FileSystemEntry.File:
-                    fileCount += 1
-                elif entry.kind == antglob.FileSystemEntry.Folder:
-                    folderCount += 1
-                else:
-                    assert False  # pragma: no cover
-            countText = u''
-            if fileCount > 0:
-                countText += _tools.oneOrOtherText(fileCount, u'file', u'files')
-            if folderCount > 0:
-                if fileCount:
-                    countText += ' and '
-                countText += _tools.oneOrOtherText(folderCount, u'folder', u'folders')
-            assert fileCount + folderCount > 0
-            _log.info(u'%s %s', operation, countText)
+    def _setChangedEntries(self, externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText):
+        self._setExternalAndWorkEntries(externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
+        self._setAddedModifiedRemovedItems()
+        if self.moveMode != ScmPuncher.MoveNone:
+            self._setCopiedAndMovedEntries()
+
+    def _plannedSteps(self, textOptions):
+        """
+        List of steps to apply the changes found by `_setAddedModifiedRemovedItems()` and
+        `_setCopiedAndMovedEntries()` to the work copy. Each step is a dictionary that can be
+        stored in a `PunchJournal` and performed using `_applyStep()`.
+        """
+        def logFilesAndFoldersMessage(operation, entries):
+            assert operation
+            assert entries is not None
+            fileCount = 0
+            folderCount = 0
+            for entry in entries:
+                if entry.kind == antglob.FileSystemEntry.File:
+                    fileCount += 1
+                elif entry.kind == antglob.FileSystemEntry.Folder:
+                    folderCount += 1
+                else:
+                    assert False  # pragma: no cover
+            countText = u''
+            if fileCount > 0:
+                countText += _tools.oneOrOtherText(fileCount, u'file', u'files')
+            if folderCount > 0:
+                if fileCount:
+                    countText += ' and '
+                countText += _tools.oneOrOtherText(folderCount, u'folder', u'folders')
+            assert fileCount + folderCount > 0
+            _log.info(u'%s %s', operation, countText)
+
+        def transferStep(entryToTransfer, isModification):
+            if entryToTransfer.kind == antglob.FileSystemEntry.Folder:
+                result = {'action': 'mkdir', 'path': entryToTransfer._relativePath}
+            else:
+                originalExternalEntry = self._renamedToOriginalExternalEntriesMap[entryToTransfer]
+                result = {
+                    'action': 'transfer',
+                    'path': entryToTransfer._relativePath,
+                    'externalPath': originalExternalEntry._relativePath,
+                    'isText': bool(textOptions and textOptions.isText(entryToTransfer)),
+                    'isModification': isModification,
+                    'byteCount': originalExternalEntry.size,
+                }
+            return result
+
+        result = []
+        if self._entriesToTransfer:
+            logFilesAndFoldersMessage(u'transfer', self._entriesToTransfer)
+            for entryToTransfer in sorted(self._entriesToTransfer):
+                result.append(transferStep(entryToTransfer, True))
+        if self._entriesToAdd:
+            logFilesAndFoldersMessage(u'add', self._entriesToAdd)
+            # Create added folders and copy added files, then add all of them to the SCM using a
+            # single command call.
+            relativePathsToAdd = []
+            for entryToAdd in sorted(self._entriesToAdd):
+                result.append(transferStep(entryToAdd, False))
+                relativePathsToAdd.append(entryToAdd._relativePath)
+            result.append({'action': 'add', 'paths': relativePathsToAdd})
+        if self._entriesToMove:
+            logFilesAndFoldersMessage(u'move', [entryToMove for entryToMove, _ in self._entriesToMove])
+            # Group moved files by target folder so each folder needs only a single command call.
+            targetFolderPathToMovedPathsMap = {}
+            for sourceEntryToMove, targetEntryToMove in self._entriesToMove:
+                targetFolderPath = os.path.dirname(targetEntryToMove._relativePath)
+                movedPaths = targetFolderPathToMovedPathsMap.get(targetFolderPath)
+                if movedPaths is None:
+                    movedPaths = []
+                    targetFolderPathToMovedPathsMap[targetFolderPath] = movedPaths
+                movedPaths.append([sourceEntryToMove._relativePath, targetEntryToMove._relativePath])
+            for targetFolderPath in sorted(targetFolderPathToMovedPathsMap.keys()):
+                result.append({'action': 'move', 'targetPath': targetFolderPath, 'movedPaths': targetFolderPathToMovedPathsMap[targetFolderPath]})
+            # Transfer the content of moved files once all of them have been moved.
+            for _, targetEntryToMove in self._entriesToMove:
+                result.append(transferStep(targetEntryToMove, False))
+        if self._entriesToRemove:
+            logFilesAndFoldersMessage(u'remove', self._entriesToRemove)
+            result.append({'action': 'remove', 'paths': [entryToRemove._relativePath for entryToRemove in sorted(self._entriesToRemove)]})
+        return result
+
+    def _hasSameArchiveContent(self, externalPath, comparedFilePath, isText):
+        """
+        ``True`` if ``comparedFilePath`` already has the content of the file ``externalPath``
+        in the external archive according to the SHA1 hash `_readArchiveFile()` computed while
+        planning. Like `_prepareArchiveFileForWork()`, binary files with the same size and
+        modification time are considered unchanged without reading them.
+        """
+        assert externalPath is not None
+        assert comparedFilePath is not None
+        entryInfo, digest = self._externalPathToArchiveDigestMap[externalPath]
+        comparedInfo = os.stat(comparedFilePath)
+        isSizeDifferent = (comparedInfo.st_size != entryInfo.st_size)
+        if not isText and isSizeDifferent:
+            result = False
+        elif not isText and (int(comparedInfo.st_mtime) == int(entryInfo.st_mtime)):
+            result = True
+        else:
+            result = (self._sha1HexDigest(comparedFilePath) == digest)
+        return result
+
+    def _changedSteps(self, steps, textOptions):
+        """
+        ``steps`` without the ``'mkdir'`` steps for folders that already exist in the work copy
+        and the ``'transfer'`` steps for files the work copy already holds with the same
+        content. Moved files are compared with their source. `punch()` does not need this
+        because it compares files while transferring them anyway, but a plan should only
+        contain what actually changes.
+        """
+        assert steps is not None
+        movedTargetToSourcePathMap = {}
+        for step in steps:
+            if step['action'] == 'move':
+                for sourcePath, targetPath in step['movedPaths']:
+                    movedTargetToSourcePathMap[targetPath] = sourcePath
+        externalPathToComparedPathMap = {}
+        for step in steps:
+            if step['action'] == 'transfer':
+                if step['isModification']:
+                    comparedPath = self.scmWork.absolutePath("file to compare", step['path'])
+                else:
+                    comparedPath = None
+                    movedSourcePath = movedTargetToSourcePathMap.get(step['path'])
+                    if movedSourcePath is not None:
+                        comparedPath = self.scmWork.absolutePath("file to compare", movedSourcePath)
+                if (comparedPath is not None) and os.path.isfile(comparedPath):
+                    externalPathToComparedPathMap[step['externalPath']] = (comparedPath, step['isText'])
+        sameExternalPaths = set()
+        isExternalArchive = self._isExternalArchive()
+        for externalPath, (comparedPath, isText) in externalPathToComparedPathMap.items():
+            if isExternalArchive:
+                hasSameContent = self._hasSameArchiveContent(externalPath, comparedPath, isText)
+            else:
+                externalFilePath = os.path.join(self._externalFolderPath, externalPath)
+                if isText:
+                    hasSameContent = self._hasSameTextContent(externalFilePath, comparedPath, textOptions)
+                else:
+                    hasSameContent = (os.path.getsize(externalFilePath) == os.path.getsize(comparedPath)) and self._hasSameBinaryContent(externalFilePath, comparedPath)
+            if hasSameContent:
+                sameExternalPaths.add(externalPath)
+        result = []
+        for step in steps:
+            action = step['action']
+            if (action == 'mkdir') and os.path.isdir(self.scmWork.absolutePath("folder to create", step['path'])):
+                _log.debug(u'  skip existing "%s"', step['path'])
+            elif (action == 'transfer') and (step['externalPath'] in sameExternalPaths):
+                _log.debug(u'  skip unchanged "%s"', step['path'])
+            else:
+                result.append(step)
+        return result
+
+    def _unversionedPaths(self, relativePaths):
+        """
+        The paths in ``relativePaths`` that are not under version control yet.
+        """
+        unversionedAbsolutePaths = set()
+        for statusItem in self.scmWork.status(relativePaths, recursive=False):
+            if statusItem.status == ScmStatus.Unversioned:
+                unversionedAbsolutePaths.add(os.path.normpath(statusItem.path))
+        return [path for path in relativePaths if os.path.normpath(self.scmWork.absolutePath("path to add", path)) in unversionedAbsolutePaths]
+
+    def _applyStep(self, step, textOptions, isResumed=False):
+        """
+        Perform ``step`` as computed by `_plannedSteps()`. The result is ``True`` if the work
+        copy changed. If ``isResumed`` is ``True``, the step might already have been performed
+        partially by an earlier run that got interrupted.
+        """
+        assert step is not None
+        action = step['action']
+        result = True
+        if action == 'mkdir':
+            _log.info(u'  create "%s"', step['path'])
+            _tools.makeFolder(self.scmWork.absolutePath("folder to create", step['path']))
+        elif action == 'transfer':
+            _log.info(u'  transfer "%s"', step['path'])
+            workFilePath = self.scmWork.absolutePath("file to transfer to", step['path'])
+            if self._pathToPreparedTransferMap is not None:
+                result = self._finishPreparedTransfer(step, workFilePath)
+            else:
+                externalFilePath = os.path.join(self._externalFolderPath, step['externalPath'])
+                result = self._transferFileToWork(externalFilePath, workFilePath, step['isText'], textOptions)
+        elif action == 'add':
+            relativePathsToAdd = step['paths']
+            if isResumed:
+                relativePathsToAdd = self._unversionedPaths(relativePathsToAdd)
+            if relativePathsToAdd:
+                self.scmWork.add(relativePathsToAdd, recursive=False)
+        elif action == 'move':
+            targetPath = step['targetPath']
+            sourcePaths = []
+            for sourcePath, _ in step['movedPaths']:
+                if not isResumed or os.path.exists(self.scmWork.absolutePath("path to move", sourcePath)):
+                    _log.info(u'  move "%s" from "%s" to "%s"', os.path.basename(sourcePath), os.path.dirname(sourcePath), targetPath)
+                    sourcePaths.append(sourcePath)
+            if sourcePaths:
+                self.scmWork.move(sourcePaths, targetPath, force=True)
+        elif action == 'remove':
+            for relativePathToRemove in step['paths']:
+                _log.info(u'  remove "%s"', relativePathToRemove)
+            # Remove folder and files using a single command call.
+            self.scmWork.remove(step['paths'], recursive=True, force=True)
+        else:
+            raise ScmError(u'step must have a known action: %r' % step)
+        return result
+
+    def _addStepToChanges(self, step, hasChanged, changes):
+        """
+        Add the changes performed by ``step`` to the `ScmChanges` ``changes``.
+        """
+        assert step is not None
+        assert changes is not None
+        action = step['action']
+        if action == 'transfer':
+            if step['isModification'] and hasChanged:
+                changes.modifiedPaths.append(step['path'])
+        elif action == 'add':
+            changes.addedPaths.extend(step['paths'])
+        elif action == 'move':
+            changes.movedPaths.extend([tuple(movedPaths) for movedPaths in step['movedPaths']])
+        elif action == 'remove':
+            changes.removedPaths.extend(step['paths'])
+
+    def _setStepDone(self, stepNumber, hasChanged, journal, stepNumberToChangedMap):
+        """
+        Remember that step ``stepNumber`` has been performed.
+        """
+        stepNumberToChangedMap[stepNumber] = hasChanged
+        if journal is not None:
+            journal.addDoneStep(stepNumber, hasChanged)
+
+    def _applyTransferSteps(self, steps, stepNumbers, textOptions, isResumed, journal, stepNumberToChangedMap):
+        """
+        Perform the ``'mkdir'`` and ``'transfer'`` steps with ``stepNumbers`` in ``steps``.
+        Folders are created one after the other in the order of the steps so folders
+        containing other folders are created first. Once all folders exist, files are
+        transferred using `transferWorkerCount` threads. Steps that fail do not prevent
+        other files from being transferred and are reported together afterwards as
+        `ScmTransferError`.
+        """
+        assert steps is not None
+        assert stepNumbers is not None
+        assert stepNumberToChangedMap is not None
+        transferStepNumbers = []
+        for stepNumber in stepNumbers:
+            if stepNumber not in stepNumberToChangedMap:
+                step = steps[stepNumber]
+                if step['action'] == 'mkdir':
+                    hasChanged = self._applyStep(step, textOptions, isResumed)
+                    self._setStepDone(stepNumber, hasChanged, journal, stepNumberToChangedMap)
+                else:
+                    assert step['action'] == 'transfer'
+                    transferStepNumbers.append(stepNumber)
+        if transferStepNumbers:
+            _log.info(u'transfer %s using %d threads', _tools.oneOrOtherText(len(transferStepNumbers), 'file', 'files'), self.transferWorkerCount)
+
+            def applyTransferStep(stepNumber):
+                return self._applyStep(steps[stepNumber], textOptions, isResumed)
+
+            pathToErrorMap = {}
+            for stepNumber, hasChanged, error in _tools.parallelResults(applyTransferStep, transferStepNumbers, self.transferWorkerCount):
+                if error is None:
+                    # Only the main thread may write to the journal.
+                    self._setStepDone(stepNumber, hasChanged, journal, stepNumberToChangedMap)
+                else:
+                    _log.debug(u'  cannot transfer "%s": %s', steps[stepNumber]['path'], error)
+                    pathToErrorMap[steps[stepNumber]['path']] = error
+            if pathToErrorMap:
+                raise ScmTransferError(pathToErrorMap)
+
+    def _prepareArchiveTransfers(self, steps, stepNumberToChangedMap, textOptions):
+        """
+        Read the files for all ``'transfer'`` steps in ``steps`` not performed yet from the
+        external archive in a single pass and remember the temporary files prepared by
+        `_prepareArchiveFileForWork()` for `_finishPreparedTransfer()`. This is only needed
+        for steps that have not been computed by scanning the archive just now, which already
+        prepared them using `_readArchiveFile()`.
+        """
+        assert steps is not None
+        assert stepNumberToChangedMap is not None
+        externalPathToStepMap = {}
+        movedTargetToSourcePathMap = {}
+        for stepNumber, step in enumerate(steps):
+            action = step['action']
+            if stepNumber not in stepNumberToChangedMap:
+                if action == 'transfer':
+                    externalPathToStepMap[step['externalPath']] = step
+                elif action == 'move':
+                    for sourcePath, targetPath in step['movedPaths']:
+                        movedTargetToSourcePathMap[targetPath] = sourcePath
+        self._createArchiveStagingFolder()
+        if externalPathToStepMap:
+            _log.info(u'read %s from "%s"', _tools.oneOrOtherText(len(externalPathToStepMap), 'file', 'files'), self._externalFolderPath)
+        for externalPath, entryInfo, sourceFile in _archive.iterFiles(self._externalFolderPath, externalPathToStepMap):
+            step = externalPathToStepMap[externalPath]
+            relativeWorkPath = step['path']
+            workFilePath = self.scmWork.absolutePath("file to transfer to", relativeWorkPath)
+            # Files to be moved are compared with their source because the target does not
+            # exist yet.
+            comparedFilePath = workFilePath
+            movedSourcePath = movedTargetToSourcePathMap.get(relativeWorkPath)
+            if (movedSourcePath is not None) and not os.path.exists(workFilePath):
+                comparedFilePath = self.scmWork.absolutePath("file to move", movedSourcePath)
+            # A file stored several times in the archive replaces the one prepared before.
+            previousTemporaryPath, _ = self._pathToPreparedTransferMap.pop(externalPath, (None, True))
+            if previousTemporaryPath is not None:
+                _removeTemporaryFile(previousTemporaryPath)
+            self._pathToPreparedTransferMap[externalPath] = (self._prepareArchiveFileForWork(
+                sourceFile, entryInfo, workFilePath, step['isText'], textOptions, comparedFilePath), True)
+
+    def _finishPreparedTransfer(self, step, workFilePath):
+        """
+        Replace ``workFilePath`` by the temporary file `_readArchiveFile()` or
+        `_prepareArchiveTransfers()` prepared for the ``'transfer'`` ``step``. The result is
+        ``True`` if the work copy changed.
+        """
+        assert step is not None
+        assert workFilePath is not None
+        externalPath = step['externalPath']
+        if externalPath not in self._pathToPreparedTransferMap:
+            raise ScmError(u'file to transfer must exist in archive "%s": "%s"' % (self._externalFolderPath, externalPath))
+        temporaryPath, isCompared = self._pathToPreparedTransferMap.pop(externalPath)
+        if (temporaryPath is not None) and not isCompared and os.path.isfile(workFilePath) \
+                and self._hasSameBinaryContent(temporaryPath, workFilePath):
+            # Moved files only exist once they have been moved, so they could not be compared
+            # when the temporary file was prepared.
+            _removeTemporaryFile(temporaryPath)
+            temporaryPath = None
+        result = (temporaryPath is not None)
+        if result:
+            self._moveStagedToWork(temporaryPath, workFilePath)
+        else:
+            _log.debug(u'  skip unchanged "%s"', workFilePath)
+        return result
+
+    def _moveStagedToWork(self, stagedPath, workFilePath):
+        """
+        Move the file ``stagedPath`` from `_archiveStagingFolderPath()` to ``workFilePath``.
+        Because the staging folder is located next to the work copy, this usually only renames
+        it. If the work copy folder is located on another file system, copy it instead.
+        """
+        assert stagedPath is not None
+        assert workFilePath is not None
+        if os.stat(stagedPath).st_dev == os.stat(os.path.dirname(workFilePath)).st_dev:
+            self._moveTemporaryToWork(stagedPath, workFilePath)
+        else:
+            _log.debug(u'  copy "%s" from other file system', workFilePath)
+            try:
+                self._replaceWorkFile(stagedPath, workFilePath, False, None)
+            finally:
+                _removeTemporaryFile(stagedPath)
+
+    def _archiveStagingFolderPath(self):
+        """
+        Path of the folder next to the work copy where files read from an external archive are
+        stored until they are moved to the work copy. It is located outside the work copy so
+        SCM commands do not report its content as unversioned, but on the same file system so
+        moving files from it only has to rename them.
+        """
+        return stateFilePath(self.scmWork.localTargetPath, 'staging')
+
+    def _createArchiveStagingFolder(self):
+        """
+        Create an empty `_archiveStagingFolderPath()`, removing files left over by an
+        interrupted punch, and start remembering the transfers prepared in it.
+        """
+        stagingFolderPath = self._archiveStagingFolderPath()
+        if os.path.exists(stagingFolderPath):
+            _log.info(u'remove staging folder left over by interrupted punch: "%s"', stagingFolderPath)
+        _tools.makeEmptyFolder(stagingFolderPath)
+        self._pathToPreparedTransferMap = {}
+
+    def _removePreparedTransfers(self):
+        """
+        Remove `_archiveStagingFolderPath()` including the files prepared by
+        `_readArchiveFile()` or `_prepareArchiveTransfers()` but not used.
+        """
+        if self._pathToPreparedTransferMap is not None:
+            _tools.removeFolder(self._archiveStagingFolderPath())
+            self._pathToPreparedTransferMap = None
+
+    def _applySteps(self, steps, textOptions, journal=None, stepNumberToChangedMap=None):
+        """
+        Perform ``steps`` and return `ScmChanges` describing all of them. If ``journal`` is
+        specified, log each performed step in it. To resume an interrupted punch, specify a
+        map with the numbers of the steps already performed in ``stepNumberToChangedMap``.
+        """
+        assert steps is not None
+        _log.info(u'punch modifications into work copy')
+        isResumed = (stepNumberToChangedMap is not None)
+        if isResumed:
+            stepNumberToChangedMap = dict(stepNumberToChangedMap)
+        else:
+            stepNumberToChangedMap = {}
+        stepNumber = 0
+        stepCount = len(steps)
+        self._fileSyncer = _FileSyncer(self.transferOptions.fsyncBatchFileCount)
+        try:
+            if self._isExternalArchive() and (self._pathToPreparedTransferMap is None):
+                self._prepareArchiveTransfers(steps, stepNumberToChangedMap, textOptions)
+            while stepNumber < stepCount:
+                if (self.transferWorkerCount > 1) and (steps[stepNumber]['action'] in _TransferActions):
+                    # Perform all following transfers at once but only then continue with steps
+                    # that depend on them, for example adding the transferred files.
+                    lastStepNumber = stepNumber
+                    while (lastStepNumber + 1 < stepCount) and (steps[lastStepNumber + 1]['action'] in _TransferActions):
+                        lastStepNumber += 1
+                    self._applyTransferSteps(steps, range(stepNumber, lastStepNumber + 1), textOptions, isResumed, journal, stepNumberToChangedMap)
+                    stepNumber = lastStepNumber + 1
+                else:
+                    if stepNumber not in stepNumberToChangedMap:
+                        hasChanged = self._applyStep(steps[stepNumber], textOptions, isResumed)
+                        self._setStepDone(stepNumber, hasChanged, journal, stepNumberToChangedMap)
+                    stepNumber += 1
+        finally:
+            self._removePreparedTransfers()
+            self._fileSyncer.flush()
+            self._fileSyncer = None
+        result = ScmChanges()
+        for stepNumber, step in enumerate(steps):
+            self._addStepToChanges(step, stepNumberToChangedMap[stepNumber], result)
+        if result.modifiedPaths:
+            _log.info(u'modified %s', _tools.oneOrOtherText(len(result.modifiedPaths), u'file', u'files'))
+        return result
+
+    def _applyChangedEntries(self, textOptions):
+        steps = self._plannedSteps(textOptions)
+        return self._applyJournaledSteps(steps, textOptions)
+
+    def _logTransferStatistics(self):
+        """
+        Log how much data and how many files and folders were throttled and for how long, and
+        how much writing files updated in place saved.
+        """
+        megaByte = 1024.0 * 1024.0
+        if self._deltaFileCount:
+            _log.info(
+                u'updated %s in place writing %.1f of %.1f MB, saving %.1f MB',
+                _tools.oneOrOtherText(self._deltaFileCount, u'file', u'files'), self._deltaWrittenByteCount / megaByte,
+                self._deltaByteCount / megaByte, (self._deltaByteCount - self._deltaWrittenByteCount) / megaByte)
+        for action, rateLimiter, unit, unitFactor in (
+            (u'read', self.transferOptions.readRateLimiter, u'MB', megaByte),
+            (u'wrote', self.transferOptions.writeRateLimiter, u'MB', megaByte),
+            (u'examined', self.transferOptions.statRateLimiter, u'entries', 1),
+        ):
+            if rateLimiter is not None:
+                _log.info(
+                    u'%s %.1f %s limited to %.1f %s/s, waiting %.1f seconds', action,
+                    rateLimiter.consumedAmount / unitFactor, unit, rateLimiter.rate / unitFactor, unit, rateLimiter.waitDuration)
+
+    def _applyJournaledSteps(self, steps, textOptions):
+        if self.journalPath is not None:
+            journal = PunchJournal(self.journalPath)
+            try:
+                journal.start(self._externalFolderPath, steps)
+                result = self._applySteps(steps, textOptions, journal)
+                journal.remove()
+            finally:
+                journal.close()
+        else:
+            result = self._applySteps(steps, textOptions)
+        return result
+
+    def punch(self, externalFolderPath, relativeWorkFolderPath="", includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+        """
+        Punch ``externalFolderPath`` into the work copy and return `ScmChanges` describing what
+        has to be committed.
+
+        If `importMessage` is set and the work copy is empty, the entries are committed
+        directly using ``svn import`` and `ScmChanges.isCommitted` is ``True``. In this case
+        the work copy does not contain the imported entries until it is updated.
+        """
+        assert externalFolderPath is not None
+        assert relativeWorkFolderPath is not None
+        try:
+            self._setChangedEntries(externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
+            if self._canImport():
+                result = self._importAddedEntries(self.textOptions)
+            else:
+                result = self._applyChangedEntries(self.textOptions)
+        finally:
+            self._removePreparedTransfers()
+            self._logTransferStatistics()
+            self._clear()
+        return result
+
+    def punchChanges(self, externalFolderPath, changedPaths, includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+        """
+        Like `punch()` but only examine ``changedPaths``, which are the paths relative to
+        ``externalFolderPath`` of files and folders that might have been added, modified or
+        removed. Changed folders are examined completely. All other files and folders are
+        assumed to be the same in ``externalFolderPath`` and the work copy.
+
+        Because changed paths in the external folder must correspond to the same paths in the
+        work copy, `nameTransformation` is not supported.
+        """
+        assert externalFolderPath is not None
+        assert changedPaths is not None
+        if self.nameTransformation:
+            raise ScmError(u'names must be preserved to punch only changed paths')
+        try:
+            self._setChangedExternalAndWorkEntries(externalFolderPath, changedPaths, includePatternText, excludePatternText, workOnlyPatternText)
+            self._setAddedModifiedRemovedItems()
+            if self.moveMode != ScmPuncher.MoveNone:
+                self._setCopiedAndMovedEntries()
+            result = self._applyChangedEntries(self.textOptions)
+        finally:
+            self._logTransferStatistics()
+            self._clear()
+        return result
+
+    def plan(self, externalFolderPath, planPath, relativeWorkFolderPath="", includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+        """
+        Similar to `punch()` but only scan ``externalFolderPath`` and the work copy and write the
+        steps to punch the changes to a `PunchJournal` at ``planPath`` without changing the work
+        copy or running any SCM command. Files that already have the same content in the work
+        copy are compared now and left out of the plan. The plan can be performed later using
+        `applyPlan()`.
+
+        The result is the list of planned steps.
+        """
+        assert externalFolderPath is not None
+        assert planPath is not None
+        assert relativeWorkFolderPath is not None
+        self._isPlanning = True
+        try:
+            self._setChangedEntries(externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
+            result = self._changedSteps(self._plannedSteps(self.textOptions), self.textOptions)
+            plan = PunchJournal(planPath)
+            try:
+                plan.start(self._externalFolderPath, result)
+            finally:
+                plan.close()
+            byteCount = sum(step.get('byteCount', 0) for step in result)
+            _log.info(u'wrote plan with %s transferring %d bytes to "%s"', _tools.oneOrOtherText(len(result), u'step', u'steps'), byteCount, planPath)
+        finally:
+            self._logTransferStatistics()
+            self._clear()
+        return result
+
+    def applyPlan(self, planPath, externalFolderPath=None):
+        """
+        Perform the steps in the plan at ``planPath`` written by `plan()` and return `ScmChanges`
+        describing what has to be committed. The files to transfer are read from
+        ``externalFolderPath`` or, if this is ``None``, from the folder the plan was computed
+        for. Specify `textOptions` as when computing the plan.
+        """
+        assert planPath is not None
+        plan = PunchJournal(planPath)
+        try:
+            plannedExternalFolderPath, steps, _ = plan.read()
+        finally:
+            plan.close()
+        if externalFolderPath is not None:
+            self._externalFolderPath = externalFolderPath
+        else:
+            self._externalFolderPath = plannedExternalFolderPath
+        try:
+            _log.info(u'apply plan "%s" with %s', planPath, _tools.oneOrOtherText(len(steps), u'step', u'steps'))
+            result = self._applyJournaledSteps(steps, self.textOptions)
+        finally:
+            self._logTransferStatistics()
+            self._clear()
+        return result
+
+    def resume(self):
+        """
+        Continue an interrupted `punch()` using the steps in the journal at `journalPath`
+        without scanning any folders. Steps already performed are skipped. The result is
+        `ScmChanges` describing both the steps performed earlier and now.
+        """
+        assert self.journalPath is not None
+        journal = PunchJournal(self.journalPath)
+        try:
+            self._externalFolderPath, steps, stepNumberToChangedMap = journal.read()
+            _log.info(u'resume punch of "%s" with %d of %d steps performed', self._externalFolderPath, len(stepNumberToChangedMap), len(steps))
+            result = self._applySteps(steps, self.textOptions, journal, stepNumberToChangedMap)
+            journal.remove()
+        finally:
+            journal.close()
+            self._logTransferStatistics()
+            self._clear()
+        return result
+
+
+class _PreparedSnapshot(object):
+    """
+    Entries and file infos of a snapshot found in the background by
+    `HistoryScmPuncher.prepare()`.
+    """
+    def __init__(self, externalFolderPath, includePatternText, excludePatternText):
+        assert externalFolderPath is not None
+        self.externalFolderPath = externalFolderPath
+        self.includePatternText = includePatternText
+        self.excludePatternText = excludePatternText
+        self.entries = None
+        self.relativePathToFileInfoMap = {}
+        self.thread = None
+
+    def matches(self, externalFolderPath, includePatternText, excludePatternText):
+        return (self.externalFolderPath, self.includePatternText, self.excludePatternText) == (externalFolderPath, includePatternText, excludePatternText)
+
+
+class HistoryScmPuncher(ScmPuncher):
+    """
+    Puncher to punch a history of snapshots one after another into the same work copy, for
+    example old releases kept in dated folders.
+
+    After each successful `punch()`, the puncher remembers the entries now in the work copy and
+    the SHA1 hash of each file it transferred. The next punch compares the snapshot with these
+    instead of scanning the work copy and reading its files again. Files of the snapshot with
+    the same size and modification time as in the previous snapshot reuse its hash without
+    being read at all. To scan and hash the next snapshot while the current one is being
+    committed, call `prepare()` before committing.
+
+    Between punches, the work copy must not change except by committing or updating it. As with
+    `ScmPuncher`, settings such as `textOptions` have to be set again before each punch.
+    """
+    def __init__(self, scmWork):
+        super(HistoryScmPuncher, self).__init__(scmWork)
+        self._preparedSnapshot = None
+        self._forgetWorkCopy()
+        self._clearPunchState()
+
+    def _forgetWorkCopy(self):
+        """
+        Forget what is known about the work copy so the next punch has to scan it again.
+        """
+        self._knownWorkEntries = None
+        self._knownPunchArguments = None
+        self._workPathToDigestMap = {}
+        self._relativePathToFileInfoMap = {}
+
+    def _clearPunchState(self):
+        self._preparedEntries = None
+        self._punchedWorkEntries = None
+        self._punchedWorkPathToDigestMap = {}
+        self._punchedFileInfoMap = {}
+
+    def _takePreparedSnapshot(self, externalFolderPath, includePatternText, excludePatternText):
+        """
+        The `_PreparedSnapshot` for ``externalFolderPath`` once its preparation has finished, or
+        ``None`` if no such snapshot has been prepared or preparing it failed.
+        """
+        result = self._preparedSnapshot
+        self._preparedSnapshot = None
+        if result is not None:
+            result.thread.join()
+            if not result.matches(externalFolderPath, includePatternText, excludePatternText):
+                _log.info(u'discard prepared snapshot "%s"', result.externalFolderPath)
+                result = None
+            elif result.entries is None:
+                result = None
+        return result
+
+    def _prepareSnapshot(self, preparedSnapshot, previousRelativePathToFileInfoMap, textOptions, transferOptions):
+        """
+        Find the entries of ``preparedSnapshot`` and the infos of its files as described by
+        `_historyFileInfo()`. This runs in a background thread.
+        """
+        assert preparedSnapshot is not None
+        assert previousRelativePathToFileInfoMap is not None
+        assert transferOptions is not None
+        externalFolderPath = preparedSnapshot.externalFolderPath
+        try:
+            patternSet = antglob.AntPatternSet()
+            if preparedSnapshot.includePatternText:
+                patternSet.include(preparedSnapshot.includePatternText)
+            if preparedSnapshot.excludePatternText:
+                patternSet.exclude(preparedSnapshot.excludePatternText)
+            if os.path.isfile(externalFolderPath):
+                # Punching reads the index and the files of an archive in a single pass, so
+                # reading the index in advance would only decompress the archive twice.
+                _log.debug(u'skip preparing archive "%s"', externalFolderPath)
+            else:
+                fileSystem = antglob.LocalFileSystem()
+                if transferOptions.statRateLimiter is not None:
+                    fileSystem = _ThrottledFileSystem(fileSystem, transferOptions)
+                entries = _sortedFileSystemEntries(patternSet.findEntries(externalFolderPath, fileSystem))
+                for entry in entries:
+                    if entry.kind == antglob.FileSystemEntry.File:
+                        isText = bool(textOptions and textOptions.isText(entry))
+                        previousFileInfo = previousRelativePathToFileInfoMap.get(entry.relativePath)
+                        preparedSnapshot.relativePathToFileInfoMap[entry.relativePath] = _historyFileInfo(entry.path, isText, textOptions, transferOptions, previousFileInfo)
+                preparedSnapshot.entries = entries
+                _log.info(u'prepared %s in "%s"', _tools.oneOrOtherText(len(entries), 'external entry', 'external entries'), externalFolderPath)
+        except (EnvironmentError, ScmError), error:
+            _log.warning(u'cannot prepare "%s" in advance, scanning it when punching: %s', externalFolderPath, error)
+
+    def prepare(self, externalFolderPath, includePatternText=None, excludePatternText=None, textOptions=None, transferOptions=None):
+        """
+        Start to scan ``externalFolderPath`` and to hash its files in a background thread, so a
+        following `punch()` of the same folder using the same patterns does not have to.
+        """
+        assert externalFolderPath is not None
+        if self._preparedSnapshot is not None:
+            self._preparedSnapshot.thread.join()
+        if transferOptions is None:
+            transferOptions = TransferOptions()
+        preparedSnapshot = _PreparedSnapshot(externalFolderPath, includePatternText, excludePatternText)
+        # Only pass the file infos of the previous snapshot, which `punch()` replaces but never
+        # changes.
+        preparedSnapshot.thread = threading.Thread(
+            target=self._prepareSnapshot, name=u'prepare',
+            args=(preparedSnapshot, self._relativePathToFileInfoMap, textOptions, transferOptions))
+        preparedSnapshot.thread.daemon = True
+        preparedSnapshot.thread.start()
+        self._preparedSnapshot = preparedSnapshot
+
+    def _findExternalEntries(self, externalFolderPath, patternSet):
+        if self._preparedEntries is not None:
+            result = self._preparedEntries
+        else:
+            result = super(HistoryScmPuncher, self)._findExternalEntries(externalFolderPath, patternSet)
+        return result
+
+    def _findWorkEntries(self, relativeWorkFolderPath, patternSet):
+        if self._knownWorkEntries is not None:
+            result = self._knownWorkEntries
+        else:
+            result = super(HistoryScmPuncher, self)._findWorkEntries(relativeWorkFolderPath, patternSet)
+        return result
 
-        _log.info(u'punch modifications into work copy')
-        if self._entriesToTransfer:
-            _logfilesAndFoldersMessage(u'transfer', self._entriesToTransfer)
-            for entryToTransfer in sorted(self._entriesToTransfer):
-                if entryToTransfer.kind == antglob.FileSystemEntry.Folder:
-                    _log.info(u'  create "%s"', entryToTransfer._relativePath)
-                    _tools.makeFolder(self._workPathFor(entryToTransfer))
-                else:
-                    _log.info(u'  transfer "%s"', entryToTransfer._relativePath)
-                    self._transferEntryFromExternalToWork(entryToTransfer, textOptions)
-        if self._entriesToAdd:
-            _logfilesAndFoldersMessage(u'add', self._entriesToAdd)
-            relativePathsToAdd = []
-            # Create added folders and copy added files.
-            for entryToAdd in sorted(self._entriesToAdd):
-                relativePathToAdd = entryToAdd._relativePath
-                _log.info(u'  add "%s"', relativePathToAdd)
-                relativePathsToAdd.append(relativePathToAdd)
-                if entryToAdd.kind == antglob.FileSystemEntry.Folder:
-                    _tools.makeFolder(self._workPathFor(entryToAdd))
-                else:
-                    self._transferEntryFromExternalToWork(entryToAdd, textOptions)
-            # Add folders and files to SCM using a single command call.
-            self.scmWork.add(relativePathsToAdd, recursive=False)
-        if self._entriesToMove:
-            _logfilesAndFoldersMessage(u'move', [entryToMove for entryToMove, _ in self._entriesToMove])
-            for sourceEntryToMove, targetEntryToMove in self._entriesToMove:
-                sourcePath = sourceEntryToMove._relativePath
-                targetPath = os.path.dirname(targetEntryToMove._relativePath)
-                _log.info(u'  move "%s" from "%s" to "%s"', os.path.basename(sourcePath), os.path.dirname(sourcePath), targetPath)
-                self.scmWork.move(sourcePath, targetPath, force=True)
-                self._transferEntryFromExternalToWork(targetEntryToMove, textOptions)
-        if self._entriesToRemove:
-            _logfilesAndFoldersMessage(u'remove', self._entriesToRemove)
-            relativePathsToRemove = []
-            for entryToRemove in sorted(self._entriesToRemove):
-                relativePathToRemove = entryToRemove._relativePath
-                _log.info(u'  remove "%s"', relativePathToRemove)
-                relativePathsToRemove.append(relativePathToRemove)
-            # Remove folder and files  using a single command call.
-            self.scmWork.remove(relativePathsToRemove, recursive=True, force=True)
+    def _setAddedModifiedRemovedItems(self):
+        super(HistoryScmPuncher, self)._setAddedModifiedRemovedItems()
+        # Once punched, the work copy contains exactly the renamed external entries.
+        self._punchedWorkEntries = self._renamedExternalEntries
+
+    def _transferFileToWork(self, externalFilePath, workFilePath, isText, textOptions):
+        """
+        Like `ScmPuncher._transferFileToWork()` but compare the SHA1 hash of
+        ``externalFilePath`` with the hash the work file got when it was punched the last
+        time, so the work file only has to be read if it has not been punched before.
+        """
+        assert externalFilePath is not None
+        assert workFilePath is not None
+        assert not isText or textOptions
+        relativeExternalPath = os.path.relpath(externalFilePath, self._externalFolderPath)
+        previousFileInfo = self._punchedFileInfoMap.get(relativeExternalPath) or self._relativePathToFileInfoMap.get(relativeExternalPath)
+        fileInfo = _historyFileInfo(externalFilePath, isText, textOptions, self.transferOptions, previousFileInfo)
+        externalDigest = fileInfo[3]
+        isWorkFile = os.path.isfile(workFilePath)
+        workDigest = self._workPathToDigestMap.get(workFilePath)
+        if (workDigest is None) and isWorkFile:
+            workDigest = self._sha1HexDigest(workFilePath)
+        result = (workDigest != externalDigest)
+        if not result:
+            _log.debug(u'  skip unchanged "%s"', workFilePath)
+        elif isWorkFile and not isText and self.transferOptions.isDeltaFile(externalFilePath):
+            self._updateWorkFile(externalFilePath, workFilePath)
+        else:
+            self._replaceWorkFile(externalFilePath, workFilePath, isText, textOptions)
+        self._punchedFileInfoMap[relativeExternalPath] = fileInfo
+        self._punchedWorkPathToDigestMap[workFilePath] = externalDigest
+        return result
 
     def punch(self, externalFolderPath, relativeWorkFolderPath="", includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+        """
+        Like `ScmPuncher.punch()` but use what is known about the work copy from the previous
+        punch and the entries and hashes found by `prepare()`, if any.
+        """
         assert externalFolderPath is not None
         assert relativeWorkFolderPath is not None
+        punchArguments = (relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
+        if punchArguments != self._knownPunchArguments:
+            self._forgetWorkCopy()
+        preparedSnapshot = self._takePreparedSnapshot(externalFolderPath, includePatternText, excludePatternText)
+        if preparedSnapshot is not None:
+            self._preparedEntries = preparedSnapshot.entries
+            self._punchedFileInfoMap = dict(preparedSnapshot.relativePathToFileInfoMap)
+        hasPunched = False
         try:
-            self._setExternalAndWorkEntries(externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
-            self._setAddedModifiedRemovedItems()
-            if self.moveMode != ScmPuncher.MoveNone:
-                self._setCopiedAndMovedEntries()
-            self._applyChangedEntries(self.textOptions)
+            result = super(HistoryScmPuncher, self).punch(externalFolderPath, relativeWorkFolderPath, includePatternText, excludePatternText, workOnlyPatternText)
+            hasPunched = True
         finally:
-            self._clear()
+            if hasPunched:
+                self._knownWorkEntries = self._punchedWorkEntries
+                self._knownPunchArguments = punchArguments
+                self._workPathToDigestMap = self._punchedWorkPathToDigestMap
+                self._relativePathToFileInfoMap = self._punchedFileInfoMap
+            else:
+                self._forgetWorkCopy()
+            self._clearPunchState()
+        return result
 
 
 class ScmWork(object):
@@ -1700,11 +4461,9 @@ class ScmWork(object):
         self.baseWorkQualifier = self.storage.absoluteQualifier(self.relativeQualifierInStorage)
         self.localTargetPath = localTargetPath
 
-        hasExistingWork = os.path.exists(self.localTargetPath)
-        if hasExistingWork and (checkOutAction == ScmWork.CheckOutActionReset):
-            self.purge()
-
-        if checkOutAction in (ScmWork.CheckOutActionCreate, ScmWork.CheckOutActionReset):
+        if checkOutAction == ScmWork.CheckOutActionReset:
+            self.checkout(True)
+        elif checkOutAction == ScmWork.CheckOutActionCreate:
             self.checkout()
         elif checkOutAction == ScmWork.CheckOutActionUpdate:
             self.update()
@@ -1717,23 +4476,112 @@ class ScmWork(object):
         """
         Check that work copy is up to date and no pending changes or messed
         up files are flowing around; otherwise, raise an `ScmError`. To remedy
-        the conditons `check()` complains about, use `reset()`.
+        the conditons `check()` complains about, use `reset()`. Temporary files
+        left over by an interrupted transfer are ignored because punching
+        removes them anyway.
         """
         assert relativePath is not None
         for statusEntry in self.status(relativePath):
-            if statusEntry.isResetable():
+            isTemporaryWorkFile = (statusEntry.status == ScmStatus.Unversioned) and _isTemporaryWorkFileName(os.path.basename(statusEntry.path))
+            if statusEntry.isResetable() and not isTemporaryWorkFile:
                 raise ScmPendingChangesError("pending changes in \"%s\" must be committed, use \"svn status\" for details." % self.localTargetPath)
 
-    def checkout(self, purge=False):
+    def checkout(self, purge=False, sparseFolderPaths=None):
         """
         Check out a work copy to ``localTargetPath``.
+
+        To check out only certain folders including all their contents, specify their relative
+        paths in ``sparseFolderPaths``, for example using
+        `antglob.AntPatternSet.staticFolderPaths()`. Folders leading to them are checked out
+        without any other contents.
+
+        If ``purge`` is ``True`` and ``localTargetPath`` already is a work copy of the same
+        repository with the same depth, reset it and switch it to ``baseWorkQualifier`` so only
+        the differences have to be obtained. Otherwise, purge it and check out everything again.
         """
-        _log.info(u'check out work copy at "%s"', self.localTargetPath)
+        hasSwitchedExistingWork = False
         if purge and os.path.exists(self.localTargetPath):
-            self.purge()
-        scmCommand = ["svn", "checkout", self.baseWorkQualifier, self.localTargetPath]
+            hasSwitchedExistingWork = self._switchExistingWork(sparseFolderPaths)
+            if not hasSwitchedExistingWork:
+                self.purge()
+        if not hasSwitchedExistingWork:
+            _log.info(u'check out work copy at "%s"', self.localTargetPath)
+            self._checkout(sparseFolderPaths)
+            if sparseFolderPaths is not None:
+                self._checkoutSparseFolders(sparseFolderPaths)
+
+    def _checkout(self, sparseFolderPaths):
+        scmCommand = ["svn", "checkout"]
+        if sparseFolderPaths is not None:
+            scmCommand.extend(["--depth", "empty"])
+        scmCommand.extend([self.baseWorkQualifier, self.localTargetPath])
+        run(scmCommand)
+
+    def _switchExistingWork(self, sparseFolderPaths):
+        """
+        Attempt to reset the existing work copy at ``localTargetPath`` and switch it to
+        ``baseWorkQualifier``. The result is ``False`` if the existing work copy has to be purged
+        because it is from a different repository, has a different depth or is broken.
+        """
+        result = False
+        try:
+            workInfo = self._info(self.localTargetPath)
+            depotInfo = self._info(self.baseWorkQualifier)
+        except ScmError, error:
+            _log.info(u'cannot reuse existing work copy at "%s": %s', self.localTargetPath, error)
+            workInfo = None
+        if workInfo is not None:
+            if sparseFolderPaths is None:
+                expectedDepth = 'infinity'
+            else:
+                expectedDepth = 'empty'
+            if workInfo.repositoryUuid != depotInfo.repositoryUuid:
+                _log.info(u'cannot reuse existing work copy at "%s" because it is from a different repository: %s', self.localTargetPath, workInfo.repositoryRoot)
+            elif workInfo.depth != expectedDepth:
+                _log.info(u'cannot reuse existing work copy at "%s" because its depth is %s instead of %s', self.localTargetPath, workInfo.depth, expectedDepth)
+            else:
+                try:
+                    self.reset()
+                    _log.info(u'switch work copy at "%s" to %s', self.localTargetPath, self.baseWorkQualifier)
+                    self._switch()
+                    if sparseFolderPaths is not None:
+                        self._checkoutSparseFolders(sparseFolderPaths)
+                    result = True
+                except (EnvironmentError, ScmError), error:
+                    _log.warning(u'cannot reuse existing work copy at "%s": %s', self.localTargetPath, error)
+        return result
+
+    def _info(self, pathOrQualifier):
+        """
+        `_SvnInfoContentHandler` with information about ``pathOrQualifier``, which can be a local
+        path or a qualifier in a repository.
+        """
+        svnInfoCommand = ["svn", "info", "--non-interactive", "--xml", pathOrQualifier]
+        result = _SvnInfoContentHandler()
+        _parseSvnXml(svnInfoCommand, result)
+        if result.depth is None:
+            # Qualifiers in a repository have no depth, and neither have work copies of older
+            # svn versions, which always use "infinity".
+            result.depth = 'infinity'
+        return result
+
+    def _switch(self):
+        scmCommand = ["svn", "switch", "--non-interactive", "--ignore-ancestry", self.baseWorkQualifier, self.localTargetPath]
         run(scmCommand)
 
+    def _checkoutSparseFolders(self, sparseFolderPaths):
+        assert sparseFolderPaths is not None
+        for depth, relativeFolderPaths in _sparseCheckoutSteps(sparseFolderPaths):
+            _log.info(u'  obtain %s with depth %s', _tools.oneOrOtherText(len(relativeFolderPaths), 'folder', 'folders'), depth)
+            self._setDepth(relativeFolderPaths, depth)
+
+    def _setDepth(self, relativePathsToUpdate, depth):
+        """
+        Update ``relativePathsToUpdate`` and change their sticky depth to ``depth``.
+        """
+        absolutePathsToUpdate = self.absolutePaths("paths to update", relativePathsToUpdate)
+        runWithPaths(["svn", "update", "--non-interactive", "--set-depth", depth], absolutePathsToUpdate, cwd=self.localTargetPath)
+
     def purge(self):
         """
         Remove work copy folder and all its contents. If the folder does not exist, do nothing.
@@ -1748,11 +4596,9 @@ class ScmWork(object):
         """
         _log.info(u'reset work copy at "%s"', self.localTargetPath)
         _log.debug(u'  clean up pending locks')
-        scmCommand = ["svn", "cleanup", "--non-interactive", self.localTargetPath]
-        run(scmCommand)
+        self._cleanup()
         _log.debug(u'  revert uncommited changes')
-        scmCommand = ["svn", "revert", "--recursive", "--non-interactive", self.localTargetPath]
-        run(scmCommand)
+        self._revert()
         _log.debug(u'  remove unversioned files and folders')
         folderPathsToRemove = []
         for statusItem in self.status(""):
@@ -1769,6 +4615,14 @@ class ScmWork(object):
             _log.debug(u'    remove folder "%s"', folderPathToRemove)
             shutil.rmtree(folderPathToRemove)
 
+    def _cleanup(self):
+        scmCommand = ["svn", "cleanup", "--non-interactive", self.localTargetPath]
+        run(scmCommand)
+
+    def _revert(self):
+        scmCommand = ["svn", "revert", "--recursive", "--non-interactive", self.localTargetPath]
+        run(scmCommand)
+
     def update(self, relativePathToUpdate=""):
         _log.info(u'update work copy at "%s"', self.localTargetPath)
         pathToUpdate = os.path.join(self.localTargetPath, relativePathToUpdate)
@@ -1823,18 +4677,20 @@ class ScmWork(object):
         run(svnMkdirCommand, cwd=self.localTargetPath)
 
     def move(self, relativeSourcePaths, relativeTargetPath, force=False):
+        """
+        Move ``relativeSourcePaths`` to ``relativeTargetPath``. If multiple source paths are
+        specified, the target must be an existing folder. Many source paths are split up into
+        multiple command calls as necessary.
+        """
         _log.debug(u'move: %s to "%s"', relativeSourcePaths, relativeTargetPath)
         assert relativeSourcePaths is not None
         assert relativeTargetPath is not None
-        svnAddCommand = ["svn", "move", "--non-interactive"]
+        svnMoveCommand = ["svn", "move", "--non-interactive"]
         if force:
-            svnAddCommand.append("--force")
+            svnMoveCommand.append("--force")
         if isinstance(relativeSourcePaths, types.StringTypes):
-            svnAddCommand.append(relativeSourcePaths)
-        else:
-            svnAddCommand.extend(relativeSourcePaths)
-        svnAddCommand.append(relativeTargetPath)
-        run(svnAddCommand, cwd=self.localTargetPath)
+            relativeSourcePaths = [relativeSourcePaths]
+        runWithPaths(svnMoveCommand, relativeSourcePaths, cwd=self.localTargetPath, trailingOptions=[relativeTargetPath])
 
     def remove(self, relativePathsToRemove, recursive=True, force=False):
         _log.info(u'remove %d items', len(relativePathsToRemove))
@@ -1850,95 +4706,639 @@ class ScmWork(object):
         runWithPaths(svnRemoveCommand, relativePathsToRemove, cwd=self.localTargetPath)
 
     def commit(self, relativePathsToCommit, message, recursive=True):
+        """
+        Commit ``relativePathsToCommit`` in a single revision. If ``recursive`` is ``False``,
+        commit only the specified paths themselves but not any changes in the folders below
+        them. In that case all changed paths have to be specified, for example using
+        `ScmChanges.relativePathsToCommit()`. To commit `ScmChanges`, use `commitChanges()`.
+        """
         assert relativePathsToCommit is not None
         assert message is not None
         _log.debug(u'commit %d items', len(relativePathsToCommit))
         _log.debug(u'  commit: %s', relativePathsToCommit)
         svnCommitCommand = ["svn", "commit", "--non-interactive"]
         if not recursive:
-            svnCommitCommand.append("--non-recursive")
+            svnCommitCommand.extend(["--depth", "empty"])
         svnCommitCommand.extend(["--message", message])
         pathsToCommit = self.absolutePaths("paths to commit", relativePathsToCommit)
-        runWithPaths(svnCommitCommand, pathsToCommit, cwd=self.localTargetPath)
+        runWithTargets(svnCommitCommand, pathsToCommit, cwd=self.localTargetPath)
+
+    def commitChanges(self, changes, message):
+        """
+        Commit the paths changed by the `ScmChanges` ``changes`` using ``message`` in a single
+        revision. Only the changed paths themselves are committed unless folders have been
+        removed, which Subversion refuses to do in a non recursive commit. In that case all
+        paths are committed recursively, which does not commit anything else because removed
+        folders only contain deletions and the other paths are files or folders added or
+        moved together with their contents.
+        """
+        assert changes is not None
+        assert message is not None
+        relativePathsToCommitRecursively = changes.relativePathsToCommitRecursively()
+        relativePathsToCommit = sorted(changes.relativePathsToCommit() + relativePathsToCommitRecursively)
+        if relativePathsToCommit:
+            self.commit(relativePathsToCommit, message, recursive=bool(relativePathsToCommitRecursively))
+
+    def importFolder(self, folderPathToImport, message):
+        """
+        Commit the contents of the unversioned folder ``folderPathToImport`` to
+        ``baseWorkQualifier`` in a single revision. This requires that the repository does not
+        contain any of the entries to import yet. The work copy remains unchanged; use
+        `update()` to obtain the imported entries.
+        """
+        assert folderPathToImport is not None
+        assert message is not None
+        _log.info(u'import "%s" to %s', folderPathToImport, self.baseWorkQualifier)
+        svnImportCommand = ["svn", "import", "--non-interactive", "--no-ignore", "--message", message, folderPathToImport, self.baseWorkQualifier]
+        run(svnImportCommand)
+
+    def isSpecialPath(self, path):
+        name = os.path.basename(path)
+        return self.specialPathPatternSet.matches(name)
+
+    def listStorage(self, relativePathsToList, recursive=True):
+        absolutePathsToList = self.absolutePaths("paths to list", relativePathsToList)
+        scmListCommand = ["svn", "list"]
+        if recursive:
+            scmListCommand.append("--recursive")
+        scmListCommand.extend(absolutePathsToList)
+        result = run(scmListCommand, returnStdout=True)
+        return result
+
+    def list(self, relativePathsToList, recursive=True, onlyFiles=True):
+        """
+        List of all files and folders found in the local working copy including ignored files but
+        excluding special files used by the SCM (for instance ".svn" for Subversion).
+        """
+        absolutePathsToList = self.absolutePaths("paths to list", relativePathsToList)
+        for pathToList in absolutePathsToList:
+            for listedPath in self._list(pathToList, recursive, onlyFiles):
+                yield listedPath
+
+    def _list(self, folderPathToList, recursive, onlyFiles):
+        for path in os.listdir(folderPathToList):
+            if not self.isSpecialPath(path):
+                if os.path.isdir(path):
+                    if not onlyFiles:
+                        yield path
+                    for recursedPath in self._list(path, recursive, onlyFiles):
+                        yield recursedPath
+                else:
+                    yield path
+
+    def findEntries(self, relativeFolderToList="", patternSetToMatch=None):
+        """
+        List of file system entries starting with ``relativeFolderPathToList`` excluding special
+        entries used internally by the SCM (such as for example ".svn" for Subversion).
+        """
+        if patternSetToMatch:
+            actualPatternSetToMatch = patternSetToMatch
+        else:
+            actualPatternSetToMatch = antglob.AntPatternSet()
+        folderPathToList = self.absolutePath("folder to list", relativeFolderToList)
+        for entry in actualPatternSetToMatch.ifindEntries(folderPathToList):
+            yield entry
+
+    def status(self, relativePathsToExamine, recursive=True):
+        absolutePathsToExamine = self.absolutePaths("paths to examine", relativePathsToExamine)
+        svnStatusCommand = ["svn", "status", "--non-interactive", "--verbose", "--xml"]
+        if not recursive:
+            svnStatusCommand.append("--non-recursive")
+        svnStatusCommand.extend(absolutePathsToExamine)
+        statusHandler = _SvnStatusContentHandler()
+        _parseSvnXml(svnStatusCommand, statusHandler, cwd=self.localTargetPath)
+        for statusItem in statusHandler.statusItems:
+            yield statusItem
+
+    def exportTo(self, targetFolderPath, relativePathToExport="", clear=False):
+        """
+        Export contents of work copy to ``targetFolderPath``. If ``clear`` is ``True``,
+        remove a possibly existing target folder.
+        """
+        assert targetFolderPath
+        folderPathToExport = self.absolutePath("export path", relativePathToExport)
+        if clear:
+            _tools.removeFolder(targetFolderPath)
+        _log.info(u'export "%s" to "%s"', folderPathToExport, targetFolderPath)
+        shutil.copytree(folderPathToExport, targetFolderPath, ignore=shutil.ignore_patterns(".svn", "_svn"))
+
+
+class SvnBindingsScmWork(ScmWork):
+    """
+    Subversion work copy using the Subversion Python bindings instead of the ``svn`` command
+    line client. This saves the time to start a process, load the configuration and open the
+    work copy for each operation because a single client context is kept for the whole
+    lifetime of the work copy.
+
+    The Python bindings are not always available, so use `scmWorkClass()` to get either this
+    class or `ScmWork` as fallback.
+    """
+    def __init__(self, storage, relativeQualifierInStorage, localTargetPath, checkOutAction=ScmWork.CheckOutActionSkip):
+        if not _HasSvnBindings:
+            raise ScmError(u'Subversion Python bindings must be installed to use %s' % self.__class__.__name__)
+        self._context = svn.client.create_context()
+        self._context.auth_baton = svn.core.svn_auth_open([
+            svn.client.get_simple_provider(),
+            svn.client.get_username_provider()
+        ])
+        self._context.config = svn.core.svn_config_get_config(None)
+        self._commitMessage = None
+        self._context.log_msg_func3 = svn.client.svn_swig_py_get_commit_log_func
+        self._context.log_msg_baton3 = self._getCommitMessage
+        self._headRevision = svn.core.svn_opt_revision_t()
+        self._headRevision.kind = svn.core.svn_opt_revision_head
+        self._svnStatusToStatusMap = {
+            svn.wc.svn_wc_status_added: ScmStatus.Added,
+            svn.wc.svn_wc_status_conflicted: ScmStatus.Conflicted,
+            svn.wc.svn_wc_status_deleted: ScmStatus.Removed,
+            svn.wc.svn_wc_status_external: ScmStatus.External,
+            svn.wc.svn_wc_status_ignored: ScmStatus.Ignored,
+            svn.wc.svn_wc_status_incomplete: ScmStatus.Incomplete,
+            svn.wc.svn_wc_status_merged: ScmStatus.Merged,
+            svn.wc.svn_wc_status_missing: ScmStatus.Missing,
+            svn.wc.svn_wc_status_modified: ScmStatus.Modified,
+            svn.wc.svn_wc_status_none: None,
+            svn.wc.svn_wc_status_normal: ScmStatus.Normal,
+            svn.wc.svn_wc_status_obstructed: ScmStatus.Obstructed,
+            svn.wc.svn_wc_status_replaced: ScmStatus.Replaced,
+            svn.wc.svn_wc_status_unversioned: ScmStatus.Unversioned
+        }
+        super(SvnBindingsScmWork, self).__init__(storage, relativeQualifierInStorage, localTargetPath, checkOutAction)
+
+    def _getCommitMessage(self, items, pool):
+        assert self._commitMessage is not None
+        return self._commitMessage
+
+    def _svnPath(self, path):
+        """
+        ``path`` in the canonical UTF-8 form the Subversion API expects.
+        """
+        assert path is not None
+        result = path
+        if isinstance(result, types.UnicodeType):
+            if _consoleNormalization is not None:
+                result = unicodedata.normalize(_consoleNormalization, result)
+            result = result.encode('utf-8')
+        result = svn.core.svn_path_canonicalize(result)
+        return result
+
+    def _svnPaths(self, name, relativePaths):
+        return [self._svnPath(path) for path in self.absolutePaths(name, relativePaths)]
+
+    def _perform(self, operationName, function, *arguments):
+        """
+        Result of ``function(*arguments)`` with Subversion errors turned into `ScmError`.
+        """
+        _log.debug(u'perform svn %s', operationName)
+        try:
+            result = function(*arguments)
+        except svn.core.SubversionException, error:
+            raise ScmError(u'cannot perform svn %s: %s' % (operationName, error))
+        return result
+
+    def _checkout(self, sparseFolderPaths):
+        if sparseFolderPaths is None:
+            depth = svn.core.svn_depth_infinity
+        else:
+            depth = svn.core.svn_depth_empty
+        self._perform(
+            'checkout', svn.client.checkout3, self._svnPath(self.baseWorkQualifier),
+            self._svnPath(self.localTargetPath), self._headRevision, self._headRevision,
+            depth, False, False, self._context
+        )
+
+    def _switch(self):
+        # Unlike later versions, switch2 ignores the ancestry of the work copy.
+        self._perform(
+            'switch', svn.client.switch2, self._svnPath(self.localTargetPath),
+            self._svnPath(self.baseWorkQualifier), self._headRevision, self._headRevision,
+            svn.core.svn_depth_unknown, False, False, False, self._context
+        )
+
+    def _setDepth(self, relativePathsToUpdate, depth):
+        pathsToUpdate = self._svnPaths("paths to update", relativePathsToUpdate)
+        self._perform('update', svn.client.update3, pathsToUpdate, self._headRevision, svn.core.svn_depth_from_word(depth), True, False, False, self._context)
+
+    def _cleanup(self):
+        self._perform('cleanup', svn.client.cleanup, self._svnPath(self.localTargetPath), self._context)
+
+    def _revert(self):
+        self._perform('revert', svn.client.revert2, [self._svnPath(self.localTargetPath)], svn.core.svn_depth_infinity, None, self._context)
+
+    def update(self, relativePathToUpdate=""):
+        _log.info(u'update work copy at "%s"', self.localTargetPath)
+        pathsToUpdate = self._svnPaths("path to update", relativePathToUpdate)
+        self._perform('update', svn.client.update3, pathsToUpdate, self._headRevision, svn.core.svn_depth_unknown, False, False, False, self._context)
+
+    def add(self, relativePathsToAdd, recursive=True):
+        assert relativePathsToAdd is not None
+
+        _log.info(u'add %d items', len(relativePathsToAdd))
+        _log.debug(u'  add: %r', relativePathsToAdd)
+        if recursive:
+            depth = svn.core.svn_depth_infinity
+        else:
+            depth = svn.core.svn_depth_empty
+        for pathToAdd in self._svnPaths("paths to add", relativePathsToAdd):
+            self._perform('add', svn.client.add4, pathToAdd, depth, False, False, False, self._context)
+
+    def mkdir(self, relativeFolderPathToCreate):
+        _log.debug(u'mkdir: "%s"', relativeFolderPathToCreate)
+        folderPathsToCreate = self._svnPaths("folder to create", relativeFolderPathToCreate)
+        self._perform('mkdir', svn.client.mkdir3, folderPathsToCreate, False, None, self._context)
+
+    def move(self, relativeSourcePaths, relativeTargetPath, force=False):
+        _log.debug(u'move: %s to "%s"', relativeSourcePaths, relativeTargetPath)
+        assert relativeSourcePaths is not None
+        assert relativeTargetPath is not None
+        sourcePaths = self._svnPaths("paths to move", relativeSourcePaths)
+        targetPath = self.absolutePath("move target", relativeTargetPath)
+        # Similar to "svn move", move into the target folder if it already exists.
+        isMoveAsChild = (len(sourcePaths) > 1) or os.path.isdir(targetPath)
+        self._perform('move', svn.client.move5, sourcePaths, self._svnPath(targetPath), force, isMoveAsChild, False, None, self._context)
+
+    def remove(self, relativePathsToRemove, recursive=True, force=False):
+        _log.info(u'remove %d items', len(relativePathsToRemove))
+        _log.debug(u'  remove: %s', relativePathsToRemove)
+        assert relativePathsToRemove is not None
+        # Note: Subversion always removes folders recursively, so ``recursive`` has no effect.
+        pathsToRemove = self._svnPaths("paths to remove", relativePathsToRemove)
+        self._perform('remove', svn.client.delete3, pathsToRemove, force, False, None, self._context)
+
+    def commit(self, relativePathsToCommit, message, recursive=True):
+        assert relativePathsToCommit is not None
+        assert message is not None
+        _log.debug(u'commit %d items', len(relativePathsToCommit))
+        _log.debug(u'  commit: %s', relativePathsToCommit)
+        if recursive:
+            depth = svn.core.svn_depth_infinity
+        else:
+            depth = svn.core.svn_depth_empty
+        pathsToCommit = self._svnPaths("paths to commit", relativePathsToCommit)
+        if isinstance(message, types.UnicodeType):
+            message = message.encode('utf-8')
+        self._commitMessage = message
+        try:
+            self._perform('commit', svn.client.commit4, pathsToCommit, depth, False, False, None, None, self._context)
+        finally:
+            self._commitMessage = None
+
+    def importFolder(self, folderPathToImport, message):
+        assert folderPathToImport is not None
+        assert message is not None
+        _log.info(u'import "%s" to %s', folderPathToImport, self.baseWorkQualifier)
+        if isinstance(message, types.UnicodeType):
+            message = message.encode('utf-8')
+        self._commitMessage = message
+        try:
+            self._perform(
+                'import', svn.client.import3, self._svnPath(folderPathToImport), self._svnPath(self.baseWorkQualifier),
+                svn.core.svn_depth_infinity, True, False, None, self._context
+            )
+        finally:
+            self._commitMessage = None
+
+    def status(self, relativePathsToExamine, recursive=True):
+        result = []
+
+        def addStatus(path, svnStatus):
+            statusItem = ScmStatus(path.decode('utf-8'))
+            statusItem.status = self._svnStatusToStatusMap[svnStatus.text_status]
+            statusItem.propertiesStatus = self._svnStatusToStatusMap[svnStatus.prop_status]
+            result.append(statusItem)
+
+        for pathToExamine in self._svnPaths("paths to examine", relativePathsToExamine):
+            self._perform('status', svn.client.status2, pathToExamine, self._headRevision, addStatus, recursive, True, False, False, True, self._context)
+        return result
+
+
+def scmWorkClass(backend='auto'):
+    """
+    The `ScmWork` class to use for ``backend``, which can be one of:
+
+    * 'auto': use the Subversion Python bindings if they are installed and otherwise the
+      ``svn`` command line client
+    * 'bindings': use the Subversion Python bindings
+    * 'cli': use the ``svn`` command line client
+    """
+    assert backend in _ValidBackends, 'backend=%r' % backend
+    if backend == 'cli':
+        result = ScmWork
+    elif backend == 'bindings':
+        if not _HasSvnBindings:
+            raise ScmError(u'Subversion Python bindings must be installed to use backend %r' % backend)
+        result = SvnBindingsScmWork
+    elif _HasSvnBindings:
+        result = SvnBindingsScmWork
+    else:
+        result = ScmWork
+    return result
+
+
+class RemoteEntry(antglob.FileSystemEntry):
+    """
+    Entry in a repository folder as listed by ``svn list``. Unlike an `antglob.FileSystemEntry`,
+    the entry does not have to exist in the local file system. If the SHA1 hash of a file is
+    known, it is available in ``checksum``; otherwise ``checksum`` is ``None``.
+    """
+    def __init__(self, parts, kind, size=None, checksum=None):
+        assert kind in (antglob.FileSystemEntry.File, antglob.FileSystemEntry.Folder)
+        self._baseFolderPath = ''
+        self.setParts(parts)
+        self._kind = kind
+        self.size = size
+        self.timeModified = None
+        self.checksum = checksum
+
+
+class _RemoteFileSystem(object):
+    """
+    Tree of `RemoteEntry`s that can be scanned using `antglob.AntPatternSet.ifind()` similar to
+    `antglob.LocalFileSystem`.
+    """
+    def __init__(self, entries):
+        assert entries is not None
+        self._folderPathToNamesMap = {u'': []}
+        self._pathToEntryMap = {}
+        for entry in entries:
+            if entry.kind == antglob.FileSystemEntry.Folder:
+                nameParts = entry.parts[:-1]
+                folderPath = antglob.resolvedPathParts(nameParts)
+                if folderPath not in self._folderPathToNamesMap:
+                    self._folderPathToNamesMap[folderPath] = []
+            else:
+                nameParts = entry.parts
+            parentFolderPath = antglob.resolvedPathParts(nameParts[:-1])
+            names = self._folderPathToNamesMap.get(parentFolderPath)
+            if names is None:
+                self._folderPathToNamesMap[parentFolderPath] = [nameParts[-1]]
+            else:
+                names.append(nameParts[-1])
+            self._pathToEntryMap[entry.relativePath] = entry
+
+    def listdir(self, folderPath):
+        return self._folderPathToNamesMap[folderPath]
+
+    def isdir(self, path):
+        return path in self._folderPathToNamesMap
+
+    def entryFor(self, path):
+        """
+        The `RemoteEntry` for ``path`` as returned by `antglob.AntPatternSet.ifind()`.
+        """
+        return self._pathToEntryMap[path]
+
+
+class RemoteScmWork(object):
+    """
+    Folder in an `ScmStorage` that `RemoteScmPuncher` can punch into directly without a local
+    work copy.
+    """
+    #: Name of the Subversion property storing the SHA1 hash of punched files.
+    ChecksumPropertyName = u'scunch:sha1'
 
-    def isSpecialPath(self, path):
-        name = os.path.basename(path)
-        return self.specialPathPatternSet.matches(name)
+    def __init__(self, storage, relativeQualifierInStorage):
+        assert storage is not None
+        assert relativeQualifierInStorage is not None
+        self.storage = storage
+        self.relativeQualifierInStorage = relativeQualifierInStorage
+        self.baseWorkQualifier = self.storage.absoluteQualifier(self.relativeQualifierInStorage)
 
-    def listStorage(self, relativePathsToList, recursive=True):
-        absolutePathsToList = self.absolutePaths("paths to list", relativePathsToList)
-        scmListCommand = ["svn", "list"]
-        if recursive:
-            scmListCommand.append("--recursive")
-        scmListCommand.extend(absolutePathsToList)
-        result = run(scmListCommand, returnStdout=True)
+    def absolutePath(self, name, relativePath):
+        """
+        Qualifier of ``relativePath`` in the repository.
+        """
+        assert name
+        if relativePath is None:
+            raise ScmError("%s must not be %r" % (name, None))
+        result = self.baseWorkQualifier.rstrip(u'/')
+        relativeQualifier = relativePath.replace(os.sep, u'/').strip(u'/')
+        if relativeQualifier:
+            result += u'/' + relativeQualifier
         return result
 
-    def list(self, relativePathsToList, recursive=True, onlyFiles=True):
+    def listEntries(self, relativeFolderToList=""):
         """
-        List of all files and folders found in the local working copy including ignored files but
-        excluding special files used by the SCM (for instance ".svn" for Subversion).
+        List of `RemoteEntry`s for all files and folders in ``relativeFolderToList`` including
+        their checksum if known.
         """
-        absolutePathsToList = self.absolutePaths("paths to list", relativePathsToList)
-        for pathToList in absolutePathsToList:
-            for listedPath in self._list(pathToList, recursive, onlyFiles):
-                yield listedPath
+        folderQualifierToList = self.absolutePath("folder to list", relativeFolderToList)
+        _log.info(u'list repository folder %s', folderQualifierToList)
+        listHandler = _SvnListContentHandler()
+        _parseSvnXml(["svn", "list", "--non-interactive", "--recursive", "--xml", folderQualifierToList], listHandler)
+        propertiesHandler = _SvnPropertiesContentHandler()
+        _parseSvnXml(["svn", "propget", "--non-interactive", "--recursive", "--xml", RemoteScmWork.ChecksumPropertyName, folderQualifierToList], propertiesHandler)
+
+        # Map the URL escaped target qualifiers to names as used by "svn list".
+        listQualifier = listHandler.listQualifier.rstrip(u'/') + u'/'
+        nameToChecksumMap = {}
+        for targetQualifier, checksum in propertiesHandler.targetToValueMap.items():
+            if targetQualifier.startswith(listQualifier):
+                escapedName = targetQualifier[len(listQualifier):].encode('utf-8')
+                nameToChecksumMap[urllib.unquote(escapedName).decode('utf-8')] = checksum
+            else:
+                _log.warning(u'ignored checksum for target outside of listed folder: %s', targetQualifier)
 
-    def _list(self, folderPathToList, recursive, onlyFiles):
-        for path in os.listdir(folderPathToList):
-            if not self.isSpecialPath(path):
-                if os.path.isdir(path):
-                    if not onlyFiles:
-                        yield path
-                    for recursedPath in self._list(path, recursive, onlyFiles):
-                        yield recursedPath
-                else:
-                    yield path
+        result = []
+        for kind, name, size in listHandler.entries:
+            parts = name.split(u'/')
+            if kind == 'dir':
+                parts.append(u'')
+                result.append(RemoteEntry(parts, antglob.FileSystemEntry.Folder))
+            else:
+                result.append(RemoteEntry(parts, antglob.FileSystemEntry.File, size, nameToChecksumMap.get(name)))
+        return result
 
     def findEntries(self, relativeFolderToList="", patternSetToMatch=None):
         """
-        List of file system entries starting with ``relativeFolderPathToList`` excluding special
-        entries used internally by the SCM (such as for example ".svn" for Subversion).
+        List of `RemoteEntry`s in ``relativeFolderToList`` matching ``patternSetToMatch`` with
+        the same rules as `ScmWork.findEntries()`.
         """
         if patternSetToMatch:
             actualPatternSetToMatch = patternSetToMatch
         else:
             actualPatternSetToMatch = antglob.AntPatternSet()
-        folderPathToList = self.absolutePath("folder to list", relativeFolderToList)
-        for entry in actualPatternSetToMatch.ifindEntries(folderPathToList):
-            yield entry
+        remoteFileSystem = _RemoteFileSystem(self.listEntries(relativeFolderToList))
+        for path in actualPatternSetToMatch.ifind(u'', True, remoteFileSystem):
+            yield remoteFileSystem.entryFor(path)
 
-    def status(self, relativePathsToExamine, recursive=True):
-        absolutePathsToExamine = self.absolutePaths("paths to examine", relativePathsToExamine)
-        svnStatusCommand = ["svn", "status", "--non-interactive", "--verbose", "--xml"]
-        if not recursive:
-            svnStatusCommand.append("--non-recursive")
-        svnStatusCommand.extend(absolutePathsToExamine)
-        statusXml = u''
-        for statusLine in run(svnStatusCommand, returnStdout=True, cwd=self.localTargetPath):
-            statusXml += statusLine + os.linesep
-        statusXml = statusXml.encode('utf-8')
-        statusHandler = _SvnStatusContentHandler()
-        xml.sax.parseString(statusXml, statusHandler)
-        for statusItem in statusHandler.statusItems:
-            yield statusItem
+    def exportFile(self, relativeFilePath, targetFilePath):
+        """
+        Export the current content of the file at ``relativeFilePath`` to ``targetFilePath``.
+        """
+        fileQualifierToExport = self.absolutePath("file to export", relativeFilePath)
+        # Append "@" so names containing "@" are not mistaken for a peg revision.
+        run(["svn", "export", "--non-interactive", "--force", "--quiet", fileQualifierToExport + u'@', targetFilePath])
 
-    def exportTo(self, targetFolderPath, relativePathToExport="", clear=False):
+    def commitActions(self, actions, message):
         """
-        Export contents of work copy to ``targetFolderPath``. If ``clear`` is ``True``,
-        remove a possibly existing target folder.
+        Perform ``actions`` using ``svnmucc`` and commit them in a single revision. The actions
+        are a list of ``svnmucc`` arguments with paths relative to the work folder, for example
+        ``['mkdir', 'docs', 'rm', 'old.txt']``.
         """
-        assert targetFolderPath
-        folderPathToExport = self.absolutePath("export path", relativePathToExport)
-        if clear:
-            _tools.removeFolder(targetFolderPath)
-        _log.info(u'export "%s" to "%s"', folderPathToExport, targetFolderPath)
-        shutil.copytree(folderPathToExport, targetFolderPath, ignore=shutil.ignore_patterns(".svn", "_svn"))
+        assert actions
+        assert message is not None
+        svnmuccCommand = ["svnmucc", "--non-interactive", "--root-url", self.baseWorkQualifier, "--message", message]
+        runWithTargets(svnmuccCommand, actions, targetsOption="--extra-args")
+
+
+class RemoteScmPuncher(ScmPuncher):
+    """
+    Puncher to update a folder in a repository described by a `RemoteScmWork` directly without
+    a local work copy. All changes are committed in a single revision using ``svnmucc``.
+
+    Because ``svn list`` does not provide any checksums, the puncher stores the SHA1 hash of
+    each file it puts into the repository in the property ``scunch:sha1``. Files without this
+    property and the same size as the external file are exported and compared; if they turn
+    out to be the same, the property is added so the next punch does not have to export them
+    again.
+    """
+    def __init__(self, remoteWork, message=u'Punched recent changes.'):
+        assert message is not None
+        super(RemoteScmPuncher, self).__init__(remoteWork)
+        self.message = message
+        self._stagingFolderPath = None
+
+    def _remotePathFor(self, entry):
+        assert entry is not None
+        return entry._relativePath.replace(os.sep, u'/').rstrip(u'/')
+
+    def _withoutTemporaryWorkFiles(self, workEntries):
+        # Temporary files are only written to local work copies, never to the repository.
+        return workEntries
+
+    def _stagedContentPath(self, entryToPut, textOptions):
+        """
+        Path of a file containing the content to put into the repository for ``entryToPut``.
+        For text files, this is a converted copy in the staging folder.
+        """
+        assert entryToPut is not None
+        assert self._stagingFolderPath is not None
+        result = self._externalPathFor(entryToPut)
+        if textOptions and textOptions.isText(entryToPut):
+            stagedFd, stagedPath = tempfile.mkstemp(prefix="put_", dir=self._stagingFolderPath)
+            os.close(stagedFd)
+            self._copyTextFile(result, stagedPath, textOptions)
+            result = stagedPath
+        return result
+
+    def _hasSameRemoteContent(self, remoteEntry, contentPath, checksum):
+        """
+        ``True`` if the file described by ``remoteEntry`` already has the content of the file at
+        ``contentPath`` with the SHA1 hash ``checksum``.
+        """
+        assert remoteEntry is not None
+        assert contentPath is not None
+        assert checksum is not None
+        if remoteEntry.checksum is not None:
+            result = (remoteEntry.checksum == checksum)
+        elif remoteEntry.size != os.path.getsize(contentPath):
+            result = False
+        else:
+            exportedFd, exportedPath = tempfile.mkstemp(prefix="export_", dir=self._stagingFolderPath)
+            os.close(exportedFd)
+            try:
+                self.scmWork.exportFile(remoteEntry._relativePath, exportedPath)
+                result = self._hasSameBinaryContent(contentPath, exportedPath)
+            finally:
+                _removeTemporaryFile(exportedPath)
+        return result
+
+    def _checksumActions(self, entry, checksum):
+        return ['propset', RemoteScmWork.ChecksumPropertyName, checksum, self._remotePathFor(entry)]
+
+    def _putActions(self, entryToPut, contentPath, checksum):
+        return ['put', contentPath, self._remotePathFor(entryToPut)] + self._checksumActions(entryToPut, checksum)
+
+    def _isInRemovedFolder(self, remotePath, removedFolderPaths):
+        result = False
+        remoteParentPath = posixpath.dirname(remotePath)
+        while remoteParentPath and not result:
+            result = (remoteParentPath in removedFolderPaths)
+            remoteParentPath = posixpath.dirname(remoteParentPath)
+        return result
 
+    def _findExternalEntries(self, externalFolderPath, patternSet):
+        if self._isExternalArchive():
+            raise ScmError(u'archive must be extracted to punch it directly into the repository: "%s"' % externalFolderPath)
+        return super(RemoteScmPuncher, self)._findExternalEntries(externalFolderPath, patternSet)
 
-def createScmWork(workFolderPath):
+    def _applyChangedEntries(self, textOptions):
+        _log.info(u'punch modifications into repository')
+        result = ScmChanges()
+        actions = []
+        workEntryMap = dict((workEntry, workEntry) for workEntry in self.workEntries)
+        self._stagingFolderPath = tempfile.mkdtemp(prefix="scunch_remote_")
+        try:
+            # Remove folders and files first so a file can be replaced by a folder of the same
+            # name and the other way round. Skip entries in removed folders, which svnmucc would
+            # not be able to find anymore.
+            removedFolderPaths = set()
+            for entryToRemove in sorted(self._entriesToRemove):
+                remotePath = self._remotePathFor(entryToRemove)
+                if not self._isInRemovedFolder(remotePath, removedFolderPaths):
+                    _log.info(u'  remove "%s"', entryToRemove._relativePath)
+                    actions.extend(['rm', remotePath])
+                    if entryToRemove.kind == antglob.FileSystemEntry.Folder:
+                        removedFolderPaths.add(remotePath)
+                result.removedPaths.append(entryToRemove._relativePath)
+            for entryToTransfer in sorted(self._entriesToTransfer):
+                if entryToTransfer.kind == antglob.FileSystemEntry.File:
+                    contentPath = self._stagedContentPath(entryToTransfer, textOptions)
+                    checksum = self._sha1HexDigest(contentPath)
+                    workEntry = workEntryMap[entryToTransfer]
+                    if self._hasSameRemoteContent(workEntry, contentPath, checksum):
+                        _log.debug(u'  skip unchanged "%s"', entryToTransfer._relativePath)
+                        if workEntry.checksum is None:
+                            actions.extend(self._checksumActions(entryToTransfer, checksum))
+                    else:
+                        _log.info(u'  transfer "%s"', entryToTransfer._relativePath)
+                        actions.extend(self._putActions(entryToTransfer, contentPath, checksum))
+                        result.modifiedPaths.append(entryToTransfer._relativePath)
+            for entryToAdd in sorted(self._entriesToAdd):
+                _log.info(u'  add "%s"', entryToAdd._relativePath)
+                if entryToAdd.kind == antglob.FileSystemEntry.Folder:
+                    actions.extend(['mkdir', self._remotePathFor(entryToAdd)])
+                else:
+                    contentPath = self._stagedContentPath(entryToAdd, textOptions)
+                    actions.extend(self._putActions(entryToAdd, contentPath, self._sha1HexDigest(contentPath)))
+                result.addedPaths.append(entryToAdd._relativePath)
+            if self._entriesToMove:
+                for sourceEntryToMove, targetEntryToMove in sorted(self._entriesToMove):
+                    _log.info(u'  move "%s" to "%s"', sourceEntryToMove._relativePath, targetEntryToMove._relativePath)
+                    sourceRemotePath = self._remotePathFor(sourceEntryToMove)
+                    targetRemotePath = self._remotePathFor(targetEntryToMove)
+                    if self._isInRemovedFolder(sourceRemotePath, removedFolderPaths):
+                        # The source already is gone with its folder, so copy it from the
+                        # revision the punch is based on.
+                        actions.extend(['cp', 'HEAD', sourceRemotePath, targetRemotePath])
+                    else:
+                        actions.extend(['mv', sourceRemotePath, targetRemotePath])
+                    contentPath = self._stagedContentPath(targetEntryToMove, textOptions)
+                    checksum = self._sha1HexDigest(contentPath)
+                    if not self._hasSameRemoteContent(sourceEntryToMove, contentPath, checksum):
+                        actions.extend(self._putActions(targetEntryToMove, contentPath, checksum))
+                    elif sourceEntryToMove.checksum is None:
+                        actions.extend(self._checksumActions(targetEntryToMove, checksum))
+                    result.movedPaths.append((sourceEntryToMove._relativePath, targetEntryToMove._relativePath))
+            if len(result) > 0:
+                _log.info(u'commit %s to %s', _tools.oneOrOtherText(len(result), u'change', u'changes'), self.scmWork.baseWorkQualifier)
+                self.scmWork.commitActions(actions, self.message)
+            elif actions:
+                _log.info(u'commit checksums of unchanged files to %s', self.scmWork.baseWorkQualifier)
+                self.scmWork.commitActions(actions, self.message)
+            else:
+                _log.info(u'skip commit because nothing changed')
+        finally:
+            _tools.removeFolder(self._stagingFolderPath)
+            self._stagingFolderPath = None
+        return result
+
+
+def createScmWork(workFolderPath, backend='auto'):
     """
-    Create an `ScmWork` from an existing work copy located at ``workFolderPath``.
+    Create an `ScmWork` from an existing work copy located at ``workFolderPath``. To choose
+    how to access the work copy, specify a ``backend`` as described with `scmWorkClass()`.
     """
     SvnUrlKey = "URL: "
     scmStorageQualifier = None
@@ -1955,14 +5355,15 @@ def createScmWork(workFolderPath):
     if scmStorageQualifier is None:
         raise ScmError("folder must be a work copy: \"%s\"" % workFolderPath)
     scmStorage = ScmStorage(scmStorageQualifier)
-    result = ScmWork(scmStorage, "", workFolderPath, ScmWork.CheckOutActionSkip)
+    result = scmWorkClass(backend)(scmStorage, "", workFolderPath, ScmWork.CheckOutActionSkip)
     return result
 
 
-def scunch(sourceFolderPath, scmWork, textOptions=None, moveMode=ScmPuncher.MoveName, nameTransformation=IdentityNameTransformation, includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+def scunch(sourceFolderPath, scmWork, textOptions=None, moveMode=ScmPuncher.MoveName, nameTransformation=IdentityNameTransformation, includePatternText=None, excludePatternText=None, workOnlyPatternText=None, importMessage=None, journalPath=None, snapshotPath=None, transferWorkerCount=1, transferOptions=None, sourceEntries=None):
     """
     Punch files from unversioned folder ``sourceFolderPath`` into a `ScmWork` work copy
-    ``scmWork``.
+    ``scmWork``. Instead of a folder, ``sourceFolderPath`` can also be a tar or zip archive,
+    which is read without extracting it as described in `_archive`.
 
     To post process text files, specify `TextOptions` in ``textOptions``.
 
@@ -1980,6 +5381,29 @@ def scunch(sourceFolderPath, scmWork, textOptions=None, moveMode=ScmPuncher.Move
     To preserve files in the work copy even when their are no such files in ``sourceFolderPath``,
     specify them usin a ant-like pattern in ``workOnlyPattern``.
 
+    To commit the files directly using a single ``svn import`` in case the work copy is empty,
+    specify the commit message in ``importMessage``. This is a lot faster than copying and
+    adding each file to the work copy. To obtain the imported files, the work copy has to be
+    updated afterwards.
+
+    To be able to continue an interrupted punch using `scunchResume()`, specify the path of a
+    `PunchJournal` in ``journalPath``.
+
+    To scan only the folders in ``sourceFolderPath`` that changed since the previous call,
+    specify the path of a file to store an `antglob.SnapshotFileSystem` in ``snapshotPath``.
+
+    To transfer several files to the work copy at the same time, which is faster for many small
+    files on network storage, specify the number of threads in ``transferWorkerCount``.
+
+    To change how files are read and written, for example to keep them out of the page cache,
+    specify `TransferOptions` in ``transferOptions``.
+
+    If the entries of ``sourceFolderPath`` have already been found using the same patterns,
+    for example by `findSourceEntries()`, pass them in ``sourceEntries`` to not scan the folder
+    again.
+
+    The result is `ScmChanges` describing the paths that have to be committed.
+
     See also: `ScmPuncher`.
     """
     assert sourceFolderPath is not None
@@ -1989,7 +5413,222 @@ def scunch(sourceFolderPath, scmWork, textOptions=None, moveMode=ScmPuncher.Move
     puncher.moveMode = moveMode
     puncher.nameTransformation = nameTransformation
     puncher.textOptions = textOptions
-    puncher.punch(sourceFolderPath, '', includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
+    puncher.importMessage = importMessage
+    puncher.journalPath = journalPath
+    puncher.snapshotPath = snapshotPath
+    puncher.foundExternalEntries = sourceEntries
+    puncher.transferWorkerCount = transferWorkerCount
+    puncher.transferOptions = transferOptions
+    return puncher.punch(sourceFolderPath, '', includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
+
+
+def scunchChanges(sourceFolderPath, scmWork, changedPaths, textOptions=None, moveMode=ScmPuncher.MoveName, includePatternText=None, excludePatternText=None, workOnlyPatternText=None, journalPath=None, transferWorkerCount=1, transferOptions=None):
+    """
+    Similar to `scunch()` but only examine ``changedPaths``, which are paths relative to
+    ``sourceFolderPath`` of files and folders that might have been added, modified or removed
+    since the work copy was punched the last time. Everything else is assumed to be unchanged.
+    Names are always preserved.
+
+    The result is `ScmChanges` describing the paths that have to be committed.
+
+    See also: `ScmPuncher.punchChanges()`.
+    """
+    assert sourceFolderPath is not None
+    assert changedPaths is not None
+    assert moveMode in ScmPuncher._ValidMoveModes
+
+    puncher = ScmPuncher(scmWork)
+    puncher.moveMode = moveMode
+    puncher.textOptions = textOptions
+    puncher.journalPath = journalPath
+    puncher.transferWorkerCount = transferWorkerCount
+    puncher.transferOptions = transferOptions
+    return puncher.punchChanges(sourceFolderPath, changedPaths, includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
+
+
+def historyMessage(message, snapshotPath):
+    """
+    ``message`` with each ``{snapshot}`` replaced by the name of the folder or archive at
+    ``snapshotPath``.
+    """
+    assert message is not None
+    assert snapshotPath is not None
+    return message.replace(u'{snapshot}', os.path.basename(os.path.normpath(snapshotPath)))
+
+
+def scunchHistory(snapshotPaths, scmWork, afterPunch, textOptions=None, moveMode=ScmPuncher.MoveName, nameTransformation=IdentityNameTransformation, includePatternText=None, excludePatternText=None, workOnlyPatternText=None, importMessage=None, journalPath=None, transferWorkerCount=1, transferOptions=None):
+    """
+    Punch each folder or archive in ``snapshotPaths`` in the given order into ``scmWork`` and
+    call ``afterPunch(snapshotPath, changes)`` after each punch, for example to commit the
+    `ScmChanges` ``changes``. While ``afterPunch`` runs, the next snapshot is scanned and
+    hashed in the background. Except for the first punch, the work copy is not scanned and
+    files that did not change since the previous snapshot are not read, see
+    `HistoryScmPuncher`.
+
+    To commit a snapshot directly using ``svn import`` in case the work copy is empty, specify
+    the commit message in ``importMessage`` as described in `historyMessage()`. In this case,
+    ``afterPunch`` has to update the work copy before the next snapshot can be punched.
+
+    For the other parameters, see `scunch()`.
+    """
+    assert snapshotPaths is not None
+    assert afterPunch is not None
+    assert moveMode in ScmPuncher._ValidMoveModes
+
+    puncher = HistoryScmPuncher(scmWork)
+    snapshotCount = len(snapshotPaths)
+    for snapshotIndex, snapshotPath in enumerate(snapshotPaths):
+        _log.info(u'punch snapshot %d of %d: "%s"', snapshotIndex + 1, snapshotCount, snapshotPath)
+        puncher.moveMode = moveMode
+        puncher.nameTransformation = nameTransformation
+        puncher.textOptions = textOptions
+        if importMessage is not None:
+            puncher.importMessage = historyMessage(importMessage, snapshotPath)
+        puncher.journalPath = journalPath
+        puncher.transferWorkerCount = transferWorkerCount
+        puncher.transferOptions = transferOptions
+        changes = puncher.punch(snapshotPath, '', includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
+        if snapshotIndex + 1 < snapshotCount:
+            puncher.prepare(snapshotPaths[snapshotIndex + 1], includePatternText, excludePatternText, textOptions, transferOptions)
+        afterPunch(snapshotPath, changes)
+
+
+def changedPathsFromLines(lines):
+    """
+    List of changed paths described by ``lines``, which can either be plain relative paths
+    such as the output of ``find -newer`` or the output of ``rsync --itemize-changes``. Empty
+    lines are ignored. For rsync, lines describing folders that only got new attributes are
+    ignored too because changes of their content are listed separately.
+    """
+    assert lines is not None
+    result = []
+    for lineNumber, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line.strip():
+            itemizeMatch = _RsyncItemizeRegex.match(line)
+            if itemizeMatch is None:
+                changedPath = line
+            else:
+                changedPath = itemizeMatch.group('path')
+                itemize = itemizeMatch.group('itemize')
+                if itemize.startswith('*'):
+                    # Deleted file or folder.
+                    pass
+                elif itemize[1] == 'L':
+                    # Remove the target of symbolic links.
+                    changedPath = changedPath.split(' -> ')[0]
+                elif (itemize[1] == 'd') and (itemize[0] != 'c'):
+                    # Only the attributes of an existing folder changed.
+                    changedPath = None
+            if changedPath:
+                _log.debug(u'%d: changed path "%s"', lineNumber, changedPath)
+                result.append(changedPath)
+    return result
+
+
+def readChangedPaths(changesPath):
+    """
+    List of changed paths read from the file ``changesPath`` or from standard input if it is
+    ``'-'``. See also: `changedPathsFromLines()`.
+    """
+    assert changesPath is not None
+    if changesPath == '-':
+        result = changedPathsFromLines(sys.stdin)
+    else:
+        with codecs.open(changesPath, 'rb', sys.getfilesystemencoding() or 'utf-8') as changesFile:
+            result = changedPathsFromLines(changesFile)
+    _log.info(u'read %s from "%s"', _tools.oneOrOtherText(len(result), 'changed path', 'changed paths'), changesPath)
+    return result
+
+
+def scunchPlan(sourceFolderPath, workFolderPath, planPath, textOptions=None, moveMode=ScmPuncher.MoveName, nameTransformation=IdentityNameTransformation, includePatternText=None, excludePatternText=None, workOnlyPatternText=None):
+    """
+    Similar to `scunch()` but only compute the steps to punch ``sourceFolderPath`` into the
+    work copy at ``workFolderPath`` and write them to a plan at ``planPath``. This neither
+    changes the work copy nor runs any SCM command, so ``workFolderPath`` can also be a plain
+    folder with the same content as the work copy, for example an export of it.
+
+    To perform the plan, use `scunchApplyPlan()`.
+
+    The result is the list of planned steps.
+    """
+    assert sourceFolderPath is not None
+    assert workFolderPath is not None
+    assert planPath is not None
+    assert moveMode in ScmPuncher._ValidMoveModes
+
+    # Planning only scans the work folder, so the storage is never accessed.
+    scmWork = ScmWork(ScmStorage(u'file:///'), u'', workFolderPath)
+    puncher = ScmPuncher(scmWork)
+    puncher.moveMode = moveMode
+    puncher.nameTransformation = nameTransformation
+    puncher.textOptions = textOptions
+    return puncher.plan(sourceFolderPath, planPath, '', includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
+
+
+def scunchApplyPlan(sourceFolderPath, scmWork, planPath, textOptions=None, journalPath=None, transferWorkerCount=1, transferOptions=None):
+    """
+    Perform the plan at ``planPath`` written by `scunchPlan()` on ``scmWork`` reading the files
+    to transfer from ``sourceFolderPath``. Specify the same ``textOptions`` as with
+    `scunchPlan()`. To be able to continue an interrupted application using `scunchResume()`,
+    specify the path of a `PunchJournal` in ``journalPath``. For ``transferWorkerCount`` and
+    ``transferOptions``, see `scunch()`.
+
+    The result is `ScmChanges` describing the paths that have to be committed.
+    """
+    assert scmWork is not None
+    assert planPath is not None
+
+    puncher = ScmPuncher(scmWork)
+    puncher.textOptions = textOptions
+    puncher.journalPath = journalPath
+    puncher.transferWorkerCount = transferWorkerCount
+    puncher.transferOptions = transferOptions
+    return puncher.applyPlan(planPath, sourceFolderPath)
+
+
+def scunchResume(scmWork, journalPath, textOptions=None, transferWorkerCount=1, transferOptions=None):
+    """
+    Continue an interrupted `scunch()` into ``scmWork`` using the `PunchJournal` at
+    ``journalPath`` without scanning the external folder and work copy again. Specify the
+    same ``textOptions`` as with the interrupted `scunch()`. For ``transferWorkerCount`` and
+    ``transferOptions``, see `scunch()`.
+
+    The result is `ScmChanges` describing the paths that have to be committed, including those
+    changed before the interruption.
+    """
+    assert scmWork is not None
+    assert journalPath is not None
+
+    puncher = ScmPuncher(scmWork)
+    puncher.textOptions = textOptions
+    puncher.journalPath = journalPath
+    puncher.transferWorkerCount = transferWorkerCount
+    puncher.transferOptions = transferOptions
+    return puncher.resume()
+
+
+def scunchRemote(sourceFolderPath, remoteWork, message, textOptions=None, moveMode=ScmPuncher.MoveName, nameTransformation=IdentityNameTransformation, includePatternText=None, excludePatternText=None, workOnlyPatternText=None, transferOptions=None):
+    """
+    Similar to `scunch()` but punch directly into the repository folder described by the
+    `RemoteScmWork` ``remoteWork`` without the need for a local work copy. The changes are
+    committed in a single revision using the log message ``message``. For
+    ``transferOptions``, see `scunch()`.
+
+    The result is `ScmChanges` describing the paths that have been committed.
+
+    See also: `RemoteScmPuncher`.
+    """
+    assert sourceFolderPath is not None
+    assert message is not None
+    assert moveMode in ScmPuncher._ValidMoveModes
+
+    puncher = RemoteScmPuncher(remoteWork, message)
+    puncher.moveMode = moveMode
+    puncher.nameTransformation = nameTransformation
+    puncher.textOptions = textOptions
+    puncher.transferOptions = transferOptions
+    return puncher.punch(sourceFolderPath, '', includePatternText=includePatternText, excludePatternText=excludePatternText, workOnlyPatternText=workOnlyPatternText)
 
 _NameToLogLevelMap = {
     'debug': logging.DEBUG,
@@ -2021,8 +5660,24 @@ def _createTextOptions(commandLineOptions):
     )
     return result
 
-_Usage = "%prog [options] FOLDER [WORK-FOLDER]"
-_Description = "Update svn work copy from folder applying add and remove."
+
+def _createTransferOptions(commandLineOptions):
+    assert commandLineOptions is not None
+    assert commandLineOptions.bufferSize > 0
+
+    return TransferOptions(
+        commandLineOptions.bufferSize,
+        commandLineOptions.isDropCache,
+        commandLineOptions.maxReadRate,
+        commandLineOptions.maxWriteRate,
+        commandLineOptions.maxStatRate,
+        commandLineOptions.fsyncMode,
+        commandLineOptions.fsyncBatchFileCount or TransferOptions.DefaultFsyncBatchFileCount,
+        commandLineOptions.deltaThreshold
+    )
+
+_Usage = "%prog [options] FOLDER [WORK-FOLDER]\n       %prog --history [options] SNAPSHOT... WORK-FOLDER"
+_Description = "Update svn work copy from folder or archive applying add and remove."
 
 
 def _parsedActions(optionsParser, actionName, actionsText, validActions):
@@ -2042,18 +5697,63 @@ def _parsedActions(optionsParser, actionName, actionsText, validActions):
     return result
 
 
+def _punchSettingsText(commandLineOptions, actionsToPerformAfterPunching):
+    """
+    Text describing all ``commandLineOptions`` that affect the result of a punch apart from the
+    content of the folder to punch. This includes ``actionsToPerformAfterPunching`` so a run
+    that commits is not skipped after a run that did not.
+    """
+    assert commandLineOptions is not None
+    assert actionsToPerformAfterPunching is not None
+    return json.dumps([
+        actionsToPerformAfterPunching,
+        commandLineOptions.depotQualifier,
+        commandLineOptions.includePattern,
+        commandLineOptions.excludePattern,
+        commandLineOptions.workOnlyPattern,
+        commandLineOptions.textPatternSet,
+        commandLineOptions.newLine,
+        commandLineOptions.tabSize,
+        commandLineOptions.isStripTrailing,
+        commandLineOptions.nameTransformation,
+        commandLineOptions.moveMode,
+    ])
+
+
 def parsedOptions(arguments):
     assert arguments is not None
 
     parser = optparse.OptionParser(usage=_Usage, description=_Description, version="%prog " + __version__)
     punchGroup = optparse.OptionGroup(parser, u"Punching options")
     punchGroup.add_option("-a", "--after", default=_Actions.None_, dest="actionsToPerformAfterPunching", metavar="ACTION", help=u'action(s) to perform after punching: %s (default: \'%%default\')' % _tools.humanReadableList(_ValidAfterActions))
+    punchGroup.add_option("--apply-plan", dest="applyPlanPath", metavar="FILE", help=u'punch the changes planned with --plan-only instead of scanning for changes')
+    punchGroup.add_option("-B", "--backend", default='auto', dest="backend", metavar="KIND", type="choice", choices=sorted(_ValidBackends), help=u'how to access Subversion: %s (default: \'%%default\')' % _tools.humanReadableList(sorted(_ValidBackends)))
     punchGroup.add_option("-b", "--before", default=_Actions.Check, dest="actionsToPerformBeforePunching", metavar="ACTION", help=u'action(s) to perform before punching: %s (default: \'%%default\')' % _tools.humanReadableList(_ValidBeforeActions))
-    punchGroup.add_option("-d", "--depot", dest="depotQualifier", metavar="QUALIFIER", help=u'qualifier for source code depot when using --before=checkout')
+    punchGroup.add_option("--buffer-size", default='1m', dest="bufferSize", metavar="SIZE", help=u'number of bytes to read and write at once when converting and comparing files, for example 64k (default: %default)')
+    punchGroup.add_option("--changes", dest="changesPath", metavar="FILE", help=u'only examine the paths listed in FILE, for example from rsync --itemize-changes; - reads them from standard input')
+    punchGroup.add_option("--commit-chunk-bytes", dest="commitChunkByteCount", metavar="SIZE", help=u'maximum size of files to commit in a single revision with --after=commit, for example 100m (default: no limit)')
+    punchGroup.add_option("--commit-chunk-files", dest="commitChunkPathCount", metavar="NUMBER", type=int, help=u'maximum number of files and folders to commit in a single revision with --after=commit (default: no limit)')
+    punchGroup.add_option("--delta-threshold", dest="deltaThreshold", metavar="SIZE", help=u'update binary files of at least SIZE bytes in place, rewriting only the blocks that changed, for example 100m (default: never)')
+    punchGroup.add_option("-d", "--depot", dest="depotQualifier", metavar="QUALIFIER", help=u'qualifier for source code depot when using --before=checkout or --remote')
+    punchGroup.add_option("--drop-cache", action="store_true", dest="isDropCache", help=u'remove each transferred file from the page cache to leave it to other processes')
+    punchGroup.add_option("--fsync", default=TransferOptions.FsyncNone, dest="fsyncMode", metavar="MODE", type="choice", choices=sorted(TransferOptions._ValidFsyncModes), help=u'when to write transferred files to the disk: %s (default: \'%%default\')' % _tools.humanReadableList(sorted(TransferOptions._ValidFsyncModes)))
+    punchGroup.add_option("--fsync-batch", dest="fsyncBatchFileCount", metavar="NUMBER", type=int, help=u'number of files to transfer before writing them to the disk with --fsync=batch (default: %d)' % TransferOptions.DefaultFsyncBatchFileCount)
     punchGroup.add_option("-f", "--names", default='preserve', dest="nameTransformation", metavar="MODE", help=u'transformation to apply on names in work copy: %s (default: \'%%default\')' % _tools.humanReadableList(sorted(_ValidNameTransformations)))
+    punchGroup.add_option("--history", action="store_true", dest="isHistory", help=u'punch and commit each SNAPSHOT in turn, reusing what is known about the work copy from the previous one')
     punchGroup.add_option("-i", "--include", dest="includePattern", metavar="PATTERN", help=u'ant pattern for files and folders to include (default: all files)')
-    punchGroup.add_option("-m", "--message", default="Punched recent changes.", dest="commitMessage", metavar="TEXT", help=u'text for commit message (default: \'%default\')')
+    punchGroup.add_option("-m", "--message", default="Punched recent changes.", dest="commitMessage", metavar="TEXT", help=u'text for commit message; with --history, {snapshot} is replaced by the name of the snapshot (default: \'%default\')')
+    punchGroup.add_option("--max-read-rate", dest="maxReadRate", metavar="SIZE", help=u'maximum number of bytes per second to read from files, for example 20m (default: no limit)')
+    punchGroup.add_option("--max-stat-rate", dest="maxStatRate", metavar="NUMBER", type=int, help=u'maximum number of files and folders per second to examine when scanning FOLDER (default: no limit)')
+    punchGroup.add_option("--max-write-rate", dest="maxWriteRate", metavar="SIZE", help=u'maximum number of bytes per second to write to files, for example 20m (default: no limit)')
     punchGroup.add_option("-M", "--move", default=ScmPuncher.MoveName, dest="moveMode", metavar="MODE", type="choice", choices=sorted(list(ScmPuncher._ValidMoveModes)), help=u'criteria to detect moved files: %s (default: \'%%default\')' % _tools.humanReadableList(ScmPuncher._ValidMoveModes))
+    punchGroup.add_option("--plan-only", dest="planPath", metavar="FILE", help=u'only write the changes to punch to FILE without changing the work copy')
+    punchGroup.add_option("--resume", action="store_true", dest="isResume", help=u'continue an interrupted punch into the work copy without scanning again')
+    punchGroup.add_option("-r", "--remote", action="store_true", dest="isRemote", help=u'punch directly into the repository folder specified with --depot without a work copy')
+    punchGroup.add_option("--scan-snapshot", action="store_true", dest="isScanSnapshot", help=u'remember the contents of folders in FOLDER to scan only changed folders next time')
+    punchGroup.add_option("--skip-unchanged", action="store_true", dest="isSkipUnchanged", help=u'do nothing if no file in FOLDER changed since the last successful run')
+    punchGroup.add_option("--transfer-workers", default=1, dest="transferWorkerCount", metavar="NUMBER", type=int, help=u'number of files to transfer to the work copy at the same time (default: %default)')
+    punchGroup.add_option("--watch", action="store_true", dest="isWatch", help=u'keep running and punch changes in FOLDER as soon as they happen')
+    punchGroup.add_option("--watch-delay", default=2.0, dest="watchDelay", metavar="SECONDS", type=float, help=u'time without further changes to wait for before punching with --watch (default: %default)')
     punchGroup.add_option("-w", "--work-only", dest="workOnlyPattern", metavar="PATTERN", help=u'ant pattern for files that only reside in work copy but still should remain (default: none)')
     punchGroup.add_option("-x", "--exclude", dest="excludePattern", metavar="PATTERN", help=u'ant pattern for files and folders to exclude (default: exclude no files but the default excludes)')
     parser.add_option_group(punchGroup)
@@ -2084,8 +5784,29 @@ def parsedOptions(arguments):
         if options.tabSize:
             parser.error("option --text must be set to enable option --tabsize")
         options.newLine = 'native'
+    if (options.backend == 'bindings') and not _HasSvnBindings:
+        parser.error("Subversion Python bindings must be installed to use --backend=bindings")
     othersCount = len(others)
-    if othersCount == 0:
+    options.historyPaths = None
+    if options.isHistory:
+        if othersCount < 2:
+            parser.error("SNAPSHOT to punch and WORK-FOLDER must be specified for --history")
+        # Expand patterns here so thousands of snapshots do not exceed the command line limit.
+        options.historyPaths = []
+        for snapshotPattern in others[:-1]:
+            if os.path.exists(snapshotPattern):
+                options.historyPaths.append(snapshotPattern)
+            else:
+                matchingPaths = sorted(glob.glob(snapshotPattern))
+                if not matchingPaths:
+                    parser.error("SNAPSHOT must exist or be a pattern matching at least one folder or archive: %s" % snapshotPattern)
+                options.historyPaths.extend(matchingPaths)
+        for snapshotPath in options.historyPaths:
+            if not os.path.isdir(snapshotPath) and not _archive.isArchive(snapshotPath):
+                parser.error("SNAPSHOT to punch must be a folder or a tar or zip archive: %s" % snapshotPath)
+        sourceFolderPath = options.historyPaths[0]
+        workFolderPath = others[-1]
+    elif othersCount == 0:
         parser.error("FOLDER to punch into work copy must be specified")
     elif othersCount == 1:
         sourceFolderPath = others[0]
@@ -2096,6 +5817,19 @@ def parsedOptions(arguments):
     else:
         parser.error("unrecognized options must be removed: %s" % others[2:])
 
+    # Validate options for punching an archive.
+    if os.path.isfile(sourceFolderPath):
+        if not _archive.isArchive(sourceFolderPath):
+            parser.error("FOLDER to punch must be a folder or a tar or zip archive: %s" % sourceFolderPath)
+        for isSet, optionName in (
+            (options.changesPath, '--changes'),
+            (options.isRemote, '--remote'),
+            (options.isScanSnapshot, '--scan-snapshot'),
+            (options.isWatch, '--watch'),
+        ):
+            if isSet:
+                parser.error('%s must be removed to punch an archive' % optionName)
+
     # Validate actions for option ``--before``.
     actionsToPerformBeforePunching = _parsedActions(parser, '--before', options.actionsToPerformBeforePunching, _ValidBeforeActions)
     destructiveActions = set([_Actions.Checkout, _Actions.Reset])
@@ -2123,9 +5857,221 @@ def parsedOptions(arguments):
         elif foundPurgeAction:
             parser.error("action %r in option --after must appear before action %r but is: %s" % (action, _Actions.Purge, options.actionsToPerformAfterPunching))
 
+    # Validate options for chunked commits.
+    if options.commitChunkByteCount is not None:
+        try:
+            options.commitChunkByteCount = _tools.parsedByteCount(options.commitChunkByteCount)
+        except ValueError, error:
+            parser.error(u'value for --commit-chunk-bytes must be fixed: %s' % error)
+        if options.commitChunkByteCount < 1:
+            parser.error(u'value for --commit-chunk-bytes is %d but must be at least 1' % options.commitChunkByteCount)
+    if (options.commitChunkPathCount is not None) and (options.commitChunkPathCount < 1):
+        parser.error(u'value for --commit-chunk-files is %d but must be at least 1' % options.commitChunkPathCount)
+    isChunkedCommit = (options.commitChunkByteCount is not None) or (options.commitChunkPathCount is not None)
+    if isChunkedCommit and (_Actions.Commit not in actionsToPerformAfterPunching):
+        parser.error(u'--after=commit must be specified for --commit-chunk-bytes and --commit-chunk-files')
+
+    # Validate options for ``--remote``.
+    if options.isRemote:
+        if not options.depotQualifier:
+            parser.error('--depot must be specified for --remote')
+        if othersCount == 2:
+            parser.error('WORK-FOLDER must be removed for --remote')
+        for action in actionsToPerformBeforePunching:
+            if action not in (_Actions.Check, _Actions.None_):
+                parser.error("action %r in option --before must be removed for --remote" % action)
+        for action in actionsToPerformAfterPunching:
+            if action not in (_Actions.Commit, _Actions.None_):
+                parser.error("action %r in option --after must be removed for --remote" % action)
+        if isChunkedCommit:
+            parser.error('--commit-chunk-bytes and --commit-chunk-files must be removed for --remote')
+        if options.isResume:
+            parser.error('--resume must be removed for --remote')
+        if options.planPath or options.applyPlanPath:
+            parser.error('--plan-only and --apply-plan must be removed for --remote')
+        if options.isSkipUnchanged:
+            parser.error('--skip-unchanged must be removed for --remote')
+        if options.isScanSnapshot:
+            parser.error('--scan-snapshot must be removed for --remote')
+        if options.changesPath:
+            parser.error('--changes must be removed for --remote')
+        if options.transferWorkerCount != 1:
+            parser.error('--transfer-workers must be removed for --remote')
+    if options.isResume and (_Actions.Checkout in actionsToPerformBeforePunching):
+        parser.error("--resume must be removed for --before=%s" % _Actions.Checkout)
+
+    # Validate options for ``--watch``.
+    if options.isWatch:
+        if options.isRemote:
+            parser.error('--watch must be removed for --remote')
+        if options.planPath:
+            parser.error('--watch must be removed for --plan-only')
+        if options.isSkipUnchanged:
+            parser.error('--skip-unchanged must be removed for --watch')
+        if _Actions.Purge in actionsToPerformAfterPunching:
+            parser.error("action %r in option --after must be removed for --watch" % _Actions.Purge)
+        if options.nameTransformation != 'preserve':
+            parser.error("--names=preserve must be used for --watch")
+    if options.watchDelay < 0:
+        parser.error("value for --watch-delay is %s but must be at least 0" % options.watchDelay)
+
+    # Validate options for ``--history``.
+    if options.isHistory:
+        if _Actions.Commit not in actionsToPerformAfterPunching:
+            parser.error("--after=%s must be specified for --history" % _Actions.Commit)
+        if _Actions.Purge in actionsToPerformAfterPunching:
+            parser.error("action %r in option --after must be removed for --history" % _Actions.Purge)
+        for isSet, optionName in (
+            (options.applyPlanPath, '--apply-plan'),
+            (options.changesPath, '--changes'),
+            (options.planPath, '--plan-only'),
+            (options.isRemote, '--remote'),
+            (options.isResume, '--resume'),
+            (options.isScanSnapshot, '--scan-snapshot'),
+            (options.isSkipUnchanged, '--skip-unchanged'),
+            (options.isWatch, '--watch'),
+        ):
+            if isSet:
+                parser.error('%s must be removed for --history' % optionName)
+
+    if options.transferWorkerCount < 1:
+        parser.error("value for --transfer-workers is %d but must be at least 1" % options.transferWorkerCount)
+    try:
+        options.bufferSize = _tools.parsedByteCount(options.bufferSize)
+    except ValueError, error:
+        parser.error(u'value for --buffer-size must be fixed: %s' % error)
+    if options.bufferSize < 1:
+        parser.error(u'value for --buffer-size is %d but must be at least 1' % options.bufferSize)
+    for optionName, attributeName in (('--max-read-rate', 'maxReadRate'), ('--max-write-rate', 'maxWriteRate')):
+        rateText = getattr(options, attributeName)
+        if rateText is not None:
+            try:
+                rate = _tools.parsedByteCount(rateText)
+            except ValueError, error:
+                parser.error(u'value for %s must be fixed: %s' % (optionName, error))
+            if rate < 1:
+                parser.error(u'value for %s is %d but must be at least 1' % (optionName, rate))
+            setattr(options, attributeName, rate)
+    if (options.maxStatRate is not None) and (options.maxStatRate < 1):
+        parser.error(u'value for --max-stat-rate is %d but must be at least 1' % options.maxStatRate)
+    if options.deltaThreshold is not None:
+        try:
+            options.deltaThreshold = _tools.parsedByteCount(options.deltaThreshold)
+        except ValueError, error:
+            parser.error(u'value for --delta-threshold must be fixed: %s' % error)
+        if options.deltaThreshold < 0:
+            parser.error(u'value for --delta-threshold is %d but must be at least 0' % options.deltaThreshold)
+    if options.fsyncBatchFileCount is not None:
+        if options.fsyncMode != TransferOptions.FsyncBatch:
+            parser.error(u'--fsync=%s must be specified for --fsync-batch' % TransferOptions.FsyncBatch)
+        if options.fsyncBatchFileCount < 1:
+            parser.error(u'value for --fsync-batch is %d but must be at least 1' % options.fsyncBatchFileCount)
+
+    # Validate options for ``--changes``.
+    if options.changesPath:
+        if options.isWatch:
+            parser.error('--changes must be removed for --watch')
+        if options.planPath or options.applyPlanPath:
+            parser.error('--plan-only and --apply-plan must be removed for --changes')
+        if options.isSkipUnchanged:
+            parser.error('--skip-unchanged must be removed for --changes')
+        if options.isScanSnapshot:
+            parser.error('--scan-snapshot must be removed for --changes')
+        if options.nameTransformation != 'preserve':
+            parser.error("--names=preserve must be used for --changes")
+
+    # Validate options for planning.
+    if options.planPath:
+        if options.applyPlanPath:
+            parser.error('--apply-plan must be removed for --plan-only')
+        if options.isResume:
+            parser.error('--resume must be removed for --plan-only')
+        if options.isSkipUnchanged:
+            parser.error('--skip-unchanged must be removed for --plan-only')
+        for action in actionsToPerformBeforePunching:
+            if action not in (_Actions.Check, _Actions.None_):
+                parser.error("action %r in option --before must be removed for --plan-only" % action)
+        for action in actionsToPerformAfterPunching:
+            if action != _Actions.None_:
+                parser.error("action %r in option --after must be removed for --plan-only" % action)
+
     return (options, sourceFolderPath, workFolderPath, actionsToPerformBeforePunching, actionsToPerformAfterPunching)
 
 
+def _performActionsAfterPunching(scmWork, punchedChanges, actionsToPerformAfterPunching, commandLineOptions, chunkedCommit, commitMessage=None):
+    """
+    Perform ``actionsToPerformAfterPunching`` on ``scmWork`` after ``punchedChanges`` have
+    been punched into it. Commits use ``commitMessage`` or, if this is ``None``, the message
+    specified with ``--message``.
+    """
+    assert scmWork is not None
+    assert punchedChanges is not None
+    assert actionsToPerformAfterPunching is not None
+    assert commandLineOptions is not None
+    assert chunkedCommit is not None
+    if commitMessage is None:
+        commitMessage = commandLineOptions.commitMessage
+    for action in actionsToPerformAfterPunching:
+        assert action in _ValidAfterActions
+        if action == _Actions.Commit:
+            if punchedChanges.isCommitted:
+                _log.info(u'skip commit because changes already have been imported')
+                if _Actions.Purge not in actionsToPerformAfterPunching:
+                    scmWork.update()
+            elif len(punchedChanges) > 0:
+                if (commandLineOptions.commitChunkByteCount is not None) or (commandLineOptions.commitChunkPathCount is not None):
+                    chunkedCommit.commit(punchedChanges, commitMessage, commandLineOptions.commitChunkPathCount, commandLineOptions.commitChunkByteCount)
+                else:
+                    scmWork.commitChanges(punchedChanges, commitMessage)
+            else:
+                _log.info(u'skip commit because nothing changed')
+        elif action == _Actions.Purge:
+            scmWork.purge()
+        else:
+            assert action == _Actions.None_
+
+
+def _punchHistory(scmWork, textOptions, commandLineOptions, actionsToPerformAfterPunching, chunkedCommit, journalPath):
+    """
+    Punch each snapshot in ``commandLineOptions.historyPaths`` into ``scmWork`` and perform
+    ``actionsToPerformAfterPunching`` after each punch using the commit message of the
+    snapshot as described by `historyMessage()`.
+    """
+    assert commandLineOptions is not None
+
+    def performActionsAfterPunchingSnapshot(snapshotPath, punchedChanges):
+        commitMessage = historyMessage(commandLineOptions.commitMessage, snapshotPath)
+        _performActionsAfterPunching(scmWork, punchedChanges, actionsToPerformAfterPunching, commandLineOptions, chunkedCommit, commitMessage)
+
+    nameTransformation = _NameToTransformationMap[commandLineOptions.nameTransformation]
+    scunchHistory(commandLineOptions.historyPaths, scmWork, performActionsAfterPunchingSnapshot, textOptions, moveMode=commandLineOptions.moveMode, nameTransformation=nameTransformation, includePatternText=commandLineOptions.includePattern, excludePatternText=commandLineOptions.excludePattern, workOnlyPatternText=commandLineOptions.workOnlyPattern, importMessage=commandLineOptions.commitMessage, journalPath=journalPath, transferWorkerCount=commandLineOptions.transferWorkerCount, transferOptions=_createTransferOptions(commandLineOptions))
+
+
+def _punchWatchedChanges(watcher, sourceFolderPath, scmWork, textOptions, commandLineOptions, actionsToPerformAfterPunching, chunkedCommit, journalPath, maxPunchCount=None):
+    """
+    Punch the changes in ``sourceFolderPath`` reported by the `_watch.FolderWatcher`
+    ``watcher`` into ``scmWork`` and perform ``actionsToPerformAfterPunching`` after each
+    punch until interrupted or, if ``maxPunchCount`` is not ``None``, until that many punches
+    have been performed.
+    """
+    assert watcher is not None
+    assert commandLineOptions is not None
+    assert (maxPunchCount is None) or (maxPunchCount >= 0)
+    punchCount = 0
+    try:
+        while (maxPunchCount is None) or (punchCount < maxPunchCount):
+            _log.info(u'wait for changes in "%s"', sourceFolderPath)
+            changedPaths = watcher.changedPaths(commandLineOptions.watchDelay)
+            if changedPaths is None:
+                punchedChanges = scunch(sourceFolderPath, scmWork, textOptions, moveMode=commandLineOptions.moveMode, includePatternText=commandLineOptions.includePattern, excludePatternText=commandLineOptions.excludePattern, workOnlyPatternText=commandLineOptions.workOnlyPattern, journalPath=journalPath, transferWorkerCount=commandLineOptions.transferWorkerCount, transferOptions=_createTransferOptions(commandLineOptions))
+            else:
+                punchedChanges = scunchChanges(sourceFolderPath, scmWork, changedPaths, textOptions, moveMode=commandLineOptions.moveMode, includePatternText=commandLineOptions.includePattern, excludePatternText=commandLineOptions.excludePattern, workOnlyPatternText=commandLineOptions.workOnlyPattern, journalPath=journalPath, transferWorkerCount=commandLineOptions.transferWorkerCount, transferOptions=_createTransferOptions(commandLineOptions))
+            _performActionsAfterPunching(scmWork, punchedChanges, actionsToPerformAfterPunching, commandLineOptions, chunkedCommit)
+            punchCount += 1
+    except KeyboardInterrupt:
+        _log.info(u'stop watching "%s"', sourceFolderPath)
+
+
 def main(arguments=None):
     """
     Main function for command line call returning a tuple
@@ -2144,45 +6090,125 @@ def main(arguments=None):
     _setUpLogging(_NameToLogLevelMap[options.logLevel])
     _setUpEncoding(options.encoding, options.unicodeNormalization)
 
+    # Launch shell commands from a helper process started while memory usage is still small.
+    _setUpCommandLauncher()
+
     # Do the actual work and log any errors.
     exitCode = 1
     exitError = None
+    watcher = None
     try:
-        if _Actions.Checkout in actionsToPerformBeforePunching:
-            assert actionsToPerformBeforePunching[0] == _Actions.Checkout
-            scmStorage = ScmStorage(options.depotQualifier)
-            scmWork = ScmWork(scmStorage, "", workFolderPath, ScmWork.CheckOutActionReset)
-        else:
-            scmWork = createScmWork(workFolderPath)
         textOptions = _createTextOptions(options)
+        transferOptions = _createTransferOptions(options)
         nameTransformation = _NameToTransformationMap[options.nameTransformation]
-
-        # Perform actions before punching.
-        for action in actionsToPerformBeforePunching:
-            assert action in _ValidBeforeActions
-            if action == _Actions.Check:
-                scmWork.check()
-            elif action == _Actions.Checkout:
-                scmWork.checkout(True)
-            elif action == _Actions.Reset:
-                scmWork.reset()
-            elif action == _Actions.Update:
-                scmWork.update()
+        if options.isRemote:
+            # Punch directly into the repository, which also commits the changes.
+            scmStorage = ScmStorage(options.depotQualifier)
+            remoteWork = RemoteScmWork(scmStorage, "")
+            scunchRemote(sourceFolderPath, remoteWork, options.commitMessage, textOptions, moveMode=options.moveMode, nameTransformation=nameTransformation, includePatternText=options.includePattern, excludePatternText=options.excludePattern, workOnlyPatternText=options.workOnlyPattern, transferOptions=transferOptions)
+        elif options.planPath:
+            # Only scan for changes. This skips ``--before=check`` because it would run svn.
+            scunchPlan(sourceFolderPath, workFolderPath, options.planPath, textOptions, moveMode=options.moveMode, nameTransformation=nameTransformation, includePatternText=options.includePattern, excludePatternText=options.excludePattern, workOnlyPatternText=options.workOnlyPattern)
+        else:
+            sourceFingerprint = SourceFingerprint(workFolderPath)
+            fingerprint = None
+            sourceEntries = None
+            isUnchanged = False
+            if options.isSkipUnchanged:
+                if os.path.isdir(sourceFolderPath):
+                    # Scan the folder only once for both the fingerprint and the punch. A
+                    # snapshot cannot be used for this because the size and time of modified
+                    # files in unchanged folders would be outdated.
+                    sourceEntries = findSourceEntries(sourceFolderPath, options.includePattern, options.excludePattern, transferOptions)
+                fingerprint = treeFingerprint(sourceFolderPath, options.includePattern, options.excludePattern, _punchSettingsText(options, actionsToPerformAfterPunching), sourceEntries)
+                hasPendingState = os.path.exists(stateFilePath(workFolderPath, 'commit')) or os.path.exists(stateFilePath(workFolderPath, 'journal'))
+                isUnchanged = sourceFingerprint.matches(fingerprint) and not hasPendingState
+            if isUnchanged:
+                _log.info(u'skip punch because nothing changed in "%s" since last run', sourceFolderPath)
             else:
-                assert action == _Actions.None_, "action=%r" % action
+                # Forget the previous fingerprint in case anything below fails.
+                sourceFingerprint.discard()
+                if options.isWatch:
+                    # Start watching before the first punch so no changes get lost.
+                    watcher = _watch.FolderWatcher(sourceFolderPath)
+                sparseFolderPaths = None
+                if _Actions.Checkout in actionsToPerformBeforePunching:
+                    assert actionsToPerformBeforePunching[0] == _Actions.Checkout
+                    scmStorage = ScmStorage(options.depotQualifier)
+                    # The actual checkout is performed by the action below.
+                    scmWork = scmWorkClass(options.backend)(scmStorage, "", workFolderPath, ScmWork.CheckOutActionSkip)
+                    if options.includePattern:
+                        includePatternSet = antglob.AntPatternSet(False)
+                        includePatternSet.include(options.includePattern)
+                        sparseFolderPaths = includePatternSet.staticFolderPaths()
+                else:
+                    scmWork = createScmWork(workFolderPath, options.backend)
+
+                # Continue a chunked commit left over by a previous failed run.
+                chunkedCommit = ChunkedCommit(scmWork)
+                if chunkedCommit.hasPendingChunks():
+                    if _Actions.Checkout in actionsToPerformBeforePunching:
+                        _log.info(u'discard remaining chunks of previous commit because of fresh checkout')
+                        chunkedCommit.discard()
+                    elif _Actions.Commit in actionsToPerformAfterPunching:
+                        _log.info(u'continue with remaining chunks of previous commit')
+                        chunkedCommit.resume()
+
+                journal = PunchJournal(stateFilePath(scmWork.localTargetPath, 'journal'))
+                if options.isResume and journal.exists():
+                    # Continue an interrupted punch. Actions before punching are skipped because
+                    # they would complain about or discard the changes performed so far.
+                    punchedChanges = scunchResume(scmWork, journal.journalPath, textOptions, transferWorkerCount=options.transferWorkerCount, transferOptions=transferOptions)
+                else:
+                    if options.isResume:
+                        _log.info(u'nothing to resume, punching everything')
+                    elif journal.exists():
+                        _log.info(u'discard journal of interrupted punch at "%s"', journal.journalPath)
+                        journal.remove()
+
+                    # Perform actions before punching.
+                    for action in actionsToPerformBeforePunching:
+                        assert action in _ValidBeforeActions
+                        if action == _Actions.Check:
+                            scmWork.check()
+                        elif action == _Actions.Checkout:
+                            scmWork.checkout(True, sparseFolderPaths)
+                        elif action == _Actions.Reset:
+                            scmWork.reset()
+                        elif action == _Actions.Update:
+                            scmWork.update()
+                        else:
+                            assert action == _Actions.None_, "action=%r" % action
+
+                    if options.isHistory:
+                        # Each snapshot is committed right after punching it.
+                        punchedChanges = None
+                        _punchHistory(scmWork, textOptions, options, actionsToPerformAfterPunching, chunkedCommit, journal.journalPath)
+                    elif options.applyPlanPath:
+                        punchedChanges = scunchApplyPlan(sourceFolderPath, scmWork, options.applyPlanPath, textOptions, journalPath=journal.journalPath, transferWorkerCount=options.transferWorkerCount, transferOptions=transferOptions)
+                    elif options.changesPath:
+                        changedPaths = readChangedPaths(options.changesPath)
+                        punchedChanges = scunchChanges(sourceFolderPath, scmWork, changedPaths, textOptions, moveMode=options.moveMode, includePatternText=options.includePattern, excludePatternText=options.excludePattern, workOnlyPatternText=options.workOnlyPattern, journalPath=journal.journalPath, transferWorkerCount=options.transferWorkerCount, transferOptions=transferOptions)
+                    else:
+                        # Actually punch work copy. If the changes are going to be committed anyway,
+                        # an empty work copy can be punched using a single import.
+                        if _Actions.Commit in actionsToPerformAfterPunching:
+                            importMessage = options.commitMessage
+                        else:
+                            importMessage = None
+                        if options.isScanSnapshot:
+                            snapshotPath = stateFilePath(workFolderPath, 'snapshot')
+                        else:
+                            snapshotPath = None
+                        punchedChanges = scunch(sourceFolderPath, scmWork, textOptions, moveMode=options.moveMode, nameTransformation=nameTransformation, includePatternText=options.includePattern, excludePatternText=options.excludePattern, workOnlyPatternText=options.workOnlyPattern, importMessage=importMessage, journalPath=journal.journalPath, snapshotPath=snapshotPath, transferWorkerCount=options.transferWorkerCount, transferOptions=transferOptions, sourceEntries=sourceEntries)
 
-        # Actually punch work copy.
-        scunch(sourceFolderPath, scmWork, textOptions, moveMode=options.moveMode, nameTransformation=nameTransformation, includePatternText=options.includePattern, excludePatternText=options.excludePattern, workOnlyPatternText=options.workOnlyPattern)
+                if punchedChanges is not None:
+                    _performActionsAfterPunching(scmWork, punchedChanges, actionsToPerformAfterPunching, options, chunkedCommit)
+                if options.isWatch:
+                    _punchWatchedChanges(watcher, sourceFolderPath, scmWork, textOptions, options, actionsToPerformAfterPunching, chunkedCommit, journal.journalPath)
 
-        # Perform actions after punching.
-        for action in actionsToPerformAfterPunching:
-            assert action in _ValidAfterActions
-            if action == _Actions.Commit:
-                scmWork.commit("", options.commitMessage)
-            elif action == _Actions.Purge:
-                scmWork.purge()
-            else:
-                assert action == _Actions.None_
+                if fingerprint is not None:
+                    sourceFingerprint.store(fingerprint)
 
         exitCode = 0
     except ScmPendingChangesError, error:
@@ -2193,12 +6219,23 @@ def main(arguments=None):
         for existingWorkPath, transformedWorkPath in error.existingToTransformedPathMap.items():
             _log.error(u'  "%s" --> "%s"', existingWorkPath, transformedWorkPath)
         exitError = error
+    except ScmTransferError, error:
+        _log.error(u'%s', error)
+        for workPath in sorted(error.pathToErrorMap.keys()):
+            _log.error(u'  "%s": %s', workPath, error.pathToErrorMap[workPath])
+        _log.error(u'To continue once the cause has been resolved, use \'--resume\'.')
+        exitError = error
     except (EnvironmentError, ScmError), error:
         _log.exception(u"%s", error)
         exitError = error
     except Exception, error:
         _log.exception(u"%s", error)
         exitError = error
+    finally:
+        # Close the watcher even if anything before or during the first punch failed.
+        if watcher is not None:
+            watcher.close()
+        _tearDownCommandLauncher()
     assert bool(exitCode) == bool(exitError), "exitCode=%d, exitError=%r" % (exitCode, exitError)
     return (exitCode, exitError)
 
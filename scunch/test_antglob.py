@@ -22,6 +22,7 @@ import logging
 import os
 import shutil
 import tempfile
+import time
 import unittest
 
 from scunch import antglob
@@ -58,6 +59,20 @@ class TextItemsTest(unittest.TestCase):
         self.assertEqual(antglob._indexInTextItemsWherePatternPartsMatch(antglob._splitTextParts(''), patternItems), None)
 
 
+class SplitTextPartsTest(unittest.TestCase):
+    def testCanSplitTextParts(self):
+        self.assertEqual(antglob._splitTextParts(''), [])
+        self.assertEqual(antglob._splitTextParts('/'), [])
+        self.assertEqual(antglob._splitTextParts('hugo.txt'), ['hugo.txt'])
+        self.assertEqual(antglob._splitTextParts('/a//b\\hugo.txt'), ['a', 'b', 'hugo.txt'])
+        self.assertEqual(antglob._splitTextParts('a/b/'), ['a', 'b', ''])
+        self.assertEqual(antglob._splitTextParts('a/b/', True), ['a', 'b', '**'])
+
+    def testCanSplitDeeplyNestedTextParts(self):
+        parts = ['folder%d' % partNumber for partNumber in range(10000)]
+        self.assertEqual(antglob._splitTextParts('/'.join(parts)), parts)
+
+
 class AntPatternTest(unittest.TestCase):
     def testShowsAsString(self):
         def _assertShows(self, pattern):
@@ -123,6 +138,12 @@ class AntPatternTest(unittest.TestCase):
         self.assertFalse(pattern.matches('hugo.txt/hugo.png'))
         self.assertFalse(pattern.matches(''))
 
+        pattern = antglob.AntPattern('**/source/*.txt')
+        self.assertTrue(pattern.matches('source/hugo.txt'))
+        self.assertTrue(pattern.matches('1/2/source/hugo.txt'))
+        self.assertFalse(pattern.matches('hugo.txt'))
+        self.assertFalse(pattern.matches('1/hugo.txt'))
+
     def testCanMatchPatternsWithMultipleAllMagics(self):
         pattern = antglob.AntPattern('**/b/**')
         self.assertTrue(pattern.matches('b'))
@@ -152,6 +173,31 @@ class AntPatternTest(unittest.TestCase):
         self.assertTrue(patternSet.matches('hugo.jpg'))
         self.assertFalse(patternSet.matches('hugo.txt'))
 
+    def testCanComputeStaticFolderParts(self):
+        self.assertEqual(antglob.AntPattern('sdk/lib/*.so').staticFolderParts(), ['sdk', 'lib'])
+        self.assertEqual(antglob.AntPattern('sdk/include/**').staticFolderParts(), ['sdk', 'include'])
+        self.assertEqual(antglob.AntPattern('sdk/include/').staticFolderParts(), ['sdk', 'include'])
+        self.assertEqual(antglob.AntPattern('sdk/*/readme.txt').staticFolderParts(), ['sdk'])
+        self.assertEqual(antglob.AntPattern('sdk/readme.txt').staticFolderParts(), ['sdk'])
+        self.assertEqual(antglob.AntPattern('readme.txt').staticFolderParts(), [])
+        self.assertEqual(antglob.AntPattern('**/*.py').staticFolderParts(), [])
+
+    def testCanMatchBelowParts(self):
+        pattern = antglob.AntPattern('sdk/lib/*.so')
+        self.assertTrue(pattern.canMatchBelowParts([]))
+        self.assertTrue(pattern.canMatchBelowParts(['sdk']))
+        self.assertTrue(pattern.canMatchBelowParts(['sdk', 'lib']))
+        self.assertFalse(pattern.canMatchBelowParts(['sdk', 'lib', 'debug']))
+        self.assertFalse(pattern.canMatchBelowParts(['docs']))
+
+        pattern = antglob.AntPattern('sdk/**/*.h')
+        self.assertTrue(pattern.canMatchBelowParts(['sdk']))
+        self.assertTrue(pattern.canMatchBelowParts(['sdk', 'include', 'internal']))
+        self.assertFalse(pattern.canMatchBelowParts(['docs', 'sdk']))
+
+        pattern = antglob.AntPattern('**/test/*.py')
+        self.assertTrue(pattern.canMatchBelowParts(['some', 'where']))
+
 
 class AntPatternSetTest(unittest.TestCase):
     def setUp(self):
@@ -320,6 +366,121 @@ class AntPatternSetTest(unittest.TestCase):
         self.assertTrue(fileCount)
         self.assertTrue(folderCount)
 
+    def testCanFindInOtherFileSystem(self):
+        class _FakeFileSystem(object):
+            FolderPathToNamesMap = {
+                '': ['docs', 'empty', 'setup.py'],
+                'docs': ['index.rst', 'logo.png'],
+                'empty': []
+            }
+
+            def listdir(self, folderPath):
+                return _FakeFileSystem.FolderPathToNamesMap[folderPath]
+
+            def isdir(self, path):
+                return path in _FakeFileSystem.FolderPathToNamesMap
+
+        pythonSet = antglob.AntPatternSet()
+        pythonSet.exclude('**/*.png')
+        self.assertEqual(
+            sorted(set(pythonSet.find('', True, _FakeFileSystem()))),
+            ['docs' + os.sep, os.path.join('docs', 'index.rst'), 'empty' + os.sep, 'setup.py']
+        )
+
+
+    def testCanComputeStaticFolderPaths(self):
+        patternSet = antglob.AntPatternSet()
+        self.assertEqual(patternSet.staticFolderPaths(), None)
+        patternSet.include('sdk/include/**, sdk/lib/*.so, sdk/include/internal/*.h')
+        self.assertEqual(patternSet.staticFolderPaths(), [os.path.join('sdk', 'include'), os.path.join('sdk', 'lib')])
+        patternSet.include('**/*.txt')
+        self.assertEqual(patternSet.staticFolderPaths(), None)
+
+    def testSkipsFoldersThatCannotMatch(self):
+        class _RecordingFileSystem(object):
+            FolderPathToNamesMap = {
+                '': ['docs', 'sdk'],
+                'docs': ['index.rst'],
+                'sdk': ['include', 'lib'],
+                os.path.join('sdk', 'include'): ['hugo.h'],
+                os.path.join('sdk', 'lib'): ['hugo.so']
+            }
+
+            def __init__(self):
+                self.listedFolderPaths = []
+
+            def listdir(self, folderPath):
+                self.listedFolderPaths.append(folderPath)
+                return _RecordingFileSystem.FolderPathToNamesMap[folderPath]
+
+            def isdir(self, path):
+                return path in _RecordingFileSystem.FolderPathToNamesMap
+
+        patternSet = antglob.AntPatternSet()
+        patternSet.include('sdk/include/**')
+        fileSystem = _RecordingFileSystem()
+        self.assertEqual(patternSet.find('', False, fileSystem), [os.path.join('sdk', 'include', 'hugo.h')])
+        self.assertEqual(sorted(fileSystem.listedFolderPaths), ['', 'sdk', os.path.join('sdk', 'include')])
+
+    def testCanMatchFilePartsInExaminedFolders(self):
+        patternSet = antglob.AntPatternSet()
+        patternSet.include('source/**/*.py')
+        patternSet.exclude('**/build')
+        self.assertTrue(patternSet.matchesFileParts(['source', 'hugo.py']))
+        self.assertTrue(patternSet.matchesFileParts(['source', 'hugo', 'hugo.py']))
+        self.assertFalse(patternSet.matchesFileParts(['source', 'hugo.txt']))
+        self.assertFalse(patternSet.matchesFileParts(['source', 'build', 'hugo.py']))
+        self.assertFalse(patternSet.matchesFileParts(['docs', 'hugo.py']))
+        self.assertTrue(patternSet.examinesFolderParts([]))
+        self.assertTrue(patternSet.examinesFolderParts(['source', 'hugo']))
+        self.assertFalse(patternSet.examinesFolderParts(['source', 'build']))
+        self.assertFalse(patternSet.examinesFolderParts(['docs']))
+
+    def testCanMatchManyFileParts(self):
+        patternSet = antglob.AntPatternSet()
+        patternSet.include('source/**/*.py')
+        patternSet.exclude('**/build')
+        filePartsToMatch = [
+            ['source', 'hugo.py'],
+            ['source', 'build', 'hugo.py'],
+            ['docs', 'hugo.py'],
+            ['source', 'hugo', 'hugo.py'],
+            ['source', 'hugo.txt'],
+            ['source', 'build', 'sepp.py'],
+        ]
+        expectedFileParts = [fileParts for fileParts in filePartsToMatch if patternSet.matchesFileParts(fileParts)]
+        self.assertEqual(expectedFileParts, [['source', 'hugo.py'], ['source', 'hugo', 'hugo.py']])
+        self.assertEqual(patternSet.matchingFileParts(filePartsToMatch), expectedFileParts)
+        self.assertEqual(patternSet.matchingFileParts([]), [])
+
+
+    def testCanMatchManyPaths(self):
+        patternSet = antglob.AntPatternSet()
+        patternSet.include('source/**/*.py, **/*.txt')
+        patternSet.exclude('**/build/**')
+        paths = [
+            'source/hugo.py',
+            'source/hugo/hugo.py',
+            'source/hugo/hugo.pyc',
+            'source/build/hugo.py',
+            'source/CVS/hugo.txt',
+            'docs/hugo.txt',
+            'docs/hugo.py',
+            'hugo.txt',
+            '',
+        ]
+        expectedMatches = [patternSet.matches(path) for path in paths]
+        self.assertEqual(expectedMatches, [True, True, False, False, False, True, False, True, False])
+        self.assertEqual(patternSet.matchesMany(paths), expectedMatches)
+        self.assertEqual(patternSet.matchesMany(sorted(paths)), [patternSet.matches(path) for path in sorted(paths)])
+        self.assertEqual(patternSet.matchesMany([]), [])
+
+    def testCanFilterPaths(self):
+        patternSet = antglob.AntPatternSet()
+        patternSet.exclude('**/*.pyc')
+        paths = ['source/hugo.py', 'source/hugo.pyc', 'source/CVS/Entries', 'setup.py']
+        self.assertEqual(list(patternSet.filter(iter(paths))), ['source/hugo.py', 'setup.py'])
+
 
 class FileSystemEntryTest(unittest.TestCase):
     def testCanProcessFileEntry(self):
@@ -355,6 +516,81 @@ class FileSystemEntryTest(unittest.TestCase):
         shutil.rmtree(testFolderPath)
 
 
+class SnapshotFileSystemTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_snapshot_')
+        self.scanFolderPath = os.path.join(self.testFolderPath, 'scan')
+        self.snapshotPath = os.path.join(self.testFolderPath, 'snapshot')
+        for folderPath in ('docs', os.path.join('source', 'hugo')):
+            os.makedirs(os.path.join(self.scanFolderPath, folderPath))
+        for filePath in ('ReadMe.txt', os.path.join('docs', 'manual.txt'), os.path.join('source', 'hugo', 'hugo.py')):
+            self._writeFile(filePath)
+        self._makeFoldersOld()
+
+    def tearDown(self):
+        shutil.rmtree(self.testFolderPath)
+
+    def _writeFile(self, relativeFilePath):
+        with open(os.path.join(self.scanFolderPath, relativeFilePath), 'wb') as testFile:
+            testFile.write(relativeFilePath)
+
+    def _makeFoldersOld(self):
+        # Pretend folders have been modified a while ago, otherwise they would be rescanned.
+        oldTime = time.time() - 60
+        for folderPath, _, _ in os.walk(self.scanFolderPath):
+            os.utime(folderPath, (oldTime, oldTime))
+
+    def _findEntries(self, patternSet=None):
+        if patternSet is None:
+            patternSet = antglob.AntPatternSet()
+        fileSystem = antglob.SnapshotFileSystem(self.snapshotPath, self.scanFolderPath)
+        entries = patternSet.findEntries(self.scanFolderPath, fileSystem)
+        fileSystem.save()
+        return (sorted(set(entry.relativePath for entry in entries)), fileSystem)
+
+    def testCanReuseUnchangedFolders(self):
+        expectedPaths, fileSystem = self._findEntries()
+        self.assertEqual(fileSystem.listedFolderCount, 4)
+        self.assertEqual(fileSystem.reusedFolderCount, 0)
+
+        paths, fileSystem = self._findEntries()
+        self.assertEqual(paths, expectedPaths)
+        self.assertEqual(fileSystem.listedFolderCount, 0)
+        self.assertEqual(fileSystem.reusedFolderCount, 4)
+
+    def testCanRescanChangedFolders(self):
+        self._findEntries()
+        self._writeFile(os.path.join('docs', 'added.txt'))
+        paths, fileSystem = self._findEntries()
+        self.assertTrue(os.path.join('docs', 'added.txt') in paths)
+        self.assertEqual(fileSystem.listedFolderCount, 1)
+        self.assertEqual(fileSystem.reusedFolderCount, 3)
+
+        # Because the changed folder was modified just now, it has to be rescanned again.
+        _, fileSystem = self._findEntries()
+        self.assertEqual(fileSystem.listedFolderCount, 1)
+
+    def testCanChangePatterns(self):
+        docsPatternSet = antglob.AntPatternSet()
+        docsPatternSet.include('docs/**')
+        paths, fileSystem = self._findEntries(docsPatternSet)
+        self.assertEqual(paths, [os.path.join('docs', ''), os.path.join('docs', 'manual.txt')])
+        self.assertEqual(fileSystem.listedFolderCount, 2)
+
+        pythonPatternSet = antglob.AntPatternSet()
+        pythonPatternSet.include('**/*.py')
+        paths, fileSystem = self._findEntries(pythonPatternSet)
+        self.assertEqual(paths, [os.path.join('source', ''), os.path.join('source', 'hugo', ''), os.path.join('source', 'hugo', 'hugo.py')])
+        self.assertEqual(fileSystem.listedFolderCount, 2)
+        self.assertEqual(fileSystem.reusedFolderCount, 2)
+
+    def testIgnoresBrokenSnapshot(self):
+        with open(self.snapshotPath, 'wb') as snapshotFile:
+            snapshotFile.write('{broken')
+        paths, fileSystem = self._findEntries()
+        self.assertEqual(fileSystem.listedFolderCount, 4)
+
+
 if __name__ == '__main__':  # pragma: no cover
     logging.basicConfig(level=logging.INFO)
     unittest.main()
@@ -0,0 +1,135 @@
+"""
+Tests for `_archive`.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import logging
+import os
+import stat
+import StringIO
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from scunch import antglob
+from scunch import _archive
+from scunch import _tools
+
+_log = logging.getLogger("test")
+
+
+def _addTarFile(archive, name, content, timeModified=1000000000):
+    tarInfo = tarfile.TarInfo(name)
+    tarInfo.size = len(content)
+    tarInfo.mtime = timeModified
+    tarInfo.mode = 0640
+    archive.addfile(tarInfo, StringIO.StringIO(content))
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_archive_')
+        self.tarPath = os.path.join(self.testFolderPath, 'drop.tar.gz')
+        self.zipPath = os.path.join(self.testFolderPath, 'drop.zip')
+        with tarfile.open(self.tarPath, 'w:gz') as archive:
+            _addTarFile(archive, 'hello.txt', 'hi\n')
+            _addTarFile(archive, './docs/deep/some.txt', 'some\n')
+            emptyFolderInfo = tarfile.TarInfo('empty')
+            emptyFolderInfo.type = tarfile.DIRTYPE
+            emptyFolderInfo.mode = 0755
+            archive.addfile(emptyFolderInfo)
+            linkInfo = tarfile.TarInfo('link.txt')
+            linkInfo.type = tarfile.SYMTYPE
+            linkInfo.linkname = 'hello.txt'
+            archive.addfile(linkInfo)
+            _addTarFile(archive, 'hello.txt', 'hello\n')
+        with zipfile.ZipFile(self.zipPath, 'w') as archive:
+            archive.writestr('hello.txt', 'hello\n')
+            archive.writestr('docs/deep/some.txt', 'some\n')
+            archive.writestr('empty/', '')
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def testCanDetectArchive(self):
+        self.assertTrue(_archive.isArchive(self.tarPath))
+        self.assertTrue(_archive.isArchive(self.zipPath))
+        self.assertFalse(_archive.isArchive(self.testFolderPath))
+        plainPath = os.path.join(self.testFolderPath, 'plain.txt')
+        with open(plainPath, 'wb') as plainFile:
+            plainFile.write('no archive\n')
+        self.assertFalse(_archive.isArchive(plainPath))
+        self.assertFalse(_archive.isArchive(os.path.join(self.testFolderPath, 'missing.zip')))
+
+    def testCanFindEntriesInArchive(self):
+        for archivePath in (self.tarPath, self.zipPath):
+            fileSystem = _archive.ArchiveFileSystem(archivePath)
+            entries = antglob.AntPatternSet().findEntries(archivePath, fileSystem)
+            relativePaths = sorted(set(entry.relativePath for entry in entries))
+            self.assertEqual(relativePaths, [
+                os.path.join('docs', ''),
+                os.path.join('docs', 'deep', ''),
+                os.path.join('docs', 'deep', 'some.txt'),
+                os.path.join('empty', ''),
+                'hello.txt',
+            ])
+            helloEntry = [entry for entry in entries if entry.name == 'hello.txt'][0]
+            self.assertEqual(helloEntry.kind, antglob.FileSystemEntry.File)
+            self.assertEqual(helloEntry.size, len('hello\n'))
+            self.assertTrue(fileSystem.isdir(os.path.join(archivePath, 'docs')))
+            self.assertFalse(fileSystem.isdir(os.path.join(archivePath, 'hello.txt')))
+            self.assertRaises(OSError, fileSystem.stat, os.path.join(archivePath, 'missing.txt'))
+            self.assertRaises(OSError, fileSystem.listdir, os.path.join(archivePath, 'hello.txt'))
+
+    def testCanFindPermissionsAndTimeInTar(self):
+        fileSystem = _archive.ArchiveFileSystem(self.tarPath)
+        entryInfo = fileSystem.stat(os.path.join(self.tarPath, 'hello.txt'))
+        self.assertEqual(entryInfo.st_mode, stat.S_IFREG | 0640)
+        self.assertEqual(entryInfo.st_mtime, 1000000000)
+
+    def testCanIterateFilesInArchiveOrder(self):
+        filesRead = [(relativePath, fileToRead.read()) for relativePath, _, fileToRead in _archive.iterFiles(self.tarPath)]
+        self.assertEqual(filesRead, [('hello.txt', 'hi\n'), (os.path.join('docs', 'deep', 'some.txt'), 'some\n'), ('hello.txt', 'hello\n')])
+        filesRead = [(relativePath, fileToRead.read()) for relativePath, _, fileToRead in _archive.iterFiles(self.zipPath, set(['hello.txt']))]
+        self.assertEqual(filesRead, [('hello.txt', 'hello\n')])
+
+    def testCanReadFilesWhileReadingIndex(self):
+        for archivePath, expectedFilesRead in (
+            (self.tarPath, [('hello.txt', 'hi\n'), (os.path.join('docs', 'deep', 'some.txt'), 'some\n'), ('hello.txt', 'hello\n')]),
+            (self.zipPath, [('hello.txt', 'hello\n'), (os.path.join('docs', 'deep', 'some.txt'), 'some\n')]),
+        ):
+            filesRead = []
+
+            def readFile(relativePath, entryInfo, fileToRead):
+                self.assertTrue(stat.S_ISREG(entryInfo.st_mode))
+                filesRead.append((relativePath, fileToRead.read()))
+
+            fileSystem = _archive.ArchiveFileSystem(archivePath, readFile)
+            self.assertEqual(filesRead, expectedFilesRead)
+            self.assertEqual(fileSystem.stat(os.path.join(archivePath, 'hello.txt')).st_size, len('hello\n'))
+
+    def testFailsOnEntryOutsideOfArchive(self):
+        brokenZipPath = os.path.join(self.testFolderPath, 'broken.zip')
+        with zipfile.ZipFile(brokenZipPath, 'w') as archive:
+            archive.writestr('../outside.txt', 'outside\n')
+        self.assertRaises(_archive.ArchiveError, _archive.ArchiveFileSystem, brokenZipPath)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Tests for `_filecopy`.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import ctypes
+import errno
+import logging
+import os
+import tempfile
+import unittest
+
+from scunch import _filecopy
+from scunch import _tools
+
+_log = logging.getLogger("test")
+
+
+class CopyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_filecopy_')
+        self.sourceFilePath = os.path.join(self.testFolderPath, 'source.bin')
+        self.targetFilePath = os.path.join(self.testFolderPath, 'target.bin')
+        with open(self.sourceFilePath, 'wb') as sourceFile:
+            for blockNumber in range(300):
+                sourceFile.write(('block %d\n' % blockNumber) * 1000)
+        os.utime(self.sourceFilePath, (1000000000, 1000000000))
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def _assertCopied(self):
+        self.assertTrue(_tools.hasSameContent(self.sourceFilePath, self.targetFilePath))
+        self.assertEqual(os.path.getmtime(self.targetFilePath), 1000000000)
+
+    def testCanCopyFile(self):
+        method = _filecopy.copyFile(self.sourceFilePath, self.targetFilePath)
+        self.assertTrue(method in _filecopy.Methods)
+        self._assertCopied()
+
+    def testCanCopyFileUsingEachMethod(self):
+        for method in _filecopy.Methods:
+            actualMethod = _filecopy.copyFile(self.sourceFilePath, self.targetFilePath, (method,))
+            self.assertTrue(actualMethod in (method, _filecopy.Read))
+            self._assertCopied()
+
+    def testCanReplaceLargerFile(self):
+        with open(self.targetFilePath, 'wb') as targetFile:
+            targetFile.write('x' * (2 * os.path.getsize(self.sourceFilePath)))
+        _filecopy.copyFile(self.sourceFilePath, self.targetFilePath)
+        self._assertCopied()
+
+    def testCanCopyEmptyFile(self):
+        with open(self.sourceFilePath, 'wb'):
+            pass
+        _filecopy.copyFile(self.sourceFilePath, self.targetFilePath, (_filecopy.CopyFileRange, _filecopy.SendFile))
+        self.assertEqual(os.path.getsize(self.targetFilePath), 0)
+
+    def testCanFallBackToRead(self):
+        def unsupportedCopy(*arguments):
+            ctypes.set_errno(errno.ENOSYS)
+            return -1
+        originalCopyFileRange = _filecopy._copyFileRange
+        originalSendFile = _filecopy._sendFile
+        _filecopy._copyFileRange = unsupportedCopy
+        _filecopy._sendFile = unsupportedCopy
+        try:
+            method = _filecopy.copyFile(self.sourceFilePath, self.targetFilePath, (_filecopy.CopyFileRange, _filecopy.SendFile))
+        finally:
+            _filecopy._copyFileRange = originalCopyFileRange
+            _filecopy._sendFile = originalSendFile
+        self.assertEqual(method, _filecopy.Read)
+        self._assertCopied()
+
+    def testCanCopyFileWithSmallBufferAndDropCache(self):
+        method = _filecopy.copyFile(self.sourceFilePath, self.targetFilePath, (_filecopy.Read,), bufferSize=7, dropCache=True)
+        self.assertEqual(method, _filecopy.Read)
+        self._assertCopied()
+
+    def testCanThrottleEachMethod(self):
+        sourceSize = os.path.getsize(self.sourceFilePath)
+        for method in (_filecopy.CopyFileRange, _filecopy.SendFile, _filecopy.Read):
+            throttledByteCounts = []
+            _filecopy.copyFile(self.sourceFilePath, self.targetFilePath, (method,), bufferSize=64 * 1024, throttle=throttledByteCounts.append)
+            self._assertCopied()
+            self.assertEqual(sum(throttledByteCounts), sourceSize)
+            self.assertTrue(max(throttledByteCounts) <= 64 * 1024)
+
+    def testCanDropFromCache(self):
+        with open(self.sourceFilePath, 'rb') as sourceFile:
+            _filecopy.adviseSequential(sourceFile.fileno())
+            sourceFile.read()
+            _filecopy.dropFromCache(sourceFile.fileno())
+        with open(self.targetFilePath, 'wb') as targetFile:
+            targetFile.write('some data')
+            targetFile.flush()
+            _filecopy.dropFromCache(targetFile.fileno(), isWritten=True)
+
+    def testCanReplaceFile(self):
+        with open(self.targetFilePath, 'wb') as targetFile:
+            targetFile.write('old')
+        _filecopy.copyFile(self.sourceFilePath, self.targetFilePath + '.tmp')
+        _filecopy.syncFile(self.targetFilePath + '.tmp')
+        _filecopy.replaceFile(self.targetFilePath + '.tmp', self.targetFilePath)
+        _filecopy.syncFolder(self.testFolderPath)
+        self._assertCopied()
+        self.assertFalse(os.path.exists(self.targetFilePath + '.tmp'))
+
+    def _writeChangedTarget(self, offset, data, size=None):
+        _filecopy.copyFile(self.sourceFilePath, self.targetFilePath)
+        with open(self.targetFilePath, 'r+b') as targetFile:
+            targetFile.seek(offset)
+            targetFile.write(data)
+            if size is not None:
+                targetFile.truncate(size)
+
+    def testCanUpdateFileWritingOnlyChangedBlocks(self):
+        blockSize = _filecopy.DeltaBlockSize
+        self._writeChangedTarget(3 * blockSize + 17, 'changed')
+        self.assertEqual(_filecopy.updateFile(self.sourceFilePath, self.targetFilePath), blockSize)
+        self._assertCopied()
+        self.assertEqual(_filecopy.updateFile(self.sourceFilePath, self.targetFilePath), 0)
+
+    def testCanUpdateShorterAndLongerFile(self):
+        sourceSize = os.path.getsize(self.sourceFilePath)
+        blockSize = _filecopy.DeltaBlockSize
+        self._writeChangedTarget(0, '', 5 * blockSize + 3)
+        self.assertEqual(_filecopy.updateFile(self.sourceFilePath, self.targetFilePath), sourceSize - 5 * blockSize)
+        self._assertCopied()
+        self._writeChangedTarget(sourceSize, 'appended')
+        self.assertEqual(_filecopy.updateFile(self.sourceFilePath, self.targetFilePath, dropCache=True), 0)
+        self._assertCopied()
+
+    def testCanThrottleUpdate(self):
+        sourceSize = os.path.getsize(self.sourceFilePath)
+        self._writeChangedTarget(0, 'changed')
+        readByteCounts = []
+        writtenByteCounts = []
+        _filecopy.updateFile(self.sourceFilePath, self.targetFilePath, bufferSize=100000, readThrottle=readByteCounts.append, writeThrottle=writtenByteCounts.append)
+        self._assertCopied()
+        self.assertEqual(sum(readByteCounts), 2 * sourceSize)
+        self.assertEqual(writtenByteCounts, [_filecopy.DeltaBlockSize])
+
+    def testFailsOnMissingSource(self):
+        self.assertRaises(OSError, _filecopy.copyFile, os.path.join(self.testFolderPath, 'missing.bin'), self.targetFilePath)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for `_launcher`.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import errno
+import logging
+import os
+import tempfile
+import unittest
+
+from scunch import _launcher
+from scunch import _tools
+
+_log = logging.getLogger("test")
+
+
+class CommandLauncherTest(_tools.LoggableTestCase):
+    def setUp(self):
+        super(CommandLauncherTest, self).setUp()
+        self.testFolderPath = tempfile.mkdtemp(prefix="scunch_test_")
+        self.stdoutPath = os.path.join(self.testFolderPath, 'stdout.txt')
+        self.stderrPath = os.path.join(self.testFolderPath, 'stderr.txt')
+        self.launcher = _launcher.CommandLauncher()
+
+    def tearDown(self):
+        self.launcher.close()
+        _tools.removeFolder(self.testFolderPath)
+        super(CommandLauncherTest, self).tearDown()
+
+    def _stdoutText(self):
+        with open(self.stdoutPath, 'rb') as stdoutFile:
+            result = stdoutFile.read()
+        return result
+
+    def testCanCallCommand(self):
+        exitCode = self.launcher.call(['echo', 'hello'], self.stdoutPath, self.stderrPath)
+        self.assertEqual(0, exitCode)
+        self.assertEqual('hello\n', self._stdoutText())
+
+    def testCanCallManyCommands(self):
+        for number in range(3):
+            exitCode = self.launcher.call(['echo', str(number)], self.stdoutPath, self.stderrPath)
+            self.assertEqual(0, exitCode)
+            self.assertEqual('%d\n' % number, self._stdoutText())
+
+    def testCanReturnExitCode(self):
+        exitCode = self.launcher.call(['false'], os.devnull, self.stderrPath)
+        self.assertNotEqual(0, exitCode)
+
+    def testCanCallCommandInFolder(self):
+        self.launcher.call(['pwd'], self.stdoutPath, self.stderrPath, self.testFolderPath)
+        self.assertEqual(os.path.realpath(self.testFolderPath), os.path.realpath(self._stdoutText().rstrip('\n')))
+
+    def testFailsOnUnknownCommand(self):
+        try:
+            self.launcher.call(['scunch_no_such_command'], os.devnull, self.stderrPath)
+            self.fail(u'unknown command must cause OSError')
+        except OSError, error:
+            self.assertEqual(errno.ENOENT, error.errno)
+        # Make sure the launcher still works after a failed command.
+        self.assertEqual(0, self.launcher.call(['true'], os.devnull, self.stderrPath))
+
+    def testFailsOnClosedLauncher(self):
+        self.launcher.close()
+        self.launcher.close()
+        self.assertRaises(_launcher.LauncherError, self.launcher.call, ['true'], os.devnull, self.stderrPath)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -19,11 +19,17 @@ from __future__ import absolute_import
 
 import codecs
 import fnmatch
+import hashlib
+import json
 import logging
 import os
 import shutil
+import tempfile
+import StringIO
+import tarfile
 import unicodedata
 import unittest
+import zipfile
 
 from urlparse import urljoin
 
@@ -52,6 +58,841 @@ class ToolsTest(_tools.LoggableTestCase):
         normalizedHelloPy = [unicodedata.normalize(scunch._consoleNormalization, hello)]
         self.assertEqual(helloWithUmlauts, normalizedHelloPy)
 
+    def testRunWithCommandLauncher(self):
+        scunch._setUpEncoding()
+        scunch._setUpCommandLauncher()
+        try:
+            self.assertEqual([u'hello'], scunch.run([u'echo', u'hello'], returnStdout=True))
+            self.assertRaises(scunch.ScmError, scunch.run, [u'false'])
+            self.assertRaises(scunch.ScmError, scunch.run, [u'scunch_no_such_command'])
+        finally:
+            scunch._tearDownCommandLauncher()
+
+
+class ScmChangesTest(unittest.TestCase):
+    def testCanCollectPathsToCommit(self):
+        changes = scunch.ScmChanges()
+        self.assertEqual(len(changes), 0)
+        self.assertEqual(changes.relativePathsToCommit(), [])
+        changes.addedPaths.extend(['source', os.path.join('source', 'added.py')])
+        changes.modifiedPaths.append('setup.py')
+        changes.movedPaths.append(('moved.py', os.path.join('source', 'moved.py')))
+        changes.removedPaths.append('obsolete')
+        self.assertEqual(len(changes), 5)
+        self.assertEqual(changes.relativePathsToCommit(), [
+            'moved.py',
+            'obsolete',
+            'setup.py',
+            'source',
+            os.path.join('source', 'added.py'),
+            os.path.join('source', 'moved.py'),
+        ])
+        self.assertEqual(changes.relativePathsToCommitRecursively(), [])
+
+    def testCanCollectRemovedFoldersToCommitRecursively(self):
+        changes = scunch.ScmChanges()
+        changes.modifiedPaths.append('setup.py')
+        changes.movedPaths.append((os.path.join('old', 'kept.py'), 'kept.py'))
+        changes.removedPaths.extend([os.path.join('old', ''), 'obsolete.py'])
+        self.assertEqual(changes.relativePathsToCommit(), ['obsolete.py', 'setup.py'])
+        self.assertEqual(changes.relativePathsToCommitRecursively(), ['kept.py', os.path.join('old', ''), os.path.join('old', 'kept.py')])
+
+    def testCanCommitChangesInSingleRevision(self):
+        class ScmWorkWithoutCommit(scunch.ScmWork):
+            def __init__(self):
+                super(ScmWorkWithoutCommit, self).__init__(scunch.ScmStorage(u'file:///'), u'', tempfile.gettempdir())
+                self.commits = []
+
+            def commit(self, relativePathsToCommit, message, recursive=True):
+                self.commits.append((relativePathsToCommit, recursive))
+
+        changes = scunch.ScmChanges()
+        changes.modifiedPaths.append('setup.py')
+        scmWork = ScmWorkWithoutCommit()
+        scmWork.commitChanges(changes, u'Punched.')
+        changes.removedPaths.append(os.path.join('old', ''))
+        scmWork.commitChanges(changes, u'Punched.')
+        self.assertEqual(scmWork.commits, [(['setup.py'], False), ([os.path.join('old', ''), 'setup.py'], True)])
+
+
+class SparseCheckoutStepsTest(unittest.TestCase):
+    def testCanComputeStepsForNestedFolders(self):
+        self.assertEqual(scunch._sparseCheckoutSteps([
+            os.path.join('sdk', 'include'),
+            os.path.join('sdk', 'lib'),
+            os.path.join('vendor', 'zlib', 'include'),
+        ]), [
+            ('empty', ['sdk', 'vendor']),
+            ('empty', [os.path.join('vendor', 'zlib')]),
+            ('infinity', [os.path.join('sdk', 'include'), os.path.join('sdk', 'lib'), os.path.join('vendor', 'zlib', 'include')]),
+        ])
+
+    def testCanComputeStepsForTopFolders(self):
+        self.assertEqual(scunch._sparseCheckoutSteps(['docs']), [('infinity', ['docs'])])
+        self.assertEqual(scunch._sparseCheckoutSteps([]), [])
+
+
+class SvnInfoTest(unittest.TestCase):
+    _InfoXml = """<?xml version="1.0" encoding="UTF-8"?>
+<info>
+<entry kind="dir" path="ohsome" revision="7">
+<url>file:///repository/tags/1.0</url>
+<relative-url>^/tags/1.0</relative-url>
+<repository><root>file:///repository</root><uuid>6b6e8c5c-ed8a-4a1d-9d4b-5c1b1a2f3e4d</uuid></repository>
+<wc-info><wcroot-abspath>/tmp/ohsome</wcroot-abspath><schedule>normal</schedule><depth>empty</depth></wc-info>
+<commit revision="7"><author>tester</author><date>2013-06-01T12:00:00.000000Z</date></commit>
+</entry>
+</info>
+"""
+
+    def testCanParseSvnInfo(self):
+        infoHandler = scunch._SvnInfoContentHandler()
+        scunch.xml.sax.parseString(SvnInfoTest._InfoXml, infoHandler)
+        self.assertEqual(infoHandler.url, u'file:///repository/tags/1.0')
+        self.assertEqual(infoHandler.repositoryRoot, u'file:///repository')
+        self.assertEqual(infoHandler.repositoryUuid, u'6b6e8c5c-ed8a-4a1d-9d4b-5c1b1a2f3e4d')
+        self.assertEqual(infoHandler.depth, u'empty')
+
+
+class ChunkedCommitTest(unittest.TestCase):
+    class _ScmWorkWithBrokenCommit(object):
+        """
+        Work copy that only remembers what it commits and fails on a certain commit.
+        """
+        def __init__(self, localTargetPath, brokenCommitNumber=None):
+            self.localTargetPath = localTargetPath
+            self.brokenCommitNumber = brokenCommitNumber
+            self.commits = []
+
+        def commit(self, relativePathsToCommit, message, recursive=True):
+            if len(self.commits) + 1 == self.brokenCommitNumber:
+                self.brokenCommitNumber = None
+                raise scunch.ScmError(u'cannot commit')
+            self.commits.append((relativePathsToCommit, message, recursive))
+
+    def setUp(self):
+        self.workFolderPath = tempfile.mkdtemp(prefix='test_chunkedcommit_')
+        self.changes = scunch.ScmChanges()
+        self.changes.addedPaths.extend(['docs' + os.sep, os.path.join('docs', 'big.txt'), os.path.join('docs', 'small.txt')])
+        self.changes.movedPaths.append(('setup.py', os.path.join('docs', 'setup.py')))
+        self.changes.removedPaths.extend(['old' + os.sep, os.path.join('old', 'obsolete.txt')])
+        _tools.makeFolder(os.path.join(self.workFolderPath, 'docs'))
+        with open(os.path.join(self.workFolderPath, 'docs', 'big.txt'), 'wb') as bigFile:
+            bigFile.write('x' * 100)
+        with open(os.path.join(self.workFolderPath, 'docs', 'small.txt'), 'wb') as smallFile:
+            smallFile.write('x')
+
+    def tearDown(self):
+        _tools.removeFolder(self.workFolderPath)
+
+    def testCanSplitChangesIntoChunks(self):
+        self.assertEqual(self.changes.commitChunks(self.workFolderPath), [[
+            'docs' + os.sep,
+            os.path.join('docs', 'big.txt'),
+            os.path.join('docs', 'small.txt'),
+            'setup.py', os.path.join('docs', 'setup.py'),
+        ]])
+        self.assertEqual(self.changes.commitChunks(self.workFolderPath, maxPathCount=2), [
+            ['docs' + os.sep, os.path.join('docs', 'big.txt')],
+            [os.path.join('docs', 'small.txt')],
+            ['setup.py', os.path.join('docs', 'setup.py')],
+        ])
+        self.assertEqual(self.changes.commitChunks(self.workFolderPath, maxByteCount=10), [
+            ['docs' + os.sep],
+            [os.path.join('docs', 'big.txt')],
+            [os.path.join('docs', 'small.txt'), 'setup.py', os.path.join('docs', 'setup.py')],
+        ])
+        self.assertEqual(self.changes.recursiveCommitChunks(), [['old' + os.sep]])
+
+    def testCanResumeBrokenCommit(self):
+        scmWork = ChunkedCommitTest._ScmWorkWithBrokenCommit(self.workFolderPath, 2)
+        chunkedCommit = scunch.ChunkedCommit(scmWork)
+        try:
+            self.assertFalse(chunkedCommit.hasPendingChunks())
+            self.assertRaises(scunch.ScmError, chunkedCommit.commit, self.changes, u'Punched.', 2)
+            self.assertTrue(chunkedCommit.hasPendingChunks())
+            self.assertEqual([message for _, message, _ in scmWork.commits], [u'Punched. (1/4)'])
+            chunkedCommit.resume()
+            self.assertFalse(chunkedCommit.hasPendingChunks())
+            self.assertEqual([message for _, message, _ in scmWork.commits], [u'Punched. (1/4)', u'Punched. (2/4)', u'Punched. (3/4)', u'Punched. (4/4)'])
+            self.assertEqual(scmWork.commits[2][0], ['setup.py', os.path.join('docs', 'setup.py')])
+            self.assertEqual([recursive for _, _, recursive in scmWork.commits], [False, False, False, True])
+        finally:
+            chunkedCommit.discard()
+
+    def testCanCommitRemovedFolderInLastChunk(self):
+        scmWork = ChunkedCommitTest._ScmWorkWithBrokenCommit(self.workFolderPath)
+        chunkedCommit = scunch.ChunkedCommit(scmWork)
+        changes = scunch.ScmChanges()
+        changes.modifiedPaths.append('setup.py')
+        changes.movedPaths.append((os.path.join('old', 'kept.py'), 'kept.py'))
+        changes.removedPaths.extend([os.path.join('old', ''), os.path.join('older', '')])
+        try:
+            chunkedCommit.commit(changes, u'Punched.', 3)
+            self.assertEqual(scmWork.commits, [
+                (['setup.py'], u'Punched. (1/3)', False),
+                ([os.path.join('old', ''), os.path.join('old', 'kept.py'), 'kept.py'], u'Punched. (2/3)', True),
+                ([os.path.join('older', '')], u'Punched. (3/3)', True),
+            ])
+        finally:
+            chunkedCommit.discard()
+
+
+class PunchJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_punchjournal_')
+        self.journal = scunch.PunchJournal(os.path.join(self.testFolderPath, 'journal'))
+        self.steps = [
+            {'action': 'mkdir', 'path': u'docs' + os.sep},
+            {'action': 'transfer', 'path': u'docs' + os.sep + u'h\xe4ll\xf6.txt', 'externalPath': u'docs' + os.sep + u'h\xe4ll\xf6.txt', 'isText': False, 'isModification': False},
+            {'action': 'add', 'paths': [u'docs' + os.sep, u'docs' + os.sep + u'h\xe4ll\xf6.txt']},
+        ]
+
+    def tearDown(self):
+        self.journal.close()
+        _tools.removeFolder(self.testFolderPath)
+
+    def testCanReadJournal(self):
+        self.assertFalse(self.journal.exists())
+        self.journal.start(u'/tmp/external', self.steps)
+        self.journal.addDoneStep(0, True)
+        self.journal.addDoneStep(1, False)
+        self.journal.close()
+        self.assertTrue(self.journal.exists())
+        self.assertEqual(self.journal.read(), (u'/tmp/external', self.steps, {0: True, 1: False}))
+        self.journal.addDoneStep(2, True)
+        self.assertEqual(self.journal.read(), (u'/tmp/external', self.steps, {0: True, 1: False, 2: True}))
+        self.journal.remove()
+        self.assertFalse(self.journal.exists())
+
+    def testIgnoresPartiallyWrittenStep(self):
+        self.journal.start(u'/tmp/external', self.steps)
+        self.journal.addDoneStep(0, True)
+        self.journal.close()
+        with open(self.journal.journalPath, 'ab') as journalFile:
+            journalFile.write('{"done":1,"chan')
+        self.assertEqual(self.journal.read()[2], {0: True})
+
+    def testFailsOnBrokenJournal(self):
+        self.journal.start(u'/tmp/external', self.steps[:1])
+        self.journal.close()
+        with open(self.journal.journalPath, 'wb') as journalFile:
+            journalFile.write('{"externalFolderPath":"/tmp/external","stepCount":2}\n{"action":"mkdir","path":"docs/"}\n')
+        self.assertRaises(scunch.ScmError, self.journal.read)
+
+
+class PunchWatchedChangesTest(unittest.TestCase):
+    """
+    TestCase for ``scunch._punchWatchedChanges()``.
+    """
+    class _WatcherWithChanges(object):
+        """
+        Watcher that reports each of ``changedPathsList`` once.
+        """
+        def __init__(self, changedPathsList):
+            self.changedPathsList = list(changedPathsList)
+
+        def changedPaths(self, delay):
+            return self.changedPathsList.pop(0)
+
+    class _ScmWorkWithoutCommit(scunch.ScmWork):
+        """
+        Work copy that only remembers what it commits.
+        """
+        def __init__(self, localTargetPath):
+            super(PunchWatchedChangesTest._ScmWorkWithoutCommit, self).__init__(scunch.ScmStorage(u'file:///'), u'', localTargetPath)
+            self.commits = []
+
+        def commitChanges(self, changes, message):
+            self.commits.append((changes.modifiedPaths, message))
+
+    def setUp(self):
+        scunch._setUpEncoding()
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_punchwatchedchanges_')
+        self.externalFolderPath = os.path.join(self.testFolderPath, 'external')
+        self.workFolderPath = os.path.join(self.testFolderPath, 'work')
+        for folderPath, content in ((self.externalFolderPath, 'print "hello"\n'), (self.workFolderPath, 'print "hi"\n')):
+            _tools.makeFolder(folderPath)
+            for name in ('hello.py', 'same.py'):
+                with open(os.path.join(folderPath, name), 'wb') as targetFile:
+                    targetFile.write(content if name == 'hello.py' else 'print "same"\n')
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def testCanPunchWatchedChange(self):
+        options, _, _, _, actionsToPerformAfterPunching = scunch.parsedOptions(['scunch', '--watch', '--after', 'commit', '--message', 'Punched watched change.', self.externalFolderPath, self.workFolderPath])
+        scmWork = PunchWatchedChangesTest._ScmWorkWithoutCommit(self.workFolderPath)
+        watcher = PunchWatchedChangesTest._WatcherWithChanges([[u'hello.py']])
+        scunch._punchWatchedChanges(watcher, self.externalFolderPath, scmWork, None, options, actionsToPerformAfterPunching, scunch.ChunkedCommit(scmWork), None, maxPunchCount=1)
+        self.assertEqual(scmWork.commits, [([u'hello.py'], 'Punched watched change.')])
+        with open(os.path.join(self.workFolderPath, 'hello.py'), 'rb') as helloPyFile:
+            self.assertEqual(helloPyFile.read(), 'print "hello"\n')
+
+
+class ScunchPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_scunchplan_')
+        self.externalFolderPath = os.path.join(self.testFolderPath, 'external')
+        self.workFolderPath = os.path.join(self.testFolderPath, 'work')
+        self.planPath = os.path.join(self.testFolderPath, 'plan')
+        for folderPath in (self.externalFolderPath, self.workFolderPath):
+            _tools.makeFolder(os.path.join(folderPath, 'docs'))
+        self._writeFile(self.externalFolderPath, 'hello.py', 'print "hello"\n')
+        self._writeFile(self.workFolderPath, 'hello.py', 'print "hi"\n')
+        self._writeFile(self.externalFolderPath, 'added.txt', 'added\n')
+        self._writeFile(self.workFolderPath, 'removed.txt', 'removed\n')
+        self._writeFile(self.externalFolderPath, os.path.join('docs', 'moved.txt'), 'moved\n')
+        self._writeFile(self.workFolderPath, 'moved.txt', 'moved\n')
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def _writeFile(self, folderPath, relativeFilePath, content):
+        with open(os.path.join(folderPath, relativeFilePath), 'wb') as targetFile:
+            targetFile.write(content)
+
+    def testCanPlanWithoutWorkCopy(self):
+        self._writeFile(self.workFolderPath, 'same.py', 'print "same"\n')
+        self._writeFile(self.externalFolderPath, 'same.py', 'print "same"\n')
+        self._writeFile(self.externalFolderPath, 'changed.txt', 'changed\n')
+        self._writeFile(self.workFolderPath, 'changed.txt', 'CHANGED\n')
+        steps = scunch.scunchPlan(self.externalFolderPath, self.workFolderPath, self.planPath)
+        self.assertEqual([step['action'] for step in steps], ['transfer', 'transfer', 'transfer', 'add', 'move', 'remove'])
+        self.assertEqual([step['path'] for step in steps[:3]], ['changed.txt', 'hello.py', 'added.txt'])
+        self.assertEqual(steps[3]['paths'], ['added.txt'])
+        self.assertEqual(steps[4]['movedPaths'], [['moved.txt', os.path.join('docs', 'moved.txt')]])
+        self.assertEqual(steps[5]['paths'], ['removed.txt'])
+        with open(self.planPath, 'rb') as planFile:
+            header = json.loads(planFile.readline())
+        self.assertEqual(header['stepCount'], len(steps))
+        self.assertEqual(header['byteCount'], len('changed\n') + len('print "hello"\n') + len('added\n'))
+        plannedExternalFolderPath, plannedSteps, stepNumberToChangedMap = scunch.PunchJournal(self.planPath).read()
+        self.assertEqual(plannedExternalFolderPath, self.externalFolderPath)
+        self.assertEqual(plannedSteps, steps)
+        self.assertEqual(stepNumberToChangedMap, {})
+        self.assertEqual(sorted(os.listdir(self.workFolderPath)), ['changed.txt', 'docs', 'hello.py', 'moved.txt', 'removed.txt', 'same.py'])
+
+    def _transferSteps(self, relativeFilePaths):
+        result = [{'action': 'mkdir', 'path': os.path.join('copied', '')}]
+        for relativeFilePath in relativeFilePaths:
+            result.append({
+                'action': 'transfer',
+                'path': os.path.join('copied', relativeFilePath),
+                'externalPath': relativeFilePath,
+                'isText': False,
+                'isModification': True,
+            })
+        return result
+
+    def testCanTransferInParallel(self):
+        relativeFilePaths = ['hello.py', 'added.txt', os.path.join('docs', 'moved.txt')]
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._externalFolderPath = self.externalFolderPath
+        puncher.transferWorkerCount = 3
+        _tools.makeFolder(os.path.join(self.workFolderPath, 'copied', 'docs'))
+        changes = puncher._applySteps(self._transferSteps(relativeFilePaths), None)
+        self.assertEqual(changes.modifiedPaths, [os.path.join('copied', relativeFilePath) for relativeFilePath in relativeFilePaths])
+        for relativeFilePath in relativeFilePaths:
+            self.assertTrue(_tools.hasSameContent(os.path.join(self.externalFolderPath, relativeFilePath), os.path.join(self.workFolderPath, 'copied', relativeFilePath)))
+
+    def testCanThrottleTransferInParallel(self):
+        relativeFilePaths = ['hello.py', 'added.txt', os.path.join('docs', 'moved.txt')]
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._externalFolderPath = self.externalFolderPath
+        puncher.transferWorkerCount = 3
+        transferOptions = scunch.TransferOptions(maxReadRate=1000000, maxWriteRate=1000000)
+        puncher.transferOptions = transferOptions
+        _tools.makeFolder(os.path.join(self.workFolderPath, 'copied', 'docs'))
+        puncher._applySteps(self._transferSteps(relativeFilePaths), None)
+        byteCount = sum(os.path.getsize(os.path.join(self.externalFolderPath, relativeFilePath)) for relativeFilePath in relativeFilePaths)
+        self.assertEqual(transferOptions.readRateLimiter.consumedAmount, byteCount)
+        self.assertEqual(transferOptions.writeRateLimiter.consumedAmount, byteCount)
+
+    def _temporaryPathsInWork(self):
+        result = []
+        for folderPath, _, fileNames in os.walk(self.workFolderPath):
+            result.extend(os.path.join(folderPath, fileName) for fileName in fileNames if fileName.startswith('.scunch_'))
+        return result
+
+    def _createExternalArchive(self, archiveName):
+        archivePath = os.path.join(self.testFolderPath, archiveName)
+        with tarfile.open(archivePath, 'w:gz') as archive:
+            for name in sorted(os.listdir(self.externalFolderPath)):
+                archive.add(os.path.join(self.externalFolderPath, name), name)
+        return archivePath
+
+    def testCanPlanFromArchive(self):
+        self._writeFile(self.workFolderPath, 'same.py', 'print "same"\n')
+        self._writeFile(self.externalFolderPath, 'same.py', 'print "same"\n')
+        archivePath = self._createExternalArchive('external.tar.gz')
+        steps = scunch.scunchPlan(archivePath, self.workFolderPath, self.planPath)
+        self.assertEqual(steps, scunch.scunchPlan(self.externalFolderPath, self.workFolderPath, self.planPath))
+        self.assertEqual(scunch.PunchJournal(self.planPath).read()[0], self.externalFolderPath)
+
+    def testCanPlanNothingForSameFolders(self):
+        _tools.removeFolder(self.workFolderPath)
+        shutil.copytree(self.externalFolderPath, self.workFolderPath)
+        for externalFolderPath in (self.externalFolderPath, self._createExternalArchive('external.tar.gz')):
+            self.assertEqual(scunch.scunchPlan(externalFolderPath, self.workFolderPath, self.planPath), [])
+            with open(self.planPath, 'rb') as planFile:
+                header = json.loads(planFile.readline())
+            self.assertEqual((header['stepCount'], header['byteCount']), (0, 0))
+
+    def testCanTransferFromArchive(self):
+        self._writeFile(self.externalFolderPath, 'same.py', 'print "same"\n')
+        self._writeFile(self.externalFolderPath, 'trailing.txt', 'text  \r\n')
+        archivePath = self._createExternalArchive('external.tar.gz')
+        _tools.makeFolder(os.path.join(self.workFolderPath, 'copied', 'docs'))
+        self._writeFile(self.workFolderPath, os.path.join('copied', 'same.py'), 'print "same"\n')
+        self._writeFile(self.workFolderPath, os.path.join('copied', 'hello.py'), 'print "hello, world"\n')
+        steps = self._transferSteps(['hello.py', 'same.py', 'trailing.txt', os.path.join('docs', 'moved.txt')])
+        steps[3]['isText'] = True
+        for transferWorkerCount in (1, 2):
+            puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+            puncher._externalFolderPath = archivePath
+            puncher.transferWorkerCount = transferWorkerCount
+            puncher.transferOptions = scunch.TransferOptions(bufferSize=4)
+            changes = puncher._applySteps(steps, scunch.TextOptions(None, scunch.TextOptions.Unix, stripTrailing=True))
+            if transferWorkerCount == 1:
+                self.assertEqual(changes.modifiedPaths, [os.path.join('copied', relativePath) for relativePath in ('hello.py', 'trailing.txt', os.path.join('docs', 'moved.txt'))])
+            else:
+                self.assertEqual(changes.modifiedPaths, [])
+            for relativePath, content in (('hello.py', 'print "hello"\n'), ('same.py', 'print "same"\n'), ('trailing.txt', 'text\n'), (os.path.join('docs', 'moved.txt'), 'moved\n')):
+                with open(os.path.join(self.workFolderPath, 'copied', relativePath), 'rb') as workFile:
+                    self.assertEqual(workFile.read(), content)
+            self.assertEqual(os.path.getmtime(os.path.join(self.workFolderPath, 'copied', 'hello.py')), int(os.path.getmtime(os.path.join(self.externalFolderPath, 'hello.py'))))
+            self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testCanReadArchiveOnceWhenScanning(self):
+        self._writeFile(self.workFolderPath, 'same.py', 'print "same"\n')
+        self._writeFile(self.externalFolderPath, 'same.py', 'print "same"\n')
+        archivePath = self._createExternalArchive('external.tar.gz')
+        folderSteps = scunch.scunchPlan(self.externalFolderPath, self.workFolderPath, self.planPath)
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        originalIterFiles = scunch._archive.iterFiles
+
+        def failingIterFiles(*arguments, **keywords):
+            raise AssertionError(u'archive must be read only once')
+
+        scunch._archive.iterFiles = failingIterFiles
+        try:
+            self.assertEqual(scunch.scunchPlan(archivePath, self.workFolderPath, self.planPath), folderSteps)
+            puncher._setChangedEntries(archivePath, u'', None, None, None)
+            self.assertEqual(self._temporaryPathsInWork(), [])
+            self.assertTrue(os.listdir(scunch.stateFilePath(self.workFolderPath, 'staging')))
+            steps = [step for step in puncher._plannedSteps(None) if step['action'] in ('mkdir', 'transfer')]
+            changes = puncher._applySteps(steps, None)
+        finally:
+            scunch._archive.iterFiles = originalIterFiles
+        self.assertEqual(changes.modifiedPaths, ['hello.py'])
+        for relativePath, content in (('hello.py', 'print "hello"\n'), ('same.py', 'print "same"\n'), ('added.txt', 'added\n'), (os.path.join('docs', 'moved.txt'), 'moved\n')):
+            with open(os.path.join(self.workFolderPath, relativePath), 'rb') as workFile:
+                self.assertEqual(workFile.read(), content)
+        self.assertEqual(self._temporaryPathsInWork(), [])
+        self.assertFalse(os.path.exists(scunch.stateFilePath(self.workFolderPath, 'staging')))
+
+    def testFailsOnTransferOfFileMissingInArchive(self):
+        archivePath = self._createExternalArchive('external.tar.gz')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._externalFolderPath = archivePath
+        self.assertRaises(scunch.ScmError, puncher._applySteps, self._transferSteps(['missing.txt']), None)
+        self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testCanTransferWithEachFsyncMode(self):
+        relativeFilePaths = ['hello.py', 'added.txt', os.path.join('docs', 'moved.txt')]
+        for fsyncMode in sorted(scunch.TransferOptions._ValidFsyncModes):
+            _tools.removeFolder(os.path.join(self.workFolderPath, 'copied'))
+            _tools.makeFolder(os.path.join(self.workFolderPath, 'copied', 'docs'))
+            puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+            puncher._externalFolderPath = self.externalFolderPath
+            puncher.transferOptions = scunch.TransferOptions(fsyncMode=fsyncMode, fsyncBatchFileCount=2)
+            changes = puncher._applySteps(self._transferSteps(relativeFilePaths), None)
+            self.assertEqual(len(changes.modifiedPaths), len(relativeFilePaths))
+            for relativeFilePath in relativeFilePaths:
+                self.assertTrue(_tools.hasSameContent(os.path.join(self.externalFolderPath, relativeFilePath), os.path.join(self.workFolderPath, 'copied', relativeFilePath)))
+            self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testKeepsWorkFileOnBrokenTransfer(self):
+        def brokenCopy(sourceFilePath, targetFilePath):
+            with open(targetFilePath, 'wb') as targetFile:
+                targetFile.write('print')
+            raise IOError(u'broken copy')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._copyBinaryFile = brokenCopy
+        workFilePath = os.path.join(self.workFolderPath, 'hello.py')
+        self.assertRaises(IOError, puncher._transferFileToWork, os.path.join(self.externalFolderPath, 'hello.py'), workFilePath, False, None)
+        with open(workFilePath, 'rb') as workFile:
+            self.assertEqual(workFile.read(), 'print "hi"\n')
+        self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testCanUpdateLargeWorkFileInPlace(self):
+        externalFilePath = os.path.join(self.externalFolderPath, 'image.bin')
+        workFilePath = os.path.join(self.workFolderPath, 'image.bin')
+        with open(externalFilePath, 'wb') as externalFile:
+            externalFile.write('x' * 300000)
+        with open(workFilePath, 'wb') as workFile:
+            workFile.write('x' * 100000 + 'changed' + 'x' * 100000)
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher.transferOptions = scunch.TransferOptions(deltaThreshold=200000, fsyncMode=scunch.TransferOptions.FsyncFile)
+        self.assertTrue(puncher._transferFileToWork(externalFilePath, workFilePath, False, None))
+        self.assertTrue(_tools.hasSameContent(externalFilePath, workFilePath))
+        self.assertFalse(puncher._transferFileToWork(externalFilePath, workFilePath, False, None))
+        self.assertEqual(puncher._deltaFileCount, 2)
+        self.assertEqual(puncher._deltaByteCount, 600000)
+        self.assertTrue(puncher._deltaWrittenByteCount < 300000)
+        puncher._logTransferStatistics()
+
+    def testCanTransferInParallelDespiteBrokenFiles(self):
+        relativeFilePaths = ['hello.py', 'missing.txt', 'added.txt', 'other_missing.txt']
+        steps = self._transferSteps(relativeFilePaths)
+        journal = scunch.PunchJournal(os.path.join(self.testFolderPath, 'journal'))
+        journal.start(self.externalFolderPath, steps)
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._externalFolderPath = self.externalFolderPath
+        puncher.transferWorkerCount = 2
+        try:
+            puncher._applySteps(steps, None, journal)
+            self.fail(u'broken transfers must cause ScmTransferError')
+        except scunch.ScmTransferError, error:
+            self.assertEqual(sorted(error.pathToErrorMap.keys()), [os.path.join('copied', 'missing.txt'), os.path.join('copied', 'other_missing.txt')])
+        finally:
+            journal.close()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.workFolderPath, 'copied'))), ['added.txt', 'hello.py'])
+        _, _, stepNumberToChangedMap = journal.read()
+        self.assertEqual(sorted(stepNumberToChangedMap.keys()), [0, 1, 3])
+
+    def testCanExamineOnlyChangedPaths(self):
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._setChangedExternalAndWorkEntries(self.externalFolderPath, ['added.txt', os.path.join('docs', 'moved.txt'), 'moved.txt'], None, None, None)
+        self.assertEqual([entry.relativePath for entry in puncher.externalEntries], [os.path.join('docs', ''), 'added.txt', os.path.join('docs', 'moved.txt')])
+        self.assertEqual([entry.relativePath for entry in puncher.workEntries], [os.path.join('docs', ''), 'moved.txt'])
+        puncher._setAddedModifiedRemovedItems()
+        puncher._setCopiedAndMovedEntries()
+        steps = puncher._plannedSteps(None)
+        self.assertEqual([step['action'] for step in steps], ['mkdir', 'transfer', 'add', 'move', 'transfer'])
+
+    def testCanExamineChangedFolders(self):
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._setChangedExternalAndWorkEntries(self.externalFolderPath, ['docs', 'removed.txt'], None, '**/*.txt', None)
+        self.assertEqual([entry.relativePath for entry in puncher.externalEntries], [os.path.join('docs', '')])
+        self.assertEqual([entry.relativePath for entry in puncher.workEntries], [os.path.join('docs', '')])
+
+    def testCanExamineChangedPathsMatchingPatterns(self):
+        self._writeFile(self.externalFolderPath, os.path.join('docs', 'manual.txt'), 'manual\n')
+        self._writeFile(self.externalFolderPath, os.path.join('docs', 'manual.py'), 'pass\n')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        changedPaths = ['hello.py', os.path.join('docs', 'manual.txt'), os.path.join('docs', 'manual.py')]
+        puncher._setChangedExternalAndWorkEntries(self.externalFolderPath, changedPaths, '**/*.py', None, None)
+        self.assertEqual([entry.relativePath for entry in puncher.externalEntries], [os.path.join('docs', ''), os.path.join('docs', 'manual.py'), 'hello.py'])
+
+    def testCanSkipExcludedChangedFolders(self):
+        self._writeFile(self.externalFolderPath, os.path.join('docs', 'manual.txt'), 'manual\n')
+        _tools.makeFolder(os.path.join(self.externalFolderPath, 'docs', 'build'))
+        self._writeFile(self.externalFolderPath, os.path.join('docs', 'build', 'manual.html'), '<html/>\n')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        patternSet = scunch.antglob.AntPatternSet()
+        patternSet.exclude('**/build')
+        for changedPath in (os.path.join('docs', 'build'), 'docs', ''):
+            entries = puncher._entriesForChangedPaths(self.externalFolderPath, [changedPath], patternSet)
+            self.assertFalse([entry for entry in entries if 'build' in entry.parts], changedPath)
+        self.assertEqual(puncher._entriesForChangedPaths(self.externalFolderPath, [os.path.join('docs', 'build')], patternSet), set())
+
+    def testCanRemoveLeftoverTemporaryFiles(self):
+        for relativeTemporaryPath in ('.scunch_crashed.tmp', os.path.join('docs', '.scunch_crashed.tmp')):
+            self._writeFile(self.workFolderPath, relativeTemporaryPath, 'partial')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._setExternalAndWorkEntries(self.externalFolderPath, '', None, None, None)
+        self.assertEqual([entry.relativePath for entry in puncher.workEntries], [os.path.join('docs', ''), 'hello.py', 'moved.txt', 'removed.txt'])
+        self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testCanRemoveLeftoverTemporaryFilesInChangedPaths(self):
+        self._writeFile(self.workFolderPath, os.path.join('docs', '.scunch_crashed.tmp'), 'partial')
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher._setChangedExternalAndWorkEntries(self.externalFolderPath, ['docs'], None, None, None)
+        self.assertEqual([entry.relativePath for entry in puncher.workEntries], [os.path.join('docs', '')])
+        self.assertEqual(self._temporaryPathsInWork(), [])
+
+    def testCanCheckWorkWithLeftoverTemporaryFile(self):
+        class ScmWorkWithStatus(scunch.ScmWork):
+            def __init__(self, localTargetPath, statusItems):
+                super(ScmWorkWithStatus, self).__init__(scunch.ScmStorage(u'file:///'), u'', localTargetPath)
+                self.statusItems = statusItems
+
+            def status(self, relativePathsToExamine, recursive=True):
+                return iter(self.statusItems)
+
+        def unversionedStatusItem(relativePath):
+            result = scunch.ScmStatus(os.path.join(self.workFolderPath, relativePath))
+            result.status = scunch.ScmStatus.Unversioned
+            return result
+
+        temporaryStatusItem = unversionedStatusItem(os.path.join('docs', '.scunch_crashed.tmp'))
+        ScmWorkWithStatus(self.workFolderPath, [temporaryStatusItem]).check()
+        scmWork = ScmWorkWithStatus(self.workFolderPath, [temporaryStatusItem, unversionedStatusItem('other.tmp')])
+        self.assertRaises(scunch.ScmPendingChangesError, scmWork.check)
+
+    def testCanExamineChangedPathsUsingFileSystem(self):
+        class RecordingFileSystem(scunch.antglob.LocalFileSystem):
+            def __init__(self):
+                self.statedPaths = []
+
+            def stat(self, path):
+                self.statedPaths.append(path)
+                return super(RecordingFileSystem, self).stat(path)
+
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        fileSystem = RecordingFileSystem()
+        changedPaths = ['hello.py', 'docs', 'removed.txt', os.path.join('hello.py', 'inside.txt')]
+        entries = puncher._entriesForChangedPaths(self.externalFolderPath, changedPaths, scunch.antglob.AntPatternSet(), fileSystem)
+        self.assertEqual(sorted(entry.relativePath for entry in entries), [os.path.join('docs', ''), os.path.join('docs', 'moved.txt'), 'hello.py'])
+        for changedPath in changedPaths:
+            self.assertTrue(os.path.join(self.externalFolderPath, changedPath) in fileSystem.statedPaths)
+
+    def testFailsOnChangedPathOutsideOfFolder(self):
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        self.assertRaises(scunch.ScmError, puncher._setChangedExternalAndWorkEntries, self.externalFolderPath, [os.path.join(os.pardir, 'hugo.txt')], None, None, None)
+
+    def testCanThrottleScanningChangedPaths(self):
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        puncher.transferOptions = scunch.TransferOptions(maxStatRate=1000000)
+        puncher._setChangedExternalAndWorkEntries(self.externalFolderPath, ['hello.py', 'docs'], None, None, None)
+        self.assertTrue(puncher.transferOptions.statRateLimiter.consumedAmount >= 4)
+
+    def testCanCopyTextFile(self):
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath))
+        textOptions = scunch.TextOptions(None, scunch.TextOptions.Unix, 4, True)
+        sourceFilePath = os.path.join(self.externalFolderPath, 'text.txt')
+        targetFilePath = os.path.join(self.workFolderPath, 'text.txt')
+        for content, expectedContent in (
+            ('conforms\n    already\n', 'conforms\n    already\n'),
+            ('conforms\nat first\n\tbut not later \r\n', 'conforms\nat first\n    but not later\n'),
+            ('missing newline', 'missing newline\n'),
+        ):
+            self._writeFile(self.externalFolderPath, 'text.txt', content)
+            puncher.transferOptions = scunch.TransferOptions(bufferSize=8, dropCache=True, maxReadRate=1000000)
+            puncher._copyTextFile(sourceFilePath, targetFilePath, textOptions)
+            self.assertEqual(puncher.transferOptions.readRateLimiter.consumedAmount, len(content))
+            with open(targetFilePath, 'rb') as targetFile:
+                self.assertEqual(targetFile.read(), expectedContent)
+            self.assertTrue(puncher._hasSameTextContent(sourceFilePath, targetFilePath, textOptions))
+
+
+class HistoryScmPuncherTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_scunchhistory_')
+        self.workFolderPath = os.path.join(self.testFolderPath, 'work')
+        self.snapshotPaths = [os.path.join(self.testFolderPath, 'release_%d' % number) for number in (1, 2, 3)]
+        for folderPath in [self.workFolderPath] + self.snapshotPaths:
+            _tools.makeFolder(os.path.join(folderPath, 'docs'))
+        self._writeFile(self.workFolderPath, 'hello.py', 'print "hi"\n')
+        self._writeFile(self.workFolderPath, os.path.join('docs', 'readme.txt'), 'read me\n')
+        for snapshotPath, helloContent, readmeContent in zip(
+                self.snapshotPaths,
+                ['print "hello"\r\n', 'print "hello"\r\n', 'print "hello world"\r\n'],
+                ['read me\n', 'read me twice\n', 'read me twice\n']):
+            self._writeFile(snapshotPath, 'hello.py', helloContent)
+            self._writeFile(snapshotPath, os.path.join('docs', 'readme.txt'), readmeContent)
+        self.scmWork = scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', self.workFolderPath)
+        self.textOptions = scunch.TextOptions('**/*.py', scunch.TextOptions.Unix)
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def _writeFile(self, folderPath, relativeFilePath, content):
+        filePath = os.path.join(folderPath, relativeFilePath)
+        with open(filePath, 'wb') as targetFile:
+            targetFile.write(content)
+        # Give unchanged files in different snapshots the same modification time.
+        os.utime(filePath, (1000000000, 1000000000 + len(content)))
+
+    def _readWorkFile(self, relativeFilePath):
+        with open(os.path.join(self.workFolderPath, relativeFilePath), 'rb') as workFile:
+            return workFile.read()
+
+    def testCanPunchHistory(self):
+        snapshotPathToModifiedPathsMap = {}
+
+        def rememberModifiedPaths(snapshotPath, changes):
+            snapshotPathToModifiedPathsMap[snapshotPath] = changes.modifiedPaths
+
+        scunch.scunchHistory(self.snapshotPaths, self.scmWork, rememberModifiedPaths, self.textOptions)
+        self.assertEqual(snapshotPathToModifiedPathsMap, {
+            self.snapshotPaths[0]: ['hello.py'],
+            self.snapshotPaths[1]: [os.path.join('docs', 'readme.txt')],
+            self.snapshotPaths[2]: ['hello.py'],
+        })
+        self.assertEqual(self._readWorkFile('hello.py'), 'print "hello world"\n')
+        self.assertEqual(self._readWorkFile(os.path.join('docs', 'readme.txt')), 'read me twice\n')
+
+    def testCanRememberWorkCopyAfterPunch(self):
+        puncher = scunch.HistoryScmPuncher(self.scmWork)
+        puncher.textOptions = self.textOptions
+        puncher.punch(self.snapshotPaths[0])
+        workHelloPath = os.path.join(self.workFolderPath, 'hello.py')
+        self.assertEqual([entry.relativePath for entry in puncher._knownWorkEntries], [os.path.join('docs', ''), os.path.join('docs', 'readme.txt'), 'hello.py'])
+        self.assertEqual(puncher._workPathToDigestMap[workHelloPath], _tools.sha1HexDigest(workHelloPath))
+
+        # Because the files in the next snapshot have the same size and modification time as
+        # in the previous one, they are neither read nor compared with the work copy.
+        self._writeFile(self.snapshotPaths[1], 'hello.py', 'print "HELLO"\r\n')
+        puncher.prepare(self.snapshotPaths[1], textOptions=self.textOptions)
+        puncher.textOptions = self.textOptions
+        changes = puncher.punch(self.snapshotPaths[1])
+        self.assertEqual(changes.modifiedPaths, [os.path.join('docs', 'readme.txt')])
+        self.assertEqual(self._readWorkFile('hello.py'), 'print "hello"\n')
+
+    def testCanDiscardPreparedSnapshotOfOtherFolder(self):
+        puncher = scunch.HistoryScmPuncher(self.scmWork)
+        puncher.prepare(self.snapshotPaths[2])
+        changes = puncher.punch(self.snapshotPaths[1])
+        self.assertEqual(changes.modifiedPaths, [os.path.join('docs', 'readme.txt'), 'hello.py'])
+        self.assertEqual(self._readWorkFile('hello.py'), 'print "hello"\r\n')
+
+
+class ChangedPathsFromLinesTest(unittest.TestCase):
+    def testCanReadPlainPaths(self):
+        self.assertEqual(scunch.changedPathsFromLines([u'hello.py\n', u'\n', u'docs/manual.txt\r\n']), [u'hello.py', u'docs/manual.txt'])
+
+    def testCanReadRsyncItemizeChanges(self):
+        lines = [
+            u'.d..t...... ./\n',
+            u'>f.st...... hello.py\n',
+            u'cd+++++++++ docs/\n',
+            u'>f+++++++++ docs/manual.txt\n',
+            u'cL+++++++++ latest -> docs/manual.txt\n',
+            u'*deleting   obsolete.txt\n',
+            u'.d..t...... source/\n',
+        ]
+        self.assertEqual(scunch.changedPathsFromLines(lines), [u'hello.py', u'docs/', u'docs/manual.txt', u'latest', u'obsolete.txt'])
+
+
+class TextOptionsTest(unittest.TestCase):
+    _Texts = [
+        '',
+        'a',
+        'a\n',
+        'a\r\nb\r\n',
+        'a \t\r\n\n\tb\t\r\r\n',
+        'ab\tc\rd\te\t\n',
+        '\r\r',
+        'no newline at end \t',
+        '\n\n\t\n',
+    ]
+
+    def _convertedLines(self, textOptions, text):
+        return ''.join(textOptions.convertedLine(line) for line in StringIO.StringIO(text))
+
+    def _convertedChunks(self, textOptions, text):
+        return ''.join(convertedChunk for _, convertedChunk in textOptions.convertedChunks(StringIO.StringIO(text)))
+
+    def testCanConvertChunksLikeLines(self):
+        for newLine in (scunch.TextOptions.Dos, scunch.TextOptions.Unix):
+            for tabSize in (scunch.TextOptions.PreserveTabs, 1, 4):
+                for stripTrailing in (False, True):
+                    textOptions = scunch.TextOptions(None, newLine, tabSize, stripTrailing)
+                    for text in TextOptionsTest._Texts:
+                        self.assertEqual(self._convertedChunks(textOptions, text), self._convertedLines(textOptions, text))
+
+    def testCanConvertChunksSplitInsideLines(self):
+        textOptions = scunch.TextOptions(None, scunch.TextOptions.Dos, 4, True)
+        text = ''.join(TextOptionsTest._Texts) * 3
+        chunks = list(textOptions.convertedChunks(StringIO.StringIO(text), 3))
+        self.assertEqual(''.join(chunk for chunk, _ in chunks), text)
+        self.assertEqual(''.join(convertedChunk for _, convertedChunk in chunks), self._convertedLines(textOptions, text))
+
+    def testCanDetectConformingChunks(self):
+        textOptions = scunch.TextOptions(None, scunch.TextOptions.Unix, 4, True)
+        for chunk, convertedChunk in textOptions.convertedChunks(StringIO.StringIO('a\n    b\n\n')):
+            self.assertEqual(chunk, convertedChunk)
+
+
+class TreeFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.testFolderPath = tempfile.mkdtemp(prefix='test_treefingerprint_')
+        self.sourceFolderPath = os.path.join(self.testFolderPath, 'source')
+        _tools.makeFolder(os.path.join(self.sourceFolderPath, 'docs'))
+        self._writeFile('hello.py', 'print "hello"\n')
+        self._writeFile(os.path.join('docs', 'manual.txt'), 'manual\n')
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def _writeFile(self, relativeFilePath, content):
+        with open(os.path.join(self.sourceFolderPath, relativeFilePath), 'wb') as targetFile:
+            targetFile.write(content)
+
+    def testCanDetectChangedFiles(self):
+        fingerprint = scunch.treeFingerprint(self.sourceFolderPath)
+        self.assertEqual(fingerprint, scunch.treeFingerprint(self.sourceFolderPath))
+        self._writeFile('hello.py', 'print "hello, world"\n')
+        changedFingerprint = scunch.treeFingerprint(self.sourceFolderPath)
+        self.assertNotEqual(fingerprint, changedFingerprint)
+        os.rename(os.path.join(self.sourceFolderPath, 'hello.py'), os.path.join(self.sourceFolderPath, 'docs', 'hello.py'))
+        self.assertNotEqual(changedFingerprint, scunch.treeFingerprint(self.sourceFolderPath))
+
+    def testCanIgnoreExcludedFiles(self):
+        fingerprint = scunch.treeFingerprint(self.sourceFolderPath, excludePatternText='**/*.tmp')
+        self._writeFile('some.tmp', 'temporary\n')
+        self.assertEqual(fingerprint, scunch.treeFingerprint(self.sourceFolderPath, excludePatternText='**/*.tmp'))
+
+    def testCanDetectChangedArchive(self):
+        archivePath = os.path.join(self.testFolderPath, 'source.zip')
+        with zipfile.ZipFile(archivePath, 'w') as archive:
+            archive.writestr('hello.py', 'print "hello"\n')
+        fingerprint = scunch.treeFingerprint(archivePath)
+        self.assertEqual(fingerprint, scunch.treeFingerprint(archivePath))
+        self.assertNotEqual(fingerprint, scunch.treeFingerprint(archivePath, excludePatternText='**/*.tmp'))
+        with zipfile.ZipFile(archivePath, 'a') as archive:
+            archive.writestr('added.py', 'print "added"\n')
+        self.assertNotEqual(fingerprint, scunch.treeFingerprint(archivePath))
+
+    def testCanDetectChangedSettings(self):
+        self.assertNotEqual(scunch.treeFingerprint(self.sourceFolderPath, settingsText=u'a'), scunch.treeFingerprint(self.sourceFolderPath, settingsText=u'b'))
+
+    def testCanDetectChangedAfterActions(self):
+        workFolderPath = os.path.join(self.testFolderPath, 'work')
+        settingsTexts = []
+        for afterActionsText in ('none', 'commit'):
+            options, _, _, _, actionsToPerformAfterPunching = scunch.parsedOptions(['scunch', '--after', afterActionsText, self.sourceFolderPath, workFolderPath])
+            settingsTexts.append(scunch._punchSettingsText(options, actionsToPerformAfterPunching))
+        self.assertNotEqual(settingsTexts[0], settingsTexts[1])
+
+    def testCanComputeFingerprintFromFoundEntries(self):
+        self._writeFile('some.tmp', 'temporary\n')
+        entries = scunch.findSourceEntries(self.sourceFolderPath, excludePatternText='**/*.tmp', transferOptions=scunch.TransferOptions(maxStatRate=1000000))
+        self.assertEqual([entry.relativePath for entry in entries], [os.path.join('docs', ''), os.path.join('docs', 'manual.txt'), 'hello.py'])
+        fingerprint = scunch.treeFingerprint(self.sourceFolderPath, excludePatternText='**/*.tmp')
+        self.assertEqual(scunch.treeFingerprint(self.sourceFolderPath, excludePatternText='**/*.tmp', entries=entries), fingerprint)
+        puncher = scunch.ScmPuncher(scunch.ScmWork(scunch.ScmStorage(u'file:///'), u'', os.path.join(self.testFolderPath, 'work')))
+        puncher._externalFolderPath = self.sourceFolderPath
+        puncher.foundExternalEntries = entries
+        self._writeFile('added.py', 'pass\n')
+        self.assertTrue(puncher._findExternalEntries(self.sourceFolderPath, scunch.antglob.AntPatternSet()) is entries)
+
+    def testCanStoreFingerprint(self):
+        fingerprint = scunch.treeFingerprint(self.sourceFolderPath)
+        sourceFingerprint = scunch.SourceFingerprint(os.path.join(self.testFolderPath, 'work'))
+        self.assertFalse(sourceFingerprint.matches(fingerprint))
+        sourceFingerprint.store(fingerprint)
+        self.assertTrue(sourceFingerprint.matches(fingerprint))
+        self.assertFalse(sourceFingerprint.matches(scunch.treeFingerprint(self.sourceFolderPath, settingsText=u'changed')))
+        sourceFingerprint.discard()
+        self.assertFalse(sourceFingerprint.matches(fingerprint))
+
+
+class ScmWorkClassTest(unittest.TestCase):
+    def testCanUseCommandLineClient(self):
+        self.assertTrue(scunch.scmWorkClass('cli') is scunch.ScmWork)
+
+    def testCanUseBindingsIfAvailable(self):
+        if scunch._HasSvnBindings:
+            self.assertTrue(scunch.scmWorkClass('auto') is scunch.SvnBindingsScmWork)
+            self.assertTrue(scunch.scmWorkClass('bindings') is scunch.SvnBindingsScmWork)
+        else:
+            self.assertTrue(scunch.scmWorkClass('auto') is scunch.ScmWork)
+            self.assertRaises(scunch.ScmError, scunch.scmWorkClass, 'bindings')
+
 
 class _ScmTest(_tools.LoggableTestCase):
     def setUp(self):
@@ -123,6 +964,9 @@ class _ScmTest(_tools.LoggableTestCase):
 
 
 class _SvnTest(_ScmTest):
+    #: `scunch.ScmWork` class to use for the work copy.
+    ScmWorkClass = scunch.ScmWork
+
     def setUpEmptyProject(self, project, testFolderPath=_BaseTestFolder):
         """
         Create an empty Subversion repository and an empty work copy with its current contents
@@ -139,7 +983,7 @@ class _SvnTest(_ScmTest):
         self.scmDepot.mkdir(["branches", "tags", "trunk"], "Added project folders.")
         self.workBaseFolderPath = os.path.join(self.testFolderPath, "svnWork")
         self.workFolderPath = os.path.join(self.workBaseFolderPath, self.project)
-        self.scmWork = scunch.ScmWork(self.scmDepot, "trunk", self.workFolderPath, scunch.ScmWork.CheckOutActionReset)
+        self.scmWork = self.ScmWorkClass(self.scmDepot, "trunk", self.workFolderPath, scunch.ScmWork.CheckOutActionReset)
 
     def setUpProject(self, project, testFolderPath=_BaseTestFolder):
         """
@@ -245,6 +1089,24 @@ class BasicTest(_SvnTest):
         self.assertTrue(os.path.exists(whilePyPath))
         self.assertNonNormalStatus({})
 
+    def testCanCheckOutSparseFolders(self):
+        self.setUpProject("testSparseCheckout")
+        self.scmWork.checkout(True, ["loops"])
+        self.assertTrue(os.path.exists(self.scmWork.absolutePath("test file path", os.path.join("loops", "while.py"))))
+        self.assertFalse(os.path.exists(self.scmWork.absolutePath("test file path", "hello.py")))
+        self.assertNonNormalStatus({})
+
+    def testCanSwitchExistingWorkCopy(self):
+        self.setUpProject("testSwitchExistingWorkCopy")
+        self.scmDepot.mkdir(["branches/empty"], "Added empty branch.")
+        helloPyPath = self.scmWork.absolutePath("test file path", "hello.py")
+        markerPath = os.path.join(self.workFolderPath, ".svn", "scunch_test_marker")
+        self.writeTextFile(markerPath, ["Removed if the work copy is checked out again."])
+        branchWork = scunch.ScmWork(self.scmDepot, "branches/empty", self.workFolderPath, scunch.ScmWork.CheckOutActionReset)
+        self.assertTrue(os.path.exists(markerPath))
+        self.assertFalse(os.path.exists(helloPyPath))
+        self.assertEqual(branchWork._info(self.workFolderPath).url, self.scmDepot.absoluteQualifier("branches/empty"))
+
     def testDetectsBrokenAbsolutePath(self):
         self.setUpEmptyProject("testDetectsBrokenAbsolutePath")
         self.assertRaises(scunch.ScmError, self.scmWork.absolutePath, 'broken test path', None)
@@ -312,6 +1174,12 @@ class ScunchTest(_SvnTest):
     def testCanShowOnlineHelp(self):
         self._testMainWithSystemExit(["--help"])
 
+    def testFailsOnUnavailableBindingsBackend(self):
+        if not scunch._HasSvnBindings:
+            self._testMainWithSystemExit(["--backend", "bindings", "/tmp"], 2)
+        else:
+            _log.info('skipping test with Subversion Python bindings installed: %s', 'testFailsOnUnavailableBindingsBackend')
+
     def testCanShowVersionInformation(self):
         self._testMainWithSystemExit(["--version"])
 
@@ -389,6 +1257,29 @@ class ScunchTest(_SvnTest):
         self._testMain(["--before", "none", testScunchWithWorkOnlyPatternPath], workOnlyPath)
         self.assertFalse(os.path.exists(makefilePath))
 
+    def testCanSkipUnchanged(self):
+        self.setUpProject("mainWithSkipUnchanged")
+        scmWork = self.scmWork
+
+        testScunchWithSkipUnchangedPath = self.createTestFolder("testMainSkipUnchanged")
+        scmWork.exportTo(testScunchWithSkipUnchangedPath, clear=True)
+        workPath = scmWork.absolutePath("work folder", "")
+        fingerprintPath = scunch.stateFilePath(workPath, 'fingerprint')
+
+        self._testMain(["--skip-unchanged", "--after", "commit", testScunchWithSkipUnchangedPath], workPath)
+        self.assertTrue(os.path.exists(fingerprintPath))
+
+        # Modify the work copy, which goes unnoticed because the external folder did not change.
+        makefilePath = os.path.join(workPath, "Makefile")
+        self.writeTextFile(makefilePath, ["# Dummy Makefile."])
+        self._testMain(["--skip-unchanged", "--after", "commit", testScunchWithSkipUnchangedPath], workPath)
+        self.assertTrue(os.path.exists(makefilePath))
+
+        self.writeTextFile(os.path.join(testScunchWithSkipUnchangedPath, "added.txt"), ["Added."])
+        self._testMain(["--skip-unchanged", "--before", "none", "--after", "commit", testScunchWithSkipUnchangedPath], workPath)
+        self.assertFalse(os.path.exists(makefilePath))
+        self.assertTrue(os.path.exists(os.path.join(workPath, "added.txt")))
+
     def testMainWithIncludeAndExcludePattern(self):
         self.setUpProject("mainWithIncludeAndExcludePattern")
         scmWork = self.scmWork
@@ -430,6 +1321,108 @@ class ScunchTest(_SvnTest):
         self.assertNonNormalStatus({})
         self.assertFalse(os.path.exists(workReadmeTxtPath))
 
+    def testMainWithHistory(self):
+        self.setUpProject("mainWithHistory")
+        scmWork = self.scmWork
+
+        historyFolderPath = self.createTestFolder("testMainWithHistory")
+        firstSnapshotPath = os.path.join(historyFolderPath, "release_1")
+        secondSnapshotPath = os.path.join(historyFolderPath, "release_2")
+        scmWork.exportTo(firstSnapshotPath, clear=True)
+        scmWork.exportTo(secondSnapshotPath, clear=True)
+        os.remove(os.path.join(firstSnapshotPath, "ReadMe.txt"))
+        self.writeTextFile(os.path.join(secondSnapshotPath, "hello.py"), ["print 'hello history!'"])
+
+        workFolderPath = scmWork.absolutePath("work folder", "")
+        self._testMain(["--history", "--after", "commit", "--message", "Imported {snapshot}.", os.path.join(historyFolderPath, "release_*"), workFolderPath])
+        self.assertNonNormalStatus({})
+        self.assertTrue(os.path.exists(scmWork.absolutePath("test file path", "ReadMe.txt")))
+        self.assertFileContains(scmWork.absolutePath("test file path", "hello.py"), ["print 'hello history!'"])
+
+    def testMainWithRemote(self):
+        self.setUpProject("mainWithRemote")
+        scmWork = self.scmWork
+
+        testScunchWithRemotePath = self.createTestFolder("testMainWithRemote")
+        scmWork.exportTo(testScunchWithRemotePath, clear=True)
+        os.remove(os.path.join(testScunchWithRemotePath, "ReadMe.txt"))
+
+        self._testMain(["--remote", "--depot", self.scmDepotTrunkQualifier, testScunchWithRemotePath])
+        scmWork.update()
+        self.assertFalse(os.path.exists(scmWork.absolutePath("test file path", "ReadMe.txt")))
+
+    def testFailsOnRemoteWithoutDepot(self):
+        self._testMainWithSystemExit(["--remote", "/tmp"], 2)
+
+    def testFailsOnChunkedCommitWithoutCommit(self):
+        self._testMainWithSystemExit(["--commit-chunk-files", "10", "/tmp"], 2)
+
+    def testFailsOnBrokenCommitChunkBytes(self):
+        self._testMainWithSystemExit(["--after", "commit", "--commit-chunk-bytes", "12x", "/tmp"], 2)
+
+    def testFailsOnPlanOnlyWithCommit(self):
+        self._testMainWithSystemExit(["--plan-only", "/tmp/plan", "--after", "commit", "/tmp"], 2)
+
+    def testFailsOnPlanOnlyWithApplyPlan(self):
+        self._testMainWithSystemExit(["--plan-only", "/tmp/plan", "--apply-plan", "/tmp/plan", "/tmp"], 2)
+
+    def testFailsOnRemoteWithSkipUnchanged(self):
+        self._testMainWithSystemExit(["--remote", "--depot", "file:///tmp/repository", "--skip-unchanged", "/tmp"], 2)
+
+    def testFailsOnWatchWithRemote(self):
+        self._testMainWithSystemExit(["--watch", "--remote", "--depot", "file:///tmp/repository", "/tmp"], 2)
+
+    def testFailsOnWatchWithLowerNames(self):
+        self._testMainWithSystemExit(["--watch", "--names", "lower", "/tmp"], 2)
+
+    def testFailsOnChangesWithWatch(self):
+        self._testMainWithSystemExit(["--changes", "-", "--watch", "/tmp"], 2)
+
+    def testFailsOnChangesWithSkipUnchanged(self):
+        self._testMainWithSystemExit(["--changes", "-", "--skip-unchanged", "/tmp"], 2)
+
+    def testFailsOnBrokenMaxRate(self):
+        self._testMainWithSystemExit(["--max-read-rate", "0", "/tmp"], 2)
+        self._testMainWithSystemExit(["--max-write-rate", "fast", "/tmp"], 2)
+        self._testMainWithSystemExit(["--max-stat-rate", "0", "/tmp"], 2)
+
+    def testFailsOnFsyncBatchWithoutBatchMode(self):
+        self._testMainWithSystemExit(["--fsync-batch", "10", "/tmp"], 2)
+        self._testMainWithSystemExit(["--fsync", "batch", "--fsync-batch", "0", "/tmp"], 2)
+
+    def testFailsOnArchiveWithWatchOrChanges(self):
+        testFolderPath = tempfile.mkdtemp(prefix='test_scunch_')
+        try:
+            archivePath = os.path.join(testFolderPath, 'external.zip')
+            with zipfile.ZipFile(archivePath, 'w') as archive:
+                archive.writestr('hello.txt', 'hello\n')
+            self._testMainWithSystemExit(["--watch", archivePath], 2)
+            self._testMainWithSystemExit(["--changes", "-", archivePath], 2)
+            plainPath = os.path.join(testFolderPath, 'plain.txt')
+            with open(plainPath, 'wb') as plainFile:
+                plainFile.write('no archive\n')
+            self._testMainWithSystemExit([plainPath], 2)
+        finally:
+            _tools.removeFolder(testFolderPath)
+
+    def testFailsOnBrokenHistory(self):
+        self._testMainWithSystemExit(["--history", "--after", "commit", "/tmp"], 2)
+        self._testMainWithSystemExit(["--history", "/tmp", "/tmp"], 2)
+        self._testMainWithSystemExit(["--history", "--after", "commit", "--watch", "/tmp", "/tmp"], 2)
+        self._testMainWithSystemExit(["--history", "--after", "commit,purge", "/tmp", "/tmp"], 2)
+        self._testMainWithSystemExit(["--history", "--after", "commit", "/tmp/scunch_no_such_snapshot_*", "/tmp"], 2)
+
+    def testFailsOnBrokenDeltaThreshold(self):
+        self._testMainWithSystemExit(["--delta-threshold", "-1", "/tmp"], 2)
+        self._testMainWithSystemExit(["--delta-threshold", "large", "/tmp"], 2)
+
+    def testFailsOnBrokenBufferSize(self):
+        self._testMainWithSystemExit(["--buffer-size", "0", "/tmp"], 2)
+        self._testMainWithSystemExit(["--buffer-size", "many", "/tmp"], 2)
+
+    def testFailsOnRemoteWithCheckout(self):
+        self._testMainWithSystemExit(["--remote", "--depot", "file:///tmp/repository", "--before", "checkout", "/tmp"], 2)
+
     def testMainWithCheckAndPendingChanges(self):
         self.setUpProject("mainCheckAndPendingChanges")
         scmWork = self.scmWork
@@ -554,6 +1547,71 @@ class ScmPuncherTest(_SvnTest):
         self.assertNonNormalStatus({})
         self._testAfterPunch(testPunchWithClonePath)
 
+    def testCanResumeInterruptedPunch(self):
+        self.setUpProject("punchResume")
+        scmWork = self.scmWork
+        testPunchResumePath = self.createTestFolder("testPunchResume")
+        scmWork.exportTo(testPunchResumePath, clear=True)
+        self.writeTextFile(os.path.join(testPunchResumePath, "added.py"), ["# Added."])
+        self.writeTextFile(os.path.join(testPunchResumePath, "hello.py"), ["print 'changed'"])
+        os.remove(os.path.join(testPunchResumePath, "ReadMe.txt"))
+        journalPath = scunch.stateFilePath(scmWork.localTargetPath, 'journal')
+
+        interruptedPuncher = scunch.ScmPuncher(scmWork)
+        interruptedPuncher.journalPath = journalPath
+        originalApplyStep = interruptedPuncher._applyStep
+
+        def applyStepAndInterruptOnRemove(step, textOptions, isResumed=False):
+            if step['action'] == 'remove':
+                raise KeyboardInterrupt()
+            return originalApplyStep(step, textOptions, isResumed)
+
+        interruptedPuncher._applyStep = applyStepAndInterruptOnRemove
+        self.assertRaises(KeyboardInterrupt, interruptedPuncher.punch, testPunchResumePath)
+        self.assertTrue(os.path.exists(journalPath))
+        self.assertNonNormalStatus({scunch.ScmStatus.Added: 1, scunch.ScmStatus.Modified: 1})
+
+        changes = scunch.scunchResume(scmWork, journalPath)
+        self.assertFalse(os.path.exists(journalPath))
+        self.assertEqual(changes.addedPaths, ["added.py"])
+        self.assertEqual(changes.modifiedPaths, ["hello.py"])
+        self.assertEqual(changes.removedPaths, ["ReadMe.txt"])
+        self.assertNonNormalStatus({scunch.ScmStatus.Added: 1, scunch.ScmStatus.Modified: 1, scunch.ScmStatus.Removed: 1})
+        self._testAfterPunch(testPunchResumePath)
+
+    def testCanApplyPlan(self):
+        self.setUpProject("punchPlan")
+        scmWork = self.scmWork
+        testPunchPlanPath = self.createTestFolder("testPunchPlan")
+        scmWork.exportTo(testPunchPlanPath, clear=True)
+        self.writeTextFile(os.path.join(testPunchPlanPath, "added.py"), ["# Added."])
+        self.writeTextFile(os.path.join(testPunchPlanPath, "hello.py"), ["print 'changed'"])
+        os.remove(os.path.join(testPunchPlanPath, "ReadMe.txt"))
+        planPath = os.path.join(self.createTestFolder("testPunchPlanFile"), "plan")
+
+        scunch.scunchPlan(testPunchPlanPath, scmWork.localTargetPath, planPath)
+        self.assertNonNormalStatus({})
+        changes = scunch.scunchApplyPlan(testPunchPlanPath, scmWork, planPath)
+        self.assertEqual(changes.addedPaths, ["added.py"])
+        self.assertEqual(changes.modifiedPaths, ["hello.py"])
+        self.assertEqual(changes.removedPaths, ["ReadMe.txt"])
+        self._testAfterPunch(testPunchPlanPath)
+
+    def testCanPunchChangedPaths(self):
+        self.setUpProject("punchChanges")
+        scmWork = self.scmWork
+        testPunchChangesPath = self.createTestFolder("testPunchChanges")
+        scmWork.exportTo(testPunchChangesPath, clear=True)
+        self.writeTextFile(os.path.join(testPunchChangesPath, "added.py"), ["# Added."])
+        self.writeTextFile(os.path.join(testPunchChangesPath, "hello.py"), ["print 'changed'"])
+        os.remove(os.path.join(testPunchChangesPath, "ReadMe.txt"))
+
+        changes = scunch.scunchChanges(testPunchChangesPath, scmWork, ["added.py", "hello.py", "ReadMe.txt"])
+        self.assertEqual(changes.addedPaths, ["added.py"])
+        self.assertEqual(changes.modifiedPaths, ["hello.py"])
+        self.assertEqual(changes.removedPaths, ["ReadMe.txt"])
+        self._testAfterPunch(testPunchChangesPath)
+
     def testPunchWithLowerCopy(self):
         self.setUpEmptyProject("punchWithLowerCopy")
         externalPunchWithLowerCopyPath = self.createTestFolder("externalPunchWithLowerCopy")
@@ -597,6 +1655,29 @@ class ScmPuncherTest(_SvnTest):
         self.assertNonNormalStatus({scunch.ScmStatus.Added: 15})
         self._testAfterPunch(externalPunchWithLowerCopyPath, names=scunch.LowerNameTransformation)
 
+    def testCanImportIntoEmptyWorkCopy(self):
+        self.setUpEmptyProject("punchImport")
+        externalImportPath = self.createTestFolder("externalPunchImport")
+        _tools.makeFolder(os.path.join(externalImportPath, "Docs"))
+        self.writeBinaryFile(os.path.join(externalImportPath, "Docs", "ReadMe.TXT"), "1\r\n2\r\n")
+        self.writeBinaryFile(os.path.join(externalImportPath, "Logo.PNG"), "\x89PNG\r\n")
+        _tools.makeFolder(os.path.join(externalImportPath, "Empty"))
+
+        importPuncher = scunch.ScmPuncher(self.scmWork)
+        importPuncher.nameTransformation = scunch.LowerNameTransformation
+        importPuncher.textOptions = scunch.TextOptions("**/*.txt", scunch.TextOptions.Unix)
+        importPuncher.importMessage = "Imported test files."
+        changes = importPuncher.punch(externalImportPath)
+        self.assertTrue(changes.isCommitted)
+        self.assertEqual(changes.addedPaths, ["docs" + os.sep, os.path.join("docs", "readme.txt"), "empty" + os.sep, "logo.png"])
+        self.assertNonNormalStatus({})
+
+        self.scmWork.update()
+        with open(self.scmWork.absolutePath("test file", os.path.join("docs", "readme.txt")), "rb") as readMeFile:
+            self.assertEqual(readMeFile.read(), "1\n2\n")
+        self.assertTrue(os.path.isdir(self.scmWork.absolutePath("test folder", "empty")))
+        self._testAfterPunch(externalImportPath, importPuncher.textOptions, scunch.LowerNameTransformation)
+
     def testPunchWithLowerNameClash(self):
         self.setUpEmptyProject("punchWithLowerNameClash")
         externalPunchWithLowerNameClashPath = self.createTestFolder("externalPunchWithLowerNameClash")
@@ -712,6 +1793,77 @@ class ScmPuncherTest(_SvnTest):
         self.assertNonNormalStatus({scunch.ScmStatus.Added: 2, scunch.ScmStatus.Removed: 2})
         self._testAfterPunch(testPunchWithMovedFilesPath)
 
+    def testPunchReturnsChangesToCommit(self):
+        self.setUpProject("punchReturnsChangesToCommit")
+        scmWork = self.scmWork
+
+        testPunchReturnsChangesToCommitPath = self.createTestFolder("testPunchReturnsChangesToCommit")
+        scmWork.exportTo(testPunchReturnsChangesToCommitPath, clear=True)
+        self.writeTextFile(os.path.join(testPunchReturnsChangesToCommitPath, "ReadMe.txt"), ["A changed read me."])
+        self.writeTextFile(os.path.join(testPunchReturnsChangesToCommitPath, "ReadMeToo.txt"), ["Read me, too."])
+        os.remove(os.path.join(testPunchReturnsChangesToCommitPath, "loops", "while.py"))
+
+        puncher = scunch.ScmPuncher(scmWork)
+        changes = puncher.punch(testPunchReturnsChangesToCommitPath)
+        self.assertEqual(changes.addedPaths, ["ReadMeToo.txt"])
+        self.assertEqual(changes.modifiedPaths, ["ReadMe.txt"])
+        self.assertEqual(changes.removedPaths, [os.path.join("loops", "while.py")])
+        self.assertEqual(changes.movedPaths, [])
+
+        scmWork.commit(changes.relativePathsToCommit(), "Punched changes.", recursive=False)
+        self.assertNonNormalStatus({})
+
+    def testCanCommitRemovedFolderWithFiles(self):
+        self.setUpProject("canCommitRemovedFolderWithFiles")
+        scmWork = self.scmWork
+
+        testCanCommitRemovedFolderWithFilesPath = self.createTestFolder("testCanCommitRemovedFolderWithFiles")
+        scmWork.exportTo(testCanCommitRemovedFolderWithFilesPath, clear=True)
+        self.writeTextFile(os.path.join(testCanCommitRemovedFolderWithFilesPath, "ReadMe.txt"), ["A changed read me."])
+        _tools.removeFolder(os.path.join(testCanCommitRemovedFolderWithFilesPath, "loops"))
+
+        puncher = scunch.ScmPuncher(scmWork)
+        changes = puncher.punch(testCanCommitRemovedFolderWithFilesPath)
+        self.assertEqual(changes.modifiedPaths, ["ReadMe.txt"])
+        self.assertEqual(changes.removedPaths, [os.path.join("loops", "")])
+
+        scmWork.commitChanges(changes, "Punched changes.")
+        self.assertNonNormalStatus({})
+        self.assertFalse(os.path.exists(scmWork.absolutePath("test folder path", "loops")))
+
+    def testCanCommitRemovedFolderWithFilesInChunks(self):
+        self.setUpProject("canCommitRemovedFolderWithFilesInChunks")
+        scmWork = self.scmWork
+
+        testCanCommitRemovedFolderWithFilesInChunksPath = self.createTestFolder("testCanCommitRemovedFolderWithFilesInChunks")
+        scmWork.exportTo(testCanCommitRemovedFolderWithFilesInChunksPath, clear=True)
+        self.writeTextFile(os.path.join(testCanCommitRemovedFolderWithFilesInChunksPath, "ReadMe.txt"), ["A changed read me."])
+        _tools.removeFolder(os.path.join(testCanCommitRemovedFolderWithFilesInChunksPath, "loops"))
+
+        puncher = scunch.ScmPuncher(scmWork)
+        changes = puncher.punch(testCanCommitRemovedFolderWithFilesInChunksPath)
+        chunkedCommit = scunch.ChunkedCommit(scmWork)
+        chunkedCommit.commit(changes, "Punched changes.", 1)
+        self.assertFalse(chunkedCommit.hasPendingChunks())
+        self.assertNonNormalStatus({})
+        self.assertFalse(os.path.exists(scmWork.absolutePath("test folder path", "loops")))
+
+    def testPunchWithFilesMovedToSameFolder(self):
+        self.setUpProject("punchWithFilesMovedToSameFolder")
+        scmWork = self.scmWork
+
+        testPunchWithFilesMovedToSameFolderPath = self.createTestFolder("testPunchWithFilesMovedToSameFolder")
+        scmWork.exportTo(testPunchWithFilesMovedToSameFolderPath, clear=True)
+        for name in ["hello.py", "ReadMe.txt"]:
+            shutil.move(os.path.join(testPunchWithFilesMovedToSameFolderPath, name), os.path.join(testPunchWithFilesMovedToSameFolderPath, "media", name))
+
+        movingPuncher = scunch.ScmPuncher(scmWork)
+        changes = movingPuncher.punch(testPunchWithFilesMovedToSameFolderPath)
+        self.assertEqual(len(changes.movedPaths), 2)
+
+        self.assertNonNormalStatus({scunch.ScmStatus.Added: 2, scunch.ScmStatus.Removed: 2})
+        self._testAfterPunch(testPunchWithFilesMovedToSameFolderPath)
+
     def testPunchWithMovedRoot(self):
         self.setUpProject("punchWithMovedRoot")
         scmWork = self.scmWork
@@ -853,6 +2005,262 @@ class ScmPuncherTest(_SvnTest):
         outerPuncher.punch(testPunchWithPatternPath)
 
 
+class RemoteEntriesTest(unittest.TestCase):
+    _ListXml = """<?xml version="1.0" encoding="UTF-8"?>
+<lists>
+<list path="file:///repository/trunk">
+<entry kind="dir"><name>docs</name><commit revision="2"><author>tester</author><date>2013-06-01T12:00:00.000000Z</date></commit></entry>
+<entry kind="file"><name>docs/h\xc3\xa4ll\xc3\xb6.txt</name><size>12</size><commit revision="2"><author>tester</author><date>2013-06-01T12:00:00.000000Z</date></commit></entry>
+<entry kind="dir"><name>empty</name><commit revision="2"><author>tester</author><date>2013-06-01T12:00:00.000000Z</date></commit></entry>
+<entry kind="file"><name>setup.py</name><size>3</size><commit revision="2"><author>tester</author><date>2013-06-01T12:00:00.000000Z</date></commit></entry>
+</list>
+</lists>
+"""
+    _PropertiesXml = """<?xml version="1.0" encoding="UTF-8"?>
+<properties>
+<target path="file:///repository/trunk/docs/h%C3%A4ll%C3%B6.txt"><property name="scunch:sha1">0123456789abcdef</property></target>
+</properties>
+"""
+
+    def testCanParseSvnList(self):
+        listHandler = scunch._SvnListContentHandler()
+        scunch.xml.sax.parseString(RemoteEntriesTest._ListXml, listHandler)
+        self.assertEqual(listHandler.listQualifier, u'file:///repository/trunk')
+        self.assertEqual(listHandler.entries, [
+            (u'dir', u'docs', None),
+            (u'file', u'docs/h\xe4ll\xf6.txt', 12),
+            (u'dir', u'empty', None),
+            (u'file', u'setup.py', 3),
+        ])
+
+    def testCanParseSvnPropget(self):
+        propertiesHandler = scunch._SvnPropertiesContentHandler()
+        scunch.xml.sax.parseString(RemoteEntriesTest._PropertiesXml, propertiesHandler)
+        self.assertEqual(propertiesHandler.targetToValueMap, {
+            u'file:///repository/trunk/docs/h%C3%A4ll%C3%B6.txt': u'0123456789abcdef'
+        })
+
+    def testCanFindRemoteEntries(self):
+        entries = [
+            scunch.RemoteEntry([u'docs', u''], scunch.antglob.FileSystemEntry.Folder),
+            scunch.RemoteEntry([u'docs', u'index.rst'], scunch.antglob.FileSystemEntry.File, 12, u'0123'),
+            scunch.RemoteEntry([u'docs', u'logo.png'], scunch.antglob.FileSystemEntry.File, 1234),
+            scunch.RemoteEntry([u'empty', u''], scunch.antglob.FileSystemEntry.Folder),
+            scunch.RemoteEntry([u'setup.py'], scunch.antglob.FileSystemEntry.File, 3),
+        ]
+        remoteFileSystem = scunch._RemoteFileSystem(entries)
+        patternSet = scunch.antglob.AntPatternSet()
+        patternSet.exclude(u'**/*.png')
+        foundEntries = set(remoteFileSystem.entryFor(path) for path in patternSet.ifind(u'', True, remoteFileSystem))
+        self.assertEqual(sorted(entry.relativePath for entry in foundEntries), [
+            u'docs' + os.sep,
+            os.path.join(u'docs', u'index.rst'),
+            u'empty' + os.sep,
+            u'setup.py',
+        ])
+        indexRstEntry = remoteFileSystem.entryFor(os.path.join(u'docs', u'index.rst'))
+        self.assertEqual(indexRstEntry.size, 12)
+        self.assertEqual(indexRstEntry.checksum, u'0123')
+
+
+class RemoteScmPuncherActionsTest(unittest.TestCase):
+    """
+    TestCase for the ``svnmucc`` actions of `scunch.RemoteScmPuncher`.
+    """
+    class _RemoteWorkWithoutRepository(scunch.RemoteScmWork):
+        """
+        Remote work that lists and exports files from ``pathToContentMap`` and only remembers
+        what it commits.
+        """
+        def __init__(self, pathToContentMap):
+            super(RemoteScmPuncherActionsTest._RemoteWorkWithoutRepository, self).__init__(scunch.ScmStorage('file:///repository/'), 'trunk')
+            self.pathToContentMap = pathToContentMap
+            self.commits = []
+
+        def listEntries(self, relativeFolderToList=""):
+            result = []
+            for path, content in sorted(self.pathToContentMap.items()):
+                parts = path.split(u'/')
+                if content is None:
+                    result.append(scunch.RemoteEntry(parts, scunch.antglob.FileSystemEntry.Folder))
+                else:
+                    result.append(scunch.RemoteEntry(parts, scunch.antglob.FileSystemEntry.File, len(content)))
+            return result
+
+        def exportFile(self, relativeFilePath, targetFilePath):
+            with open(targetFilePath, 'wb') as targetFile:
+                targetFile.write(self.pathToContentMap[relativeFilePath.replace(os.sep, u'/')])
+
+        def commitActions(self, actions, message):
+            self.commits.append((actions, message))
+
+    def setUp(self):
+        scunch._setUpEncoding()
+        self.externalFolderPath = tempfile.mkdtemp(prefix='test_remotescmpuncher_')
+
+    def tearDown(self):
+        _tools.removeFolder(self.externalFolderPath)
+
+    def _writeExternalFile(self, relativePath, content):
+        externalFilePath = os.path.join(self.externalFolderPath, relativePath)
+        _tools.makeFolder(os.path.dirname(externalFilePath))
+        with open(externalFilePath, 'wb') as externalFile:
+            externalFile.write(content)
+        return externalFilePath
+
+    def _checksum(self, content):
+        return unicode(hashlib.sha1(content).hexdigest())
+
+    def testCanReplaceFileAndFolderWithSameName(self):
+        remoteWork = RemoteScmPuncherActionsTest._RemoteWorkWithoutRepository({
+            u'ReadMe.txt': 'read me',
+            u'loops/': None,
+            u'loops/while.py': 'while True: pass',
+        })
+        infoTxtPath = self._writeExternalFile(os.path.join('ReadMe.txt', 'info.txt'), 'read me')
+        loopsPath = self._writeExternalFile('loops', 'no more loops')
+        self._writeExternalFile('while.py', 'while True: pass')
+        changes = scunch.scunchRemote(self.externalFolderPath, remoteWork, u'Punched.')
+        self.assertEqual(changes.movedPaths, [(os.path.join(u'loops', u'while.py'), u'while.py')])
+        self.assertEqual(remoteWork.commits, [([
+            'rm', u'ReadMe.txt',
+            'rm', u'loops',
+            'mkdir', u'ReadMe.txt',
+            'put', infoTxtPath, u'ReadMe.txt/info.txt', 'propset', u'scunch:sha1', self._checksum('read me'), u'ReadMe.txt/info.txt',
+            'put', loopsPath, u'loops', 'propset', u'scunch:sha1', self._checksum('no more loops'), u'loops',
+            'cp', 'HEAD', u'loops/while.py', u'while.py',
+            'propset', u'scunch:sha1', self._checksum('while True: pass'), u'while.py',
+        ], u'Punched.')])
+
+    def testCanStoreChecksumOfUnchangedFiles(self):
+        remoteWork = RemoteScmPuncherActionsTest._RemoteWorkWithoutRepository({
+            u'hello.py': 'print "hello"',
+            u'setup.py': 'pass',
+        })
+        self._writeExternalFile('hello.py', 'print "hello"')
+        setupPyPath = self._writeExternalFile('setup.py', 'exit')
+        changes = scunch.scunchRemote(self.externalFolderPath, remoteWork, u'Punched.')
+        self.assertEqual(changes.modifiedPaths, [u'setup.py'])
+        self.assertEqual(remoteWork.commits, [([
+            'propset', u'scunch:sha1', self._checksum('print "hello"'), u'hello.py',
+            'put', setupPyPath, u'setup.py', 'propset', u'scunch:sha1', self._checksum('exit'), u'setup.py',
+        ], u'Punched.')])
+
+    def testCanStoreChecksumWithoutChanges(self):
+        remoteWork = RemoteScmPuncherActionsTest._RemoteWorkWithoutRepository({u'hello.py': 'print "hello"'})
+        self._writeExternalFile('hello.py', 'print "hello"')
+        changes = scunch.scunchRemote(self.externalFolderPath, remoteWork, u'Punched.')
+        self.assertEqual(len(changes), 0)
+        self.assertEqual(remoteWork.commits, [(['propset', u'scunch:sha1', self._checksum('print "hello"'), u'hello.py'], u'Punched.')])
+
+
+class RemoteScmPuncherTest(_SvnTest):
+    """
+    TestCase for `scunch.RemoteScmPuncher`.
+    """
+    def setUp(self):
+        scunch._setUpEncoding()
+
+    def testCanPunchIntoRepository(self):
+        self.setUpProject("remotePunch")
+        scmWork = self.scmWork
+        externalFolderPath = self.createTestFolder("externalRemotePunch")
+        scmWork.exportTo(externalFolderPath, clear=True)
+
+        # Change the external folder to cause an add, a modification, a move and a remove.
+        _tools.makeFolder(os.path.join(externalFolderPath, "docs"))
+        self.writeTextFile(os.path.join(externalFolderPath, "docs", "index.rst"), ["Ohsome", "======"])
+        self.writeTextFile(os.path.join(externalFolderPath, "hello.py"), ["print 'hello remote!'"])
+        shutil.move(os.path.join(externalFolderPath, "loops", "while.py"), os.path.join(externalFolderPath, "while.py"))
+        os.remove(os.path.join(externalFolderPath, "ReadMe.txt"))
+
+        remoteWork = scunch.RemoteScmWork(self.scmDepot, "trunk")
+        changes = scunch.scunchRemote(externalFolderPath, remoteWork, u"Punched remote changes.")
+        self.assertEqual(changes.addedPaths, [u'docs' + os.sep, os.path.join(u'docs', u'index.rst')])
+        self.assertEqual(changes.modifiedPaths, [u'hello.py'])
+        self.assertEqual(changes.movedPaths, [(os.path.join(u'loops', u'while.py'), u'while.py')])
+        self.assertEqual(changes.removedPaths, [u'ReadMe.txt'])
+
+        # Check that the work copy reflects the changes committed remotely.
+        scmWork.update()
+        self.assertFileContains(scmWork.absolutePath("test file path", "hello.py"), ["print 'hello remote!'"])
+        self.assertTrue(os.path.exists(scmWork.absolutePath("test file path", "while.py")))
+        self.assertFalse(os.path.exists(scmWork.absolutePath("test file path", "ReadMe.txt")))
+
+        # Punching again must not result in any changes.
+        changes = scunch.scunchRemote(externalFolderPath, remoteWork, u"Punched remote changes again.")
+        self.assertEqual(len(changes), 0)
+
+    def testCanPunchTextFilesIntoRepository(self):
+        self.setUpEmptyProject("remotePunchText")
+        externalFolderPath = self.createTestFolder("externalRemotePunchText")
+        with open(os.path.join(externalFolderPath, "hello.py"), "wb") as helloPyFile:
+            helloPyFile.write("print 'hello'   \r\n")
+        textOptions = scunch.TextOptions("**/*.py", scunch.TextOptions.Unix, stripTrailing=True)
+        remoteWork = scunch.RemoteScmWork(self.scmDepot, "trunk")
+        changes = scunch.scunchRemote(externalFolderPath, remoteWork, u"Punched text file.", textOptions)
+        self.assertEqual(changes.addedPaths, [u'hello.py'])
+        self.scmWork.update()
+        with open(self.scmWork.absolutePath("test file path", "hello.py"), "rb") as helloPyFile:
+            self.assertEqual(helloPyFile.read(), "print 'hello'\n")
+        changes = scunch.scunchRemote(externalFolderPath, remoteWork, u"Punched text file again.", textOptions)
+        self.assertEqual(len(changes), 0)
+
+
+@unittest.skipUnless(scunch._HasSvnBindings, 'Subversion Python bindings must be installed')
+class SvnBindingsScmWorkTest(_SvnTest):
+    """
+    TestCase for `scunch.SvnBindingsScmWork`.
+    """
+    ScmWorkClass = scunch.SvnBindingsScmWork
+
+    def testCanAddMoveRemoveAndCommit(self):
+        self.setUpProject("bindingsAddMoveRemoveAndCommit")
+        scmWork = self.scmWork
+        self.assertTrue(isinstance(scmWork, scunch.SvnBindingsScmWork))
+        self.assertNonNormalStatus({})
+
+        scmWork.mkdir("tools")
+        self.writeTextFile(scmWork.absolutePath("test file path", "setup.py"), ["# Setup."])
+        scmWork.add(["setup.py"], recursive=False)
+        scmWork.move(["hello.py", os.path.join("loops", "while.py")], "tools")
+        scmWork.remove(["ReadMe.txt"])
+        self.assertNonNormalStatus({scunch.ScmStatus.Added: 4, scunch.ScmStatus.Removed: 3})
+
+        scmWork.commit([""], u"Reorganized test files.")
+        self.assertNonNormalStatus({})
+        self.assertTrue(os.path.exists(scmWork.absolutePath("test file path", os.path.join("tools", "hello.py"))))
+        self.assertFalse(os.path.exists(scmWork.absolutePath("test file path", "ReadMe.txt")))
+
+    def testCanReset(self):
+        self.setUpProject("bindingsReset")
+        scmWork = self.scmWork
+        self.writeTextFile(scmWork.absolutePath("test file path", "hello.py"), ["print 'changed'"])
+        self.writeTextFile(scmWork.absolutePath("test file path", "unversioned.txt"), ["whatever"])
+        self.assertNonNormalStatus({scunch.ScmStatus.Modified: 1, scunch.ScmStatus.Unversioned: 1})
+        self.assertRaises(scunch.ScmPendingChangesError, scmWork.check)
+        scmWork.reset()
+        self.assertNonNormalStatus({})
+
+    def testCanCheckOutAgain(self):
+        self.setUpProject("bindingsCheckOutAgain")
+        self.scmWork.checkout(True)
+        self.assertTrue(os.path.exists(self.scmWork.absolutePath("test file path", "hello.py")))
+        self.assertNonNormalStatus({})
+
+    def testFailsOnMissingPath(self):
+        self.setUpEmptyProject("bindingsMissingPath")
+        self.assertRaises(scunch.ScmError, self.scmWork.add, ["no_such_file.txt"])
+
+
+@unittest.skipUnless(scunch._HasSvnBindings, 'Subversion Python bindings must be installed')
+class SvnBindingsScmPuncherTest(ScmPuncherTest):
+    """
+    TestCase for `scunch.ScmPuncher` using `scunch.SvnBindingsScmWork`.
+    """
+    ScmWorkClass = scunch.SvnBindingsScmWork
+
+
 if __name__ == '__main__':  # pragma: no cover
     scunch._setUpLogging(logging.INFO)
     logging.getLogger("antglob.pattern").setLevel(logging.INFO)
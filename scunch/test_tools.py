@@ -17,9 +17,11 @@ Tests for `_tools`.
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from __future__ import absolute_import
 
+import hashlib
 import logging
 import os
 import tempfile
+import time
 import unittest
 
 from scunch import _tools
@@ -45,6 +47,52 @@ class FolderTest(_tools.LoggableTestCase):
         _tools.removeFolder(testFolderPath)
 
 
+class HasSameContentTest(_tools.LoggableTestCase):
+    def setUp(self):
+        super(HasSameContentTest, self).setUp()
+        self.testFolderPath = tempfile.mkdtemp(prefix="scunch_test_")
+
+    def tearDown(self):
+        _tools.removeFolder(self.testFolderPath)
+
+    def _writtenFile(self, name, data):
+        result = os.path.join(self.testFolderPath, name)
+        with open(result, 'wb') as targetFile:
+            targetFile.write(data)
+        return result
+
+    def testCanDetectSameContent(self):
+        somePath = self._writtenFile('some.bin', 'abc' * 100000)
+        otherPath = self._writtenFile('other.bin', 'abc' * 100000)
+        self.assertTrue(_tools.hasSameContent(somePath, otherPath))
+
+    def testCanDetectEmptyFilesAsSame(self):
+        somePath = self._writtenFile('some.bin', '')
+        otherPath = self._writtenFile('other.bin', '')
+        self.assertTrue(_tools.hasSameContent(somePath, otherPath))
+
+    def testCanDetectDifferentSize(self):
+        somePath = self._writtenFile('some.bin', 'abc')
+        otherPath = self._writtenFile('other.bin', 'abcd')
+        self.assertFalse(_tools.hasSameContent(somePath, otherPath))
+
+    def testCanDetectDifferentContent(self):
+        somePath = self._writtenFile('some.bin', 'abc' * 100000 + 'x')
+        otherPath = self._writtenFile('other.bin', 'abc' * 100000 + 'y')
+        self.assertFalse(_tools.hasSameContent(somePath, otherPath))
+
+    def testCanComputeSha1HexDigest(self):
+        self.assertEqual('da39a3ee5e6b4b0d3255bfef95601890afd80709', _tools.sha1HexDigest(self._writtenFile('empty.bin', '')))
+        self.assertEqual(hashlib.sha1('abc' * 100000).hexdigest(), _tools.sha1HexDigest(self._writtenFile('some.bin', 'abc' * 100000)))
+
+    def testCanCompareAndHashWithSmallBufferAndDropCache(self):
+        somePath = self._writtenFile('some.bin', 'abc' * 1000)
+        otherPath = self._writtenFile('other.bin', 'abc' * 999 + 'abd')
+        self.assertTrue(_tools.hasSameContent(somePath, somePath, bufferSize=7, dropCache=True))
+        self.assertFalse(_tools.hasSameContent(somePath, otherPath, bufferSize=7, dropCache=True))
+        self.assertEqual(hashlib.sha1('abc' * 1000).hexdigest(), _tools.sha1HexDigest(somePath, bufferSize=7, dropCache=True))
+
+
 class HumanReadableListTest(_tools.LoggableTestCase):
     def testRendersEmptyListAsEmptyText(self):
         self.assertEqual(u'', _tools.humanReadableList([]))
@@ -59,6 +107,20 @@ class HumanReadableListTest(_tools.LoggableTestCase):
         self.assertEqual(u"'red', 'green' or 'blue'", _tools.humanReadableList(['red', 'green', 'blue']))
 
 
+class ParsedByteCountTest(_tools.LoggableTestCase):
+    def testCanParseByteCount(self):
+        self.assertEqual(_tools.parsedByteCount('123'), 123)
+        self.assertEqual(_tools.parsedByteCount('2k'), 2048)
+        self.assertEqual(_tools.parsedByteCount('3 MB'), 3 * 1024 * 1024)
+        self.assertEqual(_tools.parsedByteCount('1G'), 1024 * 1024 * 1024)
+
+    def testFailsOnBrokenByteCount(self):
+        self.assertRaises(ValueError, _tools.parsedByteCount, '')
+        self.assertRaises(ValueError, _tools.parsedByteCount, 'k')
+        self.assertRaises(ValueError, _tools.parsedByteCount, '12x')
+        self.assertRaises(ValueError, _tools.parsedByteCount, '-1')
+
+
 class OneOrOtherTextTest(_tools.LoggableTestCase):
     def testShows0AsPlural(self):
         self.assertEqual(u'0 items', _tools.oneOrOtherText(0, 'item', 'items'))
@@ -70,6 +132,56 @@ class OneOrOtherTextTest(_tools.LoggableTestCase):
         self.assertEqual(u'2 items', _tools.oneOrOtherText(2, 'item', 'items'))
 
 
+class RateLimiterTest(_tools.LoggableTestCase):
+    def testCanConsumeBurstWithoutWaiting(self):
+        rateLimiter = _tools.RateLimiter(1000)
+        rateLimiter.consume(500)
+        rateLimiter.consume(500)
+        self.assertEqual(rateLimiter.consumedAmount, 1000)
+        self.assertEqual(rateLimiter.waitDuration, 0.0)
+
+    def testCanWaitForBucketToRefill(self):
+        rateLimiter = _tools.RateLimiter(1000)
+        rateLimiter.consume(1000)
+        startTime = time.time()
+        rateLimiter.consume(100)
+        self.assertTrue(time.time() - startTime >= 0.05)
+        self.assertTrue(0.05 <= rateLimiter.waitDuration <= 0.1)
+
+    def testCanShareLimitBetweenThreads(self):
+        rateLimiter = _tools.RateLimiter(1000)
+        rateLimiter.consume(1000)
+        startTime = time.time()
+        results = list(_tools.parallelResults(rateLimiter.consume, [50] * 4, 4))
+        self.assertEqual([error for _, _, error in results], [None] * 4)
+        self.assertEqual(rateLimiter.consumedAmount, 1200)
+        # The last thread has to wait for the units of all other threads.
+        self.assertTrue(time.time() - startTime >= 0.15)
+
+
+class ParallelResultsTest(_tools.LoggableTestCase):
+    def testCanComputeParallelResults(self):
+        results = list(_tools.parallelResults(lambda number: number * number, xrange(100), 4))
+        self.assertEqual(sorted(results), [(number, number * number, None) for number in range(100)])
+
+    def testCanComputeWithSingleWorker(self):
+        self.assertEqual(list(_tools.parallelResults(abs, [-1], 1)), [(-1, 1, None)])
+        self.assertEqual(list(_tools.parallelResults(abs, [], 1)), [])
+
+    def testCanCollectAllErrors(self):
+        def brokenOnOddNumbers(number):
+            if number % 2:
+                raise ValueError(u'number must be even: %d' % number)
+            return number
+        results = sorted(_tools.parallelResults(brokenOnOddNumbers, range(10), 3))
+        self.assertEqual([item for item, result, error in results if error is None], [0, 2, 4, 6, 8])
+        brokenResults = [(item, result, error) for item, result, error in results if error is not None]
+        self.assertEqual([item for item, _, _ in brokenResults], [1, 3, 5, 7, 9])
+        for _, result, error in brokenResults:
+            self.assertEqual(result, None)
+            self.assertTrue(isinstance(error, ValueError))
+
+
 class BundledPathsTest(_tools.LoggableTestCase):
     def testCanBundlePaths(self):
         self.assertEqual(
@@ -88,6 +200,11 @@ class BundledPathsTest(_tools.LoggableTestCase):
             manyPathsBundle,
             [['1'], ['two.txt'], ['three.jpeg'], ['0004.tmp'], ['5'], ['six.six']])
 
+    def testCanBundlePathsWithTrailingOptions(self):
+        self.assertEqual(
+            list(_tools.bundledPathsToRun(['c'], ['1', '2', '3'], 20, ['target'])),
+            [['1'], ['2'], ['3']])
+
     def testCanSplitLargeBundle(self):
         manyPathsBundle = list(_tools.bundledPathsToRun(['c'], [(str(i) + '.txt') for i in xrange(100)], 15))
         self.assertNotEqual(len(manyPathsBundle), 1)
@@ -0,0 +1,79 @@
+"""
+Tests for `_watch`.
+"""
+# Copyright (C) 2011 - 2013 Thomas Aglassinger
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import absolute_import
+
+import logging
+import os
+import struct
+import tempfile
+import unittest
+
+from scunch import _tools
+from scunch import _watch
+
+_log = logging.getLogger("test")
+
+
+def _event(watchDescriptor, mask, name):
+    paddedName = name + '\0' * (16 - len(name) % 16)
+    return struct.pack('iIII', watchDescriptor, mask, 0, len(paddedName)) + paddedName
+
+
+class ParsedEventsTest(unittest.TestCase):
+    def testCanParseEvents(self):
+        data = _event(1, _watch._InCreate, 'hugo.txt') + _event(2, _watch._InDelete | _watch._InIsDir, 'docs')
+        self.assertEqual(_watch.parsedEvents(data), [(1, _watch._InCreate, 'hugo.txt'), (2, _watch._InDelete | _watch._InIsDir, 'docs')])
+
+    def testCanParseEmptyEvents(self):
+        self.assertEqual(_watch.parsedEvents(''), [])
+
+
+class FolderWatcherTest(_tools.LoggableTestCase):
+    def setUp(self):
+        super(FolderWatcherTest, self).setUp()
+        self.testFolderPath = tempfile.mkdtemp(prefix="scunch_test_")
+        os.mkdir(os.path.join(self.testFolderPath, 'docs'))
+        try:
+            self.watcher = _watch.FolderWatcher(self.testFolderPath)
+        except _watch.WatchError, error:
+            _tools.removeFolder(self.testFolderPath)
+            self.skipTest(unicode(error))
+
+    def tearDown(self):
+        self.watcher.close()
+        _tools.removeFolder(self.testFolderPath)
+        super(FolderWatcherTest, self).tearDown()
+
+    def _writeFile(self, relativeFilePath):
+        with open(os.path.join(self.testFolderPath, relativeFilePath), 'wb') as targetFile:
+            targetFile.write(relativeFilePath)
+
+    def testCanFindChangedPaths(self):
+        self._writeFile(os.path.join('docs', 'manual.txt'))
+        os.mkdir(os.path.join(self.testFolderPath, 'source'))
+        self.assertEqual(sorted(self.watcher.changedPaths(0.1)), [os.path.join('docs', 'manual.txt'), 'source'])
+
+        # Files in new folders are watched too.
+        self._writeFile(os.path.join('source', 'hugo.py'))
+        os.rename(os.path.join(self.testFolderPath, 'docs', 'manual.txt'), os.path.join(self.testFolderPath, 'manual.txt'))
+        self.assertEqual(sorted(self.watcher.changedPaths(0.1)), [os.path.join('docs', 'manual.txt'), 'manual.txt', os.path.join('source', 'hugo.py')])
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()